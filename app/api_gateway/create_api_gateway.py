@@ -13,6 +13,12 @@ api_gateway_client = boto3.client('apigateway')
 api_name = 'InvoiceAPI'  # Nome do API Gateway
 api_stage_name = 'prod'  # Nome do estágio (ex: prod, dev)
 api_resource_path = 'api/v1/invoice'  # Caminho do recurso
+# Caminho do recurso que gera URLs pré-assinadas para upload direto ao S3
+api_presign_resource_path = 'api/v1/invoice/upload-url'
+# Caminho do recurso de upload em lote (várias notas por requisição)
+api_batch_resource_path = 'api/v1/invoice/batch'
+# Caminho do recurso que consulta o andamento do processamento (modo assíncrono)
+api_status_resource_path = 'api/v1/invoice/status'
 region = 'us-east-1'  # Região da AWS
 
 # Tipos de mídia binária
@@ -24,7 +30,107 @@ binary_media_types = [
 ]
 
 
-def create_api_gateway(lambda_function_arn, description='API para upload de arquivos'):
+def get_or_create_resource(api_id, resource_path):
+    """
+    Garante que todos os segmentos do caminho existam no API Gateway.
+
+    Args:
+        api_id (str): ID do API Gateway.
+        resource_path (str): Caminho do recurso (ex: 'api/v1/invoice').
+
+    Returns:
+        str: ID do recurso final do caminho.
+    """
+    resources = api_gateway_client.get_resources(
+        restApiId=api_id, limit=500)['items']
+    # Indexa pelo caminho completo para não confundir segmentos de mesmo nome
+    resources_by_path = {res['path']: res['id'] for res in resources}
+
+    resource_id = resources_by_path['/']
+    current_path = ''
+    for part in resource_path.split('/'):
+        current_path += f"/{part}"
+        if current_path in resources_by_path:
+            resource_id = resources_by_path[current_path]
+            logger.info(f"Recurso '{part}' já existe. ID: {resource_id}")
+        else:
+            resource_response = api_gateway_client.create_resource(
+                restApiId=api_id,
+                parentId=resource_id,
+                pathPart=part
+            )
+            resource_id = resource_response['id']
+            resources_by_path[current_path] = resource_id
+            logger.info(
+                f"Recurso '{part}' criado com sucesso. ID: {resource_id}")
+    return resource_id
+
+
+def add_lambda_method(api_id, resource_id, resource_path, http_method, lambda_function_arn, statement_id):
+    """
+    Cria o método no recurso com integração AWS_PROXY para a Lambda.
+
+    Args:
+        api_id (str): ID do API Gateway.
+        resource_id (str): ID do recurso.
+        resource_path (str): Caminho do recurso (usado na permissão da Lambda).
+        http_method (str): Método HTTP (ex: 'POST', 'GET').
+        lambda_function_arn (str): ARN da Lambda integrada.
+        statement_id (str): ID da permissão concedida ao API Gateway.
+    """
+    # Verifica se o método já existe
+    resource = api_gateway_client.get_resource(
+        restApiId=api_id,
+        resourceId=resource_id
+    )
+    methods = resource.get('resourceMethods', {})
+    if http_method not in methods:
+        # Cria o método
+        api_gateway_client.put_method(
+            restApiId=api_id,
+            resourceId=resource_id,
+            httpMethod=http_method,
+            authorizationType='NONE'
+        )
+        logger.info(
+            f"Método {http_method} criado no recurso '{resource_path}'.")
+
+        # Configura a integração com a Lambda
+        api_gateway_client.put_integration(
+            restApiId=api_id,
+            resourceId=resource_id,
+            httpMethod=http_method,
+            type='AWS_PROXY',
+            integrationHttpMethod='POST',
+            uri=f"arn:aws:apigateway:{region}:lambda:path/2015-03-31/functions/{lambda_function_arn}/invocations"
+        )
+        logger.info(
+            f"Integração com Lambda configurada para o método {http_method} em '{resource_path}'.")
+
+    # Concede permissão para o API Gateway invocar a Lambda
+    lambda_client = boto3.client('lambda')
+    try:
+        account_id = boto3.client(
+            'sts').get_caller_identity().get('Account')
+        source_arn = f"arn:aws:execute-api:{region}:{account_id}:{api_id}/*/*/{resource_path}"
+
+        lambda_client.add_permission(
+            FunctionName=lambda_function_arn,
+            StatementId=statement_id,
+            Action='lambda:InvokeFunction',
+            Principal='apigateway.amazonaws.com',
+            SourceArn=source_arn
+        )
+        logger.info(
+            f"Permissão concedida para o API Gateway invocar a Lambda em '{resource_path}'.")
+    except lambda_client.exceptions.ResourceConflictException:
+        logger.info(
+            f"Permissão já existe para o API Gateway invocar a Lambda em '{resource_path}'.")
+    except Exception as e:
+        logger.error(f"Erro ao conceder permissão: {e}")
+
+
+def create_api_gateway(lambda_function_arn, description='API para upload de arquivos', presign_lambda_arn=None):
     try:
         # Verifica se o API Gateway já existe
         apis = api_gateway_client.get_rest_apis()['items']
@@ -33,9 +139,8 @@ def create_api_gateway(lambda_function_arn, description='API para upload de arqu
 
         if existing_api:
             api_id = existing_api['id']
+            # Os recursos são conferidos mesmo assim, para incluir rotas novas
             logger.info(f"API Gateway '{api_name}' já existe. ID: {api_id}")
-            # Retorna a URL da API existente
-            return f"https://{api_id}.execute-api.{region}.amazonaws.com/{api_stage_name}/{api_resource_path}"
         else:
             # Cria o API Gateway
             api_response = api_gateway_client.create_rest_api(
@@ -59,82 +164,29 @@ def create_api_gateway(lambda_function_arn, description='API para upload de arqu
             )
             logger.info(f"Tags adicionadas ao API Gateway '{api_name}'.")
 
-        # Obtém o ID do recurso raiz
-        root_resource_id = api_gateway_client.get_resources(restApiId=api_id)[
-            'items'][0]['id']
-
-        # Cria o recurso '/api/v1/invoice'
-        resource_id = root_resource_id
-        for part in api_resource_path.split('/'):
-            # Verifica se o recurso já existe
-            resources = api_gateway_client.get_resources(restApiId=api_id)[
-                'items']
-            existing_resource = next(
-                (res for res in resources if res.get('pathPart') == part), None)
-            if existing_resource:
-                resource_id = existing_resource['id']
-                logger.info(f"Recurso '{part}' já existe. ID: {resource_id}")
-            else:
-                resource_response = api_gateway_client.create_resource(
-                    restApiId=api_id,
-                    parentId=resource_id,
-                    pathPart=part
-                )
-                resource_id = resource_response['id']
-                logger.info(
-                    f"Recurso '{part}' criado com sucesso. ID: {resource_id}")
-
-        # Verifica se o método POST já existe
-        resource = api_gateway_client.get_resource(
-            restApiId=api_id,
-            resourceId=resource_id
-        )
-        methods = resource.get('resourceMethods', {})
-        if 'POST' not in methods:
-            # Cria o método POST
-            api_gateway_client.put_method(
-                restApiId=api_id,
-                resourceId=resource_id,
-                httpMethod='POST',
-                authorizationType='NONE'
-            )
-            logger.info(
-                f"Método POST criado no recurso '{api_resource_path}'.")
-
-            # Configura a integração com a Lambda
-            api_gateway_client.put_integration(
-                restApiId=api_id,
-                resourceId=resource_id,
-                httpMethod='POST',
-                type='AWS_PROXY',
-                integrationHttpMethod='POST',
-                uri=f"arn:aws:apigateway:{region}:lambda:path/2015-03-31/functions/{lambda_function_arn}/invocations"
-            )
-            logger.info(
-                "Integração com Lambda s3_upload_lambda configurada para o método POST.")
-
-        # Concede permissão para o API Gateway invocar a Lambda
-        lambda_client = boto3.client('lambda')
-        try:
-            # Substitua {account_id} pelo ID da sua conta AWS
-            account_id = boto3.client(
-                'sts').get_caller_identity().get('Account')
-            source_arn = f"arn:aws:execute-api:{region}:{account_id}:{api_id}/*/*/{api_resource_path}"
-
-            lambda_client.add_permission(
-                FunctionName=lambda_function_arn,
-                StatementId='apigateway-invoke',
-                Action='lambda:InvokeFunction',
-                Principal='apigateway.amazonaws.com',
-                SourceArn=source_arn
-            )
-            logger.info(
-                "Permissão concedida para o API Gateway invocar a Lambda.")
-        except lambda_client.exceptions.ResourceConflictException:
-            logger.info(
-                "Permissão já existe para o API Gateway invocar a Lambda.")
-        except Exception as e:
-            logger.error(f"Erro ao conceder permissão: {e}")
+        # Cria o recurso '/api/v1/invoice' com o método POST (upload pela Lambda)
+        resource_id = get_or_create_resource(api_id, api_resource_path)
+        add_lambda_method(api_id, resource_id, api_resource_path, 'POST',
+                          lambda_function_arn, 'apigateway-invoke')
+
+        # Cria o recurso '/api/v1/invoice/batch' (lote de arquivos na mesma Lambda)
+        batch_resource_id = get_or_create_resource(
+            api_id, api_batch_resource_path)
+        add_lambda_method(api_id, batch_resource_id, api_batch_resource_path, 'POST',
+                          lambda_function_arn, 'apigateway-invoke-batch')
+
+        # Cria o recurso '/api/v1/invoice/status' (GET, consulta da execução assíncrona)
+        status_resource_id = get_or_create_resource(
+            api_id, api_status_resource_path)
+        add_lambda_method(api_id, status_resource_id, api_status_resource_path, 'GET',
+                          lambda_function_arn, 'apigateway-invoke-status')
+
+        # Cria o recurso '/api/v1/invoice/upload-url' (upload direto ao S3)
+        if presign_lambda_arn:
+            presign_resource_id = get_or_create_resource(
+                api_id, api_presign_resource_path)
+            add_lambda_method(api_id, presign_resource_id, api_presign_resource_path, 'POST',
+                              presign_lambda_arn, 'apigateway-invoke-presign')
 
         # Implanta o API Gateway
         api_gateway_client.create_deployment(
@@ -146,6 +198,9 @@ def create_api_gateway(lambda_function_arn, description='API para upload de arqu
         # Retorna a URL do API Gateway
         api_url = f"https://{api_id}.execute-api.{region}.amazonaws.com/{api_stage_name}/{api_resource_path}"
         logger.info(f"API Gateway URL: {api_url}")
+        if presign_lambda_arn:
+            logger.info(
+                f"URL de upload direto: https://{api_id}.execute-api.{region}.amazonaws.com/{api_stage_name}/{api_presign_resource_path}")
         return api_url
 
     except Exception as e:
@@ -153,9 +208,10 @@ def create_api_gateway(lambda_function_arn, description='API para upload de arqu
         return None
 
 
-def create_api(lambda_function_arn):
+def create_api(lambda_function_arn, presign_lambda_arn=None):
     api_url = create_api_gateway(
-        lambda_function_arn, description='API para upload de arquivos S3')
+        lambda_function_arn, description='API para upload de arquivos S3',
+        presign_lambda_arn=presign_lambda_arn)
     if api_url:
         logger.info(f"API Gateway criado com sucesso. URL: {api_url}")
         return api_url
@@ -1,9 +1,14 @@
 # app/create_lambdas.py
+import base64
 import boto3
+import hashlib
+import json
 import os
+import threading
 import zipfile
-import time
 import logging
+from deploy_graph import DEPLOY_MAX_WORKERS, DeployGraph
+from readiness import Deadline, wait_for_lambda_updated
 
 
 # Configuração do logger (ajustado para produção)
@@ -11,47 +16,116 @@ logger = logging.getLogger()
 logger.setLevel(logging.WARNING)  # Apenas warning e erros em produção
 
 
-def zip_lambda(lambda_name, source_file):
-    # Função para compactar os arquivos das Lambdas
-    zip_filename = f"{lambda_name}.zip"
-    with zipfile.ZipFile(zip_filename, 'w') as zipf:
-        zipf.write(source_file, os.path.basename(source_file))
-    return zip_filename
+# Módulos compartilhados incluídos no pacote de todas as Lambdas
+SHARED_LAMBDA_MODULES = ['lambdas/aws_clients.py', 'lambdas/claim_check.py',
+                         'lambdas/content_keys.py', 'lambdas/image_normalizer.py',
+                         'lambdas/ingestion_queue.py', 'lambdas/pipeline.py',
+                         'lambdas/results_store.py', 'lambdas/textract_cache.py',
+                         'lambdas/textract_engine.py']
 
 
-def get_s3_file_content(bucket_name, key):
-    s3_client = boto3.client('s3')
-    try:
-        response = s3_client.get_object(Bucket=bucket_name, Key=key)
-        return response['Body'].read()  # Retorna o conteúdo do arquivo
-    except Exception as e:
-        logger.error(f"Erro ao obter o arquivo do S3: {e}")
-        return None
+# Memória, timeout e arquitetura padrão das Lambdas sem dimensionamento próprio
+DEFAULT_MEMORY_SIZE = 128
+DEFAULT_TIMEOUT = 30
+DEFAULT_ARCHITECTURE = 'x86_64'
+# Dimensionamento medido pelo power tuning (power_tuning.py), por Lambda:
+# {"s3_upload": {"memory_size": 512, "timeout": 20, "architecture": "arm64"}}
+LAMBDA_SIZING_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lambda_sizing.json')
+
+
+# Clientes boto3 criados uma única vez: a criação de clientes não é thread-safe,
+# mas os clientes podem ser usados por várias threads
+_clients_lock = threading.Lock()
+_clients = {}
+
+
+def get_client(service_name):
+    with _clients_lock:
+        if service_name not in _clients:
+            _clients[service_name] = boto3.client(service_name)
+        return _clients[service_name]
+
+
+# Data fixa dos arquivos no zip: o mesmo código gera sempre o mesmo pacote (e o mesmo hash)
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# Metadado do objeto no S3 com o SHA-256 (hex) do arquivo enviado
+SHA256_METADATA_KEY = 'sha256'
+
 
+def load_lambda_sizing(path=LAMBDA_SIZING_FILE):
+    # Dimensionamento gravado pelo power tuning; vazio se o arquivo não existir
+    try:
+        with open(path, encoding='utf-8') as sizing_file:
+            return json.load(sizing_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Dimensionamento das Lambdas ignorado ({path}): {e}")
+        return {}
+
+
+def lambda_settings(lambda_name, config, sizing):
+    # Memória, timeout e arquitetura da Lambda: a configuração explícita
+    # prevalece sobre o power tuning, que prevalece sobre os padrões
+    measured = sizing.get(lambda_name, {})
+    settings = {
+        key: config.get(key, measured.get(key, default))
+        for key, default in (('memory_size', DEFAULT_MEMORY_SIZE), ('timeout', DEFAULT_TIMEOUT),
+                             ('architecture', DEFAULT_ARCHITECTURE))
+    }
+    # Layers com binários nativos (ex: spaCy, pyarrow) são montadas para uma arquitetura:
+    # a da configuração, que o power tuning não pode trocar
+    if config.get('layer_zip_path'):
+        architecture = config.get('architecture', DEFAULT_ARCHITECTURE)
+        if settings['architecture'] != architecture:
+            logger.warning(f"Arquitetura {settings['architecture']} do power tuning ignorada para "
+                           f"'{lambda_name}': a layer foi montada para {architecture}.")
+        settings['architecture'] = architecture
+    return settings
+
+
+def zip_lambda(lambda_name, source_file, extra_files=()):
+    # Função para compactar os arquivos das Lambdas (e os módulos compartilhados)
+    # sem carimbos de data e em ordem fixa, para que o pacote seja determinístico
+    zip_filename = f"{lambda_name}.zip"
+    entries = {os.path.basename(path): path for path in (source_file, *extra_files)}
+    with zipfile.ZipFile(zip_filename, 'w') as zipf:
+        for arcname in sorted(entries):
+            info = zipfile.ZipInfo(arcname, date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16  # -rw-r--r--
+            with open(entries[arcname], 'rb') as source:
+                zipf.writestr(info, source.read())
+    return zip_filename
 
-def compare_zip_files(local_zip_path, bucket_name, s3_key):
-    with open(local_zip_path, 'rb') as local_file:
-        local_content = local_file.read()
 
-    s3_content = get_s3_file_content(bucket_name, s3_key)
+def file_sha256(file_name):
+    # SHA-256 do arquivo local (bytes), lido em blocos
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.digest()
 
-    if s3_content is None:
-        return False  # Não foi possível obter o conteúdo do S3
 
-    return local_content == s3_content
+def lambda_code_sha256(file_name):
+    # Hash no formato usado pela Lambda em CodeSha256 (SHA-256 em Base64)
+    return base64.b64encode(file_sha256(file_name)).decode('ascii')
 
 
 def upload_to_s3(bucket_name, file_name, key):
-    s3_client = boto3.client('s3')
+    # Envia o arquivo apenas se o SHA-256 local for diferente do registrado no objeto.
+    # Retorna True se o arquivo foi enviado, False se já estava atualizado e None em caso de erro
+    s3_client = get_client('s3')
+    local_sha256 = file_sha256(file_name).hex()
 
-    # Verifica se o arquivo já foi enviado
+    # Verifica se o arquivo já foi enviado (apenas os metadados, sem baixar o objeto)
     try:
-        s3_client.head_object(Bucket=bucket_name, Key=key)
-        # Se o arquivo existe, faça a comparação
-        if compare_zip_files(file_name, bucket_name, key):
+        response = s3_client.head_object(Bucket=bucket_name, Key=key)
+        if response.get('Metadata', {}).get(SHA256_METADATA_KEY) == local_sha256:
             logger.info(
                 f"O arquivo '{file_name}' não foi alterado. Pulando o upload.")
-            return
+            return False
     except s3_client.exceptions.ClientError as e:
         # Se o erro for 404, significa que o arquivo não existe
         if e.response['Error']['Code'] == '404':
@@ -60,42 +134,98 @@ def upload_to_s3(bucket_name, file_name, key):
         else:
             logger.error(
                 f"Erro ao verificar a existência do arquivo '{key}': {e}")
-            return
+            return None
 
     # Se o arquivo local for diferente, faça o upload
     try:
-        s3_client.upload_file(file_name, bucket_name, key)
+        s3_client.upload_file(file_name, bucket_name, key, ExtraArgs={
+            'Metadata': {SHA256_METADATA_KEY: local_sha256}})
         logger.info(f"Arquivo '{file_name}' enviado para o S3 com sucesso.")
+        return True
     except Exception as e:
         logger.error(f"Erro ao enviar o arquivo '{file_name}' para o S3: {e}")
+        return None
 
 
-def create_lambda(lambda_name, role_arn, bucket_lambda_code_name, bucket_layers_name, layer_zip_path, bucket_imagens_name, layer_description, handler, description):
-    # Função para criar uma Lambda
-    lambda_client = boto3.client('lambda')
+def package_lambda_code(lambda_name, bucket_lambda_code_name, extra_files=()):
+    # Compacta o código da Lambda (com os módulos compartilhados e os módulos
+    # próprios da Lambda, ex: utils/nlp_utils.py) e envia ao S3
+    zip_filename = zip_lambda(
+        lambda_name, f"lambdas/{lambda_name}.py", [*SHARED_LAMBDA_MODULES, *extra_files])
+    # Sem o zip no S3 a função seria implantada com o código anterior (ou não existiria)
+    if upload_to_s3(bucket_lambda_code_name, zip_filename, f"{lambda_name}.zip") is None:
+        raise RuntimeError(f"Falha ao enviar o código da Lambda '{lambda_name}' para o S3.")
+    # Hash comparado com o CodeSha256 da função para evitar atualizações sem mudança
+    return lambda_code_sha256(zip_filename)
 
-    # Compactar o arquivo da Lambda
-    zip_filename = zip_lambda(lambda_name, f"lambdas/{lambda_name}.py")
 
-    # Enviar o arquivo .zip para o S3
-    upload_to_s3(bucket_lambda_code_name, zip_filename, f"{lambda_name}.zip")
+def publish_lambda_layer(lambda_name, bucket_layers_name, layer_zip_path, layer_description, architecture=DEFAULT_ARCHITECTURE):
+    # Envia e publica a layer da Lambda; retorna None se não houver layer
+    # architecture: arquitetura da função, declarada como compatível na layer
+    if not layer_zip_path:
+        return None
 
-    # Se layer_zip_path não for None, faça o upload da layer
-    if layer_zip_path:
-        # Nome da layer associado à Lambda
-        layer_key = f"layers/{lambda_name}-layers.zip"
-        upload_to_s3(bucket_layers_name, layer_zip_path, layer_key)
+    # Nome da layer associado à Lambda
+    layer_name = f"{lambda_name}-layers"
+    layer_key = f"layers/{layer_name}.zip"
+    if upload_to_s3(bucket_layers_name, layer_zip_path, layer_key) is None:
+        raise RuntimeError(f"Falha ao enviar a layer '{layer_name}' para o S3.")
 
-        # Criar a layer
-        layer_arn = create_layer(
-            # Nome da layer, que inclui o nome da Lambda para clareza
-            layer_name=f"{lambda_name}-layers",
-            bucket_name=bucket_layers_name,
-            zip_file=layer_key,  # Usar a chave do arquivo no S3
-            description=layer_description  # Passando a descrição da layer
-        )
-    else:
-        layer_arn = None  # Defina como None se não houver layer
+    # Reaproveita a última versão publicada se o conteúdo e a arquitetura forem os mesmos
+    layer_arn = find_layer_version(layer_name, lambda_code_sha256(layer_zip_path), architecture)
+    if layer_arn:
+        logger.info(f"Layer '{layer_name}' não foi alterada. Usando {layer_arn}.")
+        return layer_arn
+
+    # Criar a layer
+    return create_layer(
+        # Nome da layer, que inclui o nome da Lambda para clareza
+        layer_name=f"{lambda_name}-layers",
+        bucket_name=bucket_layers_name,
+        zip_file=layer_key,  # Usar a chave do arquivo no S3
+        description=layer_description,  # Passando a descrição da layer
+        compatible_architectures=[architecture]
+    )
+
+
+def find_layer_version(layer_name, code_sha256, architecture=DEFAULT_ARCHITECTURE):
+    # ARN da última versão da layer se ela tiver o mesmo conteúdo e for
+    # compatível com a arquitetura da função, ou None
+    lambda_client = get_client('lambda')
+    try:
+        versions = lambda_client.list_layer_versions(
+            LayerName=layer_name, MaxItems=1).get('LayerVersions', [])
+        if not versions:
+            return None
+        latest = lambda_client.get_layer_version_by_arn(
+            Arn=versions[0]['LayerVersionArn'])
+        if latest['Content'].get('CodeSha256') == code_sha256 and \
+                architecture in latest.get('CompatibleArchitectures', [DEFAULT_ARCHITECTURE]):
+            return latest['LayerVersionArn']
+    except Exception as e:
+        logger.warning(f"Não foi possível consultar a layer '{layer_name}': {e}")
+    return None
+
+
+def create_lambda(lambda_name, role_arn, bucket_lambda_code_name, bucket_layers_name, layer_zip_path, bucket_imagens_name, layer_description, handler, description, extra_files=(), environment=None, memory_size=DEFAULT_MEMORY_SIZE, timeout=DEFAULT_TIMEOUT, architecture=DEFAULT_ARCHITECTURE, reserved_concurrency=None):
+    # Função para criar uma Lambda (etapas em sequência; create_lambdas_main as paraleliza)
+    code_sha256 = package_lambda_code(lambda_name, bucket_lambda_code_name, extra_files)
+    layer_arn = publish_lambda_layer(
+        lambda_name, bucket_layers_name, layer_zip_path, layer_description, architecture)
+    return deploy_lambda_function(
+        lambda_name, role_arn, bucket_lambda_code_name, bucket_imagens_name,
+        handler, description, layer_arn, code_sha256, environment,
+        memory_size, timeout, architecture, reserved_concurrency)
+
+
+def deploy_lambda_function(lambda_name, role_arn, bucket_lambda_code_name, bucket_imagens_name, handler, description, layer_arn=None, code_sha256=None, environment=None, memory_size=DEFAULT_MEMORY_SIZE, timeout=DEFAULT_TIMEOUT, architecture=DEFAULT_ARCHITECTURE, reserved_concurrency=None):
+    # Cria a função Lambda ou atualiza o código e a configuração de uma existente.
+    # As atualizações são puladas quando o código e a configuração não mudaram.
+    # environment: variáveis próprias da Lambda (ex: SPACY_MODEL), além das comuns
+    # memory_size, timeout e architecture: dimensionamento (ver lambda_settings)
+    # reserved_concurrency: instâncias simultâneas reservadas (None remove a reserva)
+    lambda_client = get_client('lambda')
+    environment = environment or {}
 
     # Verificar se a função Lambda já existe
     try:
@@ -103,32 +233,48 @@ def create_lambda(lambda_name, role_arn, bucket_lambda_code_name, bucket_layers_
         logger.info(f"Função Lambda '{lambda_name}' já existe. Atualizando...")
 
         # Aguardar até que a função Lambda não esteja em estado de atualização
-        while True:
-            function_config = lambda_client.get_function_configuration(
-                FunctionName=lambda_name)
-            if function_config['State'] == 'Active':
-                break
-            logger.info(
-                f"Aguardando conclusão da atualização da função Lambda '{lambda_name}'...")
-            time.sleep(5)
-
-        # Atualizar o código da função Lambda
-        response = lambda_client.update_function_code(
-            FunctionName=lambda_name,
-            S3Bucket=bucket_lambda_code_name,
-            S3Key=f"{lambda_name}.zip"
-        )
-
-        # Atualizar a configuração da função Lambda
-        lambda_client.update_function_configuration(
-            FunctionName=lambda_name,
-            Environment={
-                'Variables': {
-                    'SOURCE_BUCKET': bucket_imagens_name,
-                    'STEP_FUNCTIONS_ARN': ''  # Placeholder ou vazio por enquanto
-                }
-            }
-        )
+        deadline = Deadline()
+        function_config = wait_for_lambda_updated(lambda_client, lambda_name, deadline)
+        response = function_config
+
+        # Atualizar o código da função Lambda (a arquitetura só muda junto com o código)
+        same_architecture = function_config.get('Architectures', [DEFAULT_ARCHITECTURE]) == [architecture]
+        if code_sha256 and function_config.get('CodeSha256') == code_sha256 and same_architecture:
+            logger.info(f"Código da Lambda '{lambda_name}' não foi alterado.")
+        else:
+            response = lambda_client.update_function_code(
+                FunctionName=lambda_name,
+                S3Bucket=bucket_lambda_code_name,
+                S3Key=f"{lambda_name}.zip",
+                Architectures=[architecture]
+            )
+            # A configuração só pode ser alterada quando a atualização do código termina
+            wait_for_lambda_updated(lambda_client, lambda_name, deadline)
+
+        # Atualizar a configuração da função Lambda, preservando as variáveis
+        # definidas depois da criação (ex: STEP_FUNCTIONS_ARN, INGESTION_QUEUE_URL)
+        current_variables = function_config.get('Environment', {}).get('Variables', {})
+        variables = {'STEP_FUNCTIONS_ARN': '',  # Placeholder ou vazio por enquanto
+                     **current_variables,
+                     **environment,
+                     'SOURCE_BUCKET': bucket_imagens_name}
+        current_layers = [layer['Arn'] for layer in function_config.get('Layers', [])]
+        config_update = {}
+        if variables != current_variables:
+            config_update['Environment'] = {'Variables': variables}
+        # Sem layer configurada, as layers de implantações anteriores são removidas
+        layers = [layer_arn] if layer_arn else []
+        if current_layers != layers:
+            config_update['Layers'] = layers
+        if function_config.get('MemorySize') != memory_size:
+            config_update['MemorySize'] = memory_size
+        if function_config.get('Timeout') != timeout:
+            config_update['Timeout'] = timeout
+        if config_update:
+            lambda_client.update_function_configuration(
+                FunctionName=lambda_name, **config_update)
+        else:
+            logger.info(f"Configuração da Lambda '{lambda_name}' não foi alterada.")
         logger.info(f"Função Lambda '{lambda_name}' atualizada com sucesso.")
     except lambda_client.exceptions.ResourceNotFoundException:
         logger.info(f"Função Lambda '{lambda_name}' não existe. Criando...")
@@ -142,11 +288,13 @@ def create_lambda(lambda_name, role_arn, bucket_lambda_code_name, bucket_layers_
                 'S3Bucket': bucket_lambda_code_name,
                 'S3Key': f"{lambda_name}.zip"
             },
-            Timeout=30,
-            MemorySize=128,
+            Timeout=timeout,
+            MemorySize=memory_size,
+            Architectures=[architecture],
             Layers=[layer_arn] if layer_arn else [],
             Environment={
                 'Variables': {
+                    **environment,
                     'SOURCE_BUCKET': bucket_imagens_name,
                     'STEP_FUNCTIONS_ARN': ''  # Placeholder ou vazio por enquanto
                 }
@@ -171,13 +319,37 @@ def create_lambda(lambda_name, role_arn, bucket_lambda_code_name, bucket_layers_
             f"Erro ao criar/atualizar a função Lambda '{lambda_name}': {e}")
         return None
 
+    if not apply_reserved_concurrency(lambda_client, lambda_name, reserved_concurrency):
+        return None
     return response['FunctionArn']
 
+
+def apply_reserved_concurrency(lambda_client, lambda_name, reserved_concurrency):
+    # Aplica (ou remove) a concorrência reservada da função, apenas se mudou.
+    # Retorna False se não foi possível aplicar: a reserva faz parte do contrato
+    # da Lambda (ex: limite de chamadas ao Textract, compactação sem concorrência)
+    try:
+        current = lambda_client.get_function_concurrency(
+            FunctionName=lambda_name).get('ReservedConcurrentExecutions')
+        if current == reserved_concurrency:
+            return True
+        if reserved_concurrency is None:
+            lambda_client.delete_function_concurrency(FunctionName=lambda_name)
+        else:
+            lambda_client.put_function_concurrency(
+                FunctionName=lambda_name, ReservedConcurrentExecutions=reserved_concurrency)
+        logger.info(f"Concorrência reservada da Lambda '{lambda_name}': {reserved_concurrency}.")
+        return True
+    except Exception as e:
+        logger.error(
+            f"Erro ao configurar a concorrência reservada da Lambda '{lambda_name}': {e}")
+        return False
+
 # Função para criar uma layer
 
 
-def create_layer(layer_name, bucket_name, zip_file, description="Layer para Lambda", compatible_runtimes=['python3.12'], compatible_architectures=['x86_64']):
-    lambda_client = boto3.client('lambda')
+def create_layer(layer_name, bucket_name, zip_file, description="Layer para Lambda", compatible_runtimes=['python3.12'], compatible_architectures=[DEFAULT_ARCHITECTURE]):
+    lambda_client = get_client('lambda')
     try:
         response = lambda_client.publish_layer_version(
             LayerName=layer_name,  # Nome da layer
@@ -199,28 +371,71 @@ def create_layer(layer_name, bucket_name, zip_file, description="Layer para Lamb
 # Função principal para ser chamada pelo main.py (será removido depois)
 
 
-def create_lambdas_main(lambda_config):
+def create_lambdas_main(lambda_config, max_workers=DEPLOY_MAX_WORKERS):
+    """
+    Cria ou atualiza as Lambdas da configuração em paralelo.
+
+    Para cada Lambda, o envio do código e a publicação da layer são etapas
+    independentes; a função é criada quando as duas terminam. Memória, timeout
+    e arquitetura vêm da configuração da Lambda ('memory_size', 'timeout',
+    'architecture') ou do dimensionamento do power tuning (LAMBDA_SIZING_FILE);
+    'reserved_concurrency' limita as instâncias simultâneas da função.
+    Com 'layer_required' a implantação falha (ValueError) se a Lambda não tiver
+    o zip da layer; a função não é implantada se a publicação da layer falhar
+    e perde as layers anteriores quando nenhuma está configurada. Funções com
+    layer mantêm a arquitetura da configuração (a da layer), mesmo com o power tuning.
+
+    Retorno:
+        dict: ARN de cada Lambda criada ou atualizada, por nome.
+    """
     role_arn = lambda_config.get('role_arn')
     bucket_lambda_code_name = lambda_config.get('bucket_lambda_code_name')
     bucket_layers_name = lambda_config.get('bucket_layers_name')
     bucket_imagens_name = lambda_config.get('bucket_imagens_name')
 
+    # Lambdas que importam dependências da layer não funcionam sem ela: falha antes de implantar
+    missing_layers = [name for name, config in lambda_config['lambdas'].items()
+                      if config.get('layer_required') and not config.get('layer_zip_path')]
+    if missing_layers:
+        raise ValueError(f"Layer obrigatória sem zip configurado para: {missing_layers}")
+
+    sizing = load_lambda_sizing()
+    graph = DeployGraph('implantação das Lambdas')
     for lambda_name, config in lambda_config['lambdas'].items():
-        create_lambda(
-            lambda_name=lambda_name,
-            role_arn=role_arn,
-            bucket_lambda_code_name=bucket_lambda_code_name,
-            bucket_layers_name=bucket_layers_name,
-            layer_zip_path=config['layer_zip_path'],
-            handler=config['handler'],
-            bucket_imagens_name=bucket_imagens_name,
-            # Passando a descrição da layer
-            layer_description=config.get(
-                'layer_description', 'Layer para Lambda'),
-            # Adiciona a descrição aqui
-            description=config.get(
-                'description', f'Função Lambda para {lambda_name}')
-        )
+        settings = lambda_settings(lambda_name, config, sizing)
+        graph.add(f"code:{lambda_name}",
+                  lambda _, name=lambda_name, config=config: package_lambda_code(
+                      name, bucket_lambda_code_name, config.get('extra_files', ())))
+        # Com o zip configurado a layer é obrigatória: implantar a função sem ela
+        # removeria a layer da versão anterior
+        graph.add(f"layer:{lambda_name}",
+                  lambda _, name=lambda_name, config=config, settings=settings: publish_lambda_layer(
+                      name, bucket_layers_name, config['layer_zip_path'],
+                      # Passando a descrição da layer
+                      config.get('layer_description', 'Layer para Lambda'),
+                      settings['architecture']),
+                  required=bool(config['layer_zip_path']))
+        graph.add(f"function:{lambda_name}",
+                  lambda results, name=lambda_name, config=config, settings=settings: deploy_lambda_function(
+                      lambda_name=name,
+                      role_arn=role_arn,
+                      bucket_lambda_code_name=bucket_lambda_code_name,
+                      bucket_imagens_name=bucket_imagens_name,
+                      handler=config['handler'],
+                      # Adiciona a descrição aqui
+                      description=config.get(
+                          'description', f'Função Lambda para {name}'),
+                      layer_arn=results[f"layer:{name}"],
+                      code_sha256=results[f"code:{name}"],
+                      environment=config.get('environment'),
+                      reserved_concurrency=config.get('reserved_concurrency'),
+                      **settings),
+                  depends_on=[f"code:{lambda_name}", f"layer:{lambda_name}"])
+
+    results = graph.run(max_workers)
+    graph.report()
+    return {name.split(':', 1)[1]: arn for name, arn in results.items()
+            if name.startswith('function:')}
 
 
 '''
@@ -251,10 +466,10 @@ if __name__ == "__main__":
         'bucket_imagens_name': 'sprint4-grupo6-imagens-talita',
         'lambdas': {
             's3_upload': {
-                'layer_zip_path': 'app/layers/upload_layer/upload_layer.zip',
+                'layer_zip_path': None,
                 'handler': 's3_upload.lambda_handler',
                 'description': 'Função Lambda para upload de arquivos S3',
-                'layer_description': 'Layer de biblioteca para upload de arquivos S3'
+                'layer_description': None
             }
         }
     }
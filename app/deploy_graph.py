@@ -0,0 +1,194 @@
+# app/deploy_graph.py  Executa as etapas da implantação em paralelo, respeitando as dependências.
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+# Etapas executadas ao mesmo tempo (as chamadas à AWS passam a maior parte do tempo esperando a rede)
+DEPLOY_MAX_WORKERS = 8
+
+
+class DeployError(RuntimeError):
+    """Falha de uma implantação, com os nomes das etapas que falharam ou foram puladas."""
+
+    def __init__(self, graph_name, failed):
+        super().__init__(f"Falha na {graph_name}: etapas {failed}")
+        self.failed = list(failed)
+
+
+class DeployNode:
+    """Etapa da implantação: função, dependências e resultado da execução."""
+
+    def __init__(self, name, func, depends_on=(), required=True):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        # Etapas obrigatórias falham quando a função retorna None ou False
+        self.required = required
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def duration(self):
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+class DeployGraph:
+    """
+    Grafo de dependências da implantação.
+
+    Cada etapa recebe um dicionário com os resultados das etapas das quais
+    depende. Etapas independentes rodam em paralelo em um pool de threads;
+    se uma etapa falha, as que dependem dela são puladas.
+    """
+
+    def __init__(self, name='implantação'):
+        self.name = name
+        self.nodes = {}
+        self.started_at = None
+        self.finished_at = None
+
+    def add(self, name, func, depends_on=(), required=True):
+        """
+        Adiciona uma etapa ao grafo.
+
+        Parâmetros:
+            name (str): Nome único da etapa.
+            func (callable): Função chamada com o dicionário {dependência: resultado}.
+            depends_on (iterable): Nomes das etapas que precisam terminar antes.
+            required (bool): Trata um retorno None ou False como falha.
+
+        Retorno:
+            DeployNode: Etapa criada.
+        """
+        if name in self.nodes:
+            raise ValueError(f"Etapa '{name}' já existe no grafo.")
+        node = DeployNode(name, func, depends_on, required)
+        self.nodes[name] = node
+        return node
+
+    def validate(self):
+        """Garante que todas as dependências existem e que o grafo não tem ciclos."""
+        for node in self.nodes.values():
+            missing = [dep for dep in node.depends_on if dep not in self.nodes]
+            if missing:
+                raise ValueError(f"Etapa '{node.name}' depende de etapas inexistentes: {missing}")
+
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Ciclo de dependências envolvendo a etapa '{name}'.")
+            visiting.add(name)
+            for dep in self.nodes[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.nodes:
+            visit(name)
+
+    def _run_node(self, node):
+        node.started_at = time.perf_counter()
+        try:
+            results = {dep: self.nodes[dep].result for dep in node.depends_on}
+            node.result = node.func(results)
+            if node.required and (node.result is None or node.result is False):
+                raise RuntimeError(f"Etapa '{node.name}' não retornou resultado.")
+            node.status = 'done'
+        except Exception as e:
+            node.status = 'failed'
+            node.error = e
+            logger.error(f"Etapa '{node.name}' falhou: {e}")
+        finally:
+            node.finished_at = time.perf_counter()
+        return node
+
+    def run(self, max_workers=DEPLOY_MAX_WORKERS):
+        """
+        Executa o grafo, iniciando cada etapa assim que suas dependências terminam.
+
+        Retorno:
+            dict: Resultado de cada etapa concluída, por nome.
+        """
+        self.validate()
+        self.started_at = time.perf_counter()
+        pending = dict(self.nodes)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                for name, node in list(pending.items()):
+                    dependencies = [self.nodes[dep] for dep in node.depends_on]
+                    if any(dep.status in ('failed', 'skipped') for dep in dependencies):
+                        node.status = 'skipped'
+                        logger.warning(f"Etapa '{name}' pulada: uma dependência falhou.")
+                        del pending[name]
+                    elif all(dep.status == 'done' for dep in dependencies):
+                        node.status = 'running'
+                        running[executor.submit(self._run_node, node)] = node
+                        del pending[name]
+
+                if not running:
+                    # Etapas puladas podem liberar (pular) outras na próxima volta
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+
+        self.finished_at = time.perf_counter()
+        return {name: node.result for name, node in self.nodes.items() if node.status == 'done'}
+
+    @property
+    def failed(self):
+        """Etapas que falharam ou foram puladas."""
+        return [node.name for node in self.nodes.values() if node.status in ('failed', 'skipped')]
+
+    def raise_for_failures(self):
+        """Levanta DeployError com as etapas que falharam ou foram puladas, se houver."""
+        if self.failed:
+            raise DeployError(self.name, self.failed)
+
+    def critical_path(self):
+        """
+        Caminho de dependências com a maior soma de durações.
+
+        Retorno:
+            tuple: (lista de nomes das etapas, duração total em segundos).
+        """
+        best = {}
+
+        def longest(name):
+            if name not in best:
+                node = self.nodes[name]
+                path, total = max(
+                    (longest(dep) for dep in node.depends_on),
+                    key=lambda item: item[1], default=([], 0.0))
+                best[name] = (path + [name], total + node.duration)
+            return best[name]
+
+        return max((longest(name) for name in self.nodes),
+                   key=lambda item: item[1], default=([], 0.0))
+
+    def report(self):
+        """Registra no log o tempo de cada etapa, o tempo total e o caminho crítico."""
+        if self.started_at is None:
+            return
+        lines = [f"Relatório da {self.name}:"]
+        for node in sorted(self.nodes.values(), key=lambda n: n.started_at or float('inf')):
+            offset = (node.started_at - self.started_at) if node.started_at else 0.0
+            lines.append(
+                f"  {node.name:<32} {node.status:<8} início +{offset:6.2f}s  duração {node.duration:6.2f}s")
+        path, total = self.critical_path()
+        wall_clock = self.finished_at - self.started_at
+        lines.append(f"  Tempo total: {wall_clock:.2f}s | caminho crítico: {total:.2f}s")
+        lines.append(f"  Caminho crítico: {' -> '.join(path)}")
+        logger.info('\n'.join(lines))
@@ -2,7 +2,9 @@
 import boto3
 import json
 import logging
+import urllib.parse
 import botocore.exceptions
+from deploy_graph import DeployError, DeployGraph
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -13,6 +15,8 @@ iam_client = boto3.client('iam')
 s3_client = boto3.client('s3')
 lambda_client = boto3.client('lambda')
 sts_client = boto3.client('sts')  # Cliente para obter o ID da conta
+sqs_client = boto3.client('sqs')
+events_client = boto3.client('events')
 
 # Configurações
 
@@ -28,6 +32,26 @@ role_name = 'sprint4-grupo6-lambda-api-step-role'
 # Policy com permissões
 policy_name = 'sprint4-grupo6-lambda-api-step-policy'
 
+# Fila de ingestão entre o upload e o processamento (e sua fila de erros)
+ingestion_queue_name = 'sprint4-grupo6-ingestion-queue'
+# Entregas de uma mensagem antes de ir para a fila de erros
+ingestion_max_receive_count = 5
+# Cota de TPS do Textract na conta: limita a concorrência do consumidor da fila
+textract_tps_quota = 5
+# Prefixo e validade (dias) das respostas do Textract guardadas no bucket de imagens
+textract_cache_prefix = 'textract-cache/'
+textract_cache_ttl_days = 90
+# Diário das movimentações (idempotência da Lambda s3_move): só precisa durar
+# mais que os retries e redrives de uma execução
+move_journal_prefix = 'move-journal/'
+move_journal_ttl_days = 14
+# Resultados intermediários grandes passados entre as etapas pelo S3 (claim check):
+# só são lidos durante a execução
+claim_check_prefix = 'claim-check/'
+claim_check_ttl_days = 2
+# Agenda da compactação do armazenamento de resultados (expressão do EventBridge)
+results_compaction_schedule = 'rate(1 hour)'
+
 # Altere para a região desejada
 region = 'us-east-1'
 
@@ -124,6 +148,275 @@ def create_s3_folder(bucket_name, folder_name):
         return False
 
 
+def put_lifecycle_rule(bucket_name, rule):
+    """
+    Grava uma regra de ciclo de vida do bucket, preservando as demais regras.
+
+    Args:
+        bucket_name (str): Nome do bucket S3.
+        rule (dict): Regra no formato do put_bucket_lifecycle_configuration (com 'ID').
+
+    Raises:
+        botocore.exceptions.ClientError: Erro do S3 ao ler ou gravar a configuração.
+    """
+    try:
+        rules = s3_client.get_bucket_lifecycle_configuration(Bucket=bucket_name)['Rules']
+    except botocore.exceptions.ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchLifecycleConfiguration':
+            raise
+        rules = []
+    rules = [existing for existing in rules if existing.get('ID') != rule['ID']]
+    rules.append(rule)
+    s3_client.put_bucket_lifecycle_configuration(
+        Bucket=bucket_name, LifecycleConfiguration={'Rules': rules})
+
+
+def configure_cache_expiration(bucket_name, prefix, days):
+    """
+    Expira os objetos de um prefixo com uma regra de ciclo de vida do bucket.
+
+    Args:
+        bucket_name (str): Nome do bucket S3.
+        prefix (str): Prefixo dos objetos expirados.
+        days (int): Dias até a expiração.
+
+    Returns:
+        bool: True se a regra foi configurada, False caso contrário.
+    """
+    try:
+        put_lifecycle_rule(bucket_name, {
+            'ID': f"expirar-{prefix.strip('/')}",
+            'Filter': {'Prefix': prefix},
+            'Status': 'Enabled',
+            'Expiration': {'Days': days}
+        })
+        logger.info(f"Objetos em '{prefix}' do bucket '{bucket_name}' expiram em {days} dias.")
+        return True
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"Erro ao configurar a expiração de '{prefix}' no bucket '{bucket_name}': {e}")
+        return False
+
+
+def configure_abort_incomplete_uploads(bucket_name, days=1):
+    """
+    Remove as partes de uploads em partes não concluídos (ex: cópia interrompida
+    pelo timeout da Lambda), que são cobradas enquanto existirem.
+
+    Args:
+        bucket_name (str): Nome do bucket S3.
+        days (int): Dias após o início do upload.
+
+    Returns:
+        bool: True se a regra foi configurada, False caso contrário.
+    """
+    try:
+        put_lifecycle_rule(bucket_name, {
+            'ID': 'abortar-uploads-incompletos',
+            'Filter': {'Prefix': ''},
+            'Status': 'Enabled',
+            'AbortIncompleteMultipartUpload': {'DaysAfterInitiation': days}
+        })
+        logger.info(f"Uploads em partes incompletos do bucket '{bucket_name}' expiram em {days} dia(s).")
+        return True
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"Erro ao configurar a limpeza de uploads do bucket '{bucket_name}': {e}")
+        return False
+
+
+def configure_upload_notification(bucket_name, lambda_function_arn, prefix='uploads/'):
+    """
+    Configura o bucket para invocar a Lambda quando um arquivo chega pelo upload direto.
+
+    Args:
+        bucket_name (str): Nome do bucket S3 de imagens.
+        lambda_function_arn (str): ARN da Lambda que inicia o processamento.
+        prefix (str): Prefixo dos objetos enviados pelas URLs pré-assinadas.
+
+    Returns:
+        bool: True se a notificação foi configurada com sucesso, False caso contrário.
+    """
+    try:
+        lambda_client.add_permission(
+            FunctionName=lambda_function_arn,
+            StatementId=f"s3-invoke-{bucket_name}",
+            Action='lambda:InvokeFunction',
+            Principal='s3.amazonaws.com',
+            SourceArn=f"arn:aws:s3:::{bucket_name}"
+        )
+        logger.info("Permissão concedida para o S3 invocar a Lambda.")
+    except lambda_client.exceptions.ResourceConflictException:
+        logger.info("Permissão já existe para o S3 invocar a Lambda.")
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"Erro ao conceder permissão ao S3: {e}")
+        return False
+
+    try:
+        # A configuração substitui as notificações existentes do bucket
+        s3_client.put_bucket_notification_configuration(
+            Bucket=bucket_name,
+            NotificationConfiguration={
+                'LambdaFunctionConfigurations': [
+                    {
+                        'Id': 'upload-direto-notas-fiscais',
+                        'LambdaFunctionArn': lambda_function_arn,
+                        'Events': ['s3:ObjectCreated:*'],
+                        'Filter': {
+                            'Key': {
+                                'FilterRules': [
+                                    {'Name': 'prefix', 'Value': prefix}
+                                ]
+                            }
+                        }
+                    }
+                ]
+            }
+        )
+        logger.info(
+            f"Notificação do bucket '{bucket_name}' configurada para o prefixo '{prefix}'.")
+        return True
+    except botocore.exceptions.ClientError as e:
+        logger.error(
+            f"Erro ao configurar a notificação do bucket '{bucket_name}': {e}")
+        return False
+
+
+def create_ingestion_queue(queue_name, visibility_timeout=180):
+    """
+    Cria a fila SQS de ingestão e a fila de erros (DLQ) associada.
+
+    Args:
+        queue_name (str): Nome da fila de ingestão.
+        visibility_timeout (int): Segundos em que a mensagem fica invisível durante o
+            processamento (pelo menos 6x o timeout da Lambda consumidora).
+
+    Returns:
+        dict: URL e ARN da fila de ingestão, ou None em caso de erro.
+    """
+    try:
+        # create_queue é idempotente para atributos iguais
+        dlq_url = sqs_client.create_queue(
+            QueueName=f"{queue_name}-dlq",
+            Attributes={'MessageRetentionPeriod': str(14 * 24 * 3600)}
+        )['QueueUrl']
+        dlq_arn = sqs_client.get_queue_attributes(
+            QueueUrl=dlq_url, AttributeNames=['QueueArn'])['Attributes']['QueueArn']
+
+        queue_url = sqs_client.create_queue(
+            QueueName=queue_name,
+            Attributes={
+                'VisibilityTimeout': str(visibility_timeout),
+                # Long polling reduz as leituras vazias do consumidor
+                'ReceiveMessageWaitTimeSeconds': '20',
+                'RedrivePolicy': json.dumps({
+                    'deadLetterTargetArn': dlq_arn,
+                    'maxReceiveCount': str(ingestion_max_receive_count)
+                })
+            }
+        )['QueueUrl']
+        queue_arn = sqs_client.get_queue_attributes(
+            QueueUrl=queue_url, AttributeNames=['QueueArn'])['Attributes']['QueueArn']
+        logger.info(f"Fila de ingestão '{queue_name}' pronta. URL: {queue_url}")
+        return {'queue_url': queue_url, 'queue_arn': queue_arn}
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"Erro ao criar a fila de ingestão '{queue_name}': {e}")
+        return None
+
+
+def configure_queue_consumer(lambda_function_arn, queue_arn, batch_size=10,
+                             max_concurrency=textract_tps_quota):
+    """
+    Liga a fila de ingestão à Lambda consumidora com falhas parciais de lote.
+
+    Args:
+        lambda_function_arn (str): ARN da Lambda consumidora.
+        queue_arn (str): ARN da fila de ingestão.
+        batch_size (int): Mensagens por invocação (máximo de 10 para filas padrão).
+        max_concurrency (int): Invocações simultâneas do consumidor. Controla o ritmo de
+            início das execuções; o limite do Textract é a concorrência reservada da
+            Lambda do Textract.
+
+    Returns:
+        bool: True se o gatilho foi configurado com sucesso, False caso contrário.
+    """
+    # O SQS exige concorrência máxima entre 2 e 1000
+    scaling_config = {'MaximumConcurrency': max(2, min(max_concurrency, 1000))}
+    try:
+        mappings = lambda_client.list_event_source_mappings(
+            EventSourceArn=queue_arn, FunctionName=lambda_function_arn)['EventSourceMappings']
+        if mappings:
+            lambda_client.update_event_source_mapping(
+                UUID=mappings[0]['UUID'],
+                BatchSize=batch_size,
+                FunctionResponseTypes=['ReportBatchItemFailures'],
+                ScalingConfig=scaling_config
+            )
+            logger.info("Gatilho da fila de ingestão atualizado.")
+        else:
+            lambda_client.create_event_source_mapping(
+                EventSourceArn=queue_arn,
+                FunctionName=lambda_function_arn,
+                BatchSize=batch_size,
+                FunctionResponseTypes=['ReportBatchItemFailures'],
+                ScalingConfig=scaling_config
+            )
+            logger.info("Gatilho da fila de ingestão criado.")
+        return True
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"Erro ao configurar o gatilho da fila de ingestão: {e}")
+        return False
+
+
+def configure_compaction_schedule(lambda_function_arn, schedule=results_compaction_schedule,
+                                  rule_name='sprint4-grupo6-results-compaction'):
+    """
+    Agenda a Lambda de compactação do armazenamento de resultados no EventBridge.
+
+    Args:
+        lambda_function_arn (str): ARN da Lambda results_compactor.
+        schedule (str): Expressão de agenda ('rate(1 hour)', 'cron(...)').
+        rule_name (str): Nome da regra do EventBridge.
+
+    Returns:
+        bool: True se a agenda foi configurada com sucesso, False caso contrário.
+    """
+    try:
+        # put_rule e put_targets são idempotentes: reexecuções só atualizam a regra
+        rule_arn = events_client.put_rule(
+            Name=rule_name,
+            ScheduleExpression=schedule,
+            State='ENABLED',
+            Description='Compacta o armazenamento de resultados das notas fiscais'
+        )['RuleArn']
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"Erro ao criar a regra de compactação '{rule_name}': {e}")
+        return False
+
+    try:
+        lambda_client.add_permission(
+            FunctionName=lambda_function_arn,
+            StatementId=f"events-invoke-{rule_name}",
+            Action='lambda:InvokeFunction',
+            Principal='events.amazonaws.com',
+            SourceArn=rule_arn
+        )
+    except lambda_client.exceptions.ResourceConflictException:
+        logger.info("Permissão já existe para o EventBridge invocar a Lambda.")
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"Erro ao conceder permissão ao EventBridge: {e}")
+        return False
+
+    try:
+        events_client.put_targets(
+            Rule=rule_name,
+            Targets=[{'Id': 'results-compactor', 'Arn': lambda_function_arn}]
+        )
+        logger.info(f"Compactação agendada com '{schedule}'.")
+        return True
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"Erro ao agendar a compactação: {e}")
+        return False
+
+
 def get_policy_arn(policy_name, account_id):
     """Verifica se uma política IAM já existe e retorna seu ARN."""
     policy_arn = f"arn:aws:iam::{account_id}:policy/{policy_name}"
@@ -159,9 +452,37 @@ def create_iam_policy(policy_name, account_id, buckets):
             f"A política '{policy_name}' já existe. Usando ARN: {policy_arn}")
         return policy_arn
 
+    policy_document = build_policy_document(account_id, buckets)
+    logger.info("Política definida.")
+
+    try:
+        response = iam_client.create_policy(
+            PolicyName=policy_name,
+            PolicyDocument=json.dumps(policy_document)
+        )
+        policy_arn = response['Policy']['Arn']
+        logger.info(
+            f"Política '{policy_name}' criada com sucesso. ARN: {policy_arn}")
+        return policy_arn
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"Erro ao criar a política: {e}")
+        return None
+
+
+def build_policy_document(account_id, buckets):
+    """
+    Monta o documento da política IAM usada pelas Lambdas e pelo Step Functions.
+
+    Args:
+        account_id (str): ID da conta AWS.
+        buckets (list): Lista de (nome, descrição) dos buckets S3.
+
+    Returns:
+        dict: Documento da política.
+    """
     bucket_arns = [f"arn:aws:s3:::{bucket_name}" for bucket_name, _ in buckets]
 
-    policy_document = {
+    return {
         "Version": "2012-10-17",
         "Statement": [
             # Permissões para CloudWatch Logs (Lambdas)
@@ -198,17 +519,41 @@ def create_iam_policy(policy_name, account_id, buckets):
                     "s3:PutObjectAcl",
                     "s3:GetObject",
                     "s3:DeleteObject",
-                    "s3:CopyObject"
+                    "s3:CopyObject",
+                    # Cópia em partes de objetos grandes (S3Mover.multipart_copy)
+                    "s3:AbortMultipartUpload",
+                    "s3:ListMultipartUploadParts"
                 ],
                 "Resource":  [f"{bucket_arn}/*" for bucket_arn in bucket_arns]
             },
-            # Permissões para Textract
+            # Listagem dos buckets: sem ela o S3 responde 403 (e não 404) a objetos inexistentes
+            {
+                "Effect": "Allow",
+                "Action": ["s3:ListBucket"],
+                "Resource": bucket_arns
+            },
+            # Fila de ingestão: envio pelo upload e consumo pelo gatilho SQS
+            {
+                "Effect": "Allow",
+                "Action": [
+                    "sqs:SendMessage",
+                    "sqs:ReceiveMessage",
+                    "sqs:DeleteMessage",
+                    "sqs:ChangeMessageVisibility",
+                    "sqs:GetQueueAttributes"
+                ],
+                "Resource": f"arn:aws:sqs:{region}:{account_id}:{ingestion_queue_name}*"
+            },
+            # Permissões para Textract (o serviço não aceita restrição por recurso)
             {
                 "Effect": "Allow",
                 "Action": [
                     "textract:DetectDocumentText",
-                    "textract:AnalyzeExpense"],
-                "Resource": f"arn:aws:s3:::{bucket_imagens_name}/*"
+                    "textract:AnalyzeDocument",
+                    "textract:AnalyzeExpense",
+                    "textract:StartExpenseAnalysis",
+                    "textract:GetExpenseAnalysis"],
+                "Resource": "*"
             },
             # Permissão para invocar Lambdas
             {
@@ -223,10 +568,16 @@ def create_iam_policy(policy_name, account_id, buckets):
                 "Effect": "Allow",
                 "Action": [
                     "states:StartExecution",
+                    # Máquina Express com PIPELINE_MODE=sync
+                    "states:StartSyncExecution",
                     "states:DescribeExecution",
                     "states:StopExecution"
                 ],
-                "Resource": f"arn:aws:states:{region}:{account_id}:stateMachine:*"
+                "Resource": [
+                    f"arn:aws:states:{region}:{account_id}:stateMachine:*",
+                    # DescribeExecution é avaliado sobre o ARN da execução (rota de status)
+                    f"arn:aws:states:{region}:{account_id}:execution:*"
+                ]
             },
             # Permissões para acessar as layers
             {
@@ -248,20 +599,50 @@ def create_iam_policy(policy_name, account_id, buckets):
         ]
     }
 
-    logger.info("Política definida.")
 
+def update_iam_policy(policy_arn, policy_document):
+    """
+    Publica uma nova versão padrão da política quando o documento mudou.
+
+    O IAM guarda no máximo 5 versões por política: as versões antigas que não
+    são a padrão são apagadas (da mais antiga para a mais nova) para abrir espaço.
+
+    Args:
+        policy_arn (str): ARN da política existente.
+        policy_document (dict): Documento desejado.
+
+    Returns:
+        bool: True se a política está atualizada, False em caso de erro.
+    """
     try:
-        response = iam_client.create_policy(
-            PolicyName=policy_name,
-            PolicyDocument=json.dumps(policy_document)
-        )
-        policy_arn = response['Policy']['Arn']
+        policy = iam_client.get_policy(PolicyArn=policy_arn)['Policy']
+        current = iam_client.get_policy_version(
+            PolicyArn=policy_arn, VersionId=policy['DefaultVersionId'])['PolicyVersion']['Document']
+        # O boto3 já decodifica o documento; por garantia aceita também o texto URL-encoded
+        if isinstance(current, str):
+            current = json.loads(urllib.parse.unquote(current))
+        if current == policy_document:
+            logger.info(f"A política '{policy_arn}' já está atualizada.")
+            return True
+
+        versions = iam_client.list_policy_versions(PolicyArn=policy_arn)['Versions']
+        old_versions = sorted((v for v in versions if not v['IsDefaultVersion']),
+                              key=lambda v: v['CreateDate'])
+        # Depois de criar a nova versão o total não pode passar de 5
+        for version in old_versions[:max(0, len(versions) - 4)]:
+            iam_client.delete_policy_version(PolicyArn=policy_arn, VersionId=version['VersionId'])
+            logger.info(f"Versão '{version['VersionId']}' da política removida.")
+
+        response = iam_client.create_policy_version(
+            PolicyArn=policy_arn,
+            PolicyDocument=json.dumps(policy_document),
+            SetAsDefault=True)
         logger.info(
-            f"Política '{policy_name}' criada com sucesso. ARN: {policy_arn}")
-        return policy_arn
+            f"Política '{policy_arn}' atualizada para a versão {response['PolicyVersion']['VersionId']}.")
+        return True
     except botocore.exceptions.ClientError as e:
-        logger.error(f"Erro ao criar a política: {e}")
-        return None
+        logger.error(f"Erro ao atualizar a política: {e}")
+        return False
 
 
 def attach_policy_to_role(role_name, policy_arn):
@@ -332,62 +713,121 @@ def get_role_arn(role_name):
         return None
 
 
-def create_infra():
-    """Cria toda a infraestrutura necessária na AWS."""
-    account_id = get_id_account_aws()
-    if not account_id:
+def ensure_iam_policy(account_id, buckets):
+    """
+    Retorna o ARN da política IAM, criando-a se ainda não existir.
+
+    Se a política já existe e as permissões mudaram, publica uma nova versão padrão.
+    """
+    policy_arn = get_policy_arn(policy_name, account_id)
+    if not policy_arn:
+        # Criar a política IAM se não existir
+        return create_iam_policy(policy_name, account_id, buckets)
+    if not update_iam_policy(policy_arn, build_policy_document(account_id, buckets)):
         return None
+    return policy_arn
 
+
+def ensure_iam_role():
+    """Retorna o ARN da role IAM, criando-a se ainda não existir."""
+    if not role_exists(role_name):
+        # Criar a role IAM se não existir
+        return create_iam_role(role_name)
+    logger.info(f"A role '{role_name}' já existe.")
+    return get_role_arn(role_name)  # Obter o ARN da role existente
+
+
+def create_infra():
+    """
+    Cria toda a infraestrutura necessária na AWS.
+
+    Buckets, política, role e fila não dependem uns dos outros e são criados
+    em paralelo; as pastas esperam o bucket de imagens e o vínculo da
+    política espera a política e a role.
+
+    Returns:
+        dict: ARN da role, nomes dos buckets, ID da conta e a fila de ingestão.
+
+    Raises:
+        DeployError: Com os nomes das etapas que falharam ou foram puladas.
+    """
     # Criar os buckets S3
     buckets = [
         (bucket_layers_name, 'Bucket para armazenar as layers da aplicação'),
         (bucket_lambda_code_name, 'Bucket para armazenar o código das Lambdas'),
         (bucket_imagens_name, 'Bucket para armazenar as imagens da aplicação')
     ]
+
+    graph = DeployGraph('implantação da infraestrutura')
+    graph.add('account', lambda _: get_id_account_aws())
     for bucket_name, description in buckets:
-        if not create_s3_bucket(bucket_name, description):
-            logger.error(f"Falha ao criar o bucket: {bucket_name}")
+        # Uma falha no bucket é registrada por create_s3_bucket, mas não interrompe a implantação
+        graph.add(f"bucket:{bucket_name}",
+                  lambda _, name=bucket_name, description=description:
+                  create_s3_bucket(name, description),
+                  required=False)
 
     # Criar as pastas 'dinheiro' e 'outros' dentro do bucket de imagens
     folders = ['dinheiro', 'outros']
     for folder in folders:
-        if not create_s3_folder(bucket_imagens_name, folder):
-            return None
-
-    # Verifica se a política IAM já existe
-    policy_arn = get_policy_arn(policy_name, account_id)
-    if not policy_arn:
-        # Criar a política IAM se não existir
-        policy_arn = create_iam_policy(policy_name, account_id, buckets)
-        if not policy_arn:
-            return None
+        graph.add(f"folder:{folder}",
+                  lambda _, folder=folder: create_s3_folder(bucket_imagens_name, folder),
+                  depends_on=[f"bucket:{bucket_imagens_name}"])
+
+    # Cache das respostas do Textract: expiradas pelo próprio S3 (opcional)
+    graph.add('textract_cache_expiration',
+              lambda _: configure_cache_expiration(
+                  bucket_imagens_name, textract_cache_prefix, textract_cache_ttl_days),
+              depends_on=[f"bucket:{bucket_imagens_name}"], required=False)
+    # As regras de ciclo de vida são lidas e regravadas juntas: uma etapa depois da outra
+    graph.add('abort_incomplete_uploads',
+              lambda _: configure_abort_incomplete_uploads(bucket_imagens_name),
+              depends_on=['textract_cache_expiration'], required=False)
+    graph.add('move_journal_expiration',
+              lambda _: configure_cache_expiration(
+                  bucket_imagens_name, move_journal_prefix, move_journal_ttl_days),
+              depends_on=['abort_incomplete_uploads'], required=False)
+    graph.add('claim_check_expiration',
+              lambda _: configure_cache_expiration(
+                  bucket_imagens_name, claim_check_prefix, claim_check_ttl_days),
+              depends_on=['move_journal_expiration'], required=False)
+
+    graph.add('policy', lambda results: ensure_iam_policy(results['account'], buckets),
+              depends_on=['account'])
+    graph.add('role', lambda _: ensure_iam_role())
+    # Anexar a política à role
+    graph.add('attach_policy',
+              lambda results: attach_policy_to_role(role_name, results['policy']),
+              depends_on=['policy', 'role'])
 
-# Verifica se a role IAM já existe
-    if not role_exists(role_name):
-        # Criar a role IAM se não existir
-        role_arn = create_iam_role(role_name)
-        if not role_arn:
-            return None
-    else:
-        logger.info(f"A role '{role_name}' já existe.")
-        role_arn = get_role_arn(role_name)  # Obter o ARN da role existente
+    # Fila de ingestão (opcional): sem ela o upload inicia o Step Functions diretamente
+    graph.add('ingestion_queue',
+              lambda _: create_ingestion_queue(ingestion_queue_name), required=False)
 
-    # Anexar a política à role
-    if not attach_policy_to_role(role_name, policy_arn):
-        return None
+    results = graph.run()
+    graph.report()
+    # As Lambdas dependem da role, da política e dos buckets: nada é implantado sem eles
+    graph.raise_for_failures()
 
+    ingestion_queue = results['ingestion_queue'] or {}
     # Retornar resultados
     return {
-        "role_arn": role_arn,
+        "role_arn": results['role'],
         "bucket_lambda_code_name": bucket_lambda_code_name,
         "bucket_imagens_name": bucket_imagens_name,
         "bucket_layers_name": bucket_layers_name,
-        "account_id": account_id
+        "account_id": results['account'],
+        "ingestion_queue_url": ingestion_queue.get('queue_url'),
+        "ingestion_queue_arn": ingestion_queue.get('queue_arn')
     }
 
 
 if __name__ == "__main__":
-    infra_result = create_infra()
+    try:
+        infra_result = create_infra()
+    except DeployError as e:
+        logger.error(f"Etapas da infraestrutura com falha: {e.failed}")
+        infra_result = None
     if infra_result:
         logger.info(f"Role ARN: {infra_result['role_arn']}")
         logger.info(
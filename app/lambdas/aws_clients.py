@@ -0,0 +1,184 @@
+# app/lambdas/aws_clients.py  Registro de clientes AWS compartilhado pelas Lambdas.
+import json
+import os
+import threading
+import time
+import logging
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+# Tamanho do pool de conexões HTTP de cada cliente (ajustável por variável de ambiente)
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '10'))
+
+# Namespace das métricas publicadas no CloudWatch (Embedded Metric Format)
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'NotasFiscais')
+
+# Estado do container: criado uma única vez e reaproveitado enquanto estiver quente
+_lock = threading.RLock()
+_session = None
+_clients = {}
+_invocation_count = 0
+_invocation_stats = {'client_hits': 0, 'client_misses': 0}
+
+
+def get_session():
+    """Retorna a sessão boto3 do container, criando-a na primeira chamada."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                # O boto3 só é importado quando o primeiro cliente é criado: as Lambdas
+                # que não chamam a AWS em toda invocação (ex: nlp_lambda, que usa este
+                # módulo só para as métricas) não pagam o import na partida a frio
+                import boto3
+                _session = boto3.session.Session()
+    return _session
+
+
+def get_client(service_name, **kwargs):
+    """
+    Retorna um cliente boto3 reutilizado entre invocações do mesmo container.
+
+    O cliente é criado uma única vez por combinação de serviço e parâmetros,
+    mantendo credenciais, endpoint e pool de conexões vivos entre invocações.
+
+    Parâmetros:
+        service_name (str): Nome do serviço AWS (ex: 's3', 'stepfunctions').
+        **kwargs: Parâmetros adicionais repassados para session.client().
+
+    Retorno:
+        botocore.client.BaseClient: Cliente do serviço.
+    """
+    key = (service_name, tuple(sorted(kwargs.items())))
+    client = _clients.get(key)
+    if client is not None:
+        _record_client_access(hit=True)
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            from botocore.config import Config
+            config = Config(
+                max_pool_connections=MAX_POOL_CONNECTIONS,
+                retries={'mode': 'standard'}
+            )
+            client = get_session().client(service_name, config=config, **kwargs)
+            _clients[key] = client
+            logger.info(f"Cliente '{service_name}' criado para o container.")
+            _invocation_stats['client_misses'] += 1
+            return client
+
+    _record_client_access(hit=True)
+    return client
+
+
+def preload_clients(*service_names):
+    """
+    Cria na inicialização do container os clientes usados em toda invocação.
+
+    Com o import do boto3 adiado até o primeiro cliente, as Lambdas que sempre
+    chamam a AWS antecipam a criação para a fase de INIT (aproveitada por
+    provisioned concurrency e SnapStart). A criação não conta como miss da
+    primeira invocação; uma falha (ex: região ausente em um import local) só é
+    registrada e o cliente é criado de novo na primeira chamada.
+
+    Parâmetros:
+        *service_names (str): Serviços AWS (ex: 's3', 'textract').
+    """
+    with _lock:
+        stats = dict(_invocation_stats)
+        for service_name in service_names:
+            try:
+                get_client(service_name)
+            except Exception as e:
+                logger.warning(f"Cliente '{service_name}' não criado na inicialização: {e}")
+        _invocation_stats.update(stats)
+
+
+def _record_client_access(hit):
+    """Contabiliza o acesso a um cliente já existente (hit) ou recém-criado (miss)."""
+    with _lock:
+        _invocation_stats['client_hits' if hit else 'client_misses'] += 1
+
+
+def emit_invocation_metrics(function_name, duration_ms):
+    """
+    Publica as métricas da invocação no formato EMF do CloudWatch.
+
+    Parâmetros:
+        function_name (str): Nome da função Lambda.
+        duration_ms (float): Duração do handler em milissegundos.
+
+    Retorno:
+        dict: Métricas publicadas.
+    """
+    with _lock:
+        stats = dict(_invocation_stats)
+        _invocation_stats['client_hits'] = 0
+        _invocation_stats['client_misses'] = 0
+
+    metrics = {
+        'ColdStart': 1 if _invocation_count == 1 else 0,
+        'WarmClient': 1 if stats['client_misses'] == 0 else 0,
+        'ClientHits': stats['client_hits'],
+        'ClientMisses': stats['client_misses'],
+        'HandlerDuration': round(duration_ms, 3)
+    }
+    emit_metrics(function_name, metrics, {
+        'ColdStart': 'Count', 'WarmClient': 'Count', 'ClientHits': 'Count',
+        'ClientMisses': 'Count', 'HandlerDuration': 'Milliseconds'
+    }, InvocationCount=_invocation_count)
+    return {'FunctionName': function_name, **metrics, 'InvocationCount': _invocation_count}
+
+
+def emit_metrics(function_name, metrics, units, dimensions=None, **properties):
+    """
+    Publica métricas no formato EMF do CloudWatch (uma linha JSON no log).
+
+    Parâmetros:
+        function_name (str): Nome da função Lambda (dimensão FunctionName).
+        metrics (dict): {nome: valor}.
+        units (dict): {nome: unidade do CloudWatch}; métricas sem unidade usam 'None'.
+        dimensions (dict): Dimensões adicionais (ex: {'Deployment': 'layer'}).
+        **properties: Campos extras registrados no log, sem virar métrica.
+    """
+    dimensions = dict(dimensions or {})
+    # Estrutura reconhecida automaticamente pelo CloudWatch a partir do log
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['FunctionName', *dimensions]],
+                'Metrics': [{'Name': name, 'Unit': units.get(name, 'None')} for name in metrics]
+            }]
+        },
+        'FunctionName': function_name,
+        **dimensions,
+        **properties,
+        **metrics
+    }))
+
+
+def track_invocation(handler):
+    """
+    Decorador para o lambda_handler que registra as métricas de cada invocação.
+
+    Indica se a invocação aconteceu em um container frio ou quente e se
+    todos os clientes AWS usados já estavam criados.
+    """
+    @wraps(handler)
+    def wrapper(event, context):
+        global _invocation_count
+        _invocation_count += 1
+        function_name = getattr(
+            context, 'function_name', os.environ.get('AWS_LAMBDA_FUNCTION_NAME', handler.__module__))
+        start = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            emit_invocation_metrics(
+                function_name, (time.perf_counter() - start) * 1000)
+    return wrapper
@@ -0,0 +1,104 @@
+# app/lambdas/claim_check.py  Passagem de resultados grandes entre as etapas pelo S3 (claim check).
+import gzip
+import hashlib
+import json
+import os
+import threading
+import logging
+from collections import OrderedDict
+
+from aws_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+# Prefixo dos resultados intermediários no bucket (expirados pela regra de ciclo de vida)
+CLAIM_CHECK_PREFIX = os.environ.get('CLAIM_CHECK_PREFIX', 'claim-check/')
+# Resultados acima deste tamanho em JSON (bytes) vão para o S3; abaixo seguem no estado.
+# O limite do estado do Step Functions é 256 KB para a execução inteira
+CLAIM_CHECK_THRESHOLD = int(os.environ.get('CLAIM_CHECK_THRESHOLD', str(32 * 1024)))
+# Memória do container para resultados já lidos (bytes do JSON, LRU)
+CLAIM_CHECK_CACHE_BYTES = int(os.environ.get('CLAIM_CHECK_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+# Campo que identifica uma referência no estado
+REFERENCE_FIELD = '$claim_check'
+
+# Resultados lidos nesta instância: as chaves incluem o hash do conteúdo, então
+# uma entrada nunca fica desatualizada
+_cache = OrderedDict()
+_cache_bytes = 0
+_lock = threading.Lock()
+
+
+def is_reference(value):
+    """Indica se o valor é uma referência a um resultado guardado no S3."""
+    return isinstance(value, dict) and REFERENCE_FIELD in value
+
+
+def put(value, bucket_name, execution_id, name, threshold=None, client=None):
+    """
+    Guarda o valor no S3 se for grande e devolve o que deve seguir no estado.
+
+    Parâmetros:
+        value: Resultado serializável em JSON.
+        bucket_name (str): Bucket dos resultados intermediários.
+        execution_id (str): ID da execução do Step Functions (agrupa os objetos).
+        name (str): Nome do resultado (ex: 'textract').
+        threshold (int): Tamanho a partir do qual o valor vai para o S3.
+
+    Retorno:
+        O próprio valor (pequeno) ou {'$claim_check': {bucket, key, size, sha256}}.
+    """
+    threshold = CLAIM_CHECK_THRESHOLD if threshold is None else threshold
+    content = json.dumps(value, separators=(',', ':')).encode('utf-8')
+    if len(content) <= threshold:
+        return value
+
+    digest = hashlib.sha256(content).hexdigest()
+    # O ARN da execução tem ':'; a chave usa apenas o nome (último trecho)
+    execution = (execution_id or 'sem-execucao').rsplit(':', 1)[-1]
+    key = f"{CLAIM_CHECK_PREFIX}{execution}/{name}-{digest[:16]}.json.gz"
+    (client or get_client('s3')).put_object(
+        Bucket=bucket_name, Key=key, Body=gzip.compress(content, compresslevel=6),
+        ContentType='application/json', ContentEncoding='gzip')
+    _remember(key, value, len(content))
+    logger.info(f"Resultado '{name}' ({len(content)} bytes) guardado em {key}.")
+    return {REFERENCE_FIELD: {'bucket': bucket_name, 'key': key,
+                              'size': len(content), 'sha256': digest}}
+
+
+def get(value, client=None):
+    """
+    Resolve uma referência (ou devolve o próprio valor, se não for uma).
+
+    O objeto é lido em streaming: o gzip é descomprimido à medida que o corpo
+    da resposta chega, sem manter o conteúdo comprimido e o JSON inteiros na
+    memória ao mesmo tempo. Leituras repetidas no container vêm do cache.
+    """
+    if not is_reference(value):
+        return value
+    reference = value[REFERENCE_FIELD]
+    key = reference['key']
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key][0]
+
+    response = (client or get_client('s3')).get_object(Bucket=reference['bucket'], Key=key)
+    with gzip.GzipFile(fileobj=response['Body'], mode='rb') as stream:
+        result = json.load(stream)
+    _remember(key, result, reference.get('size', 0))
+    return result
+
+
+def _remember(key, value, size):
+    global _cache_bytes
+    if size > CLAIM_CHECK_CACHE_BYTES:
+        return
+    with _lock:
+        if key in _cache:
+            return
+        _cache[key] = (value, size)
+        _cache_bytes += size
+        while _cache_bytes > CLAIM_CHECK_CACHE_BYTES:
+            _, (_, evicted) = _cache.popitem(last=False)
+            _cache_bytes -= evicted
@@ -0,0 +1,45 @@
+# app/lambdas/content_keys.py  Chaves endereçadas por conteúdo (SHA-256) das notas fiscais no S3.
+import hashlib
+import os
+import re
+
+# Prefixo das imagens recebidas, particionado pelos primeiros bytes do hash
+RAW_PREFIX = 'raw/'
+# Prefixo das imagens normalizadas enviadas ao Textract (o original fica em raw/)
+NORMALIZED_PREFIX = 'normalized/'
+# Prefixo dos marcadores de processamento (um por conteúdo)
+RESULTS_PREFIX = 'results/'
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def content_digest(content):
+    """Calcula o SHA-256 do conteúdo (bytes ou memoryview, sem cópia)."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def shard_path(digest):
+    """Distribui as chaves em 'ab/cd/<hash>' para evitar prefixos quentes no S3."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def content_key(digest, file_name):
+    """Chave da imagem no bucket, mantendo a extensão do arquivo original."""
+    extension = os.path.splitext(file_name)[1].lower()
+    return f"{RAW_PREFIX}{shard_path(digest)}{extension}"
+
+
+def normalized_key(digest):
+    """Chave da versão normalizada (JPEG em tons de cinza) da imagem."""
+    return f"{NORMALIZED_PREFIX}{shard_path(digest)}.jpg"
+
+
+def result_key(digest):
+    """Chave do marcador com o status e o resultado do processamento do conteúdo."""
+    return f"{RESULTS_PREFIX}{shard_path(digest)}.json"
+
+
+def digest_from_key(key):
+    """Extrai o hash de uma chave endereçada por conteúdo, ou None se não for uma."""
+    name = os.path.splitext(os.path.basename(key))[0]
+    return name if DIGEST_PATTERN.match(name) else None
@@ -0,0 +1,72 @@
+# app/lambdas/image_normalizer.py  Normaliza as fotos das notas fiscais antes do Textract.
+import io
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Resolução alvo e maior dimensão da página (A4 = 11,7 pol.) usadas para limitar o tamanho
+NORMALIZE_TARGET_DPI = int(os.environ.get('NORMALIZE_TARGET_DPI', '150'))
+NORMALIZE_PAGE_INCHES = float(os.environ.get('NORMALIZE_PAGE_INCHES', '11.7'))
+# Qualidade do JPEG gerado
+NORMALIZE_JPEG_QUALITY = int(os.environ.get('NORMALIZE_JPEG_QUALITY', '85'))
+
+
+def is_available():
+    """Indica se o Pillow está disponível (layer opcional)."""
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def max_image_side(target_dpi=NORMALIZE_TARGET_DPI, page_inches=NORMALIZE_PAGE_INCHES):
+    """Maior dimensão, em pixels, de uma página na resolução alvo."""
+    return int(target_dpi * page_inches)
+
+
+def normalize_image(content, target_dpi=NORMALIZE_TARGET_DPI, grayscale=True,
+                    quality=NORMALIZE_JPEG_QUALITY):
+    """
+    Reduz a imagem para a resolução alvo, converte para tons de cinza e remove o EXIF.
+
+    A orientação indicada no EXIF é aplicada antes da remoção, para que o
+    texto chegue ao Textract na posição correta.
+
+    Parâmetros:
+        content (bytes ou memoryview): Conteúdo da imagem original.
+        target_dpi (int): Resolução alvo para uma página A4.
+        grayscale (bool): Converte a imagem para tons de cinza.
+        quality (int): Qualidade do JPEG gerado.
+
+    Retorno:
+        tuple: (bytes do JPEG normalizado, dict com dimensões e tamanhos).
+    """
+    # Importado sob demanda: o Pillow só é carregado quando a normalização está ativa
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(content)) as image:
+        original_size = image.size
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('L' if grayscale else 'RGB')
+
+        side = max_image_side(target_dpi)
+        if max(image.size) > side:
+            image.thumbnail((side, side), Image.LANCZOS)
+
+        output = io.BytesIO()
+        # Sem o parâmetro exif, o Pillow não grava os metadados da foto
+        image.save(output, format='JPEG', quality=quality,
+                   optimize=True, dpi=(target_dpi, target_dpi))
+
+    normalized = output.getvalue()
+    info = {
+        'original_size': list(original_size),
+        'normalized_size': list(image.size),
+        'original_bytes': len(content),
+        'normalized_bytes': len(normalized)
+    }
+    logger.info(
+        f"Imagem normalizada: {info['original_bytes']} -> {info['normalized_bytes']} bytes.")
+    return normalized, info
@@ -0,0 +1,108 @@
+# app/lambdas/ingestion_consumer.py  Consome a fila de ingestão e inicia o processamento das notas.
+import json
+import os
+import logging
+from aws_clients import get_client, preload_clients, track_invocation
+from pipeline import PIPELINE_MODE, remaining_seconds, retry_step_function_execution
+
+# Configuração do logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Cliente do Step Functions usado em toda invocação: criado na inicialização do container
+preload_clients('stepfunctions')
+
+# Tempo mínimo restante para iniciar mais uma mensagem do lote (segundos)
+MIN_TIME_PER_MESSAGE = float(os.environ.get('MIN_TIME_PER_MESSAGE', '2'))
+
+
+class IngestionConsumer:
+    """
+    Processa um lote de mensagens do gatilho SQS.
+
+    As mensagens são tratadas uma a uma. A concorrência máxima do gatilho
+    controla o ritmo em que as execuções são iniciadas; o limite de chamadas
+    ao Textract é aplicado na própria etapa, pela concorrência reservada da
+    Lambda do Textract (em qualquer PIPELINE_MODE).
+    """
+
+    def __init__(self, context=None):
+        self.context = context
+        self.stepfunctions = get_client('stepfunctions')
+        self.state_machine_arn = os.environ.get('STEP_FUNCTIONS_ARN')
+
+    @staticmethod
+    def parse_record(record):
+        """
+        Valida o corpo da mensagem.
+
+        Retorno:
+            tuple: (bool, dict ou str) - True e a mensagem se válida,
+            False e mensagem de erro se inválida.
+        """
+        try:
+            message = json.loads(record['body'])
+        except (KeyError, ValueError):
+            return False, 'Corpo da mensagem não é um JSON válido.'
+
+        if not isinstance(message, dict):
+            return False, 'Corpo da mensagem deve ser um objeto JSON.'
+        for field in ('bucket_name', 'file_name'):
+            if not message.get(field) or not isinstance(message[field], str):
+                return False, f'O campo "{field}" é obrigatório e deve ser uma string válida.'
+        return True, message
+
+    def process_record(self, record):
+        """Inicia a execução do Step Functions de uma mensagem."""
+        is_valid, message = self.parse_record(record)
+        if not is_valid:
+            # Mensagens malformadas não são reenviadas: nunca serão processadas
+            logger.error(f"Mensagem {record.get('messageId')} descartada: {message}")
+            return
+
+        response = retry_step_function_execution(
+            message, self.stepfunctions, self.state_machine_arn,
+            context=self.context, sync=PIPELINE_MODE == 'sync',
+            # O id da mensagem como nome evita execuções duplicadas em reentregas
+            name=record['messageId'])
+        if PIPELINE_MODE == 'sync' and response.get('status') != 'SUCCEEDED':
+            raise RuntimeError(
+                f"Execução {response['executionArn']} terminou com status {response.get('status')}.")
+
+    def handle(self, event):
+        """
+        Processa o lote e informa as mensagens que devem voltar para a fila.
+
+        Retorno:
+            dict: batchItemFailures no formato do gatilho SQS (ReportBatchItemFailures).
+        """
+        records = event.get('Records') or []
+        if not self.state_machine_arn:
+            logger.warning("ARN do Step Functions não definido. Lote devolvido à fila.")
+            return {'batchItemFailures': [
+                {'itemIdentifier': record['messageId']} for record in records]}
+
+        failures = []
+        for index, record in enumerate(records):
+            remaining = remaining_seconds(self.context)
+            if remaining is not None and remaining < MIN_TIME_PER_MESSAGE:
+                # Sem tempo para o restante: as mensagens voltam para a fila
+                logger.warning(
+                    f"Tempo da invocação esgotado. {len(records) - index} mensagens devolvidas.")
+                failures.extend(record['messageId'] for record in records[index:])
+                break
+            try:
+                self.process_record(record)
+            except Exception as e:
+                logger.error(f"Erro ao processar a mensagem {record['messageId']}: {str(e)}")
+                failures.append(record['messageId'])
+
+        logger.info(f"Lote processado: {len(records) - len(failures)} de {len(records)} mensagens.")
+        return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]}
+
+
+@track_invocation
+def lambda_handler(event, context):
+    """Função de entrada da Lambda (gatilho SQS com ReportBatchItemFailures)."""
+    logger.info("Lambda ingestion_consumer iniciada.")
+    return IngestionConsumer(context).handle(event)
@@ -0,0 +1,144 @@
+# app/lambdas/ingestion_queue.py  Fila de ingestão entre o upload e o processamento das notas.
+import json
+import os
+import uuid
+import logging
+from collections import deque
+
+from aws_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+# URL da fila SQS; quando definida, o upload enfileira em vez de iniciar o Step Functions
+INGESTION_QUEUE_URL = os.environ.get('INGESTION_QUEUE_URL', '')
+# Limite de mensagens por chamada do SQS (SendMessageBatch e ReceiveMessage)
+SQS_MAX_BATCH = 10
+
+
+def build_message(bucket_name, file_name, **extra):
+    """
+    Mensagem de ingestão com o arquivo a processar ({bucket_name, file_name}).
+
+    Com a normalização de imagens, file_name é a cópia enviada ao Textract e
+    raw_file_name (em extra) o original em raw/, que a movimentação arquiva.
+    """
+    return {'bucket_name': bucket_name, 'file_name': file_name, **extra}
+
+
+def chunked(items, size=SQS_MAX_BATCH):
+    """Divide a lista em grupos de até size itens."""
+    return [items[index:index + size] for index in range(0, len(items), size)]
+
+
+class SqsIngestionQueue:
+    """Fila de ingestão sobre o Amazon SQS."""
+
+    def __init__(self, queue_url):
+        # Cliente SQS reaproveitado entre invocações do container
+        self.sqs = get_client('sqs')
+        self.queue_url = queue_url
+
+    def send_messages(self, messages):
+        """
+        Envia as mensagens em lotes de até 10 (SendMessageBatch).
+
+        Parâmetros:
+            messages (list): Mensagens de ingestão (dicts serializáveis em JSON).
+
+        Retorno:
+            list: Mensagens que o SQS não aceitou.
+        """
+        failed = []
+        for chunk in chunked(messages):
+            entries = [{'Id': str(index), 'MessageBody': json.dumps(message)}
+                       for index, message in enumerate(chunk)]
+            response = self.sqs.send_message_batch(
+                QueueUrl=self.queue_url, Entries=entries)
+            for failure in response.get('Failed', []):
+                logger.error(
+                    f"Mensagem não enfileirada: {failure.get('Code')} {failure.get('Message')}")
+                failed.append(chunk[int(failure['Id'])])
+        return failed
+
+
+class InMemoryIngestionQueue:
+    """
+    Fila de ingestão em memória, usada nos testes e na execução local.
+
+    Entrega os eventos no mesmo formato do gatilho SQS da Lambda e devolve à
+    fila as mensagens indicadas em batchItemFailures.
+    """
+
+    def __init__(self):
+        self.messages = deque()
+
+    def send_messages(self, messages):
+        """Enfileira as mensagens; nunca há falhas de envio."""
+        for message in messages:
+            self.messages.append({
+                'messageId': str(uuid.uuid4()),
+                'body': json.dumps(message),
+                'attributes': {'ApproximateReceiveCount': '1'},
+                'eventSource': 'aws:sqs'
+            })
+        return []
+
+    def __len__(self):
+        return len(self.messages)
+
+    def receive_event(self, max_messages=SQS_MAX_BATCH):
+        """Retira até max_messages mensagens no formato de evento do gatilho SQS."""
+        records = []
+        while self.messages and len(records) < max_messages:
+            records.append(self.messages.popleft())
+        return {'Records': records}
+
+    def drain(self, handler, context=None, max_messages=SQS_MAX_BATCH, max_receives=3):
+        """
+        Entrega as mensagens ao handler até esvaziar a fila.
+
+        Parâmetros:
+            handler (callable): lambda_handler do consumidor (event, context).
+            context (LambdaContext): Contexto repassado ao handler.
+            max_messages (int): Tamanho de cada lote entregue.
+            max_receives (int): Entregas antes de descartar a mensagem (fila de erros).
+
+        Retorno:
+            list: Mensagens descartadas após max_receives entregas.
+        """
+        dead_letters = []
+        while self.messages:
+            event = self.receive_event(max_messages)
+            response = handler(event, context) or {}
+            failed_ids = {failure['itemIdentifier']
+                          for failure in response.get('batchItemFailures', [])}
+            for record in event['Records']:
+                if record['messageId'] not in failed_ids:
+                    continue
+                receive_count = int(record['attributes']['ApproximateReceiveCount'])
+                if receive_count >= max_receives:
+                    dead_letters.append(json.loads(record['body']))
+                    continue
+                record['attributes']['ApproximateReceiveCount'] = str(receive_count + 1)
+                self.messages.append(record)
+        return dead_letters
+
+
+_queue = None
+
+
+def get_ingestion_queue():
+    """
+    Retorna a fila de ingestão do container, ou None se o modo fila estiver desligado.
+
+    Com INGESTION_QUEUE_URL='memory://' a fila é mantida no próprio processo.
+    """
+    global _queue
+    if not INGESTION_QUEUE_URL:
+        return None
+    if _queue is None:
+        if INGESTION_QUEUE_URL.startswith('memory://'):
+            _queue = InMemoryIngestionQueue()
+        else:
+            _queue = SqsIngestionQueue(INGESTION_QUEUE_URL)
+    return _queue
@@ -1 +1,140 @@
 # app/lambda_functions/nlp_lambda.py    Processa os dados extraídos com NLP (linguagem natural)
+import os
+import time
+import logging
+
+# Início da fase de inicialização do container (imports incluídos)
+_init_started = time.perf_counter()
+
+import claim_check  # noqa: E402
+from aws_clients import emit_metrics, track_invocation  # noqa: E402
+import nlp_utils  # noqa: E402
+from nota_fiscal_model import NotaFiscal  # noqa: E402
+from pydantic import ValidationError  # noqa: E402
+
+# Configuração do logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Forma de implantação ('layer' ou 'image'), usada como dimensão das métricas de inicialização
+DEPLOYMENT_TYPE = os.environ.get('DEPLOYMENT_TYPE', 'layer')
+# Com SnapStart o modelo é carregado antes do snapshot: a restauração traz a memória
+# já pronta (páginas carregadas sob demanda) em vez de desserializar o modelo
+SNAPSTART = os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'snap-start'
+# Carrega o modelo na inicialização mesmo sem SnapStart (ex: provisioned concurrency)
+NLP_EAGER_LOAD = os.environ.get('NLP_EAGER_LOAD', 'false').lower() == 'true'
+
+if SNAPSTART or NLP_EAGER_LOAD:
+    nlp_utils.load_nlp()
+
+# Duração da inicialização do módulo, em milissegundos (registrada na primeira invocação)
+INIT_DURATION = (time.perf_counter() - _init_started) * 1000
+_invocations = 0
+
+
+def normalize_nota_fiscal(fields):
+    """
+    Valida e normaliza os campos extraídos com a NotaFiscal (CNPJ só com
+    dígitos, data ISO, valor decimal, forma de pagamento do enum).
+
+    Campos inválidos são descartados (ficam None) em vez de falhar a nota.
+
+    Retorno:
+        dict: Campos no formato JSON.
+    """
+    try:
+        return NotaFiscal.model_validate(fields).model_dump(mode='json')
+    except ValidationError as e:
+        invalid = {error['loc'][0] for error in e.errors(include_url=False)}
+        logger.warning(f"Campos inválidos descartados: {sorted(invalid)}")
+        return NotaFiscal.model_validate(
+            {key: value for key, value in fields.items() if key not in invalid}).model_dump(mode='json')
+
+
+class NlpLambdaHandler:
+    def __init__(self, event):
+        self.event = event
+
+    def validate_event(self):
+        """
+        Valida os dados do evento recebido do Step Functions (saída do Textract).
+
+        Retorno:
+            tuple: (bool, str ou tuple) - True se válido, False e mensagem de erro se inválido.
+        """
+        textract = self.event.get('textract')
+        file_name = self.event.get('raw_file_name') or self.event.get('file_name')
+
+        if not isinstance(textract, dict):
+            return False, 'O campo "textract" é obrigatório e deve ser um objeto.'
+
+        if not file_name or not isinstance(file_name, str):
+            return False, 'O campo "file_name" é obrigatório e deve ser uma string válida.'
+
+        return True, (textract, file_name)
+
+    def handle(self):
+        """
+        Extrai os campos da nota fiscal e prepara a entrada da Lambda de movimentação.
+
+        Retorno:
+            dict: Evento sem o texto do Textract, com a nota fiscal, o arquivo
+            a mover (source_key) e a forma de pagamento (payment_method).
+        """
+        is_valid, validation_message = self.validate_event()
+        if not is_valid:
+            logger.error(f"Evento inválido: {validation_message}")
+            raise ValueError(validation_message)
+
+        textract, file_name = validation_message
+        # Referência ao S3 quando o resumo do Textract é grande: lido só aqui, após a validação
+        textract = claim_check.get(textract)
+        nota_fiscal = normalize_nota_fiscal(nlp_utils.extract_from_textract(textract))
+        logger.info(f"Campos extraídos de {file_name}: "
+                    f"{sum(value is not None for value in nota_fiscal.values())}/{len(nota_fiscal)}.")
+
+        # O texto completo não segue adiante: reduz o estado trafegado no Step Functions
+        result = {key: value for key, value in self.event.items() if key != 'textract'}
+        return {
+            **result,
+            'nota_fiscal': nota_fiscal,
+            'source_key': file_name,
+            'payment_method': nota_fiscal['forma_pgto'] or 'outros'
+        }
+
+
+def emit_start_metrics(function_name, duration_ms, model_loaded_before):
+    """
+    Publica a latência separando partidas a frio e a quente.
+
+    Na partida a frio a latência inclui a inicialização do módulo; o tempo de
+    carregamento do modelo é registrado à parte quando acontece nesta invocação
+    ou na inicialização. A dimensão Deployment permite comparar layer e imagem.
+    """
+    cold = _invocations == 1
+    metrics = {'ColdStartLatency' if cold else 'WarmStartLatency':
+               round(duration_ms + (INIT_DURATION if cold else 0), 3)}
+    if cold:
+        metrics['InitDuration'] = round(INIT_DURATION, 3)
+    if nlp_utils.nlp_load_seconds is not None and (cold or not model_loaded_before):
+        metrics['ModelLoadDuration'] = round(nlp_utils.nlp_load_seconds * 1000, 3)
+    emit_metrics(function_name, metrics, dict.fromkeys(metrics, 'Milliseconds'),
+                 {'Deployment': DEPLOYMENT_TYPE}, SnapStart=SNAPSTART)
+
+
+@track_invocation
+def lambda_handler(event, context):
+    """
+    Função principal da Lambda. Os erros são propagados para que o
+    Step Functions registre a falha.
+    """
+    global _invocations
+    _invocations += 1
+    logger.info("Iniciando processamento do evento na Lambda nlp_lambda.")
+    model_loaded_before = nlp_utils.nlp_load_seconds is not None
+    start = time.perf_counter()
+    try:
+        return NlpLambdaHandler(event).handle()
+    finally:
+        emit_start_metrics(getattr(context, 'function_name', 'nlp_lambda'),
+                           (time.perf_counter() - start) * 1000, model_loaded_before)
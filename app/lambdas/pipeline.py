@@ -0,0 +1,80 @@
+# app/lambdas/pipeline.py  Início das execuções do Step Functions, compartilhado pelas Lambdas.
+import json
+import os
+import random
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 'async' retorna assim que a execução é criada; 'sync' espera o resultado
+# com start_sync_execution (exige uma máquina de estados Express)
+PIPELINE_MODE = os.environ.get('PIPELINE_MODE', 'async').lower()
+# Tentativas para iniciar o Step Functions e limites do backoff exponencial (segundos)
+START_RETRIES = int(os.environ.get('START_RETRIES', '4'))
+START_RETRY_BASE_DELAY = float(os.environ.get('START_RETRY_BASE_DELAY', '0.2'))
+START_RETRY_MAX_DELAY = float(os.environ.get('START_RETRY_MAX_DELAY', '5'))
+# Folga mantida antes do fim da invocação para responder ao cliente (segundos)
+START_RETRY_TIME_MARGIN = float(os.environ.get('START_RETRY_TIME_MARGIN', '1'))
+# Erros que uma nova tentativa não resolve (ex: execução com o mesmo nome já encerrada)
+NON_RETRYABLE_START_ERRORS = ('ExecutionAlreadyExists', 'InvalidName', 'InvalidArn',
+                              'InvalidExecutionInput', 'StateMachineDoesNotExist')
+
+
+def remaining_seconds(context):
+    """Tempo restante da invocação descontada a folga, ou None sem contexto."""
+    if context is None:
+        return None
+    return context.get_remaining_time_in_millis() / 1000 - START_RETRY_TIME_MARGIN
+
+
+def retry_step_function_execution(input_data, stepfunctions_client, state_machine_arn,
+                                  context=None, sync=False, name=None,
+                                  retries=START_RETRIES, base_delay=START_RETRY_BASE_DELAY):
+    """
+    Inicia o Step Functions com retry e backoff exponencial com jitter.
+
+    No modo assíncrono a função retorna assim que a execução é criada; o
+    resultado é consultado depois pela rota de status. As esperas entre as
+    tentativas nunca ultrapassam o tempo restante da invocação.
+
+    Parameters:
+        input_data (dict): Dados para enviar ao Step Functions.
+        stepfunctions_client (boto3.client): Cliente do Step Functions.
+        state_machine_arn (str): ARN do Step Function.
+        context (LambdaContext): Contexto da invocação, usado para limitar as esperas.
+        sync (bool): Usa start_sync_execution (apenas Express Workflows).
+        name (str): Nome da execução; repetir o nome torna a tentativa idempotente.
+        retries (int): Número máximo de tentativas.
+        base_delay (float): Espera base, em segundos, dobrada a cada tentativa.
+
+    Returns:
+        dict: Resposta do Step Functions (executionArn e, no modo síncrono, output).
+    """
+    params = {'stateMachineArn': state_machine_arn, 'input': json.dumps(input_data)}
+    if name:
+        params['name'] = name
+    start_execution = stepfunctions_client.start_sync_execution if sync \
+        else stepfunctions_client.start_execution
+
+    for attempt in range(1, retries + 1):
+        try:
+            response = start_execution(**params)
+            logger.info(
+                f"Execução do Step Functions iniciada. ID: {response['executionArn']}")
+            return response
+        except Exception as e:
+            logger.error(
+                f"Tentativa {attempt} falhou ao iniciar Step Functions: {str(e)}")
+            code = (getattr(e, 'response', None) or {}).get('Error', {}).get('Code')
+            if attempt == retries or code in NON_RETRYABLE_START_ERRORS:
+                raise  # Levanta a exceção após o número máximo de tentativas
+
+            # Full jitter: espalha as novas tentativas de invocações concorrentes
+            delay = random.uniform(
+                0, min(START_RETRY_MAX_DELAY, base_delay * 2 ** (attempt - 1)))
+            remaining = remaining_seconds(context)
+            if remaining is not None and delay >= remaining:
+                logger.error("Sem tempo restante na invocação para nova tentativa.")
+                raise
+            time.sleep(delay)
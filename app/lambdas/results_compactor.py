@@ -0,0 +1,31 @@
+# app/lambdas/results_compactor.py  Compacta o armazenamento de resultados (agendada).
+import os
+import logging
+from aws_clients import preload_clients, track_invocation
+from results_store import get_results_store
+
+# Configuração do logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Cliente S3 usado em toda invocação: criado na inicialização do container
+preload_clients('s3')
+
+
+@track_invocation
+def lambda_handler(event, context):
+    """
+    Junta os arquivos pequenos de cada partição em um único arquivo colunar e
+    reconstrói os índices mensais.
+
+    Parâmetros:
+        event (dict): Evento agendado; {"force": true} compacta partições com
+            qualquer quantidade de arquivos.
+
+    Retorno:
+        dict: Partições compactadas e arquivos reescritos.
+    """
+    force = bool((event or {}).get('force', False))
+    summary = get_results_store(os.environ['SOURCE_BUCKET']).compact(force=force)
+    logger.info(f"Compactação concluída: {summary}")
+    return summary
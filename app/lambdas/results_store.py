@@ -0,0 +1,360 @@
+# app/lambdas/results_store.py  Armazenamento colunar dos resultados (notas fiscais processadas).
+import datetime
+import gzip
+import io
+import json
+import os
+import time
+import uuid
+import logging
+from decimal import Decimal
+
+from aws_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+# Prefixo do armazenamento no bucket de imagens
+RESULTS_STORE_PREFIX = os.environ.get('RESULTS_STORE_PREFIX', 'results-store/')
+# Arquivos pequenos de uma partição a partir dos quais a compactação os junta
+COMPACTION_MIN_FILES = int(os.environ.get('COMPACTION_MIN_FILES', '8'))
+# Arquivos maiores que isto já estão compactados e não são reescritos (bytes)
+COMPACTION_TARGET_BYTES = int(os.environ.get('COMPACTION_TARGET_BYTES', str(64 * 1024 * 1024)))
+
+DATA_PREFIX = 'invoices/'
+INDEX_PREFIX = 'index/'
+# Partição sem data de emissão reconhecida
+UNKNOWN_MONTH = 'desconhecido'
+
+# Colunas gravadas, na ordem do arquivo
+COLUMNS = ('sha256', 'file_name', 'destination_folder', 'processed_at',
+           'nome_emissor', 'CNPJ_emissor', 'endereco_emissor', 'CNPJ_CPF_consumidor',
+           'data_emissao', 'numero_nota_fiscal', 'serie_nota_fiscal', 'valor_total',
+           'forma_pgto')
+
+
+def is_available():
+    """Indica se o pyarrow está disponível (layer opcional) para gravar Parquet."""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def arrow_schema():
+    # Importado sob demanda: o caminho de gravação (s3_move) não depende do pyarrow
+    import pyarrow as pa
+    return pa.schema([
+        ('sha256', pa.string()), ('file_name', pa.string()),
+        ('destination_folder', pa.string()), ('processed_at', pa.timestamp('ms', tz='UTC')),
+        ('nome_emissor', pa.string()), ('CNPJ_emissor', pa.string()),
+        ('endereco_emissor', pa.string()), ('CNPJ_CPF_consumidor', pa.string()),
+        ('data_emissao', pa.date32()), ('numero_nota_fiscal', pa.string()),
+        ('serie_nota_fiscal', pa.string()), ('valor_total', pa.decimal128(14, 2)),
+        ('forma_pgto', pa.dictionary(pa.int8(), pa.string())),
+    ])
+
+
+def flatten(result):
+    """
+    Linha do armazenamento a partir do resultado do processamento.
+
+    Parâmetros:
+        result (dict): Resultado com sha256, file_name e nota_fiscal (já
+            normalizada pela NotaFiscal: CNPJ só com dígitos, data ISO).
+    """
+    nota_fiscal = result.get('nota_fiscal') or {}
+    row = {column: nota_fiscal.get(column) for column in COLUMNS[4:]}
+    row.update({
+        'sha256': result.get('sha256'),
+        'file_name': result.get('file_name'),
+        'destination_folder': result.get('destination_folder'),
+        'processed_at': result.get('processed_at') or
+        datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds'),
+    })
+    return row
+
+
+def partition_of(row):
+    """Partição (ano-mês da emissão, forma de pagamento) de uma linha."""
+    date = row.get('data_emissao') or ''
+    month = str(date)[:7] if len(str(date)) >= 7 else UNKNOWN_MONTH
+    return month, row.get('forma_pgto') or 'outros'
+
+
+def to_arrow_row(row):
+    """Converte os valores JSON (data ISO, valor em texto) para os tipos do schema."""
+    row = dict(row)
+    if isinstance(row.get('data_emissao'), str):
+        row['data_emissao'] = datetime.date.fromisoformat(row['data_emissao'])
+    if isinstance(row.get('processed_at'), str):
+        row['processed_at'] = datetime.datetime.fromisoformat(row['processed_at'])
+    if row.get('valor_total') is not None:
+        row['valor_total'] = Decimal(str(row['valor_total'])).quantize(Decimal('0.01'))
+    return row
+
+
+def from_arrow_value(value):
+    # Valores lidos do Parquet de volta ao formato JSON das linhas pendentes
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class ResultsStore:
+    """
+    Notas fiscais processadas em arquivos particionados por mês de emissão e
+    forma de pagamento: <prefixo>invoices/ano_mes=AAAA-MM/forma_pgto=<forma>/.
+
+    Cada processamento grava um arquivo pequeno (NDJSON comprimido, sem
+    dependências); a compactação periódica junta os arquivos pequenos de cada
+    partição em um Parquet e reconstrói o índice do mês por CNPJ e número.
+    Relatórios mensais leem apenas a partição do mês.
+
+    A compactação de uma partição não é segura com duas execuções ao mesmo
+    tempo: a Lambda de compactação deve ter concorrência 1.
+    """
+
+    def __init__(self, bucket_name, prefix=RESULTS_STORE_PREFIX, client=None):
+        self.s3 = client or get_client('s3')
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+
+    def partition_prefix(self, month, forma_pgto=None):
+        prefix = f"{self.prefix}{DATA_PREFIX}ano_mes={month}/"
+        return f"{prefix}forma_pgto={forma_pgto}/" if forma_pgto else prefix
+
+    def index_key(self, month):
+        return f"{self.prefix}{INDEX_PREFIX}ano_mes={month}.json.gz"
+
+    @staticmethod
+    def part_name(extension):
+        # Prefixo com o horário: a listagem do S3 (ordem lexicográfica) segue a ordem de gravação
+        return f"part-{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}.{extension}"
+
+    def append(self, results):
+        """
+        Grava os resultados, um arquivo por partição.
+
+        Parâmetros:
+            results (list): Resultados do processamento (ver flatten()).
+
+        Retorno:
+            list: Chaves dos arquivos gravados.
+        """
+        partitions = {}
+        for result in results:
+            row = flatten(result)
+            partitions.setdefault(partition_of(row), []).append(row)
+
+        keys = []
+        for (month, forma_pgto), rows in partitions.items():
+            key = f"{self.partition_prefix(month, forma_pgto)}{self.part_name('ndjson.gz')}"
+            body = gzip.compress('\n'.join(
+                json.dumps(row, separators=(',', ':'), default=str) for row in rows).encode('utf-8'))
+            self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=body,
+                               ContentType='application/x-ndjson', ContentEncoding='gzip')
+            keys.append(key)
+        return keys
+
+    def list_files(self, prefix):
+        """Arquivos de dados sob o prefixo: [{'Key', 'Size'}]."""
+        paginator = self.s3.get_paginator('list_objects_v2')
+        files = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            files.extend(item for item in page.get('Contents', [])
+                         if item['Key'].endswith(('.parquet', '.ndjson.gz')))
+        return files
+
+    def list_partitions(self):
+        """Prefixos das partições existentes (ano_mes/forma_pgto)."""
+        paginator = self.s3.get_paginator('list_objects_v2')
+        partitions = []
+        for page in paginator.paginate(Bucket=self.bucket_name,
+                                       Prefix=f"{self.prefix}{DATA_PREFIX}", Delimiter='/'):
+            for month in page.get('CommonPrefixes', []):
+                for sub_page in paginator.paginate(Bucket=self.bucket_name,
+                                                   Prefix=month['Prefix'], Delimiter='/'):
+                    partitions.extend(item['Prefix'] for item in sub_page.get('CommonPrefixes', []))
+        return partitions
+
+    def read_file(self, key, columns=None):
+        """Linhas de um arquivo (Parquet ou NDJSON), no formato JSON das linhas."""
+        body = self.s3.get_object(Bucket=self.bucket_name, Key=key)['Body'].read()
+        if key.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            table = pq.read_table(io.BytesIO(body), columns=list(columns) if columns else None)
+            return [{name: from_arrow_value(value) for name, value in row.items()}
+                    for row in table.to_pylist()]
+        rows = [json.loads(line) for line in gzip.decompress(body).splitlines() if line]
+        if columns:
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        return rows
+
+    def write_compacted(self, prefix, rows):
+        """Grava as linhas em um único arquivo (Parquet, ou NDJSON sem o pyarrow)."""
+        if is_available():
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pylist([to_arrow_row(row) for row in rows], schema=arrow_schema())
+            output = io.BytesIO()
+            pq.write_table(table, output, compression='zstd')
+            key = f"{prefix}{self.part_name('parquet')}"
+            body = output.getvalue()
+        else:
+            key = f"{prefix}{self.part_name('ndjson.gz')}"
+            body = gzip.compress('\n'.join(
+                json.dumps(row, separators=(',', ':')) for row in rows).encode('utf-8'))
+        self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=body)
+        return key
+
+    def compact_partition(self, prefix, force=False):
+        """
+        Junta os arquivos pequenos da partição em um único arquivo.
+
+        Linhas repetidas do mesmo conteúdo (sha256) são gravadas uma vez,
+        mantendo o processamento mais recente. Os arquivos originais só são
+        removidos depois que o compactado foi gravado.
+
+        Retorno:
+            dict: {'files': arquivos juntados, 'rows': linhas gravadas, 'key': novo arquivo}.
+        """
+        small = [item for item in self.list_files(prefix)
+                 if item['Size'] < COMPACTION_TARGET_BYTES]
+        if len(small) < 2 or (not force and len(small) < COMPACTION_MIN_FILES):
+            return {'files': 0, 'rows': 0, 'key': None}
+
+        latest = {}
+        for item in small:
+            for row in self.read_file(item['Key']):
+                current = latest.get(row['sha256'])
+                if current is None or (row.get('processed_at') or '') >= (current.get('processed_at') or ''):
+                    latest[row['sha256']] = row
+        rows = sorted(latest.values(), key=lambda row: row.get('data_emissao') or '')
+        key = self.write_compacted(prefix, rows)
+
+        keys = [item['Key'] for item in small]
+        for start in range(0, len(keys), 1000):
+            self.s3.delete_objects(Bucket=self.bucket_name, Delete={
+                'Objects': [{'Key': key} for key in keys[start:start + 1000]], 'Quiet': True})
+        logger.info(f"Partição {prefix}: {len(keys)} arquivos compactados em {key} ({len(rows)} linhas).")
+        return {'files': len(keys), 'rows': len(rows), 'key': key}
+
+    def build_index(self, month):
+        """
+        Reconstrói o índice do mês: CNPJ do emissor e número da nota -> arquivos.
+
+        A lista 'files' guarda todos os arquivos lidos na indexação: as consultas
+        só leem, além dos apontados pelo índice, os arquivos que não estão nela.
+
+        Retorno:
+            dict: {'cnpj': {cnpj: [chaves]}, 'numero': {numero: [chaves]},
+            'files': [chaves]}.
+        """
+        files = self.list_files(self.partition_prefix(month))
+        index = {'cnpj': {}, 'numero': {}, 'files': [item['Key'] for item in files]}
+        for item in files:
+            for row in self.read_file(item['Key'], columns=('CNPJ_emissor', 'numero_nota_fiscal')):
+                for name, value in (('cnpj', row.get('CNPJ_emissor')),
+                                    ('numero', row.get('numero_nota_fiscal'))):
+                    if value:
+                        keys = index[name].setdefault(value, [])
+                        if item['Key'] not in keys:
+                            keys.append(item['Key'])
+        self.s3.put_object(Bucket=self.bucket_name, Key=self.index_key(month),
+                           Body=gzip.compress(json.dumps(index).encode('utf-8')),
+                           ContentType='application/json', ContentEncoding='gzip')
+        return index
+
+    def read_index(self, key):
+        """Índice de um mês gravado por build_index(), ou None se não existir."""
+        try:
+            body = self.s3.get_object(Bucket=self.bucket_name, Key=key)['Body'].read()
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        return json.loads(gzip.decompress(body))
+
+    def has_unindexed_files(self, month):
+        """Indica se o mês tem arquivos gravados depois da última indexação."""
+        indexed = set((self.read_index(self.index_key(month)) or {}).get('files', []))
+        return any(item['Key'] not in indexed
+                   for item in self.list_files(self.partition_prefix(month)))
+
+    def compact(self, force=False):
+        """
+        Compacta todas as partições e reconstrói o índice dos meses alterados.
+
+        Meses com arquivos fora do índice também são reindexados, mesmo que suas
+        partições ainda não tenham arquivos suficientes para a compactação.
+
+        Retorno:
+            dict: {prefixo da partição: resultado de compact_partition}.
+        """
+        results, months, changed = {}, set(), set()
+        for prefix in self.list_partitions():
+            month = prefix.split('ano_mes=', 1)[1].split('/', 1)[0]
+            months.add(month)
+            result = self.compact_partition(prefix, force)
+            if result['files']:
+                results[prefix] = result
+                changed.add(month)
+        changed.update(month for month in months - changed if self.has_unindexed_files(month))
+        for month in sorted(changed):
+            self.build_index(month)
+        return results
+
+    def query(self, month, forma_pgto=None, columns=None):
+        """
+        Linhas de um mês (e forma de pagamento), lendo apenas a partição.
+
+        Retorno:
+            list: Linhas no formato JSON (data ISO, valor em texto).
+        """
+        rows = []
+        for item in self.list_files(self.partition_prefix(month, forma_pgto)):
+            rows.extend(self.read_file(item['Key'], columns))
+        return rows
+
+    def lookup(self, cnpj=None, numero=None):
+        """
+        Notas fiscais por CNPJ do emissor e/ou número, pelo índice de cada mês.
+
+        Além dos arquivos apontados pelo índice, só são lidos os arquivos
+        gravados depois da última indexação do mês (fora da lista 'files').
+        """
+        if not cnpj and not numero:
+            raise ValueError('Informe o CNPJ ou o número da nota fiscal.')
+        candidates, indexed = set(), set()
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name,
+                                       Prefix=f"{self.prefix}{INDEX_PREFIX}"):
+            for item in page.get('Contents', []):
+                index = self.read_index(item['Key'])
+                if index is None:
+                    continue
+                # Índices gravados antes da lista 'files' não excluem nenhum arquivo
+                indexed.update(index.get('files', []))
+                keys = [set(index['cnpj'].get(cnpj, []))] if cnpj else []
+                keys += [set(index['numero'].get(numero, []))] if numero else []
+                candidates.update(set.intersection(*keys))
+        candidates.update(item['Key'] for item in self.list_files(f"{self.prefix}{DATA_PREFIX}")
+                          if item['Key'] not in indexed)
+
+        rows = []
+        for key in sorted(candidates):
+            try:
+                file_rows = self.read_file(key)
+            except self.s3.exceptions.NoSuchKey:
+                # Arquivo removido por uma compactação depois da leitura do índice
+                continue
+            rows.extend(row for row in file_rows
+                        if (not cnpj or row.get('CNPJ_emissor') == cnpj)
+                        and (not numero or row.get('numero_nota_fiscal') == numero))
+        return rows
+
+
+def get_results_store(bucket_name):
+    """Armazenamento de resultados no bucket (cliente S3 reaproveitado do container)."""
+    return ResultsStore(bucket_name)
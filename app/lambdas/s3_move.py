@@ -1,22 +1,184 @@
 # app/lambdas/s3_move.py  Move as notas fiscais no S3 com base no pagamento.
+import csv
+import datetime
+import hashlib
+import io
 import json
-import boto3
 import os
-from botocore.exceptions import NoCredentialsError, ClientError
+import time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
 import logging
+from aws_clients import (MAX_POOL_CONNECTIONS, emit_metrics, get_client, preload_clients,
+                         track_invocation)
+from content_keys import digest_from_key, result_key
+from pipeline import remaining_seconds
+from results_store import ResultsStore, get_results_store
 
-# Configuração do logger
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Configuração do logger (o runtime da Lambda já instala o handler do logger raiz)
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Cliente S3 usado em toda invocação: criado na inicialização do container
+preload_clients('s3')
+
+# Formas de pagamento cujas notas vão para a pasta dinheiro/
+CASH_PAYMENT_METHODS = ('dinheiro', 'pix')
+# Máximo de chaves por chamada ao delete_objects
+DELETE_BATCH_SIZE = 1000
+# Cópias simultâneas da movimentação em massa (limitadas ao pool de conexões do cliente)
+BULK_MOVE_WORKERS = int(os.environ.get('BULK_MOVE_WORKERS', str(MAX_POOL_CONNECTIONS)))
+# Prefixo dos checkpoints das movimentações em massa
+BULK_MOVE_PREFIX = os.environ.get('BULK_MOVE_PREFIX', 'bulk-move/')
+# Tempo mínimo restante para começar mais um lote antes de reinvocar a Lambda (segundos)
+BULK_MOVE_MIN_TIME = float(os.environ.get('BULK_MOVE_MIN_TIME', '10'))
+
+# Acima deste tamanho a cópia é feita em partes paralelas (upload_part_copy); o
+# copy_object aceita no máximo 5 GB e copia objetos grandes em uma única requisição
+MULTIPART_COPY_THRESHOLD = int(os.environ.get('MULTIPART_COPY_THRESHOLD', str(128 * 1024 * 1024)))
+# Tamanho de cada parte (mínimo de 5 MB do S3, exceto a última)
+MULTIPART_COPY_PART_SIZE = int(os.environ.get('MULTIPART_COPY_PART_SIZE', str(64 * 1024 * 1024)))
+# Partes copiadas simultaneamente por objeto
+MULTIPART_COPY_CONCURRENCY = int(os.environ.get('MULTIPART_COPY_CONCURRENCY',
+                                                str(MAX_POOL_CONNECTIONS)))
+# Limites do S3 para o upload em partes
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+# Prefixo do diário de movimentações (uma entrada por execução e arquivo)
+MOVE_JOURNAL_PREFIX = os.environ.get('MOVE_JOURNAL_PREFIX', 'move-journal/')
+# Erros do S3 para uma escrita condicional (If-None-Match/If-Match) que não pôde ser aplicada
+CONDITIONAL_WRITE_ERRORS = ('PreconditionFailed', 'ConditionalRequestConflict')
+
+
+def destination_for(payment_method):
+    """Pasta de destino da nota a partir da forma de pagamento."""
+    return "dinheiro" if (payment_method or '').lower() in CASH_PAYMENT_METHODS else "outros"
+
+
+def part_ranges(size, part_size=None):
+    """Intervalos de bytes (inclusivos) das partes, respeitando o máximo de 10000 partes."""
+    part_size = max(part_size or MULTIPART_COPY_PART_SIZE, MIN_PART_SIZE, -(-size // MAX_PARTS))
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
 
 
 class S3Mover:
-    def __init__(self, source_bucket):
-        # Inicializa o cliente S3
-        self.s3 = boto3.client('s3')
+    def __init__(self, source_bucket, client=None):
+        # Cliente S3 reaproveitado entre invocações do container
+        self.s3 = client or get_client('s3')
         self.source_bucket = source_bucket
 
-    def move_file(self, source_key,  destination_folder):
+    def copy_file(self, source_key, destination_folder, source=None):
+        """
+        Copia o arquivo para a pasta de destino (cópia no servidor, sem download).
+
+        A cópia é condicionada ao ETag da origem (CopySourceIfMatch) e conferida
+        antes de retornar, para que a origem só seja excluída depois de uma
+        cópia íntegra.
+
+        Parâmetros:
+            source_key (str): Chave de origem.
+            destination_folder (str): Pasta de destino.
+            source (dict): ContentLength e ETag da origem, se já conhecidos (ex:
+                da listagem); sem eles é feito um head_object.
+
+        Retorno:
+            str: Chave de destino. Erros do S3 são levantados como ClientError e
+            cópias que não conferem como RuntimeError.
+        """
+        destination_key = f"{destination_folder}/{os.path.basename(source_key)}"
+        if source is None or source.get('ContentLength') is None:
+            source = self.s3.head_object(Bucket=self.source_bucket, Key=source_key)
+
+        if source['ContentLength'] > MULTIPART_COPY_THRESHOLD:
+            self.multipart_copy(source_key, destination_key, source)
+            return destination_key
+
+        copy_source = {'Bucket': self.source_bucket, 'Key': source_key}
+        response = self.s3.copy_object(CopySource=copy_source, CopySourceIfMatch=source['ETag'],
+                                       Bucket=self.source_bucket, Key=destination_key)
+        etag = response['CopyObjectResult']['ETag']
+        # O ETag de um objeto enviado em partes não é o MD5 do conteúdo: nesse caso
+        # a condição CopySourceIfMatch já garante a versão copiada
+        if '-' not in source['ETag'] and etag != source['ETag']:
+            raise RuntimeError(
+                f"ETag da cópia {destination_key} ({etag}) difere da origem ({source['ETag']}).")
+        return destination_key
+
+    def multipart_copy(self, source_key, destination_key, source):
+        """
+        Copia um objeto grande em partes paralelas com upload_part_copy.
+
+        Cada parte é copiada com CopySourceIfMatch, então todas vêm da mesma
+        versão da origem; depois da montagem só o tamanho do destino é
+        conferido (o ETag composto é calculado dos ETags das próprias partes e
+        não comprova o conteúdo). Em caso de falha o upload em partes é abortado.
+
+        Parâmetros:
+            source (dict): Resposta do head_object da origem (tamanho, ETag,
+                ContentType e Metadata, que a cópia em partes não preserva sozinha).
+        """
+        if 'ContentType' not in source:
+            source = self.s3.head_object(Bucket=self.source_bucket, Key=source_key)
+        size = source['ContentLength']
+        ranges = part_ranges(size)
+        upload_id = self.s3.create_multipart_upload(
+            Bucket=self.source_bucket, Key=destination_key,
+            ContentType=source.get('ContentType', 'binary/octet-stream'),
+            Metadata=source.get('Metadata', {}))['UploadId']
+        copy_source = {'Bucket': self.source_bucket, 'Key': source_key}
+
+        def copy_part(part):
+            number, (first, last) = part
+            response = self.s3.upload_part_copy(
+                Bucket=self.source_bucket, Key=destination_key, UploadId=upload_id,
+                PartNumber=number, CopySource=copy_source, CopySourceIfMatch=source['ETag'],
+                CopySourceRange=f"bytes={first}-{last}")
+            return {'PartNumber': number, 'ETag': response['CopyPartResult']['ETag']}
+
+        try:
+            workers = max(1, min(MULTIPART_COPY_CONCURRENCY, len(ranges)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                parts = list(executor.map(copy_part, enumerate(ranges, start=1)))
+            self.s3.complete_multipart_upload(
+                Bucket=self.source_bucket, Key=destination_key, UploadId=upload_id,
+                MultipartUpload={'Parts': parts})
+        except Exception:
+            self.s3.abort_multipart_upload(
+                Bucket=self.source_bucket, Key=destination_key, UploadId=upload_id)
+            raise
+
+        copied = self.s3.head_object(Bucket=self.source_bucket, Key=destination_key)
+        if copied['ContentLength'] != size:
+            raise RuntimeError(
+                f"Cópia em partes de {destination_key} não confere: "
+                f"{copied['ContentLength']} de {size} bytes.")
+        logger.info(f"Cópia em {len(parts)} partes concluída: {source_key} -> {destination_key}")
+
+    def delete_files(self, keys):
+        """
+        Exclui os arquivos em lotes de até 1000 chaves por chamada.
+
+        Parâmetros:
+            keys (list): Chaves a excluir.
+
+        Retorno:
+            list: Chaves que não puderam ser excluídas.
+        """
+        failed = []
+        for start in range(0, len(keys), DELETE_BATCH_SIZE):
+            batch = keys[start:start + DELETE_BATCH_SIZE]
+            try:
+                response = self.s3.delete_objects(
+                    Bucket=self.source_bucket,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True})
+                failed.extend(error['Key'] for error in response.get('Errors', []))
+            except ClientError as e:
+                logger.error(f"Erro ao excluir um lote de {len(batch)} arquivos: {e}")
+                failed.extend(batch)
+        return failed
+
+    def move_file(self, source_key, destination_folder):
         """
         Move um arquivo na bucket S3.
 
@@ -28,13 +190,8 @@ class S3Mover:
             bool: True se o arquivo foi movido com sucesso, False caso contrário.
         """
         try:
-            # Define o caminho de destino do arquivo no bucket de destino
-            destination_key = f"{destination_folder}/{os.path.basename(source_key)}"
-
             # Copia o arquivo do bucket de origem para a bucket pasta de destino
-            copy_source = {'Bucket': self.source_bucket, 'Key': source_key}
-            self.s3.copy_object(CopySource=copy_source,
-                                Bucket=self.source_bucket, Key=destination_key)
+            destination_key = self.copy_file(source_key, destination_folder)
 
             # Exclui o arquivo do bucket de origem após a cópia
             self.s3.delete_object(Bucket=self.source_bucket, Key=source_key)
@@ -42,11 +199,96 @@ class S3Mover:
             logger.info(
                 f"Arquivo movido com sucesso: {source_key} -> {destination_key}")
             return True
-        except ClientError as e:
+        except (ClientError, RuntimeError) as e:
             # Log de erro caso ocorra uma falha ao mover o arquivo
             logger.error(f"Erro ao mover o arquivo: {e}")
             return False
 
+    def read_result(self, digest):
+        """Marcador de resultado do conteúdo, ou None se não existir."""
+        try:
+            response = self.s3.get_object(Bucket=self.source_bucket, Key=result_key(digest))
+            return json.loads(response['Body'].read())
+        except self.s3.exceptions.NoSuchKey:
+            return None
+
+    def record_result(self, digest, result):
+        """
+        Atualiza o marcador do conteúdo com o resultado final do processamento.
+
+        Uploads repetidos do mesmo conteúdo passam a receber esse resultado
+        diretamente, sem executar Textract e NLP novamente.
+
+        Parâmetros:
+            digest (str): SHA-256 do conteúdo.
+            result (dict): Resultado do processamento.
+
+        Retorno:
+            bool: True se o marcador foi gravado com sucesso, False caso contrário.
+        """
+        try:
+            self.s3.put_object(
+                Bucket=self.source_bucket,
+                Key=result_key(digest),
+                Body=json.dumps(result).encode('utf-8'),
+                ContentType='application/json'
+            )
+            return True
+        except ClientError as e:
+            logger.error(f"Erro ao registrar o resultado de {digest}: {e}")
+            return False
+
+
+class MoveJournal:
+    """
+    Diário das movimentações no bucket, gravado com escritas condicionais do S3.
+
+    Cada movimentação (execução do Step Functions + arquivo) tem uma entrada que
+    avança de 'started' para 'copied' e 'done'. A criação usa If-None-Match e
+    cada avanço usa If-Match com o ETag lido: duas tentativas simultâneas não
+    avançam a mesma entrada, e uma nova tentativa retoma do último passo
+    concluído (uma entrada 'done' devolve o resultado sem acessar a nota).
+    """
+
+    def __init__(self, client, bucket_name, prefix=MOVE_JOURNAL_PREFIX):
+        self.s3 = client
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+
+    def entry_key(self, execution_id, source_key):
+        """Chave da entrada; sem execução, a movimentação é identificada só pelo arquivo."""
+        identity = f"{execution_id or ''}\n{source_key}".encode('utf-8')
+        return f"{self.prefix}{hashlib.sha256(identity).hexdigest()}.json"
+
+    def read(self, key):
+        """
+        Retorno:
+            tuple: (entrada, ETag) ou (None, None) se a entrada não existir.
+        """
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=key)
+            return json.loads(response['Body'].read()), response['ETag']
+        except self.s3.exceptions.NoSuchKey:
+            return None, None
+
+    def write(self, key, entry, etag=None):
+        """
+        Cria (etag=None) ou avança a entrada de forma condicional.
+
+        Retorno:
+            str: ETag da entrada gravada, ou None se outra tentativa gravou antes.
+        """
+        condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        try:
+            response = self.s3.put_object(
+                Bucket=self.bucket_name, Key=key, Body=json.dumps(entry).encode('utf-8'),
+                ContentType='application/json', **condition)
+            return response['ETag']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in CONDITIONAL_WRITE_ERRORS:
+                return None
+            raise
+
 
 class MoveLambdaHandler:
     def __init__(self, event):
@@ -54,6 +296,7 @@ class MoveLambdaHandler:
         # Obtém os nomes dos buckets de origem e destino das variáveis de ambiente
         self.source_bucket = os.environ['SOURCE_BUCKET']
         self.mover = S3Mover(self.source_bucket)
+        self.journal = MoveJournal(self.mover.s3, self.source_bucket)
 
     def validate_event(self):
         """
@@ -80,6 +323,13 @@ class MoveLambdaHandler:
     def handle(self):
         """
         Processa o evento e move o arquivo no S3 com base no método de pagamento.
+
+        A movimentação é idempotente: repetir o evento (retry do Step Functions,
+        reentrega) retoma do último passo registrado no diário e, depois de
+        concluída, apenas devolve o resultado.
+
+        Retorno:
+            dict: Resultado da movimentação.
         """
         is_valid, validation_message = self.validate_event()
         if not is_valid:
@@ -89,27 +339,309 @@ class MoveLambdaHandler:
         source_key, payment_method = validation_message
 
         # Define a pasta de destino com base no método de pagamento
-        destination_folder = "dinheiro" if payment_method.lower() in [
-            "dinheiro", "pix"] else "outros"
+        destination_folder = destination_for(payment_method)
+        destination_key = f"{destination_folder}/{os.path.basename(source_key)}"
 
-        # Move o arquivo
-        if not self.mover.move_file(source_key, destination_folder):
-            raise RuntimeError(
-                f"Erro ao mover o arquivo {source_key} para {destination_folder}.")
+        entry_key = self.journal.entry_key(self.event.get('execution_id'), source_key)
+        entry, etag = self.journal.read(entry_key)
+        if entry is None:
+            entry = {'status': 'started', 'source_key': source_key,
+                     'destination_key': destination_key}
+            etag = self.journal.write(entry_key, entry)
+            if etag is None:
+                raise RuntimeError(f"Movimentação de {source_key} já em andamento em outra tentativa.")
+        if entry['status'] == 'done':
+            logger.info(f"Movimentação de {source_key} já concluída; devolvendo o resultado.")
+            return entry['result']
+        # Uma tentativa anterior pode ter calculado outro destino (regra alterada): mantém o dela
+        destination_key = entry['destination_key']
+        destination_folder = os.path.dirname(destination_key)
+
+        if entry['status'] == 'started':
+            self.copy(source_key, destination_folder, destination_key)
+            entry = {**entry, 'status': 'copied'}
+            etag = self.advance(entry_key, entry, etag)
+
+        # Exclui a origem; excluir uma chave que já não existe não é erro no S3
+        self.mover.s3.delete_object(Bucket=self.source_bucket, Key=source_key)
+        logger.info(f"Arquivo movido com sucesso: {source_key} -> {destination_key}")
+
+        result = {
+            **self.event,
+            'status': 'processed',
+            'file_name': destination_key,
+            'destination_folder': destination_folder
+        }
+        # Registra o resultado para os arquivos endereçados por conteúdo (raw/ab/cd/<hash>)
+        digest = digest_from_key(source_key)
+        if digest:
+            result['sha256'] = digest
+            self.mover.record_result(digest, result)
+            self.store_result(result)
+
+        self.advance(entry_key, {**entry, 'status': 'done', 'result': result}, etag)
+        return result
+
+    def copy(self, source_key, destination_folder, destination_key):
+        """Copia para o destino; sem a origem, aceita a cópia feita por uma tentativa anterior."""
+        try:
+            self.mover.copy_file(source_key, destination_folder)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+                raise
+            try:
+                self.mover.s3.head_object(Bucket=self.source_bucket, Key=destination_key)
+            except ClientError:
+                raise RuntimeError(
+                    f"Arquivo {source_key} não existe na origem nem no destino.") from e
+            logger.info(f"Origem {source_key} já copiada para {destination_key}.")
+
+    def advance(self, entry_key, entry, etag):
+        """Avança a entrada do diário; falha se outra tentativa avançou antes."""
+        etag = self.journal.write(entry_key, entry, etag)
+        if etag is None:
+            raise RuntimeError(f"Entrada {entry_key} do diário alterada por outra tentativa.")
+        return etag
+
+    def store_result(self, result):
+        """
+        Acrescenta o resultado ao armazenamento colunar de consultas.
+
+        Uma falha aqui não desfaz a movimentação: o marcador em results/ já
+        registra o resultado e a nota entra no armazenamento no próximo envio.
+        """
+        try:
+            get_results_store(self.mover.source_bucket).append([result])
+        except Exception as e:
+            logger.error(f"Erro ao gravar o resultado no armazenamento colunar: {e}")
+
+
+class BulkMover:
+    """
+    Reclassifica em massa as notas já movidas (ex: após mudar a regra de destino).
+
+    Os arquivos vêm de um manifesto CSV no bucket (source_key[,pasta de
+    destino]) ou da listagem de um prefixo. Sem a pasta no manifesto, o destino
+    é calculado pela forma de pagamento do marcador em results/.
+
+    As cópias rodam em um pool de threads limitado e as exclusões em lotes de
+    até 1000 chaves. Ao fim de cada lote o checkpoint é gravado no bucket:
+    uma execução interrompida continua do último lote concluído, e as cópias
+    repetidas do lote interrompido são idempotentes.
+    """
+
+    def __init__(self, mover, job_id, max_workers=BULK_MOVE_WORKERS, batch_size=DELETE_BATCH_SIZE):
+        self.mover = mover
+        self.s3 = mover.s3
+        self.job_id = job_id
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.checkpoint_key = f"{BULK_MOVE_PREFIX}{job_id}.json"
+        self.store = ResultsStore(mover.source_bucket, client=mover.s3)
+
+    @staticmethod
+    def job_id_for(source):
+        """Identificador estável do job a partir do manifesto ou prefixo."""
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+
+    def load_checkpoint(self):
+        """Estado salvo do job, ou o estado inicial."""
+        try:
+            response = self.s3.get_object(Bucket=self.mover.source_bucket, Key=self.checkpoint_key)
+            return json.loads(response['Body'].read())
+        except self.s3.exceptions.NoSuchKey:
+            return {'position': None, 'moved': 0, 'skipped': 0, 'failed': 0,
+                    'failed_keys': [], 'elapsed': 0.0, 'done': False}
 
+    def save_checkpoint(self, state):
+        self.s3.put_object(Bucket=self.mover.source_bucket, Key=self.checkpoint_key,
+                           Body=json.dumps(state).encode('utf-8'),
+                           ContentType='application/json')
 
+    def iter_manifest(self, manifest_key, position):
+        """Linhas do manifesto a partir da posição salva: (posição, chave, pasta ou None, None)."""
+        body = self.s3.get_object(Bucket=self.mover.source_bucket, Key=manifest_key)['Body'].read()
+        reader = csv.reader(io.StringIO(body.decode('utf-8-sig')))
+        for line_number, row in enumerate(reader, start=1):
+            if line_number <= (position or 0) or not row or not row[0].strip():
+                continue
+            destination = row[1].strip().strip('/') if len(row) > 1 and row[1].strip() else None
+            yield line_number, row[0].strip(), destination, None
+
+    def iter_prefix(self, prefix, position):
+        """Chaves do prefixo depois da última chave salva: (chave, chave, None, tamanho e ETag)."""
+        paginator = self.s3.get_paginator('list_objects_v2')
+        params = {'Bucket': self.mover.source_bucket, 'Prefix': prefix}
+        if position:
+            params['StartAfter'] = position
+        for page in paginator.paginate(**params):
+            for item in page.get('Contents', []):
+                yield item['Key'], item['Key'], None, {'ContentLength': item['Size'],
+                                                      'ETag': item['ETag']}
+
+    def move_one(self, source_key, destination_folder=None, source=None):
+        """
+        Copia um arquivo para a pasta correta (executado no pool de threads).
+
+        Retorno:
+            tuple: (situação, resultado atualizado ou None), com a situação
+            'copied', 'skipped' ou 'failed'.
+        """
+        marker = None
+        digest = digest_from_key(source_key)
+        try:
+            if destination_folder is None:
+                marker = self.mover.read_result(digest) if digest else None
+                if not marker or not marker.get('payment_method'):
+                    return 'skipped', None
+                destination_folder = destination_for(marker['payment_method'])
+
+            if os.path.dirname(source_key) == destination_folder:
+                return 'skipped', None
+            destination_key = self.mover.copy_file(source_key, destination_folder, source)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                # Já movido por uma execução interrompida antes do checkpoint
+                return 'skipped', None
+            logger.error(f"Erro ao copiar {source_key}: {e}")
+            return 'failed', None
+        except RuntimeError as e:
+            logger.error(f"Erro ao conferir a cópia de {source_key}: {e}")
+            return 'failed', None
+
+        if marker is None:
+            return 'copied', None
+        # Horário da movimentação: na compactação a linha mais recente do conteúdo prevalece
+        moved_at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds')
+        result = {**marker, 'file_name': destination_key,
+                  'destination_folder': destination_folder, 'processed_at': moved_at}
+        self.mover.record_result(digest, result)
+        return 'copied', result
+
+    def run_batch(self, executor, batch, state):
+        """Copia o lote em paralelo, exclui as origens copiadas e grava o checkpoint."""
+        outcomes = list(executor.map(lambda task: self.move_one(*task[1:]), batch))
+
+        copied = [task[1] for task, (status, _) in zip(batch, outcomes) if status == 'copied']
+        not_deleted = set(self.mover.delete_files(copied))
+        failed = [task[1] for task, (status, _) in zip(batch, outcomes) if status == 'failed']
+        failed.extend(not_deleted)
+
+        results = [result for status, result in outcomes if result is not None]
+        if results:
+            try:
+                self.store.append(results)
+            except Exception as e:
+                logger.error(f"Erro ao atualizar o armazenamento colunar: {e}")
+
+        state['position'] = batch[-1][0]
+        state['moved'] += len(copied) - len(not_deleted)
+        state['skipped'] += sum(1 for status, _ in outcomes if status == 'skipped')
+        state['failed'] += len(failed)
+        # Guarda uma amostra das falhas para reprocessar com um manifesto
+        state['failed_keys'] = (state['failed_keys'] + failed)[-DELETE_BATCH_SIZE:]
+
+    def run(self, manifest_key=None, prefix=None, context=None):
+        """
+        Executa (ou continua) o job até o fim ou até o tempo da invocação acabar.
+
+        Parâmetros:
+            manifest_key (str): Chave do manifesto CSV no bucket.
+            prefix (str): Prefixo a reclassificar (sem manifesto).
+            context: Contexto da Lambda, para parar antes do timeout.
+
+        Retorno:
+            dict: Estado do job (posição, contadores, objects_per_second, done).
+        """
+        state = self.load_checkpoint()
+        if state.get('done'):
+            return state
+
+        tasks = (self.iter_manifest(manifest_key, state['position']) if manifest_key
+                 else self.iter_prefix(prefix, state['position']))
+        start = time.perf_counter()
+        elapsed_before = state['elapsed']
+        batch = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for task in tasks:
+                batch.append(task)
+                if len(batch) < self.batch_size:
+                    continue
+                self.finish_batch(executor, batch, state, start, elapsed_before)
+                batch = []
+                remaining = remaining_seconds(context)
+                if remaining is not None and remaining < BULK_MOVE_MIN_TIME:
+                    logger.info(f"Tempo da invocação esgotado na posição {state['position']}.")
+                    return state
+            if batch:
+                self.finish_batch(executor, batch, state, start, elapsed_before)
+
+        state['done'] = True
+        self.save_checkpoint(state)
+        logger.info(f"Movimentação em massa {self.job_id} concluída: {state['moved']} movidos, "
+                    f"{state['skipped']} ignorados, {state['failed']} com falha.")
+        return state
+
+    def finish_batch(self, executor, batch, state, start, elapsed_before):
+        self.run_batch(executor, batch, state)
+        state['elapsed'] = round(elapsed_before + time.perf_counter() - start, 3)
+        processed = state['moved'] + state['skipped'] + state['failed']
+        state['objects_per_second'] = round(processed / state['elapsed'], 1) if state['elapsed'] else 0.0
+        self.save_checkpoint(state)
+        logger.info(f"Movimentação em massa {self.job_id}: {processed} processados "
+                    f"({state['objects_per_second']} objetos/s), posição {state['position']}.")
+        emit_metrics('s3_move', {
+            'BulkMoved': state['moved'], 'BulkFailed': state['failed'],
+            'BulkObjectsPerSecond': state['objects_per_second']
+        }, {'BulkMoved': 'Count', 'BulkFailed': 'Count', 'BulkObjectsPerSecond': 'Count/Second'},
+            JobId=self.job_id)
+
+
+def handle_bulk(event, context):
+    """
+    Modo em massa: {"bulk": true, "manifest_key": "..."} ou {"bulk": true, "prefix": "dinheiro/"}.
+
+    Se o tempo acabar antes do fim, a Lambda se reinvoca de forma assíncrona
+    com o mesmo evento e o job continua a partir do checkpoint.
+    """
+    manifest_key, prefix = event.get('manifest_key'), event.get('prefix')
+    if not manifest_key and not prefix:
+        raise ValueError('O modo em massa exige "manifest_key" ou "prefix".')
+    job_id = event.get('job_id') or BulkMover.job_id_for(manifest_key or prefix)
+    mover = BulkMover(S3Mover(os.environ['SOURCE_BUCKET']), job_id)
+    state = mover.run(manifest_key=manifest_key, prefix=prefix, context=context)
+
+    if not state.get('done') and context is not None:
+        get_client('lambda').invoke(
+            FunctionName=context.invoked_function_arn, InvocationType='Event',
+            Payload=json.dumps({**event, 'job_id': job_id}).encode('utf-8'))
+        logger.info(f"Movimentação em massa {job_id} continua em uma nova invocação.")
+    return {'job_id': job_id, **state}
+
+
+@track_invocation
 def lambda_handler(event, context):
     """
     Função principal da Lambda que processa o evento.
     """
+    if event.get('bulk'):
+        logger.info("Iniciando a movimentação em massa na Lambda s3_move_lambda.")
+        return handle_bulk(event, context)
+
     logger.info("Iniciando processamento do evento na Lambda s3_move_lambda.")
+    # Os erros são registrados e relançados: o Step Functions precisa ver a falha
+    # para aplicar o Retry (seguro com o diário) ou encerrar a execução
     try:
         handler = MoveLambdaHandler(event)
-        handler.handle()
+        result = handler.handle()
         logger.info("Processamento concluído com sucesso.")
+        return result
     except ValueError as ve:
         logger.error(f"Erro de validação: {ve}")
+        raise
     except RuntimeError as re:
         logger.error(f"Erro ao mover arquivo: {re}")
+        raise
     except Exception as e:
         logger.error(f"Erro inesperado: {e}")
+        raise
@@ -0,0 +1,191 @@
+# app/lambdas/s3_presign.py    Gera URLs pré-assinadas para upload direto das notas fiscais no S3
+import json
+import os
+import uuid
+import logging
+from aws_clients import get_client, preload_clients, track_invocation
+
+# Configuração do logger (ajustado para produção)
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Cliente S3 usado em toda invocação: criado na inicialização do container
+preload_clients('s3')
+
+# Prefixo monitorado pela notificação do bucket que inicia o processamento
+UPLOAD_PREFIX = os.environ.get('UPLOAD_PREFIX', 'uploads/')
+# Tamanho máximo aceito no upload direto (sem o limite de 10 MB do API Gateway)
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(20 * 1024 * 1024)))
+# Validade das URLs geradas, em segundos
+UPLOAD_URL_EXPIRATION = int(os.environ.get('UPLOAD_URL_EXPIRATION', '300'))
+
+# Tipos de conteúdo aceitos por extensão de arquivo
+CONTENT_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg'
+}
+
+
+class S3Presigner:
+    """Classe responsável por gerar URLs pré-assinadas de upload no S3."""
+
+    def __init__(self, bucket_name):
+        self.s3 = get_client('s3')
+        self.bucket_name = bucket_name
+
+    def presign_post(self, key, content_type):
+        """
+        Gera um formulário POST pré-assinado com as condições de tipo e tamanho.
+
+        Parâmetros:
+            key (str): Chave do objeto no bucket.
+            content_type (str): Tipo de conteúdo exigido no upload.
+
+        Retorno:
+            dict: URL e campos do formulário que o cliente deve enviar.
+        """
+        return self.s3.generate_presigned_post(
+            Bucket=self.bucket_name,
+            Key=key,
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, MAX_UPLOAD_BYTES]
+            ],
+            ExpiresIn=UPLOAD_URL_EXPIRATION
+        )
+
+    def presign_put(self, key, content_type, content_length):
+        """
+        Gera uma URL PUT pré-assinada presa ao tipo e ao tamanho do arquivo.
+
+        Parâmetros:
+            key (str): Chave do objeto no bucket.
+            content_type (str): Tipo de conteúdo exigido no upload.
+            content_length (int): Tamanho exato do arquivo, em bytes.
+
+        Retorno:
+            dict: URL e cabeçalhos que o cliente deve enviar.
+        """
+        url = self.s3.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': self.bucket_name,
+                'Key': key,
+                'ContentType': content_type,
+                'ContentLength': content_length
+            },
+            ExpiresIn=UPLOAD_URL_EXPIRATION
+        )
+        return {
+            'url': url,
+            'headers': {
+                'Content-Type': content_type,
+                'Content-Length': str(content_length)
+            }
+        }
+
+
+class PresignLambdaHandler:
+    """Classe que gerencia a geração das URLs de upload."""
+
+    def __init__(self, event):
+        self.event = event
+        self.bucket_name = os.environ['SOURCE_BUCKET']
+        self.presigner = S3Presigner(self.bucket_name)
+
+    def get_params(self):
+        """Lê os parâmetros da query string ou do corpo JSON da requisição."""
+        params = dict(self.event.get('queryStringParameters') or {})
+        body = self.event.get('body')
+        if body:
+            params.update(json.loads(body))
+        return params
+
+    def validate_event(self):
+        """
+        Valida os parâmetros da requisição.
+
+        Retorno:
+            tuple: (bool, str ou tuple) - True se válido, False e mensagem de erro se inválido.
+        """
+        try:
+            params = self.get_params()
+        except (TypeError, ValueError):
+            return False, 'O corpo da requisição deve ser um JSON válido.'
+
+        file_name = params.get('file_name')
+        if not file_name or not isinstance(file_name, str):
+            return False, 'O campo "file_name" é obrigatório e deve ser uma string válida.'
+
+        file_name = os.path.basename(file_name)
+        extension = os.path.splitext(file_name)[1].lower()
+        if extension not in CONTENT_TYPES:
+            return False, 'O arquivo deve ser uma imagem (PNG, JPG, JPEG).'
+
+        method = str(params.get('method', 'POST')).upper()
+        if method not in ('POST', 'PUT'):
+            return False, 'O campo "method" deve ser POST ou PUT.'
+
+        content_length = None
+        if method == 'PUT':
+            try:
+                content_length = int(params.get('content_length'))
+            except (TypeError, ValueError):
+                return False, 'O campo "content_length" é obrigatório para uploads PUT.'
+            if not 0 < content_length <= MAX_UPLOAD_BYTES:
+                return False, f'O arquivo deve ter entre 1 e {MAX_UPLOAD_BYTES} bytes.'
+
+        return True, (file_name, CONTENT_TYPES[extension], method, content_length)
+
+    def handle(self):
+        """
+        Gera a URL de upload direto para o bucket de imagens.
+
+        Retorno:
+            dict: Resposta com statusCode e corpo da mensagem (sucesso ou erro).
+        """
+        is_valid, validation_message = self.validate_event()
+        if not is_valid:
+            logger.warning(f"Requisição inválida: {validation_message}")
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': validation_message})
+            }
+
+        file_name, content_type, method, content_length = validation_message
+        # Prefixo único evita que uploads com o mesmo nome se sobrescrevam
+        key = f"{UPLOAD_PREFIX}{uuid.uuid4().hex}/{file_name}"
+
+        try:
+            if method == 'POST':
+                upload = self.presigner.presign_post(key, content_type)
+            else:
+                upload = self.presigner.presign_put(
+                    key, content_type, content_length)
+        except Exception as e:
+            logger.error(f"Erro ao gerar URL pré-assinada: {str(e)}")
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': 'Erro interno no servidor. Tente novamente mais tarde.'})
+            }
+
+        logger.info(f"URL de upload {method} gerada para {key}.")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'file_name': key,
+                'method': method,
+                'expires_in': UPLOAD_URL_EXPIRATION,
+                'max_size': MAX_UPLOAD_BYTES,
+                'upload': upload
+            })
+        }
+
+
+@track_invocation
+def lambda_handler(event, context):
+    """Função de entrada da Lambda."""
+    logger.info("Lambda s3_presign iniciada.")
+    return PresignLambdaHandler(event).handle()
@@ -1,52 +1,334 @@
 # app/lambdas/s3_upload.py    Salva os dados processados no Amazon S3
 import json
-import boto3
+import io
 import os
+import re
 import base64
-from botocore.exceptions import NoCredentialsError
+from botocore.exceptions import ClientError, NoCredentialsError
 import logging
-from requests_toolbelt.multipart import decoder
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote_plus
+from aws_clients import get_client, preload_clients, track_invocation
+from content_keys import (DIGEST_PATTERN, content_digest, content_key, normalized_key,
+                          result_key)
+import image_normalizer
+from ingestion_queue import build_message, get_ingestion_queue
+from pipeline import PIPELINE_MODE, retry_step_function_execution
 
 # Configuração do logger (ajustado para produção)
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)  # Apenas warning e erros em produção
 
-# Cliente do Step Functions
-stepfunctions_client = boto3.client('stepfunctions')
+# Cliente S3 usado em todo upload: criado na inicialização do container. O do
+# Step Functions fica para a primeira execução (não é usado no modo fila)
+preload_clients('s3')
+
+# Limite de arquivos por requisição na rota de lote
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', '50'))
+# Uploads simultâneos no lote (não deve exceder o pool de conexões do cliente S3)
+UPLOAD_MAX_WORKERS = int(os.environ.get('UPLOAD_MAX_WORKERS', '8'))
+
+# Tempo após o qual um processamento sem resultado é considerado falho (segundos)
+PROCESSING_TIMEOUT = int(os.environ.get('PROCESSING_TIMEOUT', '900'))
+
+# Gera uma versão reduzida e em tons de cinza da imagem para o Textract (requer Pillow)
+NORMALIZE_IMAGES = os.environ.get('NORMALIZE_IMAGES', 'false').lower() == 'true'
+# Sem a layer do Pillow a normalização é desativada aqui, em vez de falhar a cada upload
+if NORMALIZE_IMAGES and not image_normalizer.is_available():
+    logger.warning("NORMALIZE_IMAGES está ativo, mas o Pillow não está instalado nesta Lambda. "
+                   "As imagens originais serão enviadas ao Textract.")
+    NORMALIZE_IMAGES = False
+
+# Rota de consulta do andamento do processamento
+STATUS_PATH = os.environ.get('STATUS_PATH', '/api/v1/invoice/status')
+
+# Extrai o parâmetro filename do cabeçalho Content-Disposition
+FILENAME_PATTERN = re.compile(r'filename\s*=\s*(?:"([^"]*)"|([^;]+))', re.IGNORECASE)
+
+
+def get_header(headers, name):
+    """Obtém um cabeçalho HTTP ignorando maiúsculas/minúsculas."""
+    if not headers:
+        return ''
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value or ''
+    return ''
+
+
+def get_multipart_boundary(content_type):
+    """
+    Extrai o boundary de um Content-Type multipart/form-data.
+
+    Retorno:
+        bytes: Boundary codificado, ou None se não estiver presente.
+    """
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'boundary' and value:
+            return value.strip().strip('"').encode('latin-1')
+    return None
+
+
+def iter_multipart_parts(body, boundary):
+    """
+    Percorre as partes de um corpo multipart/form-data sem copiar o conteúdo.
+
+    Os delimitadores são localizados diretamente no buffer original e cada
+    parte é devolvida como uma fatia de memoryview sobre esse mesmo buffer.
+
+    Parâmetros:
+        body (bytes): Corpo da requisição já decodificado.
+        boundary (bytes): Boundary informado no Content-Type.
+
+    Retorno:
+        generator: Tuplas (headers, content) com os cabeçalhos da parte
+        (dict com nomes em minúsculas) e o conteúdo (memoryview).
+    """
+    view = memoryview(body)
+    delimiter = b'--' + boundary
+    next_delimiter = b'\r\n' + delimiter
+
+    position = body.find(delimiter)
+    if position < 0:
+        raise ValueError('Boundary não encontrado no corpo da requisição.')
+    position += len(delimiter)
+
+    while not body.startswith(b'--', position):
+        # Ignora o restante da linha do delimitador (transport padding)
+        line_end = body.find(b'\r\n', position)
+        if line_end < 0:
+            raise ValueError('Corpo multipart truncado.')
+        part_start = line_end + 2
+
+        part_end = body.find(next_delimiter, part_start)
+        if part_end < 0:
+            raise ValueError('Corpo multipart truncado.')
+
+        # Separa os cabeçalhos do conteúdo da parte
+        if body.startswith(b'\r\n', part_start):
+            header_end, content_start = part_start, part_start + 2
+        else:
+            header_end = body.find(b'\r\n\r\n', part_start, part_end)
+            if header_end < 0:
+                raise ValueError('Parte multipart sem separador de cabeçalhos.')
+            content_start = header_end + 4
+
+        headers = {}
+        raw_headers = bytes(view[part_start:header_end]).decode('utf-8', 'replace')
+        for line in raw_headers.split('\r\n'):
+            name, _, value = line.partition(':')
+            if name:
+                headers[name.strip().lower()] = value.strip()
+
+        yield headers, view[content_start:part_end]
+        position = part_end + len(next_delimiter)
+
+
+def iter_file_parts(body, content_type):
+    """
+    Percorre apenas as partes do multipart que contêm arquivo (filename=).
+
+    Retorno:
+        generator: Tuplas (file_name, content) com o conteúdo em memoryview.
+    """
+    boundary = get_multipart_boundary(content_type)
+    if not boundary:
+        raise ValueError('Boundary ausente no Content-Type.')
+
+    for headers, content in iter_multipart_parts(body, boundary):
+        match = FILENAME_PATTERN.search(headers.get('content-disposition', ''))
+        if match:
+            file_name = (match.group(1) or match.group(2) or '').strip()
+            yield file_name, content
+
+
+def find_first_file_part(body, content_type):
+    """
+    Localiza a primeira parte do multipart que contém um arquivo.
+
+    A leitura é interrompida assim que a primeira parte com filename= é
+    encontrada, sem percorrer o restante do corpo.
+
+    Retorno:
+        tuple: (file_name, content) com o conteúdo em memoryview, ou None.
+    """
+    return next(iter_file_parts(body, content_type), None)
+
+
+class MemoryviewReader(io.RawIOBase):
+    """Leitor de arquivo somente leitura sobre um memoryview, sem cópia."""
+
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._view[self._position:self._position + len(buffer)]
+        size = len(chunk)
+        buffer[:size] = chunk
+        self._position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, min(offset, len(self._view)))
+        return self._position
+
+    def tell(self):
+        return self._position
 
 
 class S3Uploader:
     """Classe responsável por fazer upload de arquivos para o S3."""
 
     def __init__(self, bucket_name):
-        self.s3 = boto3.client('s3')
+        # Cliente S3 reaproveitado entre invocações do container
+        self.s3 = get_client('s3')
         self.bucket_name = bucket_name
 
+    def get_existing_result(self, digest):
+        """
+        Consulta o marcador de processamento de um conteúdo já recebido.
+
+        Parâmetros:
+            digest (str): SHA-256 do conteúdo.
+
+        Retorno:
+            dict: Conteúdo do marcador, ou None se o conteúdo ainda não foi recebido.
+        """
+        try:
+            response = self.s3.get_object(
+                Bucket=self.bucket_name, Key=result_key(digest))
+            return json.loads(response['Body'].read())
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+
+    def upload_normalized(self, digest, file_content):
+        """
+        Salva a versão normalizada da imagem, mantendo o original em raw/ para auditoria.
+
+        Parâmetros:
+            digest (str): SHA-256 do conteúdo original.
+            file_content (bytes ou memoryview): Conteúdo original.
+
+        Retorno:
+            str: Chave da imagem normalizada, ou None se a normalização falhar.
+        """
+        try:
+            normalized, info = image_normalizer.normalize_image(file_content)
+        except Exception as e:
+            logger.warning(
+                f"Não foi possível normalizar a imagem {digest}: {str(e)}. Usando o original.")
+            return None
+
+        key = normalized_key(digest)
+        self.s3.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=normalized,
+            ContentType='image/jpeg',
+            Metadata={
+                'original-bytes': str(info['original_bytes']),
+                'original-size': 'x'.join(map(str, info['original_size']))
+            }
+        )
+        return key
+
     def upload_file(self, file_name, file_content):
         """
-        Faz o upload de um arquivo para o S3.
+        Faz o upload de um arquivo para o S3 com chave endereçada pelo conteúdo.
+
+        A chave é derivada do SHA-256 do conteúdo (raw/ab/cd/<hash>.ext). Se o
+        mesmo conteúdo já foi recebido, o upload é ignorado e o resultado do
+        processamento existente é devolvido.
 
         Parâmetros:
-            file_name (str): Nome do arquivo a ser salvo.
-            file_content (bytes): Conteúdo do arquivo.
+            file_name (str): Nome original do arquivo.
+            file_content (bytes ou memoryview): Conteúdo do arquivo.
 
         Retorno:
             dict: Resposta com status e mensagem.
         """
         try:
-            logger.info(f"Iniciando upload do arquivo {file_name} para o S3.")
-            # Faz o upload do arquivo para o bucket S3
+            digest = content_digest(file_content)
+            existing_result = self.get_existing_result(digest)
+            if existing_result is not None and not self.is_stale(existing_result):
+                logger.info(
+                    f"Arquivo {file_name} já recebido ({digest}). Upload ignorado.")
+                return self.duplicate_response(file_name, digest, existing_result)
+
+            key = content_key(digest, file_name)
+            logger.info(f"Iniciando upload do arquivo {file_name} para o S3 ({key}).")
+            # Faz o upload do arquivo para o bucket S3 (memoryview é lido sem cópia)
+            body = file_content
+            if isinstance(file_content, memoryview):
+                body = MemoryviewReader(file_content)
             self.s3.put_object(
                 Bucket=self.bucket_name,
-                Key=file_name,
-                Body=file_content
+                Key=key,
+                Body=body,
+                ContentLength=len(file_content),
+                Metadata={'original-file-name': quote(file_name)}
             )
+
+            # Imagem reduzida enviada ao Textract (opcional)
+            processing_key = key
+            if NORMALIZE_IMAGES:
+                processing_key = self.upload_normalized(digest, file_content) or key
+
+            # Registra o conteúdo; a escrita condicional resolve uploads simultâneos
+            marker = {
+                'status': 'processing',
+                'file_name': processing_key,
+                'raw_file_name': key,
+                'original_file_name': file_name,
+                'sha256': digest,
+                'created_at': int(time.time())
+            }
+            # Um marcador antigo (processamento que falhou) é sobrescrito sem condição
+            condition = {} if existing_result is not None else {'IfNoneMatch': '*'}
+            try:
+                self.s3.put_object(
+                    Bucket=self.bucket_name,
+                    Key=result_key(digest),
+                    Body=json.dumps(marker).encode('utf-8'),
+                    ContentType='application/json',
+                    **condition
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] not in ('PreconditionFailed', '412'):
+                    raise
+                logger.info(
+                    f"Arquivo {file_name} enviado em paralelo por outra requisição ({digest}).")
+                return self.duplicate_response(
+                    file_name, digest, self.get_existing_result(digest) or marker)
+
             logger.info(
                 f"Upload do arquivo {file_name} concluído com sucesso.")
             return {
                 'statusCode': 200,
-                'body': json.dumps({'file_name': file_name})
+                'body': json.dumps({
+                    'file_name': processing_key,
+                    'raw_file_name': key,
+                    'original_file_name': file_name,
+                    'sha256': digest,
+                    'duplicate': False
+                })
             }
         except Exception as e:
             logger.error(f"Erro ao fazer upload: {str(e)}")
@@ -55,6 +337,27 @@ class S3Uploader:
                 'body': json.dumps({'error': 'Erro interno no servidor. Tente novamente mais tarde.'})
             }
 
+    @staticmethod
+    def is_stale(existing_result):
+        """Indica se o processamento registrado não terminou dentro do prazo esperado."""
+        if existing_result.get('status') != 'processing':
+            return False
+        return time.time() - existing_result.get('created_at', 0) > PROCESSING_TIMEOUT
+
+    @staticmethod
+    def duplicate_response(file_name, digest, existing_result):
+        """Monta a resposta de um conteúdo já recebido, com o resultado existente."""
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'file_name': existing_result.get('file_name'),
+                'original_file_name': file_name,
+                'sha256': digest,
+                'duplicate': True,
+                'result': existing_result
+            })
+        }
+
 
 class LambdaHandler:
     """Classe que gerencia o processamento do evento da Lambda."""
@@ -65,16 +368,27 @@ class LambdaHandler:
         self.bucket_name = os.environ['SOURCE_BUCKET']
         self.uploader = S3Uploader(self.bucket_name)
 
-    def validate_event(self):
-        """Valida o evento recebido."""
-        logger.info("Validando evento recebido.")
+    def is_batch_request(self):
+        """Indica se a requisição foi feita na rota de lote (api/v1/invoice/batch)."""
+        query = self.event.get('queryStringParameters') or {}
+        return (self.event.get('resource') or '').endswith('/batch') or \
+            str(query.get('batch', '')).lower() in ('1', 'true')
+
+    def decode_body(self):
+        """
+        Valida o formato da requisição e decodifica o corpo.
+
+        Retorno:
+            tuple: (bool, tuple ou str) - True e (body, content_type) se válido,
+            False e mensagem de erro se inválido.
+        """
         # Verifica se o corpo da requisição está no formato multipart/form-data
         if 'body' not in self.event:
             logger.warning("Evento sem corpo. Formato inválido.")
             return False, 'Formato de requisição inválido. Use multipart/form-data.'
 
         # Extrai o nome do arquivo e o conteúdo do corpo da requisição
-        content_type = self.event['headers'].get('Content-Type', '')
+        content_type = get_header(self.event.get('headers'), 'Content-Type')
         if 'multipart/form-data' not in content_type:
             logger.warning(f"Formato de conteúdo inválido: {content_type}")
             return False, 'Formato inválido. Envie como multipart/form-data.'
@@ -88,36 +402,151 @@ class LambdaHandler:
             except Exception as e:
                 logger.error(f"Erro ao decodificar Base64: {str(e)}")
                 return False, 'Erro ao processar o arquivo.'
+        elif isinstance(body, str):
+            body = body.encode('utf-8')
 
-        # Decodifica o corpo da requisição (que é um multipart/form-data)
+        return True, (body, content_type)
+
+    @staticmethod
+    def validate_file_name(file_name):
+        """Retorna a mensagem de erro se o arquivo não for uma imagem aceita, ou None."""
+        # Valida se o arquivo é uma imagem (PNG, JPG ou JPEG)
+        if not file_name.lower().endswith(('.png', '.jpg', '.jpeg')):
+            logger.warning(
+                f"Arquivo {file_name} não é uma imagem válida.")
+            return 'O arquivo deve ser uma imagem (PNG, JPG, JPEG).'
+        return None
+
+    def validate_event(self):
+        """Valida o evento recebido."""
+        logger.info("Validando evento recebido.")
+        is_valid, decoded = self.decode_body()
+        if not is_valid:
+            return False, decoded
+        body, content_type = decoded
+
+        # Localiza a primeira parte com arquivo no multipart/form-data
         try:
             logger.info("Decodificando multipart/form-data.")
-            multipart_data = decoder.MultipartDecoder(body, content_type)
+            file_part = find_first_file_part(body, content_type)
         except Exception as e:
             logger.error(f"Erro ao decodificar multipart: {str(e)}")
             return False, 'Erro ao processar arquivo.'
 
-        # Extrai o nome do arquivo e o conteúdo do arquivo
-        for part in multipart_data.parts:
-            if part.headers.get(b'Content-Disposition'):
-                disposition = part.headers[b'Content-Disposition'].decode()
+        if file_part is None:
+            logger.warning("Nenhum arquivo encontrado no corpo da requisição.")
+            return False, 'Nenhum arquivo encontrado no corpo da requisição.'
+
+        file_name, file_content = file_part
+        error = self.validate_file_name(file_name)
+        if error:
+            return False, error
+
+        logger.info(f"Arquivo {file_name} validado com sucesso.")
+        return True, (file_name, file_content)
 
-                if 'filename=' in disposition:
-                    file_name = disposition.split(
-                        'filename=')[-1].strip().replace('"', '')
-                    file_content = part.content
+    def validate_batch_event(self):
+        """
+        Valida o evento recebido na rota de lote, considerando todas as partes com arquivo.
 
-                    # Valida se o arquivo é uma imagem (PNG, JPG ou JPEG)
-                    if not file_name.lower().endswith(('.png', '.jpg', '.jpeg')):
-                        logger.warning(
-                            f"Arquivo {file_name} não é uma imagem válida.")
-                        return False, 'O arquivo deve ser uma imagem (PNG, JPG, JPEG).'
+        Retorno:
+            tuple: (bool, list ou str) - True e lista de (file_name, content, error)
+            se o corpo foi decodificado, False e mensagem de erro caso contrário.
+        """
+        logger.info("Validando lote recebido.")
+        is_valid, decoded = self.decode_body()
+        if not is_valid:
+            return False, decoded
+        body, content_type = decoded
 
-                    logger.info(f"Arquivo {file_name} validado com sucesso.")
-                    return True, (file_name, file_content)
+        try:
+            logger.info("Decodificando multipart/form-data.")
+            file_parts = list(iter_file_parts(body, content_type))
+        except Exception as e:
+            logger.error(f"Erro ao decodificar multipart: {str(e)}")
+            return False, 'Erro ao processar arquivo.'
+
+        if not file_parts:
+            logger.warning("Nenhum arquivo encontrado no corpo da requisição.")
+            return False, 'Nenhum arquivo encontrado no corpo da requisição.'
 
-        logger.warning("Nenhum arquivo encontrado no corpo da requisição.")
-        return False, 'Nenhum arquivo encontrado no corpo da requisição.'
+        if len(file_parts) > MAX_BATCH_FILES:
+            logger.warning(f"Lote com {len(file_parts)} arquivos excede o limite.")
+            return False, f'O lote deve ter no máximo {MAX_BATCH_FILES} arquivos.'
+
+        validated = [
+            (file_name, file_content, self.validate_file_name(file_name))
+            for file_name, file_content in file_parts
+        ]
+        logger.info(f"Lote com {len(validated)} arquivos validado.")
+        return True, validated
+
+    def handle_batch(self):
+        """
+        Processa o lote: cada arquivo válido é enviado ao S3 em paralelo.
+
+        Os uploads usam um pool de threads limitado e o mesmo cliente S3.
+
+        Retorno:
+            dict: Resposta com statusCode, id do lote e status de cada arquivo.
+        """
+        try:
+            is_valid, validation_message = self.validate_batch_event()
+            if not is_valid:
+                logger.warning(f"Lote inválido: {validation_message}")
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': validation_message})
+                }
+
+            batch_id = uuid.uuid4().hex
+            files = [{'file_name': file_name, 'status': 'invalid', 'error': error}
+                     for file_name, _, error in validation_message]
+
+            valid_indexes = [index for index, (_, _, error)
+                             in enumerate(validation_message) if error is None]
+            if valid_indexes:
+                max_workers = min(UPLOAD_MAX_WORKERS, len(valid_indexes))
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {
+                        index: executor.submit(
+                            self.uploader.upload_file, *validation_message[index][:2])
+                        for index in valid_indexes
+                    }
+                    for index, future in futures.items():
+                        upload_response = future.result()
+                        if upload_response['statusCode'] == 200:
+                            uploaded_file = json.loads(upload_response['body'])
+                            files[index] = {
+                                **uploaded_file,
+                                # Duplicatas não são processadas novamente
+                                'status': 'duplicate' if uploaded_file['duplicate'] else 'uploaded'
+                            }
+                        else:
+                            files[index].update(
+                                status='error', **json.loads(upload_response['body']))
+
+            uploaded = sum(1 for file in files
+                           if file['status'] in ('uploaded', 'duplicate'))
+            logger.info(
+                f"Lote {batch_id}: {uploaded} de {len(files)} arquivos enviados.")
+            return {
+                'statusCode': 200 if uploaded else 400,
+                'body': json.dumps({'batch_id': batch_id, 'files': files})
+            }
+
+        except NoCredentialsError:
+            logger.error("Credenciais da AWS não encontradas.")
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': 'Credenciais da AWS não encontradas.'})
+            }
+        except Exception as e:
+            logger.error(f"Erro inesperado: {str(e)}")
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': 'Erro interno no servidor. Tente novamente mais tarde.'})
+            }
 
     def handle(self):
         """
@@ -159,85 +588,419 @@ class LambdaHandler:
             }
 
 
-def retry_step_function_execution(input_data, stepfunctions_client, state_machine_arn, retries=3, backoff=2):
+def pipeline_response(upload_body, response, sync=False):
     """
-    Tenta executar o Step Functions com retry.
+    Monta a resposta da API após iniciar o processamento de um arquivo.
 
-    Parameters:
-        input_data (dict): Dados para enviar ao Step Functions.
-        stepfunctions_client (boto3.client): Cliente do Step Functions.
-        state_machine_arn (str): ARN do Step Function.
-        retries (int): Número máximo de tentativas.
-        backoff (int): Multiplicador para tempo de espera entre tentativas.
+    Parâmetros:
+        upload_body (dict): Corpo da resposta do upload.
+        response (dict): Resposta de retry_step_function_execution().
+        sync (bool): Indica se a execução foi síncrona (resultado já disponível).
 
-    Returns:
-        dict: Resposta do Step Functions.
+    Retorno:
+        dict: 200 com o resultado (síncrono) ou 202 com o ID da execução (assíncrono).
     """
-    for attempt in range(1, retries + 1):
-        try:
-            response = stepfunctions_client.start_sync_execution(
-                stateMachineArn=state_machine_arn,
-                input=json.dumps(input_data)
-            )
-            logger.info(
-                f"Execução do Step Functions iniciada. ID: {response['executionArn']}")
+    body = {**upload_body, 'execution_arn': response['executionArn']}
+    if sync:
+        body['status'] = response.get('status')
+        if response.get('output'):
+            body['result'] = json.loads(response['output'])
+        return {'statusCode': 200, 'body': json.dumps(body)}
+
+    body['status'] = 'RUNNING'
+    body['status_url'] = f"{STATUS_PATH}?execution_arn={quote(response['executionArn'], safe='')}"
+    return {'statusCode': 202, 'body': json.dumps(body)}
+
+
+def allowed_execution_prefixes():
+    """Prefixos dos ARNs de execução das máquinas de estado configuradas na Lambda."""
+    prefixes = []
+    for variable in ('STEP_FUNCTIONS_ARN', 'STEP_FUNCTIONS_BATCH_ARN'):
+        state_machine_arn = os.environ.get(variable)
+        if state_machine_arn and ':stateMachine:' in state_machine_arn:
+            # arn:...:stateMachine:<nome> -> arn:...:execution:<nome>:<id>
+            prefixes.append(
+                state_machine_arn.replace(':stateMachine:', ':execution:', 1) + ':')
+    return tuple(prefixes)
+
+
+def get_pipeline_status(event, bucket_name):
+    """
+    Consulta o andamento de um processamento (rota GET api/v1/invoice/status).
+
+    Aceita o ID da execução (execution_arn), consultado no Step Functions, ou o
+    SHA-256 do conteúdo (sha256), consultado no marcador de resultados do S3.
+
+    Parâmetros:
+        event (dict): Evento da API Gateway.
+        bucket_name (str): Bucket com os marcadores de resultado.
+
+    Retorno:
+        dict: Resposta com statusCode e o status do processamento.
+    """
+    query = event.get('queryStringParameters') or {}
+    execution_arn = query.get('execution_arn')
+    digest = (query.get('sha256') or '').lower()
+
+    try:
+        if execution_arn:
+            # Só consulta execuções das máquinas de estado desta aplicação
+            prefixes = allowed_execution_prefixes()
+            if not prefixes or not execution_arn.startswith(prefixes):
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'O campo "execution_arn" é inválido.'})
+                }
+            response = get_client('stepfunctions').describe_execution(
+                executionArn=execution_arn)
+            body = {'execution_arn': execution_arn, 'status': response['status']}
+            if response.get('output'):
+                body['result'] = json.loads(response['output'])
+            if response.get('error'):
+                body['error'] = response['error']
+            return {'statusCode': 200, 'body': json.dumps(body)}
+
+        if DIGEST_PATTERN.match(digest):
+            existing_result = S3Uploader(bucket_name).get_existing_result(digest)
+            if existing_result is None:
+                return {
+                    'statusCode': 404,
+                    'body': json.dumps({'error': 'Conteúdo não encontrado.'})
+                }
             return {
                 'statusCode': 200,
-                # O resultado final do Step Functions
-                'body': response['output']
-            }  # Se bem-sucedido, retorna a resposta
-        except Exception as e:
-            logger.error(
-                f"Tentativa {attempt} falhou ao iniciar Step Functions: {str(e)}")
-            if attempt == retries:
-                raise  # Levanta a exceção após o número máximo de tentativas
-            time.sleep(backoff * attempt)  # Aguarda antes de tentar novamente
+                'body': json.dumps({'sha256': digest, **existing_result})
+            }
 
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Informe "execution_arn" ou "sha256".'})
+        }
 
-def lambda_handler(event, context):
-    """Função de entrada da Lambda."""
-    logger.info("Lambda iniciada.")
-    handler = LambdaHandler(event)
-    upload_response = handler.handle()
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ExecutionDoesNotExist':
+            return {
+                'statusCode': 404,
+                'body': json.dumps({'error': 'Execução não encontrada.'})
+            }
+        logger.error(f"Erro ao consultar o status: {str(e)}")
+    except Exception as e:
+        logger.error(f"Erro ao consultar o status: {str(e)}")
+    return {
+        'statusCode': 500,
+        'body': json.dumps({'error': 'Erro interno no servidor. Tente novamente mais tarde.'})
+    }
 
-    # Verifica se o upload foi bem-sucedido
-    if upload_response['statusCode'] == 200:
-        # Verifica se o ARN do Step Functions está definido
-        step_function_arn = os.environ.get('STEP_FUNCTIONS_ARN')
 
-        # Inicializa input_data como um dicionário vazio
-        input_data = {}
+def queued_response(body):
+    """Resposta 202 de arquivos enfileirados para processamento."""
+    body['status'] = 'QUEUED'
+    if body.get('sha256'):
+        body['status_url'] = f"{STATUS_PATH}?sha256={body['sha256']}"
+    return {'statusCode': 202, 'body': json.dumps(body)}
 
-        if step_function_arn:
-            logger.info("Iniciando execução do Step Functions.")
-            # Inicia a execução do Step Functions
-            stepfunctions_client = boto3.client('stepfunctions')
 
-            # Prepara a entrada para o Step Functions
-            input_data = {
-                "bucket_name": handler.bucket_name,
-                "file_name": json.loads(upload_response['body'])['file_name']
-            }
+def ingest_direct_upload(uploader, key):
+    """
+    Registra um upload direto (uploads/<id>/<nome>) na chave endereçada por conteúdo.
+
+    O arquivo segue o mesmo caminho do upload pela API (upload_file): SHA-256,
+    deduplicação pelo marcador em results/, normalização opcional e chave
+    raw/ab/cd/<hash>. O objeto em uploads/ só é excluído depois que o
+    processamento foi iniciado (delete_direct_upload).
+
+    Parâmetros:
+        uploader (S3Uploader): Uploader do bucket da notificação.
+        key (str): Chave do upload direto.
 
+    Retorno:
+        dict: Corpo da resposta de upload_file() (file_name, raw_file_name,
+        sha256, duplicate, result), ou None se o upload já foi processado
+        (evento reenviado).
+    """
+    try:
+        response = uploader.s3.get_object(Bucket=uploader.bucket_name, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            logger.info(f"Upload direto {key} já processado.")
+            return None
+        raise
+    upload_response = uploader.upload_file(os.path.basename(key), response['Body'].read())
+    if upload_response['statusCode'] != 200:
+        raise RuntimeError(f"Falha ao registrar o upload direto {key}.")
+    return json.loads(upload_response['body'])
+
+
+def delete_direct_upload(uploader, key):
+    """Exclui o upload direto já registrado em raw/ (uma falha só deixa a cópia para o ciclo de vida)."""
+    try:
+        uploader.s3.delete_object(Bucket=uploader.bucket_name, Key=key)
+    except ClientError as e:
+        logger.warning(f"Não foi possível excluir o upload direto {key}: {str(e)}")
+
+
+def start_pipeline_from_s3_event(event, context=None):
+    """
+    Inicia o processamento das imagens enviadas direto ao S3 (URL pré-assinada).
+
+    Cada upload é primeiro registrado na chave endereçada por conteúdo
+    (ingest_direct_upload), como no upload pela API, e conteúdos já processados
+    não são processados de novo. Cada arquivo novo inicia uma execução
+    assíncrona do Step Functions com o SHA-256 como nome: se o evento for
+    reenviado depois de uma falha, o conteúdo ainda em 'processing' é iniciado
+    de novo sem duplicar a execução. Com a fila de ingestão ativa, os arquivos
+    são apenas enfileirados.
+
+    Parâmetros:
+        event (dict): Notificação de evento do S3 (ObjectCreated).
+        context (LambdaContext): Contexto da invocação, usado para limitar os retries.
+
+    Retorno:
+        dict: ARNs das execuções iniciadas (ou arquivos enfileirados), conteúdos
+        duplicados e arquivos que falharam.
+    """
+    pending, duplicates, failed = [], [], []
+    for record in event['Records']:
+        uploader = S3Uploader(record['s3']['bucket']['name'])
+        # As chaves chegam codificadas na notificação do S3
+        key = unquote_plus(record['s3']['object']['key'])
         try:
-            # Tentativas com backoff
-            response = retry_step_function_execution(
-                input_data, stepfunctions_client, step_function_arn)
-            logger.info(
-                f"Execução do Step Functions iniciada com sucesso. ID: {response['executionArn']}")
-            upload_response['body'] = json.dumps({
-                **json.loads(upload_response['body']),
-                "execution_arn": response['executionArn']
-            })
+            upload = ingest_direct_upload(uploader, key)
         except Exception as e:
-            logger.error(
-                f"Erro ao iniciar o Step Functions após várias tentativas: {str(e)}")
-            upload_response['body'] = json.dumps(
-                {'error': 'Falha ao iniciar Step Functions.'})
+            logger.error(f"Erro ao registrar o upload direto {key}: {str(e)}")
+            failed.append(key)
+            continue
+        if upload is None:
+            continue
+        if upload['duplicate'] and (upload.get('result') or {}).get('status') != 'processing':
+            logger.info(f"Upload direto {key} já processado ({upload['sha256']}).")
+            duplicates.append(upload['sha256'])
+            delete_direct_upload(uploader, key)
+            continue
+        pending.append((uploader, key, upload['sha256'],
+                        build_message(uploader.bucket_name, upload['file_name'],
+                                      raw_file_name=upload['raw_file_name'])))
+
+    queue = get_ingestion_queue()
+    if queue:
+        not_sent = queue.send_messages([message for _, _, _, message in pending])
+        started = [item for item in pending if item[3] not in not_sent]
+        failed.extend(message['file_name'] for message in not_sent)
+        result = {'queued': [message['file_name'] for _, _, _, message in started]}
     else:
+        step_function_arn = os.environ.get('STEP_FUNCTIONS_ARN')
+        if not step_function_arn:
+            logger.warning("ARN do Step Functions não definido. Evento do S3 ignorado.")
+            return {'executions': [], 'duplicates': duplicates, 'failed': failed}
+
+        stepfunctions_client = get_client('stepfunctions')
+        started, executions = [], []
+        for item in pending:
+            _, _, digest, input_data = item
+            try:
+                response = retry_step_function_execution(
+                    input_data, stepfunctions_client, step_function_arn, context=context,
+                    name=digest)
+                executions.append(response['executionArn'])
+                started.append(item)
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ExecutionAlreadyExists':
+                    logger.error(
+                        f"Erro ao iniciar o Step Functions para {input_data['file_name']}: {str(e)}")
+                    failed.append(input_data['file_name'])
+                    continue
+                # Execução do mesmo conteúdo já iniciada (e encerrada) por um evento anterior
+                logger.info(f"Execução {digest} já existe.")
+                started.append(item)
+            except Exception as e:
+                logger.error(
+                    f"Erro ao iniciar o Step Functions para {input_data['file_name']}: {str(e)}")
+                failed.append(input_data['file_name'])
+        result = {'executions': executions}
+
+    for uploader, key, _, _ in started:
+        delete_direct_upload(uploader, key)
+    if failed:
+        # Falha a invocação para que o S3 reenvie o evento (os uploads não iniciados ficam em uploads/)
+        raise RuntimeError(f"Falha ao iniciar o processamento de: {failed}")
+    return {**result, 'duplicates': duplicates, 'failed': failed}
+
+
+def enqueue_batch(queue, bucket_name, body):
+    """
+    Enfileira cada arquivo novo do lote como uma mensagem da fila de ingestão.
+
+    Parâmetros:
+        queue: Fila de ingestão (SQS ou em memória).
+        bucket_name (str): Bucket onde os arquivos foram salvos.
+        body (dict): Corpo da resposta de LambdaHandler.handle_batch().
+
+    Retorno:
+        dict: Resposta 202 com o status de cada arquivo.
+    """
+    uploaded = [file for file in body['files'] if file['status'] == 'uploaded']
+    if not uploaded:
+        logger.info(f"Lote {body['batch_id']} sem arquivos novos para processar.")
+        return {'statusCode': 200, 'body': json.dumps(body)}
+
+    messages = [build_message(bucket_name, file['file_name'], raw_file_name=file['raw_file_name'],
+                              batch_id=body['batch_id'])
+                for file in uploaded]
+    try:
+        failed = queue.send_messages(messages)
+    except Exception as e:
+        logger.error(f"Erro ao enfileirar o lote {body['batch_id']}: {str(e)}")
+        failed = messages
+    failed_names = {message['file_name'] for message in failed}
+    for file in uploaded:
+        if file['file_name'] in failed_names:
+            file.update(status='error', error='Falha ao enfileirar o arquivo.')
+        else:
+            file['status'] = 'queued'
+    logger.info(
+        f"Lote {body['batch_id']}: {len(uploaded) - len(failed)} arquivos enfileirados.")
+    return queued_response(body)
+
+
+def start_batch_pipeline(bucket_name, batch_response, context=None):
+    """
+    Inicia uma única execução do Step Functions para todos os arquivos do lote.
+
+    A máquina de estados de lote percorre a lista "files" com um estado Map.
+    A execução recebe o id do lote como nome, então um retry não a duplica.
+
+    Parâmetros:
+        bucket_name (str): Bucket onde os arquivos foram salvos.
+        batch_response (dict): Resposta de LambdaHandler.handle_batch().
+        context (LambdaContext): Contexto da invocação, usado para limitar os retries.
+
+    Retorno:
+        dict: Resposta 202 com o ARN da execução incluído no corpo.
+    """
+    body = json.loads(batch_response['body'])
+    queue = get_ingestion_queue()
+    if queue:
+        return enqueue_batch(queue, bucket_name, body)
+
+    step_function_arn = os.environ.get('STEP_FUNCTIONS_BATCH_ARN')
+    if not step_function_arn:
         logger.warning(
-            "ARN do Step Functions não definido. Apenas o upload foi realizado.")
+            "ARN do Step Functions de lote não definido. Apenas o upload foi realizado.")
+        return batch_response
+
+    input_data = {
+        "batch_id": body['batch_id'],
+        "files": [
+            {"bucket_name": bucket_name, "file_name": file['file_name'],
+             "raw_file_name": file['raw_file_name']}
+            for file in body['files'] if file['status'] == 'uploaded'
+        ]
+    }
+    if not input_data['files']:
+        logger.info(f"Lote {body['batch_id']} sem arquivos novos para processar.")
+        return batch_response
+
+    # Com a máquina Express (PIPELINE_MODE=sync) a resposta já traz os resultados do lote
+    sync = PIPELINE_MODE == 'sync'
+    try:
+        response = retry_step_function_execution(
+            input_data, get_client('stepfunctions'), step_function_arn,
+            context=context, sync=sync, name=body['batch_id'])
+        logger.info(
+            f"Execução do lote {body['batch_id']} iniciada. ID: {response['executionArn']}")
+        return pipeline_response(body, response, sync=sync)
+    except Exception as e:
+        logger.error(
+            f"Erro ao iniciar o Step Functions do lote {body['batch_id']}: {str(e)}")
+        body['error'] = 'Falha ao iniciar Step Functions.'
+
+    batch_response['body'] = json.dumps(body)
+    return batch_response
+
+
+def is_s3_event(event):
+    """Indica se o evento é uma notificação do S3 em vez de uma requisição da API."""
+    records = event.get('Records') or []
+    return bool(records) and records[0].get('eventSource') == 'aws:s3'
+
+
+def is_status_request(event):
+    """Indica se a requisição é uma consulta de status (GET api/v1/invoice/status)."""
+    return event.get('httpMethod') == 'GET' and \
+        (event.get('resource') or event.get('path') or '').endswith('/status')
+
+
+@track_invocation
+def lambda_handler(event, context):
+    """Função de entrada da Lambda."""
+    logger.info("Lambda iniciada.")
+    # Uploads diretos ao S3 chegam como notificação do bucket
+    if is_s3_event(event):
+        return start_pipeline_from_s3_event(event, context)
 
-    return upload_response
+    # Consulta do andamento de um processamento iniciado anteriormente
+    if is_status_request(event):
+        return get_pipeline_status(event, os.environ['SOURCE_BUCKET'])
+
+    handler = LambdaHandler(event)
+    # Lotes de notas fiscais são enviados juntos e processados em uma única execução
+    if handler.is_batch_request():
+        batch_response = handler.handle_batch()
+        if batch_response['statusCode'] != 200:
+            return batch_response
+        return start_batch_pipeline(handler.bucket_name, batch_response, context)
 
-# O código acima é responsável por fazer o upload de um arquivo para o Amazon S3 e iniciar a execução de um Step Functions. O Step Functions é responsável por orquestrar o processamento do arquivo, que será feito por outras lambdas.
+    upload_response = handler.handle()
+    if upload_response['statusCode'] != 200:
+        return upload_response
+
+    upload_body = json.loads(upload_response['body'])
+    # Conteúdo já recebido: devolve o resultado existente sem reprocessar
+    if upload_body['duplicate']:
+        logger.info("Arquivo duplicado. Step Functions não será iniciado.")
+        return upload_response
+
+    # Modo fila: o consumidor inicia o processamento no ritmo suportado pelo Textract
+    queue = get_ingestion_queue()
+    if queue:
+        try:
+            if not queue.send_messages(
+                    [build_message(handler.bucket_name, upload_body['file_name'],
+                                   raw_file_name=upload_body['raw_file_name'])]):
+                logger.info(f"Arquivo {upload_body['file_name']} enfileirado.")
+                return queued_response(upload_body)
+        except Exception as e:
+            logger.error(f"Erro ao enfileirar o arquivo: {str(e)}")
+        upload_response['body'] = json.dumps(
+            {**upload_body, 'error': 'Falha ao enfileirar o arquivo.'})
+        return upload_response
+
+    # Verifica se o ARN do Step Functions está definido
+    step_function_arn = os.environ.get('STEP_FUNCTIONS_ARN')
+    if not step_function_arn:
+        logger.warning(
+            "ARN do Step Functions não definido. Apenas o upload foi realizado.")
+        return upload_response
+
+    logger.info("Iniciando execução do Step Functions.")
+    input_data = {
+        "bucket_name": handler.bucket_name,
+        "file_name": upload_body['file_name'],
+        # Original em raw/: é ele que a movimentação arquiva (file_name pode ser a cópia normalizada)
+        "raw_file_name": upload_body['raw_file_name']
+    }
+    sync = PIPELINE_MODE == 'sync'
+    try:
+        # Cliente do Step Functions criado uma única vez por container
+        response = retry_step_function_execution(
+            input_data, get_client('stepfunctions'), step_function_arn,
+            context=context, sync=sync)
+        return pipeline_response(upload_body, response, sync=sync)
+    except Exception as e:
+        logger.error(
+            f"Erro ao iniciar o Step Functions após várias tentativas: {str(e)}")
+        upload_response['body'] = json.dumps(
+            {**upload_body, 'error': 'Falha ao iniciar Step Functions.'})
+        return upload_response
+
+# O código acima é responsável por fazer o upload de um arquivo para o Amazon S3 e iniciar a execução de um Step Functions. O Step Functions é responsável por orquestrar o processamento do arquivo, que será feito por outras lambdas. No modo assíncrono a API responde 202 e o resultado é consultado na rota de status.
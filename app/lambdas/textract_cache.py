@@ -0,0 +1,310 @@
+# app/lambdas/textract_cache.py  Cache das respostas do Textract endereçado pelo conteúdo da imagem.
+import gzip
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from aws_clients import emit_metrics, get_client
+from content_keys import shard_path
+
+logger = logging.getLogger(__name__)
+
+# Prefixo das respostas guardadas no bucket de imagens (expiradas pela regra de ciclo de vida)
+TEXTRACT_CACHE_PREFIX = os.environ.get('TEXTRACT_CACHE_PREFIX', 'textract-cache/')
+# Bucket do cache; vazio usa o bucket da imagem analisada
+TEXTRACT_CACHE_BUCKET = os.environ.get('TEXTRACT_CACHE_BUCKET', '')
+# Diretório do cache local (replays e benchmarks fora da AWS); tem precedência sobre o S3
+TEXTRACT_CACHE_DIR = os.environ.get('TEXTRACT_CACHE_DIR', '')
+# Validade de uma resposta em dias (0 desativa o cache)
+TEXTRACT_CACHE_TTL_DAYS = float(os.environ.get('TEXTRACT_CACHE_TTL_DAYS', '90'))
+# Respostas mantidas na memória do container (LRU)
+TEXTRACT_CACHE_MEMORY_ENTRIES = int(os.environ.get('TEXTRACT_CACHE_MEMORY_ENTRIES', '64'))
+# Entradas do cache local antes da remoção das menos usadas (LRU)
+TEXTRACT_CACHE_MAX_ENTRIES = int(os.environ.get('TEXTRACT_CACHE_MAX_ENTRIES', '10000'))
+# Versão da API do Textract: respostas de outra versão não são reaproveitadas
+TEXTRACT_API_VERSION = '2018-06-27'
+
+
+def cache_key(digest, feature, api_version=TEXTRACT_API_VERSION):
+    """
+    Chave de uma resposta: (hash do conteúdo, operação/variante, versão da API).
+
+    Parâmetros:
+        digest (str): SHA-256 da imagem original.
+        feature (str): Operação e variante da imagem (ex: 'expense-normalized').
+        api_version (str): Versão da API do Textract.
+
+    Retorno:
+        str: Caminho relativo 'feature/versão/ab/cd/<hash>.json.gz'.
+    """
+    return f"{feature}/{api_version}/{shard_path(digest)}.json.gz"
+
+
+def encode_response(response):
+    """Serializa a resposta em JSON comprimido (gzip), sem os metadados da chamada."""
+    response = {key: value for key, value in response.items() if key != 'ResponseMetadata'}
+    return gzip.compress(json.dumps(response, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_response(content):
+    return json.loads(gzip.decompress(content).decode('utf-8'))
+
+
+class S3ResponseStore:
+    """Respostas guardadas como objetos S3; a expiração também é aplicada pelo ciclo de vida do bucket."""
+
+    def __init__(self, bucket_name, prefix=TEXTRACT_CACHE_PREFIX, client=None):
+        self.s3 = client or get_client('s3')
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+
+    def get(self, key, max_age):
+        """
+        Retorno:
+            dict: Resposta guardada, ou None se não existir ou estiver expirada.
+        """
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=f"{self.prefix}{key}")
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        if time.time() - response['LastModified'].timestamp() > max_age:
+            return None
+        return decode_response(response['Body'].read())
+
+    def put(self, key, content):
+        self.s3.put_object(Bucket=self.bucket_name, Key=f"{self.prefix}{key}", Body=content,
+                           ContentType='application/json', ContentEncoding='gzip')
+
+    def keys(self, feature):
+        """Lista as chaves guardadas de uma operação (para replays do NLP)."""
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"{self.prefix}{feature}/"):
+            for item in page.get('Contents', []):
+                yield item['Key'][len(self.prefix):]
+
+
+class LocalResponseStore:
+    """
+    Respostas guardadas em disco, com remoção das menos usadas (LRU).
+
+    O horário de acesso de cada arquivo é atualizado na leitura e define a
+    ordem de remoção quando o limite de entradas é ultrapassado.
+    """
+
+    def __init__(self, directory, max_entries=TEXTRACT_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # Contagem de entradas, lida do disco na primeira gravação
+        self.entries = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, *key.split('/'))
+
+    def get(self, key, max_age):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > max_age:
+                os.remove(path)
+                return None
+            with open(path, 'rb') as file:
+                content = file.read()
+        except FileNotFoundError:
+            return None
+        # Marca o uso sem alterar a data de gravação (usada na validade)
+        os.utime(path, (time.time(), os.path.getmtime(path)))
+        return decode_response(content)
+
+    def put(self, key, content):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        is_new = not os.path.exists(path)
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            file.write(content)
+        os.replace(temporary_path, path)
+        with self.lock:
+            if self.entries is None:
+                self.entries = sum(1 for _ in self._files())
+            elif is_new:
+                self.entries += 1
+            full = self.entries > self.max_entries
+        if full:
+            self.evict()
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.json.gz'):
+                    yield os.path.join(root, name)
+
+    def evict(self):
+        """Remove as entradas menos usadas além de max_entries."""
+        with self.lock:
+            files = list(self._files())
+            self.entries = len(files)
+            if len(files) <= self.max_entries:
+                return 0
+            files.sort(key=os.path.getatime)
+            # Remove 10% além do excesso para não varrer o diretório a cada gravação
+            excess = len(files) - self.max_entries + self.max_entries // 10
+            removed = files[:excess]
+            for path in removed:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.entries -= len(removed)
+            return len(removed)
+
+    def keys(self, feature):
+        base = os.path.join(self.directory, feature)
+        for path in self._files():
+            if path.startswith(base + os.sep):
+                yield os.path.relpath(path, self.directory).replace(os.sep, '/')
+
+
+class TextractCache:
+    """
+    Cache das respostas do Textract em duas camadas: memória do container (LRU)
+    e um armazenamento persistente (S3 ou disco).
+
+    Retries, uploads repetidos e reprocessamentos após mudanças no NLP
+    reaproveitam a resposta em vez de chamar (e pagar) o Textract de novo.
+    """
+
+    def __init__(self, store, ttl_days=TEXTRACT_CACHE_TTL_DAYS,
+                 memory_entries=TEXTRACT_CACHE_MEMORY_ENTRIES):
+        self.store = store
+        self.max_age = ttl_days * 86400
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'errors': 0}
+
+    def _remember(self, key, response):
+        with self.lock:
+            self.memory[key] = response
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def get(self, key):
+        """Resposta guardada para a chave, ou None (falhas do armazenamento contam como miss)."""
+        with self.lock:
+            response = self.memory.get(key)
+            if response is not None:
+                self.memory.move_to_end(key)
+                self.stats['hits'] += 1
+                return response
+        try:
+            response = self.store.get(key, self.max_age)
+        except Exception as e:
+            logger.warning(f"Erro ao ler o cache do Textract ({key}): {e}")
+            self._count('errors')
+            response = None
+        if response is None:
+            self._count('misses')
+            return None
+        self._remember(key, response)
+        self._count('hits')
+        return response
+
+    def put(self, key, response):
+        self._remember(key, response)
+        try:
+            self.store.put(key, encode_response(response))
+        except Exception as e:
+            # O cache nunca interrompe o processamento
+            logger.warning(f"Erro ao gravar o cache do Textract ({key}): {e}")
+            self._count('errors')
+
+    def get_or_call(self, key, call):
+        """
+        Retorna a resposta guardada ou chama o Textract e guarda o resultado.
+
+        Parâmetros:
+            key (str): Chave gerada por cache_key().
+            call (callable): Chamada ao Textract, feita apenas em caso de miss.
+
+        Retorno:
+            tuple: (resposta, bool indicando se veio do cache).
+        """
+        response = self.get(key)
+        if response is not None:
+            return response, True
+        response = call()
+        self.put(key, response)
+        return response, False
+
+    @property
+    def hit_rate(self):
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def emit_metrics(self, function_name):
+        """Publica hits, misses e a taxa de acerto do cache no formato EMF do CloudWatch."""
+        with self.lock:
+            stats = dict(self.stats)
+            self.stats = {'hits': 0, 'misses': 0, 'errors': 0}
+        total = stats['hits'] + stats['misses']
+        emit_metrics(function_name, {
+            'TextractCacheHits': stats['hits'],
+            'TextractCacheMisses': stats['misses'],
+            'TextractCacheErrors': stats['errors'],
+            'TextractCacheHitRate': round(100 * stats['hits'] / total, 2) if total else 0.0
+        }, {
+            'TextractCacheHits': 'Count', 'TextractCacheMisses': 'Count',
+            'TextractCacheErrors': 'Count', 'TextractCacheHitRate': 'Percent'
+        })
+        return stats
+
+    def replay(self, feature, api_version=TEXTRACT_API_VERSION):
+        """
+        Percorre as respostas guardadas de uma operação, sem chamar o Textract.
+
+        Usado para reprocessar notas fiscais após mudanças no NLP.
+
+        Retorno:
+            generator: Pares (hash do conteúdo, resposta).
+        """
+        prefix = f"{feature}/{api_version}/"
+        for key in self.store.keys(feature):
+            if not key.startswith(prefix):
+                continue
+            response = self.store.get(key, self.max_age)
+            if response is not None:
+                yield os.path.basename(key)[:-len('.json.gz')], response
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(bucket_name):
+    """
+    Retorna o cache do container para o bucket (ou o cache local, se configurado).
+
+    Retorno:
+        TextractCache: Cache, ou None se desativado (TEXTRACT_CACHE_TTL_DAYS=0).
+    """
+    if TEXTRACT_CACHE_TTL_DAYS <= 0:
+        return None
+    location = TEXTRACT_CACHE_DIR or TEXTRACT_CACHE_BUCKET or bucket_name
+    cache = _caches.get(location)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(location)
+            if cache is None:
+                store = (LocalResponseStore(TEXTRACT_CACHE_DIR) if TEXTRACT_CACHE_DIR
+                         else S3ResponseStore(location))
+                cache = TextractCache(store)
+                _caches[location] = cache
+    return cache
@@ -0,0 +1,315 @@
+# app/lambdas/textract_engine.py  Execução do Textract (síncrona e em lote) dentro da cota de TPS.
+import json
+import os
+import queue
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from aws_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+# Cotas de TPS da conta por operação (Service Quotas do Textract na região)
+TEXTRACT_SYNC_TPS = float(os.environ.get('TEXTRACT_SYNC_TPS', '5'))
+TEXTRACT_START_TPS = float(os.environ.get('TEXTRACT_START_TPS', '5'))
+TEXTRACT_GET_TPS = float(os.environ.get('TEXTRACT_GET_TPS', '10'))
+# Tentativas quando o Textract responde com throttling ou erro temporário
+TEXTRACT_RETRIES = int(os.environ.get('TEXTRACT_RETRIES', '5'))
+# Intervalo inicial e máximo entre as consultas de um job assíncrono (segundos)
+JOB_POLL_INITIAL_DELAY = float(os.environ.get('JOB_POLL_INITIAL_DELAY', '1'))
+JOB_POLL_MAX_DELAY = float(os.environ.get('JOB_POLL_MAX_DELAY', '10'))
+# Prazo para um lote de jobs assíncronos terminar (segundos)
+JOB_TIMEOUT = float(os.environ.get('JOB_TIMEOUT', '600'))
+
+# Erros do Textract que indicam excesso de requisições ou falha temporária
+RETRYABLE_ERRORS = ('ThrottlingException', 'ProvisionedThroughputExceededException',
+                    'LimitExceededException', 'InternalServerError')
+
+
+class TokenBucket:
+    """
+    Limitador de taxa (token bucket) compartilhado pelas threads do container.
+
+    Cada chamada consome um token; os tokens são repostos a rate por segundo,
+    até capacity (rajada permitida). Sem rajada por padrão: a cota do Textract
+    é por segundo e uma rajada inicial somada à reposição a ultrapassaria.
+    """
+
+    def __init__(self, rate, capacity=1.0):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Aguarda até haver tokens disponíveis.
+
+        Retorno:
+            bool: True se os tokens foram consumidos, False se o timeout terminou antes.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+def error_code(error):
+    """Código de erro de uma ClientError do botocore (ou o nome da exceção)."""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code', type(error).__name__)
+
+
+class TextractEngine:
+    """
+    Executa o AnalyzeExpense do Textract respeitando as cotas de TPS da conta.
+
+    - analyze_expense: caminho síncrono para uma imagem.
+    - start_expense_analysis / get_expense_analysis / analyze_batch: caminho
+      assíncrono para lotes, com conclusão por polling ou por notificação SNS.
+    """
+
+    def __init__(self, client=None, sync_tps=TEXTRACT_SYNC_TPS, start_tps=TEXTRACT_START_TPS,
+                 get_tps=TEXTRACT_GET_TPS, retries=TEXTRACT_RETRIES):
+        self.textract = client or get_client('textract')
+        self.sync_limiter = TokenBucket(sync_tps)
+        self.start_limiter = TokenBucket(start_tps)
+        self.get_limiter = TokenBucket(get_tps)
+        self.retries = retries
+
+    def _call(self, limiter, operation, **kwargs):
+        """Chama a operação após obter um token, com backoff em caso de throttling."""
+        for attempt in range(1, self.retries + 1):
+            limiter.acquire()
+            try:
+                return operation(**kwargs)
+            except Exception as e:
+                if error_code(e) not in RETRYABLE_ERRORS or attempt == self.retries:
+                    raise
+                delay = random.uniform(0, min(JOB_POLL_MAX_DELAY, 0.1 * 2 ** attempt))
+                logger.warning(
+                    f"Textract limitou a requisição ({error_code(e)}). Nova tentativa em {delay:.2f}s.")
+                time.sleep(delay)
+
+    @staticmethod
+    def document(bucket_name, file_name):
+        return {'S3Object': {'Bucket': bucket_name, 'Name': file_name}}
+
+    def analyze_expense(self, bucket_name, file_name):
+        """
+        Analisa uma imagem de forma síncrona (AnalyzeExpense).
+
+        Retorno:
+            dict: Resposta do Textract (ExpenseDocuments).
+        """
+        return self._call(self.sync_limiter, self.textract.analyze_expense,
+                          Document=self.document(bucket_name, file_name))
+
+    def start_expense_analysis(self, bucket_name, file_name, job_tag=None,
+                               notification_channel=None):
+        """
+        Inicia um job assíncrono de AnalyzeExpense.
+
+        Parâmetros:
+            notification_channel (dict): {'SNSTopicArn', 'RoleArn'} para ser avisado
+                da conclusão em vez de consultar o job.
+
+        Retorno:
+            str: JobId do Textract.
+        """
+        params = {'DocumentLocation': self.document(bucket_name, file_name)}
+        if job_tag:
+            params['JobTag'] = job_tag[:64]
+        if notification_channel:
+            params['NotificationChannel'] = notification_channel
+        return self._call(self.start_limiter, self.textract.start_expense_analysis,
+                          **params)['JobId']
+
+    def get_expense_analysis(self, job_id):
+        """
+        Consulta um job assíncrono, reunindo todas as páginas de resultado.
+
+        Retorno:
+            dict: JobStatus e, quando concluído, ExpenseDocuments de todas as páginas.
+        """
+        response = self._call(self.get_limiter, self.textract.get_expense_analysis,
+                              JobId=job_id)
+        if response['JobStatus'] != 'SUCCEEDED':
+            return response
+
+        documents = list(response.get('ExpenseDocuments', []))
+        next_token = response.get('NextToken')
+        while next_token:
+            page = self._call(self.get_limiter, self.textract.get_expense_analysis,
+                              JobId=job_id, NextToken=next_token)
+            documents.extend(page.get('ExpenseDocuments', []))
+            next_token = page.get('NextToken')
+        return {**response, 'ExpenseDocuments': documents, 'NextToken': None}
+
+    def handle_completion_notification(self, message):
+        """
+        Trata a notificação SNS de conclusão de um job.
+
+        Parâmetros:
+            message (dict ou str): Mensagem publicada pelo Textract no tópico.
+
+        Retorno:
+            tuple: (JobTag, resposta de get_expense_analysis ou o status de falha).
+        """
+        if isinstance(message, str):
+            message = json.loads(message)
+        if message.get('Status') != 'SUCCEEDED':
+            return message.get('JobTag'), {'JobStatus': message.get('Status')}
+        return message.get('JobTag'), self.get_expense_analysis(message['JobId'])
+
+    def wait_for_jobs(self, job_ids=(), timeout=JOB_TIMEOUT, incoming=None):
+        """
+        Consulta os jobs até todos terminarem, com intervalos crescentes.
+
+        Os jobs são consultados na ordem em que foram iniciados e cada rodada
+        para no primeiro ainda em andamento, economizando a cota do
+        GetExpenseAnalysis enquanto o lote não termina.
+
+        Parâmetros:
+            job_ids (iterable): Jobs já iniciados.
+            timeout (float): Prazo para todos os jobs terminarem (segundos).
+            incoming (queue.Queue): Jobs iniciados durante a espera; None encerra a fila.
+
+        Retorno:
+            dict: {job_id: resposta final}; jobs não concluídos no prazo ficam com
+            JobStatus 'TIMED_OUT'.
+        """
+        deadline = time.monotonic() + timeout
+        pending = list(job_ids)
+        results = {}
+        delay = JOB_POLL_INITIAL_DELAY
+        receiving = incoming is not None
+        while pending or receiving:
+            # Recebe os jobs iniciados desde a última rodada
+            while receiving:
+                try:
+                    job_id = incoming.get_nowait()
+                except queue.Empty:
+                    break
+                if job_id is None:
+                    receiving = False
+                else:
+                    pending.append(job_id)
+
+            while pending:
+                response = self.get_expense_analysis(pending[0])
+                if response['JobStatus'] == 'IN_PROGRESS':
+                    break
+                results[pending.pop(0)] = response
+                # Os jobs estão terminando: volta ao intervalo inicial
+                delay = JOB_POLL_INITIAL_DELAY
+            if not pending and not receiving:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error(f"{len(pending)} jobs do Textract não terminaram no prazo.")
+                results.update({job_id: {'JobStatus': 'TIMED_OUT'} for job_id in pending})
+                break
+            time.sleep(min(remaining, delay))
+            delay = min(JOB_POLL_MAX_DELAY, delay * 2)
+        return results
+
+    def analyze_batch(self, documents, timeout=JOB_TIMEOUT, max_workers=8):
+        """
+        Analisa um lote com jobs assíncronos e aguarda todos por polling.
+
+        Os primeiros jobs já são consultados enquanto os demais ainda estão
+        sendo iniciados.
+
+        Parâmetros:
+            documents (list): Pares (bucket_name, file_name).
+
+        Retorno:
+            dict: {(bucket_name, file_name): resposta final do job ou {'Error': ...}}.
+        """
+        results, jobs = {}, {}
+        started = queue.Queue()
+
+        def start(document):
+            try:
+                job_id = self.start_expense_analysis(*document)
+            except Exception as e:
+                logger.error(f"Erro ao iniciar o Textract para {document[1]}: {e}")
+                results[document] = {'JobStatus': 'FAILED', 'Error': str(e)}
+                return
+            jobs[job_id] = document
+            started.put(job_id)
+
+        def start_all():
+            try:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    # O limitador mantém o início dos jobs dentro da cota de TPS
+                    list(executor.map(start, documents))
+            finally:
+                started.put(None)
+
+        starter = threading.Thread(target=start_all, daemon=True)
+        starter.start()
+        finished = self.wait_for_jobs(timeout=timeout, incoming=started)
+        starter.join()
+        for job_id, response in finished.items():
+            results[jobs[job_id]] = response
+        return results
+
+
+def summarize_expense(response):
+    """
+    Reduz a resposta do AnalyzeExpense aos campos usados pelo NLP.
+
+    Retorno:
+        dict: {'summary': {tipo: texto}, 'line_items': [[textos]], 'text': linhas}.
+    """
+    summary, line_items, lines = {}, [], []
+    for document in response.get('ExpenseDocuments', []):
+        for field in document.get('SummaryFields', []):
+            field_type = field.get('Type', {}).get('Text')
+            value = field.get('ValueDetection', {}).get('Text')
+            if field_type and value and field_type not in summary:
+                summary[field_type] = value
+        for group in document.get('LineItemGroups', []):
+            for item in group.get('LineItems', []):
+                line_items.append([
+                    expense_field.get('ValueDetection', {}).get('Text', '')
+                    for expense_field in item.get('LineItemExpenseFields', [])
+                ])
+        lines.extend(block['Text'] for block in document.get('Blocks', [])
+                     if block.get('BlockType') == 'LINE' and block.get('Text'))
+    return {'summary': summary, 'line_items': line_items, 'text': lines}
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Retorna o motor do container, compartilhando os limitadores entre invocações."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = TextractEngine()
+    return _engine
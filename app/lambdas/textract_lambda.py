@@ -1 +1,98 @@
 # app/lambda_functions/textract_lambda.py  Extrai dados de notas fiscais usando o Textract.
+import logging
+import claim_check
+from aws_clients import preload_clients, track_invocation
+from content_keys import NORMALIZED_PREFIX, digest_from_key
+from textract_cache import cache_key, get_cache
+from textract_engine import get_engine, summarize_expense
+
+# Configuração do logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Clientes usados em toda invocação (Textract e S3 do cache): criados na inicialização
+preload_clients('textract', 's3')
+
+
+class TextractLambdaHandler:
+    def __init__(self, event):
+        self.event = event
+        # Motor do container: os limitadores de TPS valem para todas as invocações
+        self.engine = get_engine()
+        self.cache = None
+
+    def validate_event(self):
+        """
+        Valida os dados do evento recebido do Step Functions.
+
+        Retorno:
+            tuple: (bool, str ou tuple) - True se válido, False e mensagem de erro se inválido.
+        """
+        bucket_name = self.event.get('bucket_name')
+        file_name = self.event.get('file_name')
+
+        if not bucket_name or not isinstance(bucket_name, str):
+            return False, 'O campo "bucket_name" é obrigatório e deve ser uma string válida.'
+
+        if not file_name or not isinstance(file_name, str):
+            return False, 'O campo "file_name" é obrigatório e deve ser uma string válida.'
+
+        return True, (bucket_name, file_name)
+
+    def handle(self):
+        """
+        Analisa a imagem com o AnalyzeExpense e devolve os campos extraídos.
+
+        O resumo grande (ex: muitas linhas de itens) é gravado no S3 sob o ID
+        da execução e apenas a referência segue no estado (claim check).
+
+        Retorno:
+            dict: Evento recebido acrescido do resultado resumido do Textract.
+        """
+        is_valid, validation_message = self.validate_event()
+        if not is_valid:
+            logger.error(f"Evento inválido: {validation_message}")
+            raise ValueError(validation_message)
+
+        bucket_name, file_name = validation_message
+        response, cached = self.analyze(bucket_name, file_name)
+        logger.info(f"Textract concluído para {file_name} (cache: {cached}).")
+        textract = claim_check.put(summarize_expense(response), bucket_name,
+                                   self.event.get('execution_id'), 'textract')
+        return {**self.event, 'textract': textract, 'textract_cached': cached}
+
+    def analyze(self, bucket_name, file_name):
+        """
+        Analisa a imagem, reaproveitando a resposta guardada para o mesmo conteúdo.
+
+        A chave do cache usa o hash do conteúdo (do evento ou da chave
+        endereçada por conteúdo); sem hash, o Textract é chamado diretamente.
+
+        Retorno:
+            tuple: (resposta do AnalyzeExpense, bool indicando se veio do cache).
+        """
+        def call():
+            return self.engine.analyze_expense(bucket_name, file_name)
+
+        digest = self.event.get('sha256') or digest_from_key(file_name)
+        self.cache = get_cache(bucket_name)
+        if not digest or self.cache is None:
+            return call(), False
+
+        variant = 'normalized' if file_name.startswith(NORMALIZED_PREFIX) else 'raw'
+        return self.cache.get_or_call(cache_key(digest, f"expense-{variant}"), call)
+
+
+@track_invocation
+def lambda_handler(event, context):
+    """
+    Função principal da Lambda. Os erros são propagados para que o
+    Step Functions registre a falha (e aplique os retries configurados).
+    """
+    logger.info("Iniciando processamento do evento na Lambda textract_lambda.")
+    handler = TextractLambdaHandler(event)
+    try:
+        return handler.handle()
+    finally:
+        if handler.cache is not None:
+            handler.cache.emit_metrics(getattr(context, 'function_name', 'textract_lambda'))
@@ -1,13 +1,17 @@
 # app/main.py
 import botocore.exceptions
 import os
+import sys
 import logging
-import time
-from infra.create_infra import create_infra
+from infra.create_infra import (create_infra, configure_upload_notification, configure_queue_consumer,
+                                configure_compaction_schedule, textract_tps_quota)
 from create_lambdas import create_lambdas_main
-# Pode ser comentado se não for usado
-# Importe a função para criar o Step Functions
-from step_functions.create_step_functions import create_initial_step_functions
+from power_tuning import power_tuning_main
+from deploy_graph import DeployError, DeployGraph
+from readiness import Deadline, wait_all, wait_for_lambda_active
+# Importe a função para criar o Step Functions (descomente junto com as etapas 3 e 5 de main())
+# from step_functions.create_step_functions import (create_initial_step_functions, create_batch_step_functions,
+#                                                   create_express_step_functions, update_step_functions)
 from api_gateway.create_api_gateway import create_api
 import boto3
 
@@ -16,33 +20,43 @@ logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
-def wait_for_lambda_creation(lambda_name, timeout=300, sleep_interval=10):
+def wait_for_lambda_creation(lambda_name, timeout=300, deadline=None, client=None):
+    # Espera a Lambda existir e ficar ativa (waiter do botocore, sem intervalos fixos)
+    try:
+        response = wait_for_lambda_active(
+            client or boto3.client('lambda'), lambda_name, deadline or Deadline(timeout))
+        logger.info(f"Lambda {lambda_name} criada com sucesso.")
+        return response
+    except TimeoutError:
+        logger.error(
+            f"Timeout ao aguardar a criação da Lambda {lambda_name}.")
+        raise
+    except botocore.exceptions.ClientError as e:
+        logger.error(
+            f"Erro ao verificar a criação da Lambda {lambda_name}: {str(e)}")
+        raise  # Re-raise the exception to handle it further up the call stack
+
+
+def wait_for_lambdas(lambda_names, timeout=300):
+    # Espera várias Lambdas em paralelo, com um único prazo para todas
+    deadline = Deadline(timeout)
+    # Um único cliente para todas as threads (a criação de clientes não é thread-safe)
     client = boto3.client('lambda')
-    start_time = time.time()
-
-    while True:
-        try:
-            response = client.get_function(FunctionName=lambda_name)
-            logger.info(f"Lambda {lambda_name} criada com sucesso.")
-            return response
-        except client.exceptions.ResourceNotFoundException:
-            logger.info(
-                f"Lambda {lambda_name} ainda não criada, aguardando...")
-            time.sleep(sleep_interval)
-            if time.time() - start_time > timeout:
-                logger.error(
-                    f"Timeout ao aguardar a criação da Lambda {lambda_name}.")
-                raise TimeoutError(
-                    f"Timeout ao aguardar a criação da Lambda {lambda_name}.")
-        except botocore.exceptions.ClientError as e:
-            logger.error(
-                f"Erro ao verificar a criação da Lambda {lambda_name}: {str(e)}")
-            raise  # Re-raise the exception to handle it further up the call stack
+    responses, errors = wait_all(
+        {name: lambda deadline, name=name: wait_for_lambda_creation(
+            name, deadline=deadline, client=client)
+         for name in lambda_names},
+        deadline)
+    if errors:
+        raise RuntimeError(f"Lambdas não ficaram prontas: {sorted(errors)}")
+    return {name: response['Configuration']['FunctionArn']
+            for name, response in responses.items()}
 
 
 def create_initial_lambdas(infra_config):
     # Lambdas que já estão prontas
-    lambdas_existentes = ['s3_upload', 's3_move']
+    lambdas_existentes = ['s3_upload', 's3_move', 's3_presign', 'ingestion_consumer',
+                          'results_compactor']
 
     # Pegamos os valores da infraestrutura
     role_arn = infra_config['role_arn']
@@ -50,18 +64,6 @@ def create_initial_lambdas(infra_config):
     bucket_imagens_name = infra_config['bucket_imagens_name']
     bucket_layers_name = infra_config['bucket_layers_name']
 
-    # Construir o caminho dinâmico para o arquivo ZIP da layer
-    # Diretório atual do script (main.py)
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    layer_upload_zip_path = os.path.join(
-        current_dir, "layers", "upload_layer", "upload_layer.zip")
-
-    # Verificar se o arquivo existe
-    if not os.path.exists(layer_upload_zip_path):
-        logger.error(f"Arquivo '{layer_upload_zip_path}' não encontrado.")
-        raise FileNotFoundError(
-            f"Arquivo '{layer_upload_zip_path}' não encontrado.")
-
     # A configuração das Lambdas será passada diretamente para a função `create_lambdas_main()`
     lambda_config = {
         'role_arn': role_arn,
@@ -70,40 +72,63 @@ def create_initial_lambdas(infra_config):
         'bucket_imagens_name': bucket_imagens_name,
         'lambdas': {
             's3_upload': {
-                # Caminho para o arquivo ZIP da layer
-                'layer_zip_path': layer_upload_zip_path,
+                # O multipart é decodificado sem dependências externas,
+                # então a Lambda não precisa mais da layer upload_layer
+                # Sem layer, o Pillow não está disponível: NORMALIZE_IMAGES não é definido
+                # aqui e, se for ativado no console, a Lambda registra um aviso ao iniciar
+                # e envia as imagens originais ao Textract
+                'layer_zip_path': None,
                 'handler': 's3_upload.lambda_handler',
                 'description': 'Função Lambda para upload de arquivos S3',  # Adiciona a descrição
-                # Adiciona a descrição da layer
-                'layer_description': 'Layer de biblioteca para upload de arquivos S3'
+                'layer_description': None
             },
             's3_move': {
                 'layer_zip_path': None,  # Não há layer para s3_move_lambda
                 'handler': 's3_move.lambda_handler',
                 'description': 'Função Lambda para mover arquivos S3',  # Adiciona a descrição
                 'layer_description': None  # Não há layer para esta Lambda
+            },
+            's3_presign': {
+                'layer_zip_path': None,
+                'handler': 's3_presign.lambda_handler',
+                'description': 'Função Lambda que gera URLs de upload direto ao S3',
+                'layer_description': None
+            },
+            'ingestion_consumer': {
+                'layer_zip_path': None,
+                'handler': 'ingestion_consumer.lambda_handler',
+                'description': 'Função Lambda que consome a fila de ingestão de notas fiscais',
+                'layer_description': None
+            },
+            'results_compactor': {
+                # Layer opcional com o pyarrow para compactar em Parquet; sem PYARROW_LAYER_ZIP
+                # a compactação grava NDJSON comprimido (results_store.write_compacted)
+                'layer_zip_path': os.environ.get('PYARROW_LAYER_ZIP') or None,
+                'handler': 'results_compactor.lambda_handler',
+                'description': 'Função Lambda que compacta o armazenamento de resultados',
+                'layer_description': 'pyarrow para a compactação em Parquet',
+                # Duas compactações da mesma partição ao mesmo tempo perderiam linhas
+                'reserved_concurrency': 1
             }
         }
     }
 
-    # Agora chamamos a função para criar as Lambdas
+    # Agora chamamos a função para criar as Lambdas (em paralelo)
     logger.info("Criando as Lambdas a partir da configuração fornecida...")
-    create_lambdas_main(lambda_config)
+    lambda_arns = create_lambdas_main(lambda_config)
 
-    # Aguardar as Lambdas serem criadas e obter o ARN
-    lambda_arns = {}
-    for lambda_name in lambdas_existentes:
-        lambda_response = wait_for_lambda_creation(
-            lambda_name)  # Espera a Lambda ser criada
-        # Armazena o ARN
-        lambda_arns[lambda_name] = lambda_response['Configuration']['FunctionArn']
+    # A criação retorna o ARN de cada Lambda implantada; as que falharam ficam de
+    # fora e não são aguardadas (o erro já está no relatório da implantação)
+    failed_lambdas = [name for name in lambdas_existentes if name not in lambda_arns]
+    if failed_lambdas:
+        logger.error(f"Lambdas não implantadas: {failed_lambdas}")
 
-    return lambda_arns  # Retorna os ARNs das Lambdas criadas
+    return lambda_arns, failed_lambdas  # ARNs das Lambdas criadas e as que falharam
 
 
 def create_remaining_lambdas(infra_config):
     # Defina as Lambdas que precisam ser criadas
-    lambdas_futuras = ['other_lambda_1', 'other_lambda_2']
+    lambdas_futuras = ['textract_lambda', 'nlp_lambda']
 
     # Pegue os valores da infraestrutura
     role_arn = infra_config['role_arn']
@@ -117,58 +142,97 @@ def create_remaining_lambdas(infra_config):
         'bucket_lambda_code_name': bucket_lambda_code_name,
         'bucket_layers_name': bucket_layers_name,
         'bucket_imagens_name': bucket_imagens_name,
-        'lambdas': {}
-    }
-
-    for lambda_name in lambdas_futuras:
-        # Adiciona a configuração da Lambda à estrutura
-        lambda_config['lambdas'][lambda_name] = {
-            'layer_zip_path': None,  # Defina se houver uma layer
-            # Defina o handler da Lambda
-            'handler': f"{lambda_name}.lambda_handler"
+        'lambdas': {
+            'textract_lambda': {
+                'layer_zip_path': None,
+                'handler': 'textract_lambda.lambda_handler',
+                'description': 'Função Lambda que extrai o texto das notas fiscais com o Textract',
+                'layer_description': None,
+                # A cota de TPS do Textract é respeitada na própria etapa, em qualquer
+                # PIPELINE_MODE: no máximo textract_tps_quota instâncias simultâneas, cada
+                # uma com 1 AnalyzeExpense por segundo. As execuções que passam do limite
+                # recebem throttling da Lambda e esperam no Retry do estado TextractLambda
+                'reserved_concurrency': textract_tps_quota,
+                'environment': {'TEXTRACT_SYNC_TPS': '1'}
+            },
+            'nlp_lambda': {
+                # Layer com o spaCy e o modelo já descompactado em /opt/models
+                'layer_zip_path': os.environ.get('NLP_LAYER_ZIP') or None,
+                'handler': 'nlp_lambda.lambda_handler',
+                'description': 'Função Lambda que extrai os campos das notas fiscais',
+                'layer_description': 'spaCy e modelo pt_core_news_sm para a Lambda de NLP',
+                # O pydantic da NotaFiscal vem na layer (dependência do spaCy): sem
+                # NLP_LAYER_ZIP a Lambda falharia no import, então a layer é obrigatória
+                'layer_required': True,
+                'extra_files': ['../etc/utils/nlp_utils.py', '../etc/models/nota_fiscal_model.py'],
+                'environment': {
+                    'SPACY_MODEL': '/opt/models/pt_core_news_sm',
+                    'DEPLOYMENT_TYPE': 'layer'
+                }
+            }
         }
+    }
 
     # Agora chamamos a função para criar as Lambdas
     logger.info("Criando as Lambdas a partir da configuração fornecida...")
-    create_lambdas_main(lambda_config)
+    lambda_arns = create_lambdas_main(lambda_config)
+    failed_lambdas = [name for name in lambdas_futuras if name not in lambda_arns]
+    if failed_lambdas:
+        logger.error(f"Lambdas não implantadas: {failed_lambdas}")
 
-    # Aguardar as Lambdas serem criadas e obter o ARN
-    lambda_arns = {}
-    for lambda_name in lambdas_futuras:
-        lambda_arn = wait_for_lambda_creation(
-            lambda_name)  # Espera a Lambda ser criada
-        lambda_arns[lambda_name] = lambda_arn  # Armazena o ARN
+    # Aguardar (em paralelo) apenas as Lambdas implantadas ficarem ativas
+    lambda_arns = wait_for_lambdas([name for name in lambdas_futuras if name in lambda_arns])
+    return lambda_arns, failed_lambdas  # ARNs das Lambdas criadas e as que falharam
 
-    return lambda_arns  # Retorna os ARNs das Lambdas criadas
 
-
-def update_lambda_with_step_function_arn(lambda_name, step_functions_arn):
+def update_lambda_with_step_function_arn(lambda_name, step_functions_arn, batch_step_functions_arn=None):
     # Função para atualizar a Lambda com o ARN do Step Functions (comentada)
     client = boto3.client('lambda')
+    # Preserva as variáveis já configuradas (ex: SOURCE_BUCKET)
+    variables = client.get_function_configuration(
+        FunctionName=lambda_name).get('Environment', {}).get('Variables', {})
+    variables['STEP_FUNCTIONS_ARN'] = step_functions_arn
+    if batch_step_functions_arn:
+        variables['STEP_FUNCTIONS_BATCH_ARN'] = batch_step_functions_arn
     client.update_function_configuration(
         FunctionName=lambda_name,
-        Environment={'Variables': {'STEP_FUNCTIONS_ARN': step_functions_arn}}
+        Environment={'Variables': variables}
     )
     logger.info(
         f"Lambda {lambda_name} atualizada com o ARN do Step Functions.")
 
 
+def update_lambda_with_queue_url(lambda_name, queue_url):
+    # Ativa o modo fila: o upload enfileira em vez de iniciar o Step Functions
+    client = boto3.client('lambda')
+    variables = client.get_function_configuration(
+        FunctionName=lambda_name).get('Environment', {}).get('Variables', {})
+    variables['INGESTION_QUEUE_URL'] = queue_url
+    client.update_function_configuration(
+        FunctionName=lambda_name,
+        Environment={'Variables': variables}
+    )
+    logger.info(
+        f"Lambda {lambda_name} atualizada com a URL da fila de ingestão.")
+
+
 def main():
     # Função principal que orquestra a criação de todos os recursos
     try:
         # Etapa 1: Criação da infraestrutura (S3, roles, políticas)
         logger.info("Criando a infraestrutura...")
-        infra_config = create_infra()  # Agora pega a infraestrutura criada
-
-        if not infra_config:
-            logger.error("Falha ao criar a infraestrutura.")
+        try:
+            infra_config = create_infra()  # Agora pega a infraestrutura criada
+        except DeployError as e:
+            # Sem a infraestrutura completa as Lambdas não são implantadas
+            logger.error(f"Falha ao criar a infraestrutura. Etapas com falha: {e.failed}")
             return
 
         # Etapa 2: Criação das Lambdas
         logger.info("Criando as Lambdas iniciais...")
         # Passa infra_config como argumento
-        initial_lambda_arns = create_initial_lambdas(
-            infra_config)  # Obtemos os ARNs das Lambdas
+        initial_lambda_arns, failed_lambdas = create_initial_lambdas(
+            infra_config)  # Obtemos os ARNs das Lambdas e as que falharam
         '''
         # Etapa 3: Criação do Step Functions inicial
         logger.info("Criando o Step Functions inicial...")
@@ -178,23 +242,59 @@ def main():
             logger.error("Falha ao criar o Step Functions inicial.")
             return
 
+        # Step Functions de lote (estado Map sobre os arquivos do upload em lote)
+        logger.info("Criando o Step Functions de lote...")
+        batch_step_functions_arn = create_batch_step_functions(
+            initial_lambda_arns, infra_config['role_arn'])
+
+        # Alternativa Express (PIPELINE_MODE=sync): lote e arquivo único na mesma máquina,
+        # cobrada por duração em vez de por transição de estado
+        # batch_step_functions_arn = create_express_step_functions(
+        #     initial_lambda_arns, infra_config['role_arn'], max_concurrency=10)
+
         # # Etapa 4: Criação das Lambdas restantes, podemos criar as próximas Lambdas
         # Se você não tem outras Lambdas prontas, comente a linha abaixo
         # logger.info("Criando as Lambdas restantes...")
-        # remaining_lambda_arns = create_remaining_lambdas(infra_config)
+        # remaining_lambda_arns, failed_remaining = create_remaining_lambdas(infra_config)
+        # failed_lambdas += failed_remaining
         
         '''
         # Combine os ARNs das Lambdas COMPLETAS         all_lambda_arns = {**initial_lambda_arns, **remaining_lambda_arns}
         all_lambda_arns = initial_lambda_arns  # Use apenas as Lambdas iniciais
 
-        # Etapa 4: Criação da API Gateway e integração com as Lambdas
-        logger.info("Criando a API Gateway...")
-        api_url = create_api(
-            all_lambda_arns['s3_upload'])  # Passa o ARN da Lambda
-        if api_url:
-            logger.info(f"API Gateway criado com sucesso. URL: {api_url}")
+        # Etapa 4: API Gateway, notificação do bucket e fila de ingestão dependem
+        # apenas das Lambdas e são configurados em paralelo
+        graph = DeployGraph('configuração das integrações')
+        graph.add('api_gateway', lambda _: create_api(
+            all_lambda_arns['s3_upload'],  # Passa o ARN da Lambda
+            presign_lambda_arn=all_lambda_arns['s3_presign']))
+
+        # Uploads diretos (URL pré-assinada) iniciam o processamento pelo evento do S3
+        graph.add('upload_notification', lambda _: configure_upload_notification(
+            infra_config['bucket_imagens_name'], all_lambda_arns['s3_upload']))
+
+        # Fila de ingestão: o consumidor drena lotes de até 10 mensagens com a
+        # concorrência limitada à cota de TPS do Textract
+        if infra_config.get('ingestion_queue_arn'):
+            graph.add('queue_consumer', lambda _: configure_queue_consumer(
+                all_lambda_arns['ingestion_consumer'], infra_config['ingestion_queue_arn']))
+            # O upload só passa a enfileirar quando o consumidor já está ligado à fila
+            graph.add('queue_url', lambda _: update_lambda_with_queue_url(
+                's3_upload', infra_config['ingestion_queue_url']),
+                depends_on=['queue_consumer'], required=False)
+
+        # Compactação periódica do armazenamento de resultados (Parquet por partição)
+        graph.add('results_compaction', lambda _: configure_compaction_schedule(
+            all_lambda_arns['results_compactor']), required=False)
+
+        results = graph.run()
+        graph.report()
+        if results.get('api_gateway'):
+            logger.info(f"API Gateway criado com sucesso. URL: {results['api_gateway']}")
         else:
             logger.error("Falha ao criar o API Gateway.")
+        # Etapas que dependem de uma Lambda não implantada falham com a Lambda
+        failures = failed_lambdas + graph.failed
 
         '''
         # Etapa 5: Criação do Step Functions (comentado, pois ainda está em desenvolvimento)
@@ -207,12 +307,16 @@ def main():
         # logger.info("Atualizando as Lambdas com o ARN do Step Functions...")
         # for lambda_name in all_lambda_arns.keys():
         #    update_lambda_with_step_function_arn(
-        #        lambda_name, step_functions_arn)  # Atualiza cada Lambda
+        #        lambda_name, step_functions_arn,
+        #        batch_step_functions_arn)  # Atualiza cada Lambda
         
         '''
 
-        logger.info(
-            "Todos os recursos foram criados e configurados com sucesso.")
+        if failures:
+            logger.error(f"Implantação concluída com falhas. Lambdas e etapas com falha: {failures}")
+        else:
+            logger.info(
+                "Todos os recursos foram criados e configurados com sucesso.")
 
     except Exception as e:
         logger.error(f"Erro ao criar e configurar os recursos: {str(e)}")
@@ -220,4 +324,9 @@ def main():
 
 # Chama a função principal para executar a criação dos recursos
 if __name__ == '__main__':
-    main()
+    # python main.py --power-tuning [opções]: mede as Lambdas já implantadas e grava
+    # o dimensionamento (memória, timeout, arquitetura) usado na próxima implantação
+    if sys.argv[1:2] == ['--power-tuning']:
+        power_tuning_main(sys.argv[2:])
+    else:
+        main()
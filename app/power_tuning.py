@@ -0,0 +1,338 @@
+# app/power_tuning.py
+# Power tuning das Lambdas: invoca cada função implantada com payloads das
+# fixtures em várias memórias (e nas arquiteturas x86_64 e arm64), registra a
+# duração e o custo por invocação e grava o melhor dimensionamento (memória,
+# timeout e arquitetura) em LAMBDA_SIZING_FILE, lido por create_lambdas_main.
+#
+# As invocações são reais: o s3_upload grava as imagens no bucket e inicia o
+# Step Functions, e o s3_move move os arquivos indicados nas fixtures. Ao fim,
+# cada função volta à memória e à arquitetura que tinha antes da medição.
+#
+# Uso: python main.py --power-tuning [--strategy balanced] [--memory 128,256,512]
+#      [--invocations 5] [--no-arm64] [--payload s3_presign=evento.json] [lambda ...]
+import argparse
+import base64
+import glob
+import json
+import math
+import os
+import statistics
+import time
+import uuid
+import logging
+from create_lambdas import DEFAULT_ARCHITECTURE, LAMBDA_SIZING_FILE, get_client, load_lambda_sizing
+from deploy_graph import DeployGraph
+from readiness import Deadline, wait_for_lambda_updated
+from infra.create_infra import bucket_lambda_code_name
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.join(ROOT_DIR, 'etc', 'tests')
+
+# Memórias medidas (MB); 1769 MB equivale a uma vCPU inteira
+POWER_TUNING_MEMORY_SIZES = [128, 256, 512, 1024, 1769, 3008]
+# Invocações por configuração (a primeira, a frio, só entra no cálculo do timeout)
+POWER_TUNING_INVOCATIONS = 5
+# Funções medidas em paralelo (cada uma altera apenas a própria configuração)
+POWER_TUNING_MAX_WORKERS = 4
+
+# Preço da Lambda em us-east-1 (USD): por GB-segundo faturado e por requisição
+PRICE_PER_GB_SECOND = {'x86_64': 0.0000166667, 'arm64': 0.0000133334}
+PRICE_PER_REQUEST = 0.20 / 1_000_000
+
+# Timeout = maior duração observada (com a inicialização) x fator, em segundos
+TIMEOUT_SAFETY_FACTOR = 3
+MIN_TIMEOUT = 3
+MAX_TIMEOUT = 900
+# Estratégia 'balanced': a configuração mais barata até 20% mais lenta que a mais rápida
+BALANCED_SPEED_TOLERANCE = 0.2
+STRATEGIES = ('cost', 'speed', 'balanced')
+
+# Fixtures usadas como payload de cada Lambda (diretório em etc/tests, padrão dos arquivos).
+# As fixtures de validação (respostas 400 imediatas) não representam a carga real
+PAYLOAD_FIXTURES = {
+    's3_upload': ('upload lambdas', 'TestUpload*.json'),
+    's3_move': ('movements lambdas', 'TestMovement*.json'),
+    'nlp_lambda': ('nlp lambdas', 'NotasFiscaisCorpus.json'),
+}
+
+
+def multipart_event(event):
+    """
+    Evento da API (multipart/form-data, Base64) a partir de uma fixture do upload.
+
+    As fixtures trazem o arquivo no corpo e o nome no cabeçalho "filename". A
+    imagem recebe bytes únicos depois do fim do arquivo (o JPEG continua válido),
+    para que cada invocação processe um conteúdo novo, sem deduplicação.
+    """
+    content = base64.b64decode(event['body']) + f"#{uuid.uuid4().hex}".encode()
+    file_name = (event.get('headers') or {}).get('filename', 'nota.jpg')
+    boundary = f"----tuning{uuid.uuid4().hex}"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{file_name}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n").encode('utf-8') + \
+        content + f"\r\n--{boundary}--\r\n".encode('utf-8')
+    return {
+        'httpMethod': 'POST',
+        'resource': '/api/v1/invoice',
+        'headers': {'Content-Type': f"multipart/form-data; boundary={boundary}"},
+        'isBase64Encoded': True,
+        'body': base64.b64encode(body).decode('ascii')
+    }
+
+
+def fixture_payloads(lambda_name):
+    """
+    Payloads representativos de uma Lambda, montados a partir das fixtures.
+
+    Retorno:
+        list: Funções sem argumentos que devolvem um evento novo a cada chamada.
+    """
+    if lambda_name not in PAYLOAD_FIXTURES:
+        return []
+    directory, pattern = PAYLOAD_FIXTURES[lambda_name]
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(TESTS_DIR, directory, pattern))):
+        with open(path, encoding='utf-8') as fixture:
+            fixtures.append(json.load(fixture))
+
+    if lambda_name == 's3_upload':
+        return [lambda event=event: multipart_event(event) for event in fixtures]
+    if lambda_name == 'nlp_lambda':
+        # Cada nota do corpus chega como a saída do Textract (summarize_expense)
+        return [lambda entry=entry: {
+            'file_name': f"{entry['id']}.jpg",
+            'textract': {'summary': entry.get('summary', {}), 'line_items': [],
+                         'text': entry.get('text', [])}
+        } for corpus in fixtures for entry in corpus]
+    return [lambda event=event: dict(event) for event in fixtures]
+
+
+def file_payloads(path):
+    """Payloads de um arquivo JSON: um evento ou uma lista de eventos."""
+    with open(path, encoding='utf-8') as payload_file:
+        events = json.load(payload_file)
+    return [lambda event=event: event for event in (events if isinstance(events, list) else [events])]
+
+
+def parse_report(log_result):
+    """
+    Lê a linha REPORT do final do log da invocação (LogType='Tail').
+
+    Retorno:
+        dict: duration_ms, billed_ms, max_memory_mb e init_ms (None se a
+        invocação foi a quente), ou None se não houver linha REPORT.
+    """
+    log = base64.b64decode(log_result or '').decode('utf-8', errors='replace')
+    line = next((line for line in reversed(log.splitlines()) if line.startswith('REPORT ')), None)
+    if line is None:
+        return None
+    fields = {}
+    for part in line.split('\t'):
+        # Campos numéricos em ms ou MB (o primeiro é o RequestId)
+        name, _, value = part.partition(':')
+        number, _, unit = value.strip().partition(' ')
+        if unit in ('ms', 'MB'):
+            fields[name.strip()] = float(number)
+    return {
+        'duration_ms': fields.get('Duration', 0.0),
+        'billed_ms': fields.get('Billed Duration', fields.get('Duration', 0.0)),
+        'max_memory_mb': fields.get('Max Memory Used'),
+        'init_ms': fields.get('Init Duration'),
+    }
+
+
+def invocation_cost(billed_ms, memory_size, architecture):
+    # Custo de uma invocação: GB-segundos faturados mais a taxa por requisição
+    return billed_ms / 1000 * memory_size / 1024 * PRICE_PER_GB_SECOND[architecture] + PRICE_PER_REQUEST
+
+
+def apply_configuration(lambda_client, lambda_name, memory_size, architecture, current, deadline):
+    """
+    Altera a memória e a arquitetura da função e espera a atualização terminar.
+
+    A arquitetura só muda junto com o código: o pacote é reenviado do bucket de
+    código (o mesmo zip de create_lambdas, que não tem binários nativos).
+
+    Retorno:
+        dict: Configuração da função depois da alteração.
+    """
+    if current.get('Architectures', [DEFAULT_ARCHITECTURE]) != [architecture]:
+        lambda_client.update_function_code(
+            FunctionName=lambda_name, S3Bucket=bucket_lambda_code_name,
+            S3Key=f"{lambda_name}.zip", Architectures=[architecture])
+        current = wait_for_lambda_updated(lambda_client, lambda_name, deadline)
+    if current.get('MemorySize') != memory_size:
+        lambda_client.update_function_configuration(FunctionName=lambda_name, MemorySize=memory_size)
+        current = wait_for_lambda_updated(lambda_client, lambda_name, deadline)
+    return current
+
+
+def measure(lambda_client, lambda_name, payloads, memory_size, architecture, invocations):
+    """
+    Invoca a função `invocations` vezes (em rodízio entre os payloads).
+
+    Retorno:
+        dict: Duração média a quente, custo médio por invocação, maior duração
+        com a inicialização e memória máxima usada; None se alguma invocação
+        falhou (a configuração é descartada).
+    """
+    reports = []
+    for index in range(invocations):
+        event = payloads[index % len(payloads)]()
+        response = lambda_client.invoke(FunctionName=lambda_name, LogType='Tail',
+                                        Payload=json.dumps(event).encode('utf-8'))
+        response['Payload'].read()
+        if response.get('FunctionError'):
+            logger.warning(f"{lambda_name} com {memory_size} MB ({architecture}) falhou: "
+                           f"{response['FunctionError']}")
+            return None
+        report = parse_report(response.get('LogResult'))
+        if report:
+            reports.append(report)
+    if not reports:
+        return None
+
+    # A invocação a frio entra no timeout, mas não na duração típica
+    warm = [report for report in reports if report['init_ms'] is None] or reports
+    return {
+        'memory_size': memory_size,
+        'architecture': architecture,
+        'duration_ms': statistics.mean(report['duration_ms'] for report in warm),
+        'cost': statistics.mean(invocation_cost(report['billed_ms'], memory_size, architecture)
+                                for report in warm),
+        'max_duration_ms': max(report['duration_ms'] + (report['init_ms'] or 0) for report in reports),
+        'max_memory_mb': max(report['max_memory_mb'] or 0 for report in reports),
+    }
+
+
+def choose(results, strategy):
+    # Melhor configuração medida segundo a estratégia
+    if strategy == 'speed':
+        return min(results, key=lambda result: (result['duration_ms'], result['cost']))
+    if strategy == 'balanced':
+        fastest = min(result['duration_ms'] for result in results)
+        results = [result for result in results
+                   if result['duration_ms'] <= fastest * (1 + BALANCED_SPEED_TOLERANCE)]
+    return min(results, key=lambda result: (result['cost'], result['duration_ms']))
+
+
+def recommended_timeout(results):
+    # O timeout cobre a invocação mais lenta de qualquer configuração, com folga
+    slowest = max(result['max_duration_ms'] for result in results) / 1000
+    return max(MIN_TIMEOUT, min(MAX_TIMEOUT, math.ceil(slowest * TIMEOUT_SAFETY_FACTOR)))
+
+
+def tune_lambda(lambda_name, payloads, memory_sizes=POWER_TUNING_MEMORY_SIZES,
+                invocations=POWER_TUNING_INVOCATIONS, strategy='balanced', arm64=True):
+    """
+    Mede uma Lambda em cada memória e arquitetura e escolhe o dimensionamento.
+
+    Funções com layers são medidas apenas na arquitetura atual, pois as layers
+    (ex: spaCy, pyarrow) podem trazer binários de uma só arquitetura.
+
+    Retorno:
+        dict: memory_size, timeout, architecture e o resumo da medição, ou
+        None se nenhuma configuração terminou sem erro.
+    """
+    lambda_client = get_client('lambda')
+    deadline = Deadline(MAX_TIMEOUT)
+    original = wait_for_lambda_updated(lambda_client, lambda_name, deadline)
+    original_architecture = original.get('Architectures', [DEFAULT_ARCHITECTURE])[0]
+    architectures = [original_architecture]
+    if arm64 and not original.get('Layers'):
+        architectures = sorted({original_architecture, 'x86_64', 'arm64'})
+
+    results = []
+    current = original
+    try:
+        for architecture in architectures:
+            for memory_size in memory_sizes:
+                deadline = Deadline(MAX_TIMEOUT)
+                current = apply_configuration(lambda_client, lambda_name, memory_size,
+                                              architecture, current, deadline)
+                result = measure(lambda_client, lambda_name, payloads, memory_size,
+                                 architecture, invocations)
+                if result:
+                    logger.info(f"{lambda_name} {memory_size} MB {architecture}: "
+                                f"{result['duration_ms']:.1f} ms, US$ {result['cost']:.10f}")
+                    results.append(result)
+    finally:
+        # Restaura a configuração anterior à medição (relida: a última alteração pode ter falhado)
+        deadline = Deadline(MAX_TIMEOUT)
+        apply_configuration(lambda_client, lambda_name, original['MemorySize'], original_architecture,
+                            wait_for_lambda_updated(lambda_client, lambda_name, deadline), deadline)
+
+    if not results:
+        logger.error(f"Nenhuma configuração da Lambda {lambda_name} terminou sem erro.")
+        return None
+    best = choose(results, strategy)
+    return {
+        'memory_size': best['memory_size'],
+        'timeout': recommended_timeout(results),
+        'architecture': best['architecture'],
+        'tuning': {
+            'strategy': strategy,
+            'duration_ms': round(best['duration_ms'], 1),
+            'cost_per_invocation': best['cost'],
+            'max_memory_mb': best['max_memory_mb'],
+            'measured_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+    }
+
+
+def save_lambda_sizing(tuned, path=LAMBDA_SIZING_FILE):
+    # Mescla o dimensionamento medido com o já gravado (as demais Lambdas são mantidas)
+    sizing = load_lambda_sizing(path)
+    sizing.update(tuned)
+    with open(path, 'w', encoding='utf-8', newline='\n') as sizing_file:
+        json.dump(sizing, sizing_file, indent=2, sort_keys=True, ensure_ascii=False)
+        sizing_file.write('\n')
+    return sizing
+
+
+def power_tuning_main(argv=None):
+    """
+    Mede as Lambdas e grava o dimensionamento usado por create_lambdas_main.
+
+    Retorno:
+        dict: Dimensionamento escolhido para cada Lambda medida, por nome.
+    """
+    parser = argparse.ArgumentParser(description='Power tuning das Lambdas implantadas.')
+    parser.add_argument('lambdas', nargs='*', help='Lambdas (padrão: todas com payload de fixture).')
+    parser.add_argument('--strategy', choices=STRATEGIES, default='balanced')
+    parser.add_argument('--memory', default=','.join(map(str, POWER_TUNING_MEMORY_SIZES)),
+                        help='Memórias medidas (MB), separadas por vírgula.')
+    parser.add_argument('--invocations', type=int, default=POWER_TUNING_INVOCATIONS)
+    parser.add_argument('--no-arm64', action='store_true', help='Mede apenas a arquitetura atual.')
+    parser.add_argument('--payload', action='append', default=[], metavar='LAMBDA=ARQUIVO',
+                        help='Evento (ou lista de eventos) em JSON para uma Lambda.')
+    parser.add_argument('--output', default=LAMBDA_SIZING_FILE)
+    args = parser.parse_args(argv)
+
+    payloads = {name: fixture_payloads(name) for name in PAYLOAD_FIXTURES}
+    for item in args.payload:
+        name, _, path = item.partition('=')
+        payloads[name] = file_payloads(path)
+    memory_sizes = [int(size) for size in args.memory.split(',')]
+
+    graph = DeployGraph('power tuning das Lambdas')
+    for lambda_name in args.lambdas or list(payloads):
+        if not payloads.get(lambda_name):
+            logger.warning(f"Sem payload para a Lambda {lambda_name} (use --payload); pulando.")
+            continue
+        graph.add(lambda_name,
+                  lambda _, name=lambda_name: tune_lambda(
+                      name, payloads[name], memory_sizes, args.invocations,
+                      args.strategy, not args.no_arm64),
+                  required=False)
+
+    results = graph.run(POWER_TUNING_MAX_WORKERS)
+    graph.report()
+    tuned = {name: sizing for name, sizing in results.items() if sizing}
+    if tuned:
+        save_lambda_sizing(tuned, args.output)
+        for name, sizing in tuned.items():
+            logger.info(f"{name}: {sizing['memory_size']} MB, {sizing['timeout']} s, "
+                        f"{sizing['architecture']} ({args.output})")
+    return tuned
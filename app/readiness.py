@@ -0,0 +1,176 @@
+# app/readiness.py  Espera os recursos da implantação ficarem prontos (waiters e polling adaptativo).
+import math
+import random
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError, WaiterError
+
+logger = logging.getLogger(__name__)
+
+# Prazo padrão para um recurso (ou grupo de recursos) ficar pronto, em segundos
+DEFAULT_TIMEOUT = 300
+# Primeiro intervalo do polling e intervalo máximo, em segundos
+POLL_INITIAL_DELAY = 0.25
+POLL_MAX_DELAY = 5.0
+# Intervalo entre as tentativas dos waiters do botocore (mínimo aceito: 1 s)
+WAITER_DELAY = 1
+
+
+class Deadline:
+    """Prazo compartilhado por várias esperas (ex: todas as Lambdas de uma implantação)."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def poll_until(check, description, deadline=None, initial_delay=POLL_INITIAL_DELAY,
+               max_delay=POLL_MAX_DELAY):
+    """
+    Chama check() até retornar um valor verdadeiro, com intervalos crescentes e jitter.
+
+    O primeiro intervalo é curto (o recurso costuma ficar pronto em menos de
+    um segundo) e dobra a cada tentativa até max_delay, sem passar do prazo.
+
+    Parâmetros:
+        check (callable): Retorna o recurso pronto, ou None/False se ainda não estiver.
+            Exceções são propagadas (erro definitivo).
+        description (str): Descrição do recurso, usada no log e no erro.
+        deadline (Deadline): Prazo da espera; um novo prazo padrão se omitido.
+
+    Retorno:
+        object: Valor retornado por check().
+
+    Exceções:
+        TimeoutError: Se o prazo terminar antes de o recurso ficar pronto.
+    """
+    deadline = deadline or Deadline()
+    delay = initial_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        result = check()
+        if result:
+            logger.info(f"{description} pronto após {attempt} verificação(ões).")
+            return result
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise TimeoutError(f"Timeout ao aguardar {description}.")
+        # Jitter entre metade e o intervalo inteiro evita verificações sincronizadas
+        time.sleep(min(remaining, random.uniform(delay / 2, delay)))
+        delay = min(max_delay, delay * 2)
+
+
+def wait_with_waiter(client, waiter_name, description, deadline=None, fallback=None, **kwargs):
+    """
+    Usa um waiter do botocore limitado ao prazo, ou o polling se o waiter não existir.
+
+    Parâmetros:
+        client: Cliente boto3 do serviço.
+        waiter_name (str): Nome do waiter (ex: 'function_active_v2').
+        description (str): Descrição do recurso, usada no log e no erro.
+        deadline (Deadline): Prazo da espera.
+        fallback (callable): check() usado com poll_until quando o waiter não existe.
+        **kwargs: Parâmetros da operação consultada pelo waiter.
+    """
+    deadline = deadline or Deadline()
+    try:
+        waiter = client.get_waiter(waiter_name)
+    except ValueError:
+        # Versões antigas do botocore não têm todos os waiters
+        if fallback is None:
+            raise
+        logger.info(f"Waiter '{waiter_name}' indisponível. Usando polling para {description}.")
+        return poll_until(fallback, description, deadline)
+
+    max_attempts = max(1, math.ceil(deadline.remaining() / WAITER_DELAY))
+    try:
+        waiter.wait(WaiterConfig={'Delay': WAITER_DELAY, 'MaxAttempts': max_attempts}, **kwargs)
+    except WaiterError as e:
+        if 'Max attempts exceeded' in str(e):
+            raise TimeoutError(f"Timeout ao aguardar {description}.") from e
+        raise
+    logger.info(f"{description} pronto.")
+    return True
+
+
+def wait_for_lambda_active(lambda_client, lambda_name, deadline=None):
+    """Espera a função existir e ficar no estado Active; retorna get_function()."""
+    deadline = deadline or Deadline()
+
+    def check():
+        try:
+            response = lambda_client.get_function(FunctionName=lambda_name)
+        except lambda_client.exceptions.ResourceNotFoundException:
+            return None
+        return response if response['Configuration'].get('State') == 'Active' else None
+
+    description = f"Lambda {lambda_name}"
+    wait_with_waiter(lambda_client, 'function_exists', description, deadline,
+                     fallback=check, FunctionName=lambda_name)
+    wait_with_waiter(lambda_client, 'function_active_v2', description, deadline,
+                     fallback=check, FunctionName=lambda_name)
+    return lambda_client.get_function(FunctionName=lambda_name)
+
+
+def wait_for_lambda_updated(lambda_client, lambda_name, deadline=None):
+    """Espera o fim da última atualização da função; retorna get_function_configuration()."""
+    def check():
+        config = lambda_client.get_function_configuration(FunctionName=lambda_name)
+        if config.get('LastUpdateStatus') == 'Failed':
+            raise RuntimeError(
+                f"Atualização da Lambda {lambda_name} falhou: {config.get('LastUpdateStatusReason')}")
+        return config if config.get('LastUpdateStatus', 'Successful') == 'Successful' \
+            and config.get('State') == 'Active' else None
+
+    wait_with_waiter(lambda_client, 'function_updated_v2', f"atualização da Lambda {lambda_name}",
+                     deadline, fallback=check, FunctionName=lambda_name)
+    return lambda_client.get_function_configuration(FunctionName=lambda_name)
+
+
+def wait_for_state_machine(stepfunctions_client, state_machine_arn, deadline=None):
+    """Espera o Step Functions ficar ACTIVE (não há waiter para state machines)."""
+    def check():
+        try:
+            response = stepfunctions_client.describe_state_machine(
+                stateMachineArn=state_machine_arn)
+        except stepfunctions_client.exceptions.StateMachineDoesNotExist:
+            return None
+        return response if response.get('status') == 'ACTIVE' else None
+
+    return poll_until(check, f"Step Function {state_machine_arn}", deadline)
+
+
+def wait_all(waits, deadline=None, max_workers=8):
+    """
+    Executa várias esperas em paralelo com o mesmo prazo.
+
+    Parâmetros:
+        waits (dict): {nome: função que recebe o Deadline e espera o recurso}.
+        deadline (Deadline): Prazo compartilhado.
+
+    Retorno:
+        tuple: ({nome: resultado} dos prontos, {nome: exceção} dos que falharam).
+    """
+    deadline = deadline or Deadline()
+    results, errors = {}, {}
+    if not waits:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(waits))) as executor:
+        futures = {name: executor.submit(wait, deadline) for name, wait in waits.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except (ClientError, WaiterError, TimeoutError, RuntimeError) as e:
+                logger.error(f"Recurso {name} não ficou pronto: {e}")
+                errors[name] = e
+    return results, errors
@@ -1,7 +1,7 @@
 import json
 import boto3
-import time
 import logging
+from readiness import wait_for_state_machine
 
 # Configuração do logger
 logger = logging.getLogger()
@@ -11,6 +11,85 @@ logger.setLevel(logging.INFO)
 stepfunctions_client = boto3.client('stepfunctions')
 
 
+# Erros transitórios do serviço Lambda (throttling e falhas internas), repetidos
+# com backoff exponencial em todos os estados
+LAMBDA_RETRY_ERRORS = ["Lambda.ServiceException", "Lambda.AWSLambdaException",
+                       "Lambda.SdkClientException", "Lambda.TooManyRequestsException"]
+# Throttling da Lambda do Textract: a concorrência reservada limita as chamadas
+# simultâneas ao Textract, e as execuções excedentes aguardam a vez neste Retry
+LAMBDA_THROTTLE_ERRORS = ["Lambda.TooManyRequestsException"]
+# O throttling do Textract já é repetido dentro da Lambda; o ClientError que ainda
+# chega ao Step Functions é repetido com um intervalo maior
+TEXTRACT_RETRY_ERRORS = ["ClientError"]
+# Erros da Lambda de movimentação repetidos pelo Step Functions: com o diário de
+# movimentações a nova tentativa retoma do último passo concluído
+MOVE_RETRY_ERRORS = ["RuntimeError", "ClientError", *LAMBDA_RETRY_ERRORS]
+
+
+def retry_policy(errors=LAMBDA_RETRY_ERRORS, interval=2, attempts=3, max_delay=None):
+    """Bloco Retry com backoff exponencial e jitter para os erros informados."""
+    retrier = {
+        "ErrorEquals": errors,
+        "IntervalSeconds": interval,
+        "MaxAttempts": attempts,
+        "BackoffRate": 2,
+        "JitterStrategy": "FULL"
+    }
+    if max_delay:
+        retrier["MaxDelaySeconds"] = max_delay
+    return [retrier]
+
+
+def task_state(resource, next_state=None, retry=None):
+    """Estado Task de uma Lambda com Retry para os erros transitórios."""
+    state = {"Type": "Task", "Resource": resource, "Retry": retry or retry_policy()}
+    if next_state:
+        state["Next"] = next_state
+    else:
+        state["End"] = True
+    return state
+
+
+def with_execution_id(state):
+    """
+    Acrescenta o ID da execução à entrada do estado (JSONata).
+
+    Usado como chave do diário de movimentações e como prefixo dos resultados
+    grandes guardados no S3 (claim check).
+    """
+    state["QueryLanguage"] = "JSONata"
+    state["Arguments"] = \
+        "{% $merge([$states.input, {'execution_id': $states.context.Execution.Id}]) %}"
+    return state
+
+
+def textract_state(resource, next_state=None):
+    """
+    Estado da Lambda do Textract: erros do serviço Lambda e do Textract.
+
+    O throttling da Lambda (concorrência reservada na cota de TPS do Textract)
+    é repetido por mais tempo que os demais erros: é a fila de espera das
+    execuções pelo Textract. Recebe o ID da execução: respostas grandes são
+    gravadas no S3 sob esse prefixo e apenas a referência segue no estado.
+    """
+    other_errors = [error for error in LAMBDA_RETRY_ERRORS if error not in LAMBDA_THROTTLE_ERRORS]
+    retry = (retry_policy(LAMBDA_THROTTLE_ERRORS, interval=1, attempts=8, max_delay=20)
+             + retry_policy(other_errors)
+             + retry_policy(TEXTRACT_RETRY_ERRORS, interval=5, attempts=2))
+    return with_execution_id(task_state(resource, next_state, retry=retry))
+
+
+def move_state(resource, next_state=None):
+    """
+    Estado da Lambda de movimentação.
+
+    A entrada recebe o ID da execução (chave do diário de movimentações), de
+    modo que os retries da mesma execução sejam reconhecidos pela Lambda.
+    Erros de validação (ValueError) não são repetidos.
+    """
+    return with_execution_id(task_state(resource, next_state, retry=retry_policy(MOVE_RETRY_ERRORS)))
+
+
 def create_initial_step_functions(lambda_arns, role_arn):
     """
     Cria o Step Functions inicialmente com as Lambdas disponíveis.
@@ -32,30 +111,20 @@ def create_initial_step_functions(lambda_arns, role_arn):
 
         # Adiciona estados apenas para as Lambdas que existem
         if 'textract_lambda' in lambda_arns:
-            step_function_definition['States']['TextractLambda'] = {
-                "Type": "Task",
-                "Resource": lambda_arns['textract_lambda'],
-                "Next": "NLPLambda"
-            }
+            step_function_definition['States']['TextractLambda'] = textract_state(
+                lambda_arns['textract_lambda'], "NLPLambda")
 
         if 'nlp_lambda' in lambda_arns:
-            step_function_definition['States']['NLPLambda'] = {
-                "Type": "Task",
-                "Resource": lambda_arns['nlp_lambda'],
-                "Next": "MoveLambda"
-            }
+            step_function_definition['States']['NLPLambda'] = task_state(
+                lambda_arns['nlp_lambda'], "MoveLambda")
 
-        if 'move_lambda' in lambda_arns:
-            step_function_definition['States']['MoveLambda'] = {
-                "Type": "Task",
-                "Resource": lambda_arns['move_lambda'],
-                "Next": "ReturnResult"
-            }
+        if 's3_move' in lambda_arns:
+            step_function_definition['States']['MoveLambda'] = move_state(
+                lambda_arns['s3_move'], "ReturnResult")
 
-        # Estado final
+        # Estado final: devolve o resultado da movimentação (nota fiscal e destino)
         step_function_definition['States']['ReturnResult'] = {
             "Type": "Pass",
-            "InputPath": "$.NLPLambdaResult",
             "End": True
         }
 
@@ -79,6 +148,190 @@ def create_initial_step_functions(lambda_arns, role_arn):
         return None
 
 
+def build_processing_states(lambda_arns):
+    """
+    Monta a cadeia Textract -> NLP -> Move com as Lambdas disponíveis.
+
+    Parâmetros:
+        lambda_arns (dict): Dicionário com os ARNs das Lambdas existentes.
+
+    Retorno:
+        tuple: (nome do estado inicial, dicionário de estados).
+    """
+    chain = [
+        (state_name, lambda_arns[lambda_key])
+        for state_name, lambda_key in (
+            ('TextractLambda', 'textract_lambda'),
+            ('NLPLambda', 'nlp_lambda'),
+            ('MoveLambda', 's3_move')
+        )
+        if lambda_key in lambda_arns
+    ]
+
+    builders = {'TextractLambda': textract_state, 'NLPLambda': task_state, 'MoveLambda': move_state}
+    states = {}
+    for index, (state_name, resource) in enumerate(chain):
+        next_state = chain[index + 1][0] if index + 1 < len(chain) else None
+        states[state_name] = builders[state_name](resource, next_state)
+    return chain[0][0], states
+
+
+def create_batch_step_functions(lambda_arns, role_arn, max_concurrency=10):
+    """
+    Cria o Step Functions de lote, que processa todos os arquivos de um upload em lote.
+
+    A entrada tem o formato {"batch_id": ..., "files": [{"bucket_name", "file_name"}]}
+    e cada item de "files" percorre a mesma cadeia de Lambdas dentro de um estado Map.
+
+    Parâmetros:
+        lambda_arns (dict): Dicionário com os ARNs das Lambdas existentes.
+        role_arn (str): ARN da role criada em criar_infra.
+        max_concurrency (int): Número máximo de arquivos processados em paralelo.
+
+    Retorno:
+        str: ARN do Step Functions criado ou None em caso de erro.
+    """
+    try:
+        start_at, states = build_processing_states(lambda_arns)
+        step_function_definition = {
+            "Comment": "Fluxo de processamento de lotes de notas fiscais",
+            "StartAt": "ProcessarLote",
+            "States": {
+                "ProcessarLote": {
+                    "Type": "Map",
+                    "ItemsPath": "$.files",
+                    "MaxConcurrency": max_concurrency,
+                    "ItemProcessor": {
+                        "ProcessorConfig": {"Mode": "INLINE"},
+                        "StartAt": start_at,
+                        "States": states
+                    },
+                    "ResultPath": "$.results",
+                    "End": True
+                }
+            }
+        }
+
+        response = stepfunctions_client.create_state_machine(
+            name='ProcessamentoNotasFiscaisLote',
+            definition=json.dumps(step_function_definition),
+            roleArn=role_arn
+        )
+        step_function_arn = response['stateMachineArn']
+        logger.info(f"Step Function de lote criado com ARN: {step_function_arn}")
+
+        wait_for_step_function(step_function_arn)
+
+        return step_function_arn
+
+    except Exception as e:
+        logger.error(f"Erro ao criar o Step Function de lote: {e}")
+        return None
+
+
+# Campos que cada etapa repassa à seguinte na máquina Express. Os campos
+# ausentes na entrada (ex: sha256) são omitidos pelo JSONata, o que um
+# ResultSelector em JSONPath não permite (caminho inexistente é erro)
+EXPRESS_OUTPUTS = {
+    # O resumo do Textract (ou a referência ao S3, se grande) junto com a entrada original
+    'TextractLambda': "{% $merge([$states.input, {'textract': $states.result.textract}]) %}",
+    # Sem o texto do Textract: apenas o que a movimentação usa
+    'NLPLambda': "{% {'source_key': $states.result.source_key, "
+                 "'payment_method': $states.result.payment_method, "
+                 "'sha256': $states.result.sha256, 'nota_fiscal': $states.result.nota_fiscal} %}",
+    # Resultado de cada arquivo no lote
+    'MoveLambda': "{% {'sha256': $states.result.sha256, 'file_name': $states.result.file_name, "
+                  "'destination_folder': $states.result.destination_folder, "
+                  "'status': $states.result.status, 'nota_fiscal': $states.result.nota_fiscal} %}",
+}
+
+# Resultado de um arquivo que falhou depois dos retries: o lote continua
+FAILED_ITEM_OUTPUT = (
+    "{% {'file_name': $exists($states.input.source_key) ? $states.input.source_key "
+    ": $states.input.file_name, 'status': 'failed', 'error': $states.errorOutput.Error, "
+    "'cause': $substring($string($states.errorOutput.Cause), 0, 1000)} %}")
+
+
+def build_express_definition(lambda_arns, max_concurrency=10):
+    """
+    Definição da máquina Express: um estado Map processa os arquivos do lote.
+
+    Aceita {"batch_id": ..., "files": [...]} ou um único arquivo
+    ({"bucket_name", "file_name"}), tratado como lote de um item. Cada etapa
+    repassa apenas os campos usados pela seguinte (EXPRESS_OUTPUTS), mantendo
+    o estado bem abaixo do limite de 256 KB do Step Functions.
+
+    Parâmetros:
+        lambda_arns (dict): Dicionário com os ARNs das Lambdas existentes.
+        max_concurrency (int): Número máximo de arquivos processados em paralelo.
+
+    Retorno:
+        dict: Definição da máquina de estados.
+    """
+    start_at, states = build_processing_states(lambda_arns)
+    for state_name, state in states.items():
+        state["QueryLanguage"] = "JSONata"
+        state["Output"] = EXPRESS_OUTPUTS[state_name]
+        state["Catch"] = [{"ErrorEquals": ["States.ALL"], "Next": "ArquivoComFalha",
+                           "Output": FAILED_ITEM_OUTPUT}]
+    states["ArquivoComFalha"] = {"Type": "Pass", "QueryLanguage": "JSONata", "End": True}
+
+    return {
+        "Comment": "Fluxo Express de processamento de lotes de notas fiscais",
+        "QueryLanguage": "JSONata",
+        "StartAt": "ProcessarLote",
+        "States": {
+            "ProcessarLote": {
+                "Type": "Map",
+                "Items": "{% $exists($states.input.files) ? $states.input.files : [$states.input] %}",
+                "MaxConcurrency": max_concurrency,
+                "ItemProcessor": {
+                    "ProcessorConfig": {"Mode": "INLINE"},
+                    "StartAt": start_at,
+                    "States": states
+                },
+                "Output": "{% {'batch_id': $states.input.batch_id, 'results': $states.result} %}",
+                "End": True
+            }
+        }
+    }
+
+
+def create_express_step_functions(lambda_arns, role_arn, max_concurrency=10):
+    """
+    Cria (ou atualiza) a máquina Express de processamento em lote.
+
+    Execuções Express custam por duração em vez de por transição e podem ser
+    iniciadas com start_sync_execution (PIPELINE_MODE=sync), mas duram no
+    máximo 5 minutos e não são consultadas por describe_execution.
+
+    Parâmetros:
+        lambda_arns (dict): Dicionário com os ARNs das Lambdas existentes.
+        role_arn (str): ARN da role criada em criar_infra.
+        max_concurrency (int): Número máximo de arquivos processados em paralelo.
+
+    Retorno:
+        str: ARN do Step Functions criado ou None em caso de erro.
+    """
+    try:
+        response = stepfunctions_client.create_state_machine(
+            name='ProcessamentoNotasFiscaisExpress',
+            definition=json.dumps(build_express_definition(lambda_arns, max_concurrency)),
+            roleArn=role_arn,
+            type='EXPRESS'
+        )
+        step_function_arn = response['stateMachineArn']
+        logger.info(f"Step Function Express criado com ARN: {step_function_arn}")
+
+        wait_for_step_function(step_function_arn)
+
+        return step_function_arn
+
+    except Exception as e:
+        logger.error(f"Erro ao criar o Step Function Express: {e}")
+        return None
+
+
 def update_step_functions(step_function_arn, lambda_arns):
     """
     Atualiza o Step Functions para incluir novas Lambdas.
@@ -96,25 +349,16 @@ def update_step_functions(step_function_arn, lambda_arns):
 
         # Adiciona novos estados para as Lambdas que não estavam na definição original
         if 'textract_lambda' in lambda_arns and 'TextractLambda' not in current_definition['States']:
-            current_definition['States']['TextractLambda'] = {
-                "Type": "Task",
-                "Resource": lambda_arns['textract_lambda'],
-                "Next": "NLPLambda"
-            }
+            current_definition['States']['TextractLambda'] = textract_state(
+                lambda_arns['textract_lambda'], "NLPLambda")
 
         if 'nlp_lambda' in lambda_arns and 'NLPLambda' not in current_definition['States']:
-            current_definition['States']['NLPLambda'] = {
-                "Type": "Task",
-                "Resource": lambda_arns['nlp_lambda'],
-                "Next": "MoveLambda"
-            }
+            current_definition['States']['NLPLambda'] = task_state(
+                lambda_arns['nlp_lambda'], "MoveLambda")
 
-        if 'move_lambda' in lambda_arns and 'MoveLambda' not in current_definition['States']:
-            current_definition['States']['MoveLambda'] = {
-                "Type": "Task",
-                "Resource": lambda_arns['move_lambda'],
-                "Next": "ReturnResult"
-            }
+        if 's3_move' in lambda_arns and 'MoveLambda' not in current_definition['States']:
+            current_definition['States']['MoveLambda'] = move_state(
+                lambda_arns['s3_move'], "ReturnResult")
 
         # Atualiza o Step Functions
         update_response = stepfunctions_client.update_state_machine(
@@ -128,24 +372,22 @@ def update_step_functions(step_function_arn, lambda_arns):
         logger.error(f"Erro ao atualizar o Step Functions: {e}")
 
 
-def wait_for_step_function(step_function_arn):
+def wait_for_step_function(step_function_arn, deadline=None):
     """
     Aguarda até que o Step Function esteja ativo.
 
     Parâmetros:
         step_function_arn (str): ARN do Step Function.
+        deadline (Deadline): Prazo compartilhado da implantação (opcional).
+
+    Retorno:
+        bool: True se o Step Function ficou ativo dentro do prazo.
     """
-    while True:
-        try:
-            response = stepfunctions_client.describe_state_machine(
-                stateMachineArn=step_function_arn
-            )
-            logger.info(f"Step Function está ativo. Status: {response['status']}")
-            break
-        except stepfunctions_client.exceptions.StateMachineDoesNotExist:
-            logger.info(
-                "Step Function ainda não está disponível. Aguardando...")
-            time.sleep(5)  # Esperar 5 segundos antes de tentar novamente
-        except Exception as e:
-            logger.error(f"Erro ao verificar o Step Function: {e}")
-            break
+    try:
+        response = wait_for_state_machine(
+            stepfunctions_client, step_function_arn, deadline)
+        logger.info(f"Step Function está ativo. Status: {response['status']}")
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao verificar o Step Function: {e}")
+        return False
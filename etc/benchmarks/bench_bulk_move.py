@@ -0,0 +1,151 @@
+# benchmarks/bench_bulk_move.py
+# Reclassificação em massa das notas (dinheiro/ <-> outros/) contra um S3 local
+# com latência por chamada: compara a movimentação arquivo a arquivo do
+# S3Mover com o BulkMover (cópias em paralelo e exclusões em lotes de 1000) e
+# confere a retomada pelo checkpoint depois de uma interrupção.
+#
+# Uso: python etc/benchmarks/bench_bulk_move.py [--objects 5000] [--latency 0.005] [--workers 10]
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app', 'lambdas'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'etc', 'utils'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import s3_move  # noqa: E402
+from content_keys import result_key  # noqa: E402
+from local_s3 import LocalS3  # noqa: E402
+
+BUCKET = 'notas-fiscais-local'
+PAYMENTS = ('dinheiro', 'pix', 'cartao_credito', 'cartao_debito', 'vale')
+
+
+class ExpiringContext:
+    """Contexto de Lambda cujo tempo restante acaba depois de `calls` consultas."""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def get_remaining_time_in_millis(self):
+        self.calls -= 1
+        return 900000 if self.calls > 0 else 0
+
+
+def seed(client, count, rng):
+    """Notas já movidas pela regra atual (pix em dinheiro/) com os marcadores em results/."""
+    expected = {}
+    # A preparação não conta no tempo: grava sem a latência simulada
+    latency, client.latency = client.latency, 0.0
+    for _ in range(count):
+        digest = f"{rng.getrandbits(256):064x}"
+        payment = rng.choice(PAYMENTS)
+        folder = 'dinheiro' if payment in ('dinheiro', 'pix') else 'outros'
+        key = f"{folder}/{digest}.jpg"
+        client.put_object(Bucket=BUCKET, Key=key, Body=b'x' * 64)
+        client.put_object(Bucket=BUCKET, Key=result_key(digest), Body=json.dumps({
+            'sha256': digest, 'file_name': key, 'payment_method': payment,
+            'destination_folder': folder}))
+        # Nova regra: apenas dinheiro vai para dinheiro/
+        expected[f"{'dinheiro' if payment == 'dinheiro' else 'outros'}/{digest}.jpg"] = digest
+    client.latency = latency
+    return expected
+
+
+def invoice_keys(client):
+    return {key for bucket, key in client.objects
+            if key.startswith(('dinheiro/', 'outros/'))}
+
+
+def run_serial(client):
+    """Linha de base: lista, lê o marcador e move um arquivo por vez (copy + delete)."""
+    mover = s3_move.S3Mover(BUCKET, client=client)
+    keys = sorted(key for key in invoice_keys(client) if key.startswith('dinheiro/'))
+    for key in keys:
+        marker = mover.read_result(os.path.splitext(os.path.basename(key))[0])
+        destination = s3_move.destination_for(marker['payment_method'])
+        if destination != 'dinheiro':
+            mover.move_file(key, destination)
+    return len(keys)
+
+
+def run_bulk(client, workers, context=None, job_id='bench', batch_size=s3_move.DELETE_BATCH_SIZE):
+    mover = s3_move.BulkMover(s3_move.S3Mover(BUCKET, client=client), job_id,
+                              max_workers=workers, batch_size=batch_size)
+    return mover.run(prefix='dinheiro/', context=context)
+
+
+def check(client, expected, label):
+    client.latency = 0.0
+    keys = invoice_keys(client)
+    assert keys == set(expected), (
+        f"{label}: {len(set(expected) - keys)} faltando, {len(keys - set(expected))} sobrando")
+    for key, digest in expected.items():
+        marker = json.loads(client.get_object(Bucket=BUCKET, Key=result_key(digest))['Body'].read())
+        assert marker['file_name'] == key or label == 'serial', f"{label}: marcador de {key}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da movimentação em massa.')
+    parser.add_argument('--objects', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--workers', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    s3_move.CASH_PAYMENT_METHODS = ('dinheiro',)
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Linha de base arquivo a arquivo
+        client = LocalS3(latency=args.latency)
+        expected = seed(client, args.objects, random.Random(args.seed))
+        client.calls.clear()
+        start = time.perf_counter()
+        listed = run_serial(client)
+        results.append(('arquivo a arquivo', time.perf_counter() - start, listed, dict(client.calls)))
+        check(client, expected, 'serial')
+
+        # Em massa, de uma vez
+        client = LocalS3(latency=args.latency)
+        expected = seed(client, args.objects, random.Random(args.seed))
+        client.calls.clear()
+        start = time.perf_counter()
+        state = run_bulk(client, args.workers)
+        results.append(('em massa', time.perf_counter() - start, listed, dict(client.calls)))
+        check(client, expected, 'bulk')
+        assert state['done'] and state['failed'] == 0
+
+        # Interrompido depois do primeiro lote e retomado pelo checkpoint
+        client = LocalS3(latency=args.latency)
+        expected = seed(client, args.objects, random.Random(args.seed))
+        # Lotes menores garantem mais de um lote mesmo com poucas notas
+        batch_size = max(1, min(s3_move.DELETE_BATCH_SIZE, args.objects // 4))
+        first = run_bulk(client, args.workers, context=ExpiringContext(1), job_id='retomada',
+                         batch_size=batch_size)
+        resumed = run_bulk(client, args.workers, job_id='retomada', batch_size=batch_size)
+        check(client, expected, 'retomada')
+        assert not first['done'] and resumed['done']
+        assert resumed['moved'] == state['moved'], (resumed['moved'], state['moved'])
+
+    print(f"{args.objects} notas, latência de {args.latency * 1000:.0f} ms por chamada, "
+          f"{args.workers} threads")
+    print(f"{'cenário':<20} {'tempo (s)':>10} {'objetos/s':>10} {'DeleteObject':>13} {'DeleteObjects':>14}")
+    baseline = None
+    for name, elapsed, listed, calls in results:
+        baseline = baseline or elapsed
+        print(f"{name:<20} {elapsed:>10.2f} {listed / elapsed:>10,.0f} "
+              f"{calls.get('DeleteObject', 0):>13} {calls.get('DeleteObjects', 0):>14}  "
+              f"({baseline / elapsed:.1f}x)")
+    print(f"retomada: primeira execução parou na posição {first['position']!r} "
+          f"com {first['moved']} movidos; a segunda concluiu com {resumed['moved']}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+# benchmarks/bench_cold_start.py
+# Perfil da partida a frio de cada Lambda: um interpretador novo por módulo
+# importa o handler a partir de uma cópia do pacote (os arquivos .py, sem
+# bytecode em cache, como no zip implantado) e registra a duração da
+# inicialização, a memória residente e o detalhamento do `-X importtime`.
+# Com --check, falha (código 1) se algum módulo passar do orçamento de import.
+#
+# A CPU reduzida das funções de 128 MB não é emulada: os tempos servem para
+# comparar módulos e versões; o InitDuration real aparece no REPORT da Lambda.
+#
+# Uso: python etc/benchmarks/bench_cold_start.py [--runs 5] [--top 8] [--check]
+#      [--budget nlp_lambda=300] [--json resultado.json] [modulo ...]
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LAMBDAS_DIR = os.path.join(ROOT_DIR, 'app', 'lambdas')
+# Módulos de fora de app/lambdas empacotados com as Lambdas (extra_files do main.py)
+EXTRA_MODULES = [os.path.join(ROOT_DIR, 'etc', 'utils', 'nlp_utils.py'),
+                 os.path.join(ROOT_DIR, 'etc', 'models', 'nota_fiscal_model.py')]
+
+# Orçamento do import de cada handler (ms, mediana das execuções). O boto3 e a
+# criação dos clientes pré-carregados (no self do próprio módulo) custam ~250 ms;
+# o nlp_lambda não usa a AWS em toda invocação e carrega só o pydantic e o modelo
+IMPORT_BUDGETS_MS = {
+    'nlp_lambda': 250,
+}
+DEFAULT_IMPORT_BUDGET_MS = 500
+
+# Executado no interpretador novo: importa o handler e mede a inicialização
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+except ImportError:
+    rss = None
+print(json.dumps({{'import_ms': elapsed * 1000, 'rss': rss}}))
+"""
+
+
+def lambda_modules():
+    """Módulos de app/lambdas que definem um lambda_handler."""
+    modules = []
+    for path in sorted(glob.glob(os.path.join(LAMBDAS_DIR, '*.py'))):
+        with open(path, encoding='utf-8') as source:
+            if '\ndef lambda_handler(' in source.read().replace('\r\n', '\n'):
+                modules.append(os.path.splitext(os.path.basename(path))[0])
+    return modules
+
+
+def build_package(directory):
+    """Copia os módulos empacotados para um diretório (sem __pycache__)."""
+    for path in [*glob.glob(os.path.join(LAMBDAS_DIR, '*.py')), *EXTRA_MODULES]:
+        shutil.copy(path, directory)
+
+
+def parse_importtime(stderr):
+    """
+    Linhas do -X importtime como (nome, profundidade, self µs, cumulativo µs).
+
+    A profundidade vem da indentação do nome (2 espaços por nível); o
+    cabeçalho da saída é ignorado.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        head, cumulative_us, name = line.split('|')
+        # O campo do nome começa com um espaço separador antes da indentação
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        entries.append((name.strip(), depth, int(head.split(':', 1)[1]), int(cumulative_us)))
+    return entries
+
+
+def profile_module(module, package_dir, runs):
+    """
+    Importa o módulo em `runs` interpretadores novos.
+
+    Returns:
+        dict: Medianas de import e de processo (ms), RSS (MB) e o importtime
+        da execução mediana.
+    """
+    env = {**os.environ, 'PYTHONPATH': package_dir, 'PYTHONDONTWRITEBYTECODE': '1',
+           'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+           'AWS_LAMBDA_FUNCTION_NAME': module}
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT.format(module=module)],
+            cwd=package_dir, env=env, capture_output=True, text=True)
+        process_ms = (time.perf_counter() - start) * 1000
+        if completed.returncode != 0:
+            raise RuntimeError(f"Falha ao importar {module}: {completed.stderr.strip().splitlines()[-1:]}")
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        samples.append((result['import_ms'], process_ms, result['rss'], completed.stderr))
+
+    samples.sort(key=lambda sample: sample[0])
+    import_ms, _, rss, stderr = samples[len(samples) // 2]
+    return {
+        'import_ms': import_ms,
+        'process_ms': statistics.median(sample[1] for sample in samples),
+        'rss_mb': rss / 2 ** 20 if rss else None,
+        'importtime': parse_importtime(stderr),
+    }
+
+
+def breakdown(entries, module, top):
+    """
+    Maiores custos do import: imports diretos do módulo (cumulativo) e
+    pacotes de nível superior (soma do self de todos os submódulos).
+    """
+    # No -X importtime o módulo aparece depois dos seus imports, que vêm mais
+    # indentados logo antes dele (os anteriores são do próprio script de medição)
+    index = next(index for index, entry in enumerate(entries) if entry[0] == module)
+    root_depth = entries[index][1]
+    first = index
+    while first > 0 and entries[first - 1][1] > root_depth:
+        first -= 1
+    subtree = entries[first:index + 1]
+    direct = sorted(((name, cumulative) for name, depth, _, cumulative in subtree
+                     if depth == root_depth + 1), key=lambda item: -item[1])[:top]
+    packages = {}
+    for name, _, self_us, _ in subtree:
+        package = name.split('.', 1)[0]
+        packages[package] = packages.get(package, 0) + self_us
+    return direct, sorted(packages.items(), key=lambda item: -item[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Perfil da partida a frio das Lambdas.')
+    parser.add_argument('modules', nargs='*', help='Módulos (padrão: todos com lambda_handler).')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8)
+    parser.add_argument('--check', action='store_true', help='Falha se passar do orçamento.')
+    parser.add_argument('--budget', action='append', default=[], metavar='MODULO=MS',
+                        help='Sobrescreve o orçamento de um módulo (ou "*" para o padrão).')
+    parser.add_argument('--json', help='Grava o resultado em JSON (comparação entre versões).')
+    args = parser.parse_args()
+
+    budgets, default_budget = dict(IMPORT_BUDGETS_MS), DEFAULT_IMPORT_BUDGET_MS
+    for item in args.budget:
+        name, _, value = item.partition('=')
+        if name == '*':
+            default_budget = float(value)
+        else:
+            budgets[name] = float(value)
+
+    results, over_budget = {}, []
+    with tempfile.TemporaryDirectory(prefix='cold-start-') as package_dir:
+        build_package(package_dir)
+        for module in args.modules or lambda_modules():
+            result = profile_module(module, package_dir, args.runs)
+            budget = budgets.get(module, default_budget)
+            result['budget_ms'] = budget
+            results[module] = result
+            if result['import_ms'] > budget:
+                over_budget.append(module)
+
+    print(f"Partida a frio por módulo (mediana de {args.runs} interpretadores novos, "
+          f"Python {sys.version.split()[0]})")
+    print(f"{'módulo':<20} {'import (ms)':>12} {'orçamento':>10} {'processo (ms)':>14} {'RSS (MB)':>9}")
+    for module, result in results.items():
+        rss = f"{result['rss_mb']:>9.1f}" if result['rss_mb'] else f"{'-':>9}"
+        flag = '  ACIMA' if module in over_budget else ''
+        print(f"{module:<20} {result['import_ms']:>12.1f} {result['budget_ms']:>10.0f} "
+              f"{result['process_ms']:>14.1f} {rss}{flag}")
+
+    for module, result in results.items():
+        direct, packages = breakdown(result['importtime'], module, args.top)
+        print(f"\n{module}")
+        print("  imports diretos (cumulativo): " + ", ".join(
+            f"{name} {cumulative / 1000:.1f} ms" for name, cumulative in direct))
+        print("  por pacote (self): " + ", ".join(
+            f"{name} {self_us / 1000:.1f} ms" for name, self_us in packages))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({module: {key: value for key, value in result.items() if key != 'importtime'}
+                       for module, result in results.items()}, output, indent=2)
+
+    if args.check and over_budget:
+        print(f"\nAcima do orçamento de import: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_image_normalization.py
+# Mede a redução de bytes e o tempo da normalização das imagens de exemplo
+# (etc/tests/upload lambdas/*.json) antes do envio ao Textract.
+#
+# Uso: python etc/benchmarks/bench_image_normalization.py [--repeat 5] [--dpi 150]
+import argparse
+import base64
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app', 'lambdas'))
+
+import image_normalizer  # noqa: E402
+
+FIXTURES_GLOB = os.path.join(ROOT_DIR, 'etc', 'tests', 'upload lambdas', '*.json')
+
+
+def load_fixture_images():
+    """Carrega as imagens dos eventos de teste (corpo em Base64)."""
+    images = []
+    for path in sorted(glob.glob(FIXTURES_GLOB)):
+        with open(path, encoding='utf-8') as fixture:
+            event = json.load(fixture)
+        try:
+            content = base64.b64decode(event.get('body', ''), validate=True)
+        except ValueError:
+            continue
+        # Ignora os eventos de validação, que não trazem uma imagem de verdade
+        if content[:3] == b'\xff\xd8\xff' or content[:8] == b'\x89PNG\r\n\x1a\n':
+            images.append((os.path.basename(path), content))
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark da normalização de imagens antes do Textract.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Execuções por imagem')
+    parser.add_argument('--dpi', type=int,
+                        default=image_normalizer.NORMALIZE_TARGET_DPI, help='Resolução alvo')
+    args = parser.parse_args()
+
+    if not image_normalizer.is_available():
+        sys.exit('Pillow não está instalado (pip install pillow).')
+
+    images = load_fixture_images()
+    if not images:
+        sys.exit('Nenhuma imagem encontrada nos eventos de teste.')
+
+    print(f"{'arquivo':<28} {'original':>12} {'normalizado':>12} {'redução':>8} "
+          f"{'pixels':>8} {'ms (p50)':>9}")
+    total_original = total_normalized = 0
+    for name, content in images:
+        durations = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            normalized, info = image_normalizer.normalize_image(
+                content, target_dpi=args.dpi)
+            durations.append((time.perf_counter() - start) * 1000)
+
+        original_pixels = info['original_size'][0] * info['original_size'][1]
+        normalized_pixels = info['normalized_size'][0] * info['normalized_size'][1]
+        total_original += len(content)
+        total_normalized += len(normalized)
+        print(f"{name:<28} {len(content):>12} {len(normalized):>12} "
+              f"{1 - len(normalized) / len(content):>8.1%} "
+              f"{1 - normalized_pixels / original_pixels:>8.1%} "
+              f"{statistics.median(durations):>9.1f}")
+
+    print(f"{'total':<28} {total_original:>12} {total_normalized:>12} "
+          f"{1 - total_normalized / total_original:>8.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_multipart_copy.py
+# Compara a cópia no servidor com copy_object (uma requisição) e a cópia em
+# partes paralelas (upload_part_copy) do S3Mover em vários tamanhos de objeto,
+# contra um S3 local com latência por chamada e vazão limitada por requisição.
+#
+# Uso: python etc/benchmarks/bench_multipart_copy.py [--sizes 1,16,64,256] [--part-size 16]
+#      [--concurrency 10] [--bandwidth 100] [--latency 0.02]
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app', 'lambdas'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'etc', 'utils'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import s3_move  # noqa: E402
+from local_s3 import LocalS3  # noqa: E402
+
+BUCKET = 'notas-fiscais-local'
+MB = 1024 * 1024
+
+
+def copy(client, key, threshold):
+    """Copia uma vez para outros/ com o limite informado e confere o conteúdo."""
+    s3_move.MULTIPART_COPY_THRESHOLD = threshold
+    mover = s3_move.S3Mover(BUCKET, client=client)
+    start = time.perf_counter()
+    destination_key = mover.copy_file(key, 'outros')
+    elapsed = time.perf_counter() - start
+
+    source = client.objects[(BUCKET, key)]
+    copied = client.objects[(BUCKET, destination_key)]
+    assert hashlib.md5(copied['Body']).digest() == hashlib.md5(source['Body']).digest()
+    assert copied['ContentType'] == source['ContentType']
+    client.objects.pop((BUCKET, destination_key))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da cópia em partes do S3Mover.')
+    parser.add_argument('--sizes', default='1,16,64,256', help='Tamanhos dos objetos em MB')
+    parser.add_argument('--part-size', type=int, default=16, help='Tamanho da parte em MB')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--bandwidth', type=float, default=100, help='MB/s por requisição')
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    s3_move.MULTIPART_COPY_PART_SIZE = args.part_size * MB
+    s3_move.MULTIPART_COPY_CONCURRENCY = args.concurrency
+    client = LocalS3(latency=args.latency, bandwidth=args.bandwidth * MB)
+
+    print(f"partes de {args.part_size} MB, {args.concurrency} em paralelo, "
+          f"{args.bandwidth:.0f} MB/s e {args.latency * 1000:.0f} ms por requisição")
+    print(f"{'tamanho (MB)':>12} {'partes':>7} {'copy_object (s)':>16} {'em partes (s)':>14} {'ganho':>7}")
+    for size_mb in (int(size) for size in args.sizes.split(',')):
+        key = f"dinheiro/nota-{size_mb}mb.pdf"
+        client.put_object(Bucket=BUCKET, Key=key, Body=os.urandom(size_mb * MB),
+                          ContentType='application/pdf')
+        single = copy(client, key, threshold=float('inf'))
+        multipart = copy(client, key, threshold=0)
+        parts = len(s3_move.part_ranges(size_mb * MB))
+        print(f"{size_mb:>12} {parts:>7} {single:>16.2f} {multipart:>14.2f} {single / multipart:>6.1f}x")
+        client.objects.pop((BUCKET, key))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# benchmarks/bench_nlp_extraction.py
+# Mede o tempo de extração (µs por nota fiscal) e a acurácia por campo do
+# extrator de regras do nlp_utils, no corpus de fixtures e em notas sintéticas.
+#
+# Uso: python etc/benchmarks/bench_nlp_extraction.py [--synthetic 500] [--repeat 5] [--spacy]
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'etc', 'utils'))
+
+import nlp_utils  # noqa: E402
+
+CORPUS_PATH = os.path.join(ROOT_DIR, 'etc', 'tests', 'nlp lambdas', 'NotasFiscaisCorpus.json')
+
+NAMES = ['MERCADO SAO JOSE LTDA', 'FARMACIA POPULAR DO POVO', 'RESTAURANTE SABOR CASEIRO',
+         'LOJAS CENTRAL ME', 'PADARIA PAO QUENTE', 'AUTO POSTO BANDEIRANTES']
+STREETS = ['RUA', 'AV.', 'AVENIDA', 'ALAMEDA', 'TRAVESSA', 'ROD.']
+TOTAL_LABELS = ['VALOR TOTAL R$', 'TOTAL R$', 'Valor a Pagar R$', 'TOTAL']
+PAYMENTS = [('Dinheiro', 'dinheiro'), ('PIX', 'pix'), ('Cartao de Credito', 'cartao_credito'),
+            ('Cartao de Debito', 'cartao_debito'), ('Vale Refeicao', 'vale')]
+
+
+def check_digits(digits, weight_sets, modulo_rule):
+    digits = list(digits)
+    for weights in weight_sets:
+        total = sum(int(digit) * weight for digit, weight in zip(digits, weights))
+        digits.append(str(modulo_rule(total)))
+    return ''.join(digits)
+
+
+def random_cnpj(rng):
+    base = f"{rng.randrange(10 ** 8):08d}0001"
+    weights = ([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    return check_digits(base, weights, lambda total: 0 if 11 - total % 11 >= 10 else 11 - total % 11)
+
+
+def random_cpf(rng):
+    base = f"{rng.randrange(1, 10 ** 9):09d}"
+    weights = (range(10, 1, -1), range(11, 1, -1))
+    return check_digits(base, weights, lambda total: 0 if total * 10 % 11 == 10 else total * 10 % 11)
+
+
+def access_key(cnpj, series, number, rng):
+    key = f"35{rng.randrange(20, 25)}{rng.randrange(1, 13):02d}{cnpj}65{series:03d}{number:09d}1" \
+          f"{rng.randrange(10 ** 8):08d}"
+    total = sum(int(digit) * weight for digit, weight in zip(reversed(key), [2, 3, 4, 5, 6, 7, 8, 9] * 6))
+    check = 11 - total % 11
+    key += str(0 if check >= 10 else check)
+    return ' '.join(key[index:index + 4] for index in range(0, 44, 4))
+
+
+def synthetic_invoice(rng):
+    """Nota fiscal sintética com layout variado e os campos esperados."""
+    cnpj = random_cnpj(rng)
+    consumer = rng.choice([None, random_cpf(rng), random_cnpj(rng)])
+    series, number = rng.randrange(1, 10), rng.randrange(1, 10 ** 6)
+    total = round(rng.uniform(1, 5000), 2)
+    payment_text, payment = rng.choice(PAYMENTS)
+    day, month, year = rng.randrange(1, 29), rng.randrange(1, 13), rng.randrange(2020, 2025)
+    name = rng.choice(NAMES)
+    address = f"{rng.choice(STREETS)} {rng.choice(['BRASIL', 'XV DE NOVEMBRO', 'DAS PALMEIRAS'])}, " \
+              f"{rng.randrange(1, 3000)}"
+    money = f"{total:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    formatted_cnpj = nlp_utils.format_cnpj(cnpj)
+
+    lines = [name, address, f"CNPJ: {rng.choice([formatted_cnpj, cnpj])} IE: 123456789",
+             'Documento Auxiliar da Nota Fiscal de Consumidor Eletronica']
+    lines += [f"ITEM {index} 1 UN {rng.randrange(1, 99)},{rng.randrange(100):02d}"
+              for index in range(rng.randrange(1, 15))]
+    # Rótulo do total às vezes em uma linha e o valor na seguinte
+    label = rng.choice(TOTAL_LABELS)
+    lines += [f"{label} {money}"] if rng.random() < 0.8 else [label, money]
+    lines.append(f"{payment_text} {money}")
+    if rng.random() < 0.7:
+        lines.append(access_key(cnpj, series, number, rng))
+    if consumer:
+        label = 'CPF' if len(consumer) == 11 else 'CNPJ'
+        lines.append(f"CONSUMIDOR {label}: {consumer}")
+    else:
+        lines.append('CONSUMIDOR NAO IDENTIFICADO')
+    lines.append(f"NFC-e nº {number:09d} Série {series:03d} {day:02d}/{month:02d}/{year} 10:00:00")
+    if rng.random() < 0.2:
+        # Caixa mista, como costuma vir do OCR de cupons com fontes diferentes
+        lines = [line.title() if rng.random() < 0.5 else line for line in lines]
+
+    expected = {
+        'nome_emissor': name,
+        'CNPJ_emissor': formatted_cnpj,
+        'endereco_emissor': address,
+        'CNPJ_CPF_consumidor': None if consumer is None else (
+            nlp_utils.format_cpf(consumer) if len(consumer) == 11 else nlp_utils.format_cnpj(consumer)),
+        'data_emissao': f"{day:02d}/{month:02d}/{year}",
+        'numero_nota_fiscal': str(number),
+        'serie_nota_fiscal': str(series),
+        'valor_total': total,
+        'forma_pgto': payment,
+    }
+    return {'id': f"sintetica-{number}", 'summary': {}, 'text': lines, 'expected': expected}
+
+
+def load_corpus(synthetic, seed):
+    with open(CORPUS_PATH, encoding='utf-8') as file:
+        corpus = json.load(file)
+    rng = random.Random(seed)
+    return corpus + [synthetic_invoice(rng) for _ in range(synthetic)]
+
+
+def matches(value, expected):
+    if isinstance(expected, float):
+        return value is not None and abs(value - expected) < 0.005
+    if isinstance(expected, str) and isinstance(value, str):
+        # Nome e endereço mantêm a caixa do OCR
+        return value.upper() == expected.upper()
+    return value == expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da extração de campos da NotaFiscal.')
+    parser.add_argument('--synthetic', type=int, default=500, help='Notas sintéticas além das fixtures')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetições da medição de tempo')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--spacy', action='store_true', help='Permite o fallback com o spaCy')
+    parser.add_argument('--verbose', action='store_true', help='Mostra os campos errados')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.synthetic, args.seed)
+
+    # Tempo: melhor de N passadas pelo corpus inteiro
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for invoice in corpus:
+            nlp_utils.extract_nota_fiscal(invoice['summary'], invoice['text'], use_spacy=args.spacy)
+        best = min(best, time.perf_counter() - start)
+
+    correct = dict.fromkeys(nlp_utils.NOTA_FISCAL_FIELDS, 0)
+    for invoice in corpus:
+        fields = nlp_utils.extract_nota_fiscal(invoice['summary'], invoice['text'],
+                                               use_spacy=args.spacy)
+        for field, expected in invoice['expected'].items():
+            if matches(fields[field], expected):
+                correct[field] += 1
+            elif args.verbose:
+                print(f"{invoice['id']}: {field} = {fields[field]!r}, esperado {expected!r}")
+
+    print(f"{len(corpus)} notas fiscais | {best / len(corpus) * 1e6:.1f} µs por nota")
+    print(f"{'campo':<22} {'acurácia':>9}")
+    for field, count in correct.items():
+        print(f"{field:<22} {count / len(corpus):>8.1%}")
+    print(f"{'todos os campos':<22} {sum(correct.values()) / (len(corpus) * len(correct)):>8.1%}")
+
+
+if __name__ == '__main__':
+    main()
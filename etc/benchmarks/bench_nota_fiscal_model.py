@@ -0,0 +1,74 @@
+# benchmarks/bench_nota_fiscal_model.py
+# Compara a validação e a serialização da NotaFiscal objeto a objeto com a
+# validação em lote (uma chamada para a lista inteira) e a saída em colunas.
+#
+# Uso: python etc/benchmarks/bench_nota_fiscal_model.py [--records 100000] [--repeat 3]
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'etc', 'models'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'etc', 'utils'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'etc', 'benchmarks'))
+
+import nota_fiscal_model  # noqa: E402
+from bench_nlp_extraction import synthetic_invoice  # noqa: E402
+
+
+def make_records(count, seed):
+    """Registros no formato produzido pelo extrator (textos mascarados, data dd/mm/aaaa)."""
+    rng = random.Random(seed)
+    templates = [synthetic_invoice(rng)['expected'] for _ in range(min(count, 1000))]
+    return [dict(templates[index % len(templates)]) for index in range(count)]
+
+
+def per_object(records):
+    models = [nota_fiscal_model.NotaFiscal(**record) for record in records]
+    return b'[' + b','.join(model.model_dump_json().encode('utf-8') for model in models) + b']'
+
+
+def batch(records):
+    return nota_fiscal_model.validate_json_batch(records)
+
+
+def batch_columns(records):
+    return nota_fiscal_model.to_columns(nota_fiscal_model.validate_batch(records))
+
+
+def measure(func, records, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(records)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da validação da NotaFiscal.')
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    records = make_records(args.records, args.seed)
+    # As duas formas precisam produzir o mesmo JSON
+    sample = records[:100]
+    assert per_object(sample).replace(b' ', b'') == batch(sample).replace(b' ', b'')
+
+    print(f"{'cenário':<34} {'tempo (s)':>10} {'registros/s':>12}")
+    baseline = None
+    for name, func in [('objeto a objeto (model_dump_json)', per_object),
+                       ('lote -> JSON (uma chamada)', batch),
+                       ('lote -> colunas', batch_columns)]:
+        elapsed = measure(func, records, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<34} {elapsed:>10.3f} {len(records) / elapsed:>12,.0f}  "
+              f"({baseline / elapsed:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/bench_pipeline.py
+# Reproduz as requisições de fixture da API (etc/tests/upload lambdas) contra o
+# pipeline completo emulado localmente (utils/local_pipeline.py) e relata, por
+# etapa, a latência (p50/p95/p99), a vazão, a memória residente e o maior
+# estado trafegado, para pegar regressões sem conta AWS.
+#
+# As fixtures são enviadas como multipart/form-data, como pelo API Gateway. Cada
+# repetição de uma imagem recebe alguns bytes a mais depois do fim do arquivo: o
+# conteúdo muda (outro SHA-256, sem deduplicação) e o JPEG continua válido.
+#
+# Uso: python etc/benchmarks/bench_pipeline.py [--requests 60] [--concurrency 8]
+#      [--s3-latency 0.005] [--textract-latency 0.2] [--textract-tps 5] [--line-items 0]
+#      [--json resultado.json]
+import argparse
+import base64
+import collections
+import contextlib
+import glob
+import io
+import json
+import logging
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'etc', 'utils'))
+
+from local_pipeline import LocalPipeline  # noqa: E402
+
+FIXTURES_DIR = os.path.join(ROOT_DIR, 'etc', 'tests', 'upload lambdas')
+
+
+def load_fixtures(directory):
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(path, encoding='utf-8') as fixture:
+            fixtures.append((os.path.splitext(os.path.basename(path))[0], json.load(fixture)))
+    return fixtures
+
+
+def multipart_event(event, index):
+    """
+    Evento da API (multipart/form-data, Base64) montado a partir de uma fixture.
+
+    As fixtures trazem o arquivo inteiro no corpo e o nome no cabeçalho
+    "filename"; a API recebe o mesmo arquivo como parte de um formulário.
+    Imagens recebem bytes a mais depois do fim (conteúdo único por requisição).
+    """
+    try:
+        content = base64.b64decode(event['body'], validate=True) + f"#{index}".encode()
+    except (ValueError, TypeError):
+        # Fixtures de validação: corpo que não é uma imagem, enviado como está
+        content = str(event.get('body', '')).encode('utf-8')
+    file_name = (event.get('headers') or {}).get('filename')
+    disposition = 'form-data; name="file"' + (f'; filename="{file_name}"' if file_name else '')
+    boundary = f"----bench{index:08d}"
+    body = (f"--{boundary}\r\nContent-Disposition: {disposition}\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n").encode('utf-8') + \
+        content + f"\r\n--{boundary}--\r\n".encode('utf-8')
+    return {
+        'httpMethod': 'POST',
+        'resource': '/api/v1/invoice',
+        'headers': {'Content-Type': f"multipart/form-data; boundary={boundary}"},
+        'isBase64Encoded': True,
+        'body': base64.b64encode(body).decode('ascii')
+    }
+
+
+def build_events(fixtures, requests):
+    """Eventos em rodízio entre as fixtures, até `requests` requisições."""
+    return [(name, multipart_event(event, index))
+            for index, (name, event) in zip(range(requests), _cycle(fixtures))]
+
+
+def _cycle(items):
+    while True:
+        yield from items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline completo emulado localmente.')
+    parser.add_argument('--requests', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--executions', type=int, default=None,
+                        help='Execuções do Step Functions em paralelo (padrão: --concurrency).')
+    parser.add_argument('--s3-latency', type=float, default=0.005)
+    parser.add_argument('--textract-latency', type=float, default=0.2)
+    parser.add_argument('--textract-tps', type=float, default=5)
+    parser.add_argument('--line-items', type=int, default=0)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--json', help='Grava o resumo em JSON (comparação entre versões).')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    events = build_events(fixtures, args.requests)
+
+    # As Lambdas registram no nível INFO e publicam métricas EMF no stdout
+    logging.disable(logging.WARNING)
+    pipeline = LocalPipeline(s3_latency=args.s3_latency, textract_latency=args.textract_latency,
+                             textract_tps=args.textract_tps,
+                             max_executions=args.executions or args.concurrency,
+                             line_items=args.line_items)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            responses, elapsed = pipeline.replay([event for _, event in events], args.concurrency)
+    finally:
+        pipeline.close()
+        logging.disable(logging.NOTSET)
+
+    statuses = collections.Counter()
+    for (name, _), response in zip(events, responses):
+        statuses[(name, response['statusCode'])] += 1
+    executions = pipeline.execution_statuses()
+    summary = pipeline.stats.summary(elapsed)
+
+    print(f"{args.requests} requisições ({len(fixtures)} fixtures), {args.concurrency} simultâneas, "
+          f"S3 {args.s3_latency * 1000:.0f} ms, Textract {args.textract_latency * 1000:.0f} ms "
+          f"a {args.textract_tps:g} TPS, {args.line_items} linhas de itens")
+    print(f"tempo total {elapsed:.2f} s: {executions.get('SUCCEEDED', 0) / elapsed:.2f} notas/s; "
+          f"execuções {dict(executions)}")
+    print("respostas da API: " + ", ".join(
+        f"{name}={status}x{count}" for (name, status), count in sorted(statuses.items())))
+    print(f"{'etapa':<10} {'n':>5} {'erros':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'vazão/s':>8} {'RSS (MB)':>9} {'Δ pico (MB)':>12} {'estado (KB)':>12}")
+
+    def cell(value, width, spec):
+        return f"{'-':>{width}}" if value is None else f"{value:>{width}{spec}}"
+
+    for stage, row in summary.items():
+        print(f"{stage:<10} {row['count']:>5} {row['errors']:>6} {row['p50']:>9.1f} "
+              f"{row['p95']:>9.1f} {row['p99']:>9.1f} {cell(row['throughput'], 8, '.2f')} "
+              f"{cell(row['rss_mb'], 9, '.1f')} {cell(row['peak_growth_mb'], 12, '.1f')} "
+              f"{cell(row['payload_kb'], 12, '.1f')}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({'args': vars(args), 'elapsed': elapsed, 'executions': dict(executions),
+                       'stages': summary}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/bench_textract_engine.py
+# Mede a vazão (documentos por segundo) do motor do Textract contra um Textract
+# simulado localmente, com latência e cota de TPS configuráveis.
+#
+# Uso: python etc/benchmarks/bench_textract_engine.py [--documents 60] [--tps 5]
+import argparse
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app', 'lambdas'))
+
+import textract_engine  # noqa: E402
+
+
+class ThrottlingError(Exception):
+    """Erro no formato de ClientError do botocore (campo response)."""
+
+    def __init__(self):
+        super().__init__('Rate exceeded')
+        self.response = {'Error': {'Code': 'ThrottlingException'}}
+
+
+class StubTextract:
+    """Textract simulado: aplica a cota de TPS por operação e a latência de cada chamada."""
+
+    def __init__(self, tps, get_tps, sync_latency, job_duration):
+        self.tps = {'GetExpenseAnalysis': get_tps}
+        self.default_tps = tps
+        self.sync_latency = sync_latency
+        self.job_duration = job_duration
+        self.calls = collections.defaultdict(collections.deque)
+        self.throttled = collections.Counter()
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def _admit(self, operation):
+        now = time.monotonic()
+        with self.lock:
+            window = self.calls[operation]
+            while window and now - window[0] >= 1.0:
+                window.popleft()
+            if len(window) >= self.tps.get(operation, self.default_tps):
+                self.throttled[operation] += 1
+                raise ThrottlingError()
+            window.append(now)
+
+    def analyze_expense(self, Document):
+        self._admit('AnalyzeExpense')
+        time.sleep(self.sync_latency)
+        return {'ExpenseDocuments': [{'SummaryFields': []}]}
+
+    def start_expense_analysis(self, DocumentLocation, **kwargs):
+        self._admit('StartExpenseAnalysis')
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self.jobs[job_id] = time.monotonic() + self.job_duration
+        return {'JobId': job_id}
+
+    def get_expense_analysis(self, JobId, NextToken=None):
+        self._admit('GetExpenseAnalysis')
+        if time.monotonic() < self.jobs[JobId]:
+            return {'JobStatus': 'IN_PROGRESS'}
+        return {'JobStatus': 'SUCCEEDED', 'ExpenseDocuments': [{'SummaryFields': []}]}
+
+
+def run_naive(stub, documents, workers):
+    """Chamadas síncronas em paralelo, sem limitador: conta os erros de throttling."""
+    def call(document):
+        try:
+            stub.analyze_expense(Document=textract_engine.TextractEngine.document(*document))
+            return True
+        except ThrottlingError:
+            return False
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(call, documents))
+
+
+def run_sync(engine, documents, workers):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return len(list(executor.map(lambda document: engine.analyze_expense(*document),
+                                     documents)))
+
+
+def run_async(engine, documents, workers):
+    results = engine.analyze_batch(documents, max_workers=workers)
+    return sum(1 for response in results.values() if response['JobStatus'] == 'SUCCEEDED')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark do motor do Textract contra um Textract simulado.')
+    parser.add_argument('--documents', type=int, default=60, help='Documentos por cenário')
+    parser.add_argument('--tps', type=float, default=5,
+                        help='Cota de TPS simulada (AnalyzeExpense e StartExpenseAnalysis)')
+    parser.add_argument('--get-tps', type=float, default=10,
+                        help='Cota de TPS simulada do GetExpenseAnalysis')
+    parser.add_argument('--workers', type=int, default=16, help='Threads de chamada')
+    parser.add_argument('--latency', type=float, default=0.4,
+                        help='Latência do AnalyzeExpense síncrono (s)')
+    parser.add_argument('--job-duration', type=float, default=2.0,
+                        help='Duração de um job assíncrono (s)')
+    args = parser.parse_args()
+
+    # Os retries por throttling aparecem na coluna throttles, não no log
+    logging.getLogger('textract_engine').setLevel(logging.ERROR)
+    textract_engine.JOB_POLL_INITIAL_DELAY = 0.25
+    documents = [('bucket-simulado', f"raw/{index:04d}.jpg") for index in range(args.documents)]
+
+    print(f"{'cenário':<28} {'ok':>5} {'throttles':>10} {'tempo (s)':>10} {'docs/s':>8}")
+    scenarios = [
+        ('síncrono sem limitador', lambda stub: run_naive(stub, documents, args.workers)),
+        ('síncrono com token bucket', lambda stub: run_sync(
+            textract_engine.TextractEngine(stub, sync_tps=args.tps), documents, args.workers)),
+        ('assíncrono (jobs em lote)', lambda stub: run_async(
+            textract_engine.TextractEngine(stub, start_tps=args.tps, get_tps=args.get_tps),
+            documents, args.workers)),
+    ]
+    for name, scenario in scenarios:
+        stub = StubTextract(args.tps, args.get_tps, args.latency, args.job_duration)
+        start = time.perf_counter()
+        succeeded = scenario(stub)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<28} {succeeded:>5} {sum(stub.throttled.values()):>10} "
+              f"{elapsed:>10.2f} {succeeded / elapsed:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
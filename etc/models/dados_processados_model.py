@@ -1,6 +1,23 @@
 # models/dados_processados_model.py
-from pydantic import BaseModel
+import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+
+from nota_fiscal_model import NotaFiscal
+
 
 class DadosProcessados(BaseModel):
-    # Defina os campos necessários aqui
-    pass
+    # Resultado do processamento de uma nota fiscal (registro do armazenamento de resultados)
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
+    sha256: str
+    file_name: str
+    status: str = 'processed'
+    destination_folder: Optional[str] = None
+    processed_at: Optional[datetime.datetime] = None
+    nota_fiscal: NotaFiscal = NotaFiscal()
+
+
+# Validador em lote, como NotasFiscais em nota_fiscal_model
+DadosProcessadosLote = TypeAdapter(list[DadosProcessados])
@@ -1,13 +1,188 @@
 # models/nota_fiscal_model.py
-from pydantic import BaseModel
+# Modelo da nota fiscal com campos normalizados (CNPJ/CPF só com dígitos, data
+# como date, valor como Decimal, forma de pagamento como enum) e validação em
+# lote: uma única chamada ao validador compilado do pydantic para a lista inteira.
+import datetime
+import enum
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Annotated, Optional
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, TypeAdapter, ValidationError
+
+
+class FormaPagamento(str, enum.Enum):
+    DINHEIRO = 'dinheiro'
+    PIX = 'pix'
+    CARTAO_CREDITO = 'cartao_credito'
+    CARTAO_DEBITO = 'cartao_debito'
+    VALE = 'vale'
+    OUTROS = 'outros'
+
+
+# Grafias aceitas na entrada além dos valores do enum
+PAYMENT_ALIASES = {
+    'crédito': FormaPagamento.CARTAO_CREDITO, 'credito': FormaPagamento.CARTAO_CREDITO,
+    'cartão de crédito': FormaPagamento.CARTAO_CREDITO,
+    'cartao de credito': FormaPagamento.CARTAO_CREDITO,
+    'débito': FormaPagamento.CARTAO_DEBITO, 'debito': FormaPagamento.CARTAO_DEBITO,
+    'cartão de débito': FormaPagamento.CARTAO_DEBITO,
+    'cartao de debito': FormaPagamento.CARTAO_DEBITO,
+    'espécie': FormaPagamento.DINHEIRO, 'especie': FormaPagamento.DINHEIRO,
+}
+PAYMENT_VALUES = {forma.value: forma for forma in FormaPagamento}
+
+
+# Caracteres de máscara removidos do CNPJ/CPF (str.translate roda em C, sem laço Python)
+MASK_CHARACTERS = str.maketrans('', '', './- ')
+
+# Parte inteira com separador de milhar: grupos de 3 dígitos depois do primeiro
+GROUPED_INTEGER = {separator: re.compile(rf'\d{{1,3}}(?:{re.escape(separator)}\d{{3}})+')
+                   for separator in '.,'}
+
+
+def _digits(value, sizes, label):
+    # Remove a máscara ('12.345.678/0001-95' -> '12345678000195') e confere o tamanho
+    if not isinstance(value, str):
+        return value
+    digits = value.translate(MASK_CHARACTERS)
+    if len(digits) not in sizes or not digits.isdigit():
+        raise ValueError(f"{label} deve ter {' ou '.join(map(str, sizes))} dígitos")
+    return digits
+
+
+def _cnpj(value):
+    return _digits(value, (14,), 'CNPJ')
+
+
+def _cnpj_cpf(value):
+    return _digits(value, (11, 14), 'CPF/CNPJ')
+
+
+def _date(value):
+    # Aceita date, ISO ('2024-03-12') e o formato brasileiro ('12/03/2024')
+    if isinstance(value, str) and len(value) == 10 and value[2] == '/' and value[5] == '/':
+        return datetime.date(int(value[6:]), int(value[3:5]), int(value[:2]))
+    return value
+
+
+def _number_text(text):
+    # Converte '1.234,56' (brasileiro) ou '1,234.56' (americano) para '1234.56'.
+    # O último separador é o decimal, a menos que seja o único e venha seguido de
+    # exatamente 3 dígitos: aí vale o formato brasileiro das notas, em que '.' é
+    # o separador de milhar ('R$ 12.500' = 12500) e ',' o decimal ('1,234' = 1.234)
+    sign = text[:1] if text[:1] in '+-' else ''
+    text = text[len(sign):]
+    last = max(text.rfind(','), text.rfind('.'))
+    if last < 0:
+        return sign + text
+    separator = text[last]
+    other = '.' if separator == ',' else ','
+    if other not in text and text.count(separator) > 1:
+        # Só separadores de milhar ('1.234.567')
+        integer, fraction, thousands = text, '', separator
+    else:
+        integer, fraction, thousands = text[:last], text[last + 1:], other
+        if other not in text and len(fraction) == 3 and integer.lstrip('0') \
+                and separator == '.' and GROUPED_INTEGER['.'].fullmatch(text):
+            integer, fraction, thousands = text, '', separator
+    if thousands in integer and not GROUPED_INTEGER[thousands].fullmatch(integer):
+        raise ValueError('valor inválido')
+    integer = integer.replace(thousands, '')
+    return f"{sign}{integer}.{fraction}" if fraction else sign + integer
+
+
+def _decimal(value):
+    # Aceita números e textos nos formatos brasileiro ('1.234,56', 'R$ 40,70') e
+    # americano ('1,234.56'); float passa por str para não carregar o erro de
+    # representação binária (40.7 -> Decimal('40.7'))
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    if isinstance(value, str):
+        text = value.replace('R$', '').replace(' ', '')
+        try:
+            return Decimal(_number_text(text))
+        except InvalidOperation:
+            raise ValueError('valor inválido') from None
+    return value
+
+
+def _payment(value):
+    if isinstance(value, str):
+        key = value.strip().lower()
+        return PAYMENT_VALUES.get(key) or PAYMENT_ALIASES.get(key) or FormaPagamento.OUTROS
+    return value
+
+
+CNPJ = Annotated[str, BeforeValidator(_cnpj)]
+CNPJOuCPF = Annotated[str, BeforeValidator(_cnpj_cpf)]
+DataEmissao = Annotated[datetime.date, BeforeValidator(_date)]
+Valor = Annotated[Decimal, BeforeValidator(_decimal)]
+Pagamento = Annotated[FormaPagamento, BeforeValidator(_payment)]
+
 
 class NotaFiscal(BaseModel):
-    nome_emissor: str = None
-    CNPJ_emissor: str = None
-    endereco_emissor: str = None
-    CNPJ_CPF_consumidor: str = None
-    data_emissao: str = None
-    numero_nota_fiscal: str = None
-    serie_nota_fiscal: str = None
-    valor_total: float = None
-    forma_pgto: str = None
+    # Imutável e sem campos extras: os registros são só validados e serializados
+    model_config = ConfigDict(frozen=True, extra='ignore', str_strip_whitespace=True,
+                              validate_default=False)
+
+    nome_emissor: Optional[str] = None
+    CNPJ_emissor: Optional[CNPJ] = None
+    endereco_emissor: Optional[str] = None
+    CNPJ_CPF_consumidor: Optional[CNPJOuCPF] = None
+    data_emissao: Optional[DataEmissao] = None
+    numero_nota_fiscal: Optional[str] = None
+    serie_nota_fiscal: Optional[str] = None
+    valor_total: Optional[Valor] = None
+    forma_pgto: Optional[Pagamento] = None
+
+
+# Validador da lista inteira, construído uma única vez: a iteração sobre os
+# registros acontece no pydantic-core (Rust), sem uma chamada Python por nota
+NotasFiscais = TypeAdapter(list[NotaFiscal])
+
+NOTA_FISCAL_FIELDS = tuple(NotaFiscal.model_fields)
+
+
+def validate_batch(records, collect_errors=False):
+    """
+    Valida uma lista de dicionários em uma única chamada.
+
+    Parâmetros:
+        records (list): Dicionários com os campos da NotaFiscal.
+        collect_errors (bool): Em vez de levantar ValidationError, separa os
+            registros inválidos e valida os demais em uma segunda chamada.
+
+    Retorno:
+        list: NotaFiscal validadas; com collect_errors, a tupla
+        (válidas, {índice: lista de erros}).
+    """
+    if not collect_errors:
+        return NotasFiscais.validate_python(records)
+    try:
+        return NotasFiscais.validate_python(records), {}
+    except ValidationError as e:
+        errors = {}
+        for error in e.errors(include_url=False):
+            errors.setdefault(error['loc'][0], []).append(error)
+        valid = [record for index, record in enumerate(records) if index not in errors]
+        return NotasFiscais.validate_python(valid), errors
+
+
+def dump_json_batch(notas):
+    """Serializa a lista de NotaFiscal direto para bytes JSON (sem dicts intermediários)."""
+    return NotasFiscais.dump_json(notas)
+
+
+def validate_json_batch(records):
+    """Valida a lista de dicionários e devolve os bytes JSON normalizados."""
+    return dump_json_batch(NotasFiscais.validate_python(records))
+
+
+def to_columns(notas):
+    """
+    Converte a lista em colunas ({campo: [valores]}), o formato do armazenamento de resultados.
+
+    Os valores mantêm os tipos normalizados (date, Decimal, FormaPagamento).
+    """
+    return {field: [getattr(nota, field) for nota in notas] for field in NOTA_FISCAL_FIELDS}
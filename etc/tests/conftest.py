@@ -0,0 +1,26 @@
+# tests/conftest.py
+# Caminhos dos módulos testados: as Lambdas (app/lambdas), os utilitários com
+# os substitutos locais da AWS (etc/utils) e os modelos (etc/models)
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for path in (os.path.join(ROOT_DIR, 'etc', 'models'), os.path.join(ROOT_DIR, 'etc', 'utils'),
+             os.path.join(ROOT_DIR, 'app', 'lambdas')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+
+@pytest.fixture
+def aws_client(monkeypatch):
+    """Registra um substituto local como cliente da AWS (aws_clients.get_client)."""
+    import aws_clients
+
+    def register(service_name, client):
+        monkeypatch.setitem(aws_clients._clients, (service_name, ()), client)
+        return client
+    return register
@@ -0,0 +1,113 @@
+# tests/test_ingestion_consumer.py
+# Testes para a função ingestion_consumer com a fila de ingestão em memória
+import json
+
+import pytest
+
+import ingestion_consumer
+import pipeline
+from ingestion_queue import InMemoryIngestionQueue, build_message
+
+STATE_MACHINE_ARN = 'arn:aws:states:us-east-1:000000000000:stateMachine:ProcessamentoNotasFiscais'
+
+
+class FakeStepFunctions:
+    """Step Functions que falha nas primeiras `failures[file_name]` tentativas de cada arquivo."""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.started = []
+
+    def start_execution(self, stateMachineArn, input, name=None):
+        file_name = json.loads(input)['file_name']
+        if self.failures.get(file_name, 0):
+            self.failures[file_name] -= 1
+            raise RuntimeError(f"Falha simulada em {file_name}")
+        self.started.append((name, file_name))
+        return {'executionArn': f"{stateMachineArn}:{name}"}
+
+
+@pytest.fixture
+def stepfunctions(monkeypatch, aws_client):
+    monkeypatch.setenv('STEP_FUNCTIONS_ARN', STATE_MACHINE_ARN)
+    # Sem esperas entre as tentativas de iniciar a execução
+    monkeypatch.setattr(pipeline.time, 'sleep', lambda seconds: None)
+
+    def build(failures=None):
+        return aws_client('stepfunctions', FakeStepFunctions(failures))
+    return build
+
+
+def enqueue(queue, *file_names):
+    queue.send_messages([build_message('bucket', file_name) for file_name in file_names])
+
+
+def test_batch_item_failures_lists_only_failed_messages(stepfunctions):
+    client = stepfunctions({'b.jpg': pipeline.START_RETRIES})
+    queue = InMemoryIngestionQueue()
+    enqueue(queue, 'a.jpg', 'b.jpg', 'c.jpg')
+    event = queue.receive_event()
+
+    response = ingestion_consumer.lambda_handler(event, None)
+
+    failed_id = event['Records'][1]['messageId']
+    assert response == {'batchItemFailures': [{'itemIdentifier': failed_id}]}
+    assert [file_name for _, file_name in client.started] == ['a.jpg', 'c.jpg']
+
+
+def test_failed_message_is_redelivered_until_it_succeeds(stepfunctions):
+    # A primeira entrega esgota as tentativas; a segunda inicia a execução
+    client = stepfunctions({'b.jpg': pipeline.START_RETRIES})
+    queue = InMemoryIngestionQueue()
+    enqueue(queue, 'a.jpg', 'b.jpg')
+
+    dead_letters = queue.drain(ingestion_consumer.lambda_handler)
+
+    assert dead_letters == []
+    assert len(queue) == 0
+    assert sorted(file_name for _, file_name in client.started) == ['a.jpg', 'b.jpg']
+    # O nome da execução é o id da mensagem, mantido entre as entregas
+    assert len({name for name, _ in client.started}) == 2
+
+
+def test_message_goes_to_dead_letters_after_max_receives(stepfunctions):
+    stepfunctions({'b.jpg': pipeline.START_RETRIES * 10})
+    queue = InMemoryIngestionQueue()
+    enqueue(queue, 'a.jpg', 'b.jpg')
+    receives = []
+
+    def handler(event, context):
+        receives.extend(record['attributes']['ApproximateReceiveCount']
+                        for record in event['Records']
+                        if json.loads(record['body'])['file_name'] == 'b.jpg')
+        return ingestion_consumer.lambda_handler(event, context)
+
+    dead_letters = queue.drain(handler, max_receives=3)
+
+    assert dead_letters == [build_message('bucket', 'b.jpg')]
+    assert receives == ['1', '2', '3']
+
+
+def test_malformed_message_is_not_redelivered(stepfunctions):
+    client = stepfunctions()
+    queue = InMemoryIngestionQueue()
+    queue.send_messages([{'bucket_name': 'bucket'}])
+    enqueue(queue, 'a.jpg')
+
+    response = ingestion_consumer.lambda_handler(queue.receive_event(), None)
+
+    assert response == {'batchItemFailures': []}
+    assert [file_name for _, file_name in client.started] == ['a.jpg']
+
+
+def test_whole_batch_returns_to_queue_without_state_machine(stepfunctions, monkeypatch):
+    stepfunctions()
+    monkeypatch.delenv('STEP_FUNCTIONS_ARN')
+    queue = InMemoryIngestionQueue()
+    enqueue(queue, 'a.jpg', 'b.jpg')
+    event = queue.receive_event()
+
+    response = ingestion_consumer.lambda_handler(event, None)
+
+    assert [failure['itemIdentifier'] for failure in response['batchItemFailures']] == \
+        [record['messageId'] for record in event['Records']]
@@ -1,3 +1,105 @@
 # tests/test_nlp_lambda.py
-# Testes para a função nlp_lambda
-pass
+# Testes da extração por regras (nlp_utils) sobre o corpus de notas fiscais e
+# da normalização dos campos com a NotaFiscal na Lambda de NLP
+import json
+import os
+
+import pytest
+
+import nlp_lambda
+import nlp_utils
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nlp lambdas',
+                           'NotasFiscaisCorpus.json')
+
+with open(CORPUS_PATH, encoding='utf-8') as corpus_file:
+    CORPUS = json.load(corpus_file)
+
+
+@pytest.fixture
+def no_spacy(monkeypatch):
+    """Falha se o fallback do spaCy for usado."""
+    def extract_entities(lines):
+        raise AssertionError('o spaCy não deveria ser carregado')
+    monkeypatch.setattr(nlp_utils, 'extract_entities', extract_entities)
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=[case['id'] for case in CORPUS])
+def test_rules_extract_every_field_of_the_corpus(case, no_spacy):
+    fields = nlp_utils.extract_nota_fiscal(case['summary'], case['text'])
+
+    assert fields == case['expected']
+
+
+def test_spacy_is_only_a_fallback_for_the_issuer(monkeypatch):
+    calls = []
+
+    def extract_entities(lines):
+        calls.append(lines)
+        return 'EMISSOR PELO NER', 'ENDERECO PELO NER'
+    monkeypatch.setattr(nlp_utils, 'extract_entities', extract_entities)
+    # Nome encontrado pelas regras, endereço não: só o endereço vem do NER
+    lines = ['MERCADINHO DA ESQUINA', 'CNPJ 98.765.432/0001-98', 'VALOR TOTAL R$ 10,00', 'PIX 10,00']
+
+    fields = nlp_utils.extract_nota_fiscal({}, lines)
+
+    assert (fields['nome_emissor'], fields['endereco_emissor']) == \
+        ('MERCADINHO DA ESQUINA', 'ENDERECO PELO NER')
+    assert fields['valor_total'] == 10.0 and fields['forma_pgto'] == 'pix'
+    assert len(calls) == 1
+    assert nlp_utils.extract_nota_fiscal({}, lines, use_spacy=False)['endereco_emissor'] is None
+    assert len(calls) == 1
+
+
+def test_consumer_id_is_not_taken_as_the_issuer(no_spacy):
+    lines = ['LOJA TESTE', 'RUA UM, 1', 'CONSUMIDOR CNPJ: 55.667.788/0001-86', 'TOTAL 5,00']
+
+    fields = nlp_utils.extract_nota_fiscal({}, lines)
+
+    assert fields['CNPJ_emissor'] is None
+    assert fields['CNPJ_CPF_consumidor'] == '55.667.788/0001-86'
+
+
+def test_normalize_formats_the_extracted_fields(no_spacy):
+    case = CORPUS[0]
+
+    nota_fiscal = nlp_lambda.normalize_nota_fiscal(
+        nlp_utils.extract_nota_fiscal(case['summary'], case['text']))
+
+    assert nota_fiscal['CNPJ_emissor'] == '12345678000195'
+    assert nota_fiscal['CNPJ_CPF_consumidor'] == '12345678909'
+    assert nota_fiscal['data_emissao'] == '2024-03-12'
+    assert nota_fiscal['valor_total'] == '40.7'
+    assert nota_fiscal['forma_pgto'] == 'dinheiro'
+
+
+def test_normalize_drops_only_the_invalid_fields():
+    fields = dict(CORPUS[1]['expected'], CNPJ_emissor='123.456', data_emissao='31/02/2024',
+                  valor_total='R$ abc')
+
+    nota_fiscal = nlp_lambda.normalize_nota_fiscal(fields)
+
+    assert nota_fiscal['CNPJ_emissor'] is None
+    assert nota_fiscal['data_emissao'] is None
+    assert nota_fiscal['valor_total'] is None
+    assert nota_fiscal['nome_emissor'] == 'DROGARIA SAUDE E VIDA'
+    assert nota_fiscal['numero_nota_fiscal'] == '4567'
+    assert nota_fiscal['forma_pgto'] == 'cartao_credito'
+
+
+def test_handler_replaces_the_textract_output_with_the_nota_fiscal(no_spacy):
+    case = CORPUS[2]
+    event = {'bucket_name': 'imagens', 'raw_file_name': 'raw/ab/cd/nota.jpg',
+             'textract': {'summary': case['summary'], 'text': case['text'], 'line_items': []}}
+
+    result = nlp_lambda.NlpLambdaHandler(event).handle()
+
+    assert 'textract' not in result
+    assert result['source_key'] == 'raw/ab/cd/nota.jpg'
+    assert result['payment_method'] == case['expected']['forma_pgto']
+    assert result['nota_fiscal']['numero_nota_fiscal'] == case['expected']['numero_nota_fiscal']
+
+
+def test_handler_rejects_an_event_without_textract_output():
+    with pytest.raises(ValueError):
+        nlp_lambda.NlpLambdaHandler({'file_name': 'nota.jpg'}).handle()
@@ -0,0 +1,65 @@
+# tests/test_nota_fiscal_model.py
+# Testes da normalização do valor_total nos formatos brasileiro e americano
+from decimal import Decimal
+
+import pytest
+from pydantic import ValidationError
+
+from nota_fiscal_model import NotaFiscal, _decimal
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1.234,56', '1234.56'),
+    ('R$ 1.234,56', '1234.56'),
+    ('40,70', '40.70'),
+    ('1.234.567', '1234567'),
+    ('1.234.567,89', '1234567.89'),
+    ('0,500', '0.500'),
+    ('-1.234,56', '-1234.56'),
+])
+def test_brazilian_format(text, expected):
+    assert _decimal(text) == Decimal(expected)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1,234.56', '1234.56'),
+    ('40.70', '40.70'),
+    ('1,234,567', '1234567'),
+    ('1,234,567.89', '1234567.89'),
+    ('0.500', '0.500'),
+    ('12.3456', '12.3456'),
+])
+def test_american_format(text, expected):
+    assert _decimal(text) == Decimal(expected)
+
+
+def test_plain_numbers():
+    assert _decimal('1234') == Decimal('1234')
+    assert _decimal(40.7) == Decimal('40.7')
+    assert _decimal(Decimal('5')) == Decimal('5')
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1.234', '1234'),
+    ('R$ 12.500', '12500'),
+    ('1.500', '1500'),
+    ('1,234', '1.234'),
+    ('R$ 0,500', '0.500'),
+    ('12345.678', '12345.678'),
+])
+def test_single_separator_before_three_digits_follows_the_brazilian_format(text, expected):
+    # '.' é separador de milhar e ',' é decimal, como nas notas fiscais
+    assert _decimal(text) == Decimal(expected)
+
+
+@pytest.mark.parametrize('text', ['1.23.4,5', '1,234.5.6', '12,34,567', 'abc', ''])
+def test_invalid_values_are_rejected(text):
+    with pytest.raises(ValueError):
+        _decimal(text)
+
+
+def test_model_normalizes_and_reports_invalid_values():
+    assert NotaFiscal(valor_total='1,234.56').valor_total == Decimal('1234.56')
+    assert NotaFiscal(valor_total='R$ 12.500').valor_total == Decimal('12500')
+    with pytest.raises(ValidationError):
+        NotaFiscal(valor_total='1.23.4')
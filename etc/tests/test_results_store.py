@@ -0,0 +1,72 @@
+# tests/test_results_store.py
+# Testes do índice do armazenamento de resultados sobre o S3 local em memória
+import pytest
+
+from local_s3 import LocalS3
+from results_store import ResultsStore
+
+BUCKET = 'imagens'
+CNPJ_A = '11111111000111'
+CNPJ_B = '22222222000122'
+
+
+class ReadTrackingS3(LocalS3):
+    """S3 local que registra as chaves lidas por get_object."""
+
+    def __init__(self):
+        super().__init__()
+        self.read_keys = []
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.read_keys.append(Key)
+        return super().get_object(Bucket, Key, **kwargs)
+
+
+def result(sha256, cnpj, forma_pgto, numero='1'):
+    return {'sha256': sha256, 'file_name': f"dinheiro/{sha256}.jpg", 'destination_folder': 'dinheiro',
+            'nota_fiscal': {'CNPJ_emissor': cnpj, 'numero_nota_fiscal': numero,
+                            'data_emissao': '2024-03-12', 'forma_pgto': forma_pgto}}
+
+
+@pytest.fixture
+def store():
+    return ResultsStore(BUCKET, client=ReadTrackingS3())
+
+
+def data_reads(store):
+    return [key for key in store.s3.read_keys if '/invoices/' in key]
+
+
+def test_lookup_reads_only_indexed_matches_and_new_files(store):
+    store.append([result('a1', CNPJ_A, 'dinheiro')])
+    store.append([result('a2', CNPJ_A, 'dinheiro')])
+    store.append([result('b1', CNPJ_B, 'pix')])
+    store.append([result('b2', CNPJ_B, 'pix')])
+    compacted = store.compact(force=True)
+    pix_key = compacted[store.partition_prefix('2024-03', 'pix')]['key']
+    new_key, = store.append([result('a3', CNPJ_A, 'dinheiro', numero='2')])
+
+    store.s3.read_keys.clear()
+    rows = store.lookup(cnpj=CNPJ_A)
+
+    assert sorted(row['sha256'] for row in rows) == ['a1', 'a2', 'a3']
+    assert new_key in data_reads(store)
+    assert pix_key not in data_reads(store)
+    assert len(data_reads(store)) == 2
+
+
+def test_compaction_indexes_months_below_the_file_threshold(store):
+    store.append([result('a1', CNPJ_A, 'dinheiro')])
+    pix_key, = store.append([result('b1', CNPJ_B, 'pix')])
+
+    assert store.compact() == {}
+    store.s3.read_keys.clear()
+    rows = store.lookup(cnpj=CNPJ_A)
+
+    assert [row['sha256'] for row in rows] == ['a1']
+    assert pix_key not in data_reads(store)
+
+
+def test_lookup_requires_a_filter(store):
+    with pytest.raises(ValueError):
+        store.lookup()
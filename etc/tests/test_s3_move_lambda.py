@@ -0,0 +1,228 @@
+# tests/test_s3_move_lambda.py
+# Testes da movimentação (s3_move) sobre o S3 local em memória: diário com
+# escritas condicionais, movimentação em massa, cópia em partes e retomada
+import datetime
+import json
+import os
+
+import pytest
+from botocore.exceptions import ClientError
+
+import s3_move
+from content_keys import content_digest, result_key
+from local_s3 import LocalS3
+
+BUCKET = 'imagens'
+
+
+class FailingS3(LocalS3):
+    """S3 local em que as cópias das chaves em `fail_keys` falham com InternalError."""
+
+    def __init__(self):
+        super().__init__()
+        self.fail_keys = set()
+
+    def copy_object(self, CopySource, Bucket, Key, **kwargs):
+        if CopySource['Key'] in self.fail_keys:
+            raise ClientError({'Error': {'Code': 'InternalError', 'Message': 'Falha simulada.'}},
+                              'CopyObject')
+        return super().copy_object(CopySource, Bucket, Key, **kwargs)
+
+
+class ExpiringContext:
+    """Contexto da Lambda sem tempo restante: o job para depois do primeiro lote."""
+
+    @staticmethod
+    def get_remaining_time_in_millis():
+        return 0
+
+
+@pytest.fixture
+def s3(monkeypatch, aws_client):
+    monkeypatch.setenv('SOURCE_BUCKET', BUCKET)
+    return aws_client('s3', FailingS3())
+
+
+def put_invoice(s3, folder, content, payment_method=None):
+    """Grava a nota em <pasta>/<sha256>.jpg e, com a forma de pagamento, o seu marcador."""
+    digest = content_digest(content)
+    key = f"{folder}/{digest}.jpg"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=content)
+    if payment_method:
+        marker = {'status': 'processed', 'sha256': digest, 'file_name': key,
+                  'payment_method': payment_method,
+                  'nota_fiscal': {'CNPJ_emissor': '11111111000111', 'forma_pgto': payment_method}}
+        s3.put_object(Bucket=BUCKET, Key=result_key(digest), Body=json.dumps(marker))
+    return key
+
+
+def put_manifest(s3, keys, name='manifesto.csv'):
+    s3.put_object(Bucket=BUCKET, Key=name, Body='\n'.join(keys))
+    return name
+
+
+def exists(s3, key):
+    return (BUCKET, key) in s3.objects
+
+
+def bulk_mover(s3, job_id='job', batch_size=1000):
+    return s3_move.BulkMover(s3_move.S3Mover(BUCKET, client=s3), job_id,
+                             max_workers=4, batch_size=batch_size)
+
+
+def test_bulk_move_skips_files_already_placed_or_without_marker(s3):
+    to_move = put_invoice(s3, 'outros', b'nota pix', 'pix')
+    placed = put_invoice(s3, 'dinheiro', b'nota dinheiro', 'dinheiro')
+    unknown = put_invoice(s3, 'outros', b'nota sem marcador')
+    manifest = put_manifest(s3, [to_move, placed, unknown])
+
+    state = bulk_mover(s3).run(manifest_key=manifest)
+
+    assert (state['moved'], state['skipped'], state['failed'], state['done']) == (1, 2, 0, True)
+    moved_key = f"dinheiro/{os.path.basename(to_move)}"
+    assert exists(s3, moved_key) and not exists(s3, to_move)
+    assert exists(s3, placed) and exists(s3, unknown)
+    assert s3.calls['CopyObject'] == 1
+
+    marker = json.loads(s3.objects[(BUCKET, result_key(content_digest(b'nota pix')))]['Body'])
+    assert marker['file_name'] == moved_key
+    assert marker['destination_folder'] == 'dinheiro'
+    moved_at = datetime.datetime.fromisoformat(marker['processed_at'])
+    assert datetime.datetime.now(datetime.timezone.utc) - moved_at < datetime.timedelta(minutes=1)
+    assert any(key.startswith('results-store/invoices/') for _, key in s3.objects)
+
+
+def test_bulk_move_rerun_of_the_same_manifest_copies_nothing(s3):
+    manifest = put_manifest(s3, [put_invoice(s3, 'outros', b'nota pix', 'pix')])
+    bulk_mover(s3, 'primeiro').run(manifest_key=manifest)
+    copies = s3.calls['CopyObject']
+
+    state = bulk_mover(s3, 'segundo').run(manifest_key=manifest)
+
+    assert (state['moved'], state['skipped']) == (0, 1)
+    assert s3.calls['CopyObject'] == copies
+
+
+def test_bulk_move_failed_copies_keep_the_source_and_succeed_on_retry(s3):
+    keys = [put_invoice(s3, 'outros', f'nota {i}'.encode(), 'pix') for i in range(4)]
+    s3.fail_keys = {keys[1], keys[3]}
+
+    state = bulk_mover(s3, 'primeiro').run(manifest_key=put_manifest(s3, keys))
+
+    assert (state['moved'], state['failed']) == (2, 2)
+    assert sorted(state['failed_keys']) == sorted(s3.fail_keys)
+    assert all(exists(s3, key) for key in s3.fail_keys)
+
+    # Reprocessa só as falhas, com um manifesto montado a partir do checkpoint
+    s3.fail_keys = set()
+    retry = put_manifest(s3, state['failed_keys'], 'falhas.csv')
+    state = bulk_mover(s3, 'reprocessamento').run(manifest_key=retry)
+
+    assert (state['moved'], state['failed']) == (2, 0)
+    assert not any(exists(s3, key) for key in keys)
+    assert all(exists(s3, f"dinheiro/{os.path.basename(key)}") for key in keys)
+
+
+def test_bulk_move_resumes_from_the_checkpoint(s3):
+    keys = [put_invoice(s3, 'outros', f'nota {i}'.encode(), 'pix') for i in range(5)]
+    manifest = put_manifest(s3, keys)
+
+    state = bulk_mover(s3, batch_size=2).run(manifest_key=manifest, context=ExpiringContext())
+    assert (state['position'], state['moved'], state['done']) == (2, 2, False)
+
+    state = bulk_mover(s3, batch_size=2).run(manifest_key=manifest)
+
+    assert (state['moved'], state['failed'], state['done']) == (5, 0, True)
+    # Os lotes concluídos antes da interrupção não são copiados de novo
+    assert s3.calls['CopyObject'] == 5
+
+
+@pytest.fixture
+def small_parts(monkeypatch):
+    # Partes de 4 KB acima de 8 KB: a cópia em partes sem objetos de centenas de MB
+    monkeypatch.setattr(s3_move, 'MIN_PART_SIZE', 1024)
+    monkeypatch.setattr(s3_move, 'MULTIPART_COPY_PART_SIZE', 4096)
+    monkeypatch.setattr(s3_move, 'MULTIPART_COPY_THRESHOLD', 8192)
+
+
+def test_multipart_copy_assembles_the_parts(s3, small_parts):
+    body = os.urandom(10000)
+    s3.put_object(Bucket=BUCKET, Key='outros/grande.jpg', Body=body,
+                  ContentType='image/jpeg', Metadata={'origem': 'teste'})
+
+    destination_key = s3_move.S3Mover(BUCKET, client=s3).copy_file('outros/grande.jpg', 'dinheiro')
+
+    copied = s3.objects[(BUCKET, destination_key)]
+    assert copied['Body'] == body
+    assert copied['ETag'].endswith('-3"')
+    assert (copied['ContentType'], copied['Metadata']) == ('image/jpeg', {'origem': 'teste'})
+    assert s3.calls['UploadPartCopy'] == 3 and s3.calls['CopyObject'] == 0
+
+
+def test_multipart_copy_aborts_when_a_part_fails(s3, small_parts, monkeypatch):
+    s3.put_object(Bucket=BUCKET, Key='outros/grande.jpg', Body=os.urandom(10000))
+    upload_part_copy = s3.upload_part_copy
+
+    def failing_part(**kwargs):
+        if kwargs['PartNumber'] == 2:
+            raise ClientError({'Error': {'Code': 'SlowDown', 'Message': 'Falha simulada.'}},
+                              'UploadPartCopy')
+        return upload_part_copy(**kwargs)
+    monkeypatch.setattr(s3, 'upload_part_copy', failing_part)
+
+    with pytest.raises(ClientError):
+        s3_move.S3Mover(BUCKET, client=s3).copy_file('outros/grande.jpg', 'dinheiro')
+
+    assert s3.calls['AbortMultipartUpload'] == 1 and not s3.uploads
+    assert not exists(s3, 'dinheiro/grande.jpg') and exists(s3, 'outros/grande.jpg')
+
+
+def move_event(source_key, execution_id='execucao-1'):
+    return {'source_key': source_key, 'payment_method': 'pix', 'execution_id': execution_id}
+
+
+def test_move_retry_after_completion_returns_the_journaled_result(s3):
+    source_key = put_invoice(s3, 'raw', b'nota pix')
+    result = s3_move.MoveLambdaHandler(move_event(source_key)).handle()
+    copies = s3.calls['CopyObject']
+
+    assert s3_move.MoveLambdaHandler(move_event(source_key)).handle() == result
+    assert s3.calls['CopyObject'] == copies
+    assert result['file_name'] == f"dinheiro/{os.path.basename(source_key)}"
+
+
+def test_move_retry_resumes_after_the_copy(s3, monkeypatch):
+    source_key = put_invoice(s3, 'raw', b'nota pix')
+    handler = s3_move.MoveLambdaHandler(move_event(source_key))
+    delete_object = s3.delete_object
+
+    def crash(**kwargs):
+        raise ClientError({'Error': {'Code': 'InternalError', 'Message': 'Falha simulada.'}},
+                          'DeleteObject')
+    monkeypatch.setattr(s3, 'delete_object', crash)
+    with pytest.raises(ClientError):
+        handler.handle()
+    entry, _ = handler.journal.read(handler.journal.entry_key('execucao-1', source_key))
+    assert entry['status'] == 'copied'
+
+    monkeypatch.setattr(s3, 'delete_object', delete_object)
+    result = s3_move.MoveLambdaHandler(move_event(source_key)).handle()
+
+    assert not exists(s3, source_key) and exists(s3, result['file_name'])
+    # A nova tentativa retoma do passo 'copied', sem copiar outra vez
+    assert s3.calls['CopyObject'] == 1
+
+
+def test_concurrent_attempt_does_not_move_the_same_file(s3, monkeypatch):
+    source_key = put_invoice(s3, 'raw', b'nota pix')
+    handler = s3_move.MoveLambdaHandler(move_event(source_key))
+    entry_key = handler.journal.entry_key('execucao-1', source_key)
+    # Outra tentativa criou a entrada depois da leitura desta
+    handler.journal.write(entry_key, {'status': 'started', 'source_key': source_key,
+                                      'destination_key': 'dinheiro/outra.jpg'})
+    monkeypatch.setattr(handler.journal, 'read', lambda key: (None, None))
+
+    with pytest.raises(RuntimeError, match='em andamento'):
+        handler.handle()
+
+    assert exists(s3, source_key) and s3.calls['CopyObject'] == 0
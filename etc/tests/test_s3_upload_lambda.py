@@ -1,3 +1,224 @@
 # tests/test_s3_upload_lambda.py
-# Testes para a função s3_upload_lambda
-pass
+# Testes para a função s3_upload: leitura do multipart sem cópia e rotas de
+# upload, lote e status sobre o S3 local em memória
+import base64
+import json
+
+import pytest
+
+import s3_upload
+from content_keys import content_digest, content_key, result_key
+from local_s3 import LocalS3
+
+BUCKET = 'imagens'
+BOUNDARY = 'XyZ123'
+STATE_MACHINE_ARN = 'arn:aws:states:us-east-1:000000000000:stateMachine:ProcessamentoNotasFiscais'
+BATCH_STATE_MACHINE_ARN = 'arn:aws:states:us-east-1:000000000000:stateMachine:ProcessamentoLotes'
+
+
+def multipart(*parts, boundary=BOUNDARY, preamble=b'', closing=True):
+    """Monta um corpo multipart/form-data: cada parte é (cabeçalhos, conteúdo)."""
+    delimiter = b'--' + boundary.encode()
+    body = preamble
+    for headers, content in parts:
+        body += delimiter + b'\r\n' + b''.join(header + b'\r\n' for header in headers) + b'\r\n' + content + b'\r\n'
+    return body + (delimiter + b'--\r\n' if closing else b'')
+
+
+def file_part(file_name, content, field='file'):
+    return ([f'Content-Disposition: form-data; name="{field}"; filename="{file_name}"'.encode(),
+             b'Content-Type: image/jpeg'], content)
+
+
+def parts_of(body, boundary=BOUNDARY):
+    return [(headers, bytes(content)) for headers, content
+            in s3_upload.iter_multipart_parts(body, boundary.encode())]
+
+
+def test_preamble_before_the_first_boundary_is_ignored():
+    body = multipart(file_part('nota.jpg', b'imagem'), preamble=b'Preambulo do cliente\r\n')
+
+    (headers, content), = parts_of(body)
+
+    assert content == b'imagem'
+    assert 'filename="nota.jpg"' in headers['content-disposition']
+
+
+def test_boundary_like_text_inside_the_content_does_not_split_the_part():
+    content = b'inicio --' + BOUNDARY.encode() + b' meio\r\n--' + BOUNDARY.encode()[:-1] + b' fim'
+
+    (_, parsed), = parts_of(multipart(file_part('nota.jpg', content)))
+
+    assert parsed == content
+
+
+def test_part_without_headers_has_empty_headers():
+    body = multipart(([], b'sem cabecalhos'), file_part('nota.jpg', b'imagem'))
+
+    parts = parts_of(body)
+
+    assert parts[0] == ({}, b'sem cabecalhos')
+    assert parts[1][1] == b'imagem'
+
+
+def test_truncated_body_without_closing_boundary_raises():
+    body = multipart(file_part('nota.jpg', b'imagem'), closing=False)[:-4]
+
+    with pytest.raises(ValueError):
+        parts_of(body)
+
+
+def test_missing_boundary_in_the_body_raises():
+    with pytest.raises(ValueError):
+        parts_of(b'corpo sem delimitadores')
+
+
+def test_quoted_boundary_is_unquoted():
+    content_type = 'multipart/form-data; charset=utf-8; boundary="a b:c"'
+
+    assert s3_upload.get_multipart_boundary(content_type) == b'a b:c'
+    assert s3_upload.get_multipart_boundary('multipart/form-data') is None
+
+    body = multipart(file_part('nota.png', b'png'), boundary='a b:c')
+    file_name, content = s3_upload.find_first_file_part(body, content_type)
+    assert (file_name, bytes(content)) == ('nota.png', b'png')
+
+
+def test_parts_without_filename_are_not_files():
+    body = multipart(([b'Content-Disposition: form-data; name="descricao"'], b'texto'))
+
+    assert s3_upload.find_first_file_part(body, f'multipart/form-data; boundary={BOUNDARY}') is None
+
+
+def test_file_content_is_a_view_over_the_request_body():
+    body = multipart(file_part('nota.jpg', b'0123456789'))
+    _, content = s3_upload.find_first_file_part(body, f'multipart/form-data; boundary={BOUNDARY}')
+
+    assert isinstance(content, memoryview) and content.obj is body
+    reader = s3_upload.MemoryviewReader(content)
+    assert reader.read(4) == b'0123'
+    reader.seek(-2, 2)
+    assert (reader.tell(), reader.read()) == (8, b'89')
+
+
+class FakeStepFunctions:
+    """Step Functions que registra as execuções iniciadas e responde ao describe_execution."""
+
+    def __init__(self):
+        self.started = []
+
+    def start_execution(self, stateMachineArn, input, name=None, **kwargs):
+        arn = f"{stateMachineArn.replace(':stateMachine:', ':execution:')}:{name or len(self.started)}"
+        self.started.append({'executionArn': arn, 'input': json.loads(input)})
+        return {'executionArn': arn}
+
+    def describe_execution(self, executionArn):
+        return {'executionArn': executionArn, 'status': 'SUCCEEDED',
+                'output': json.dumps({'destination_folder': 'dinheiro'})}
+
+
+@pytest.fixture
+def s3(monkeypatch, aws_client):
+    monkeypatch.setenv('SOURCE_BUCKET', BUCKET)
+    monkeypatch.setenv('STEP_FUNCTIONS_ARN', STATE_MACHINE_ARN)
+    monkeypatch.setenv('STEP_FUNCTIONS_BATCH_ARN', BATCH_STATE_MACHINE_ARN)
+    monkeypatch.setattr(s3_upload, 'get_ingestion_queue', lambda: None)
+    return aws_client('s3', LocalS3())
+
+
+@pytest.fixture
+def stepfunctions(aws_client):
+    return aws_client('stepfunctions', FakeStepFunctions())
+
+
+def upload_event(*parts, resource='/api/v1/invoice'):
+    return {'httpMethod': 'POST', 'resource': resource, 'isBase64Encoded': True,
+            'headers': {'content-type': f'multipart/form-data; boundary={BOUNDARY}'},
+            'body': base64.b64encode(multipart(*parts)).decode('ascii')}
+
+
+def status_event(**query):
+    return {'httpMethod': 'GET', 'resource': '/api/v1/invoice/status',
+            'queryStringParameters': query}
+
+
+def test_upload_stores_by_content_and_starts_the_pipeline(s3, stepfunctions):
+    response = s3_upload.lambda_handler(upload_event(file_part('nota.jpg', b'imagem')), None)
+
+    body = json.loads(response['body'])
+    digest = content_digest(b'imagem')
+    assert response['statusCode'] == 202 and body['status'] == 'RUNNING'
+    assert body['raw_file_name'] == content_key(digest, 'nota.jpg')
+    assert s3.objects[(BUCKET, body['raw_file_name'])]['Body'] == b'imagem'
+    assert json.loads(s3.objects[(BUCKET, result_key(digest))]['Body'])['status'] == 'processing'
+    execution, = stepfunctions.started
+    assert execution['input']['raw_file_name'] == body['raw_file_name']
+    assert body['status_url'].startswith(s3_upload.STATUS_PATH)
+
+
+def test_duplicate_upload_is_answered_from_the_results_marker(s3, stepfunctions):
+    event = upload_event(file_part('nota.jpg', b'imagem'))
+    s3_upload.lambda_handler(event, None)
+    digest = content_digest(b'imagem')
+    s3.put_object(Bucket=BUCKET, Key=result_key(digest), Body=json.dumps(
+        {'status': 'processed', 'file_name': 'dinheiro/x.jpg', 'sha256': digest}))
+    puts = s3.calls['PutObject']
+
+    response = s3_upload.lambda_handler(event, None)
+
+    body = json.loads(response['body'])
+    assert response['statusCode'] == 200 and body['duplicate'] is True
+    assert body['result']['status'] == 'processed'
+    assert s3.calls['PutObject'] == puts and len(stepfunctions.started) == 1
+
+
+def test_batch_route_starts_one_execution_for_the_new_files(s3, stepfunctions):
+    event = upload_event(file_part('a.jpg', b'nota a'), file_part('b.png', b'nota b'),
+                         file_part('c.pdf', b'nota c'), resource='/api/v1/invoice/batch')
+
+    response = s3_upload.lambda_handler(event, None)
+
+    body = json.loads(response['body'])
+    assert response['statusCode'] == 202
+    assert [file['status'] for file in body['files']] == ['uploaded', 'uploaded', 'invalid']
+    execution, = stepfunctions.started
+    assert execution['executionArn'].endswith(body['batch_id'])
+    assert [file['raw_file_name'] for file in execution['input']['files']] == \
+        [file['raw_file_name'] for file in body['files'][:2]]
+
+
+def test_batch_route_skips_files_already_received(s3, stepfunctions):
+    s3_upload.lambda_handler(upload_event(file_part('a.jpg', b'nota a')), None)
+
+    response = s3_upload.lambda_handler(upload_event(
+        file_part('a.jpg', b'nota a'), file_part('b.jpg', b'nota b'),
+        resource='/api/v1/invoice/batch'), None)
+
+    body = json.loads(response['body'])
+    assert [file['status'] for file in body['files']] == ['duplicate', 'uploaded']
+    assert len(stepfunctions.started[-1]['input']['files']) == 1
+
+
+def test_upload_without_a_file_part_is_rejected(s3, stepfunctions):
+    event = upload_event(([b'Content-Disposition: form-data; name="descricao"'], b'texto'))
+
+    response = s3_upload.lambda_handler(event, None)
+
+    assert response['statusCode'] == 400 and not stepfunctions.started
+
+
+def test_status_route_by_sha256_and_by_execution(s3, stepfunctions):
+    upload = json.loads(s3_upload.lambda_handler(
+        upload_event(file_part('nota.jpg', b'imagem')), None)['body'])
+
+    by_digest = s3_upload.lambda_handler(status_event(sha256=upload['sha256']), None)
+    assert by_digest['statusCode'] == 200
+    assert json.loads(by_digest['body'])['status'] == 'processing'
+
+    by_execution = s3_upload.lambda_handler(
+        status_event(execution_arn=upload['execution_arn']), None)
+    assert json.loads(by_execution['body'])['status'] == 'SUCCEEDED'
+
+    assert s3_upload.lambda_handler(status_event(sha256='0' * 64), None)['statusCode'] == 404
+    foreign = 'arn:aws:states:us-east-1:999999999999:execution:Outra:1'
+    assert s3_upload.lambda_handler(status_event(execution_arn=foreign), None)['statusCode'] == 400
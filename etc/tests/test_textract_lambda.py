@@ -1,3 +1,214 @@
 # tests/test_textract_lambda.py
-# Testes para a função textract_lambda
-pass
+# Testes do motor do Textract (cota de TPS, retries, paginação e polling), do
+# cache das respostas e da passagem de resultados grandes pelo S3 (claim check)
+import gzip
+import json
+import os
+import time
+from collections import OrderedDict
+
+import pytest
+from botocore.exceptions import ClientError
+
+import claim_check
+import textract_engine
+from local_s3 import LocalS3
+from textract_cache import LocalResponseStore, TextractCache, cache_key
+from textract_engine import TextractEngine, TokenBucket
+
+BUCKET = 'imagens'
+DIGEST = 'ab' * 32
+
+
+def client_error(code, operation='AnalyzeExpense'):
+    return ClientError({'Error': {'Code': code, 'Message': 'Erro simulado.'}}, operation)
+
+
+class StubTextract:
+    """Textract com respostas programadas por operação (exceções são levantadas)."""
+
+    def __init__(self, analyze=(), jobs=None):
+        self.analyze = list(analyze)
+        self.jobs = jobs or {}
+        self.calls = []
+
+    def analyze_expense(self, **kwargs):
+        self.calls.append(('analyze_expense', kwargs))
+        response = self.analyze.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def get_expense_analysis(self, JobId, NextToken=None):
+        self.calls.append(('get_expense_analysis', {'JobId': JobId, 'NextToken': NextToken}))
+        return self.jobs[JobId][NextToken]
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    # Sem espera entre as tentativas: o backoff é sorteado entre 0 e o limite
+    monkeypatch.setattr(textract_engine.random, 'uniform', lambda low, high: 0)
+
+    def build(client, retries=3):
+        return TextractEngine(client, sync_tps=1000, start_tps=1000, get_tps=1000, retries=retries)
+    return build
+
+
+def test_token_bucket_paces_calls_to_the_rate():
+    bucket = TokenBucket(rate=20)
+
+    started = time.monotonic()
+    for _ in range(5):
+        assert bucket.acquire()
+    elapsed = time.monotonic() - started
+
+    # O primeiro token já está disponível; os outros quatro chegam a cada 50 ms
+    assert elapsed >= 4 / 20 - 0.01
+    assert bucket.acquire(timeout=0.01) is False
+
+
+def test_call_retries_throttling_until_it_succeeds(engine):
+    client = StubTextract(analyze=[client_error('ThrottlingException'),
+                                   client_error('ProvisionedThroughputExceededException'),
+                                   {'ExpenseDocuments': []}])
+
+    assert engine(client).analyze_expense(BUCKET, 'nota.jpg') == {'ExpenseDocuments': []}
+    assert len(client.calls) == 3
+
+
+def test_call_does_not_retry_other_errors(engine):
+    client = StubTextract(analyze=[client_error('InvalidS3ObjectException'), {}])
+
+    with pytest.raises(ClientError) as error:
+        engine(client).analyze_expense(BUCKET, 'nota.jpg')
+
+    assert error.value.response['Error']['Code'] == 'InvalidS3ObjectException'
+    assert len(client.calls) == 1
+
+
+def test_call_gives_up_after_the_last_attempt(engine):
+    client = StubTextract(analyze=[client_error('ThrottlingException')] * 3)
+
+    with pytest.raises(ClientError):
+        engine(client, retries=3).analyze_expense(BUCKET, 'nota.jpg')
+    assert len(client.calls) == 3
+
+
+def test_get_expense_analysis_joins_every_page(engine):
+    client = StubTextract(jobs={'job-1': {
+        None: {'JobStatus': 'SUCCEEDED', 'ExpenseDocuments': [{'ExpenseIndex': 1}], 'NextToken': 't2'},
+        't2': {'JobStatus': 'SUCCEEDED', 'ExpenseDocuments': [{'ExpenseIndex': 2}], 'NextToken': 't3'},
+        't3': {'JobStatus': 'SUCCEEDED', 'ExpenseDocuments': [{'ExpenseIndex': 3}]},
+    }})
+
+    response = engine(client).get_expense_analysis('job-1')
+
+    assert [document['ExpenseIndex'] for document in response['ExpenseDocuments']] == [1, 2, 3]
+    assert response['NextToken'] is None
+    assert [call[1]['NextToken'] for call in client.calls] == [None, 't2', 't3']
+
+
+def test_wait_for_jobs_marks_unfinished_jobs_as_timed_out(engine, monkeypatch):
+    monkeypatch.setattr(textract_engine, 'JOB_POLL_INITIAL_DELAY', 0.01)
+    client = StubTextract(jobs={
+        'job-1': {None: {'JobStatus': 'SUCCEEDED', 'ExpenseDocuments': []}},
+        'job-2': {None: {'JobStatus': 'IN_PROGRESS'}},
+        'job-3': {None: {'JobStatus': 'SUCCEEDED', 'ExpenseDocuments': []}},
+    })
+
+    results = engine(client).wait_for_jobs(['job-1', 'job-2', 'job-3'], timeout=0.05)
+
+    assert results['job-1']['JobStatus'] == 'SUCCEEDED'
+    assert results['job-2'] == {'JobStatus': 'TIMED_OUT'}
+    # A consulta para no primeiro job em andamento: o job-3 nunca é consultado
+    assert results['job-3'] == {'JobStatus': 'TIMED_OUT'}
+    assert {call[1]['JobId'] for call in client.calls} == {'job-1', 'job-2'}
+
+
+def test_cache_calls_textract_only_on_a_miss(tmp_path):
+    store = LocalResponseStore(str(tmp_path))
+    key = cache_key(DIGEST, 'expense')
+    calls = []
+
+    def call():
+        calls.append(1)
+        return {'ExpenseDocuments': [{'ExpenseIndex': 1}], 'ResponseMetadata': {'RequestId': 'x'}}
+
+    cache = TextractCache(store)
+    assert cache.get_or_call(key, call)[1] is False
+    assert cache.get_or_call(key, call)[1] is True
+
+    # Um novo container encontra a resposta no armazenamento, sem os metadados da chamada
+    response, cached = TextractCache(store).get_or_call(key, call)
+    assert cached is True and response == {'ExpenseDocuments': [{'ExpenseIndex': 1}]}
+    assert len(calls) == 1
+    assert cache.stats == {'hits': 1, 'misses': 1, 'errors': 0}
+
+
+def test_cache_entries_expire_after_the_ttl(tmp_path):
+    store = LocalResponseStore(str(tmp_path))
+    key = cache_key(DIGEST, 'expense')
+    TextractCache(store, ttl_days=1).put(key, {'ExpenseDocuments': []})
+    path = os.path.join(str(tmp_path), *key.split('/'))
+    written_at = time.time() - 2 * 86400
+    os.utime(path, (written_at, written_at))
+
+    response, cached = TextractCache(store, ttl_days=1).get_or_call(
+        key, lambda: {'ExpenseDocuments': [{'ExpenseIndex': 2}]})
+
+    assert cached is False and response['ExpenseDocuments'] == [{'ExpenseIndex': 2}]
+    assert time.time() - os.path.getmtime(path) < 60
+
+
+def test_local_store_evicts_the_least_recently_used(tmp_path):
+    store = LocalResponseStore(str(tmp_path), max_entries=100)
+    keys = [cache_key(f'{index:02d}' * 32, 'expense') for index in range(12)]
+    now = time.time()
+    for index, key in enumerate(keys):
+        store.put(key, b'conteudo')
+        path = os.path.join(str(tmp_path), *key.split('/'))
+        # Acesso mais antigo para as primeiras chaves
+        os.utime(path, (now - 1000 + index, now))
+
+    store.max_entries = 10
+    removed = store.evict()
+
+    # O excesso (2) mais 10% do limite (1)
+    assert removed == 3
+    assert sorted(store.keys('expense')) == sorted(keys[3:])
+
+
+@pytest.fixture
+def claim_s3(monkeypatch):
+    # Cache do container vazio: as leituras vão ao S3
+    monkeypatch.setattr(claim_check, '_cache', OrderedDict())
+    monkeypatch.setattr(claim_check, '_cache_bytes', 0)
+    return LocalS3()
+
+
+def test_claim_check_keeps_small_values_in_the_state(claim_s3):
+    value = {'summary': {'TOTAL': '10,00'}}
+
+    assert claim_check.put(value, BUCKET, 'exec', 'textract', threshold=1024, client=claim_s3) is value
+    assert not claim_s3.objects
+
+
+def test_claim_check_round_trip_above_the_threshold(claim_s3, monkeypatch):
+    value = {'text': [f'linha {index}' for index in range(200)]}
+    execution_arn = 'arn:aws:states:us-east-1:000000000000:execution:Notas:exec-1'
+
+    reference = claim_check.put(value, BUCKET, execution_arn, 'textract', threshold=256,
+                                client=claim_s3)
+
+    assert claim_check.is_reference(reference)
+    location = reference[claim_check.REFERENCE_FIELD]
+    assert location['key'].startswith(f'{claim_check.CLAIM_CHECK_PREFIX}exec-1/textract-')
+    stored = claim_s3.objects[(BUCKET, location['key'])]['Body']
+    assert json.loads(gzip.decompress(stored)) == value
+    assert location['size'] == len(json.dumps(value, separators=(',', ':')))
+
+    # Outro container: sem cache, o resultado é lido do S3 uma única vez
+    monkeypatch.setattr(claim_check, '_cache', OrderedDict())
+    assert claim_check.get(reference, client=claim_s3) == value
+    assert claim_check.get(reference, client=claim_s3) == value
+    assert claim_s3.calls['GetObject'] == 1
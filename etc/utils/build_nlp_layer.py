@@ -0,0 +1,59 @@
+# utils/build_nlp_layer.py
+# Gera a layer da Lambda de NLP: o spaCy em python/ e o modelo já reduzido
+# (sem os componentes de SPACY_EXCLUDE) e descompactado em models/, que a
+# Lambda encontra em /opt/models/<modelo>. Carregar o diretório evita instalar
+# o pacote do modelo e lê do disco apenas os componentes usados.
+#
+# Uso: python etc/utils/build_nlp_layer.py [--model pt_core_news_sm] [--output nlp_layer.zip]
+# Depois: NLP_LAYER_ZIP=nlp_layer.zip python app/main.py
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+from nlp_utils import SPACY_EXCLUDE
+
+
+def build_layer(model, output, spacy_requirement='spacy==3.7.4'):
+    """
+    Instala o spaCy para o runtime da Lambda e grava o modelo reduzido na layer.
+
+    Retorno:
+        str: Caminho do zip da layer.
+    """
+    import spacy
+
+    build_dir = tempfile.mkdtemp(prefix='nlp_layer_')
+    try:
+        # Dependências compiladas para o ambiente da Lambda (Linux x86_64, Python 3.12)
+        subprocess.run([
+            sys.executable, '-m', 'pip', 'install', spacy_requirement,
+            '--target', os.path.join(build_dir, 'python'),
+            '--platform', 'manylinux2014_x86_64', '--python-version', '3.12',
+            '--only-binary=:all:', '--no-compile', '--quiet'
+        ], check=True)
+
+        nlp = spacy.load(model, exclude=SPACY_EXCLUDE)
+        nlp.to_disk(os.path.join(build_dir, 'models', model))
+        print(f"Modelo {model} gravado com os componentes {nlp.pipe_names}.")
+
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for root, _, files in os.walk(build_dir):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    zipf.write(path, os.path.relpath(path, build_dir))
+        print(f"Layer gerada em {output} ({os.path.getsize(output) / 1e6:.1f} MB).")
+        return output
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera a layer do spaCy para a Lambda de NLP.')
+    parser.add_argument('--model', default='pt_core_news_sm')
+    parser.add_argument('--output', default='nlp_layer.zip')
+    args = parser.parse_args()
+    build_layer(args.model, args.output)
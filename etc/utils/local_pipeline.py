@@ -0,0 +1,348 @@
+# utils/local_pipeline.py
+# Emulador local do pipeline completo (upload -> Textract -> NLP -> movimentação)
+# para medir o processamento sem conta AWS: as Lambdas reais rodam no próprio
+# processo contra substitutos em memória do S3 (LocalS3), do Textract e do
+# Step Functions, registrando a latência e a memória de cada etapa.
+import collections
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+try:
+    import resource
+except ImportError:  # Windows: apenas a memória atual (psutil), sem o pico do processo
+    resource = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for path in (os.path.join(ROOT_DIR, 'etc', 'models'), os.path.join(ROOT_DIR, 'etc', 'utils'),
+             os.path.join(ROOT_DIR, 'app', 'lambdas')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import aws_clients  # noqa: E402
+import nlp_lambda  # noqa: E402
+import s3_move  # noqa: E402
+import s3_upload  # noqa: E402
+import textract_engine  # noqa: E402
+import textract_lambda  # noqa: E402
+from botocore.exceptions import ClientError  # noqa: E402
+from local_s3 import LocalS3  # noqa: E402
+
+CORPUS_PATH = os.path.join(ROOT_DIR, 'etc', 'tests', 'nlp lambdas', 'NotasFiscaisCorpus.json')
+STATE_MACHINE_ARN = 'arn:aws:states:us-east-1:000000000000:stateMachine:ProcessamentoNotasFiscais'
+# Ordem em que as etapas aparecem no relatório
+STAGES = ('upload', 'textract', 'nlp', 'move', 'execution')
+
+
+def current_rss():
+    """Memória residente atual do processo, em bytes (None se não for possível medir)."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def peak_rss():
+    """Pico de memória residente do processo, em bytes (ru_maxrss é em KB no Linux)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(values, p):
+    """Percentil pelo posto mais próximo de uma lista ordenada."""
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
+
+
+class LocalContext:
+    """Contexto de Lambda com o prazo contado a partir da criação."""
+
+    def __init__(self, function_name, timeout=30, memory_limit_in_mb=128):
+        self.function_name = function_name
+        self.memory_limit_in_mb = memory_limit_in_mb
+        self.aws_request_id = uuid.uuid4().hex
+        self.deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+class StageStats:
+    """
+    Latência, erros, memória e tamanho do estado de cada etapa (seguro para várias threads).
+
+    A memória é do processo inteiro: com concorrência, o crescimento do pico
+    é atribuído à etapa em execução quando ele foi observado (exato apenas
+    com uma execução por vez).
+    """
+
+    def __init__(self):
+        self.durations = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self.rss = {}
+        self.peak_growth = collections.Counter()
+        self.payload = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds, error=False, peak_before=None, payload_bytes=None):
+        rss, peak = current_rss(), peak_rss()
+        with self.lock:
+            self.durations[stage].append(seconds)
+            if error:
+                self.errors[stage] += 1
+            if rss is not None:
+                self.rss[stage] = max(self.rss.get(stage, 0), rss)
+            if peak is not None and peak_before is not None:
+                self.peak_growth[stage] += max(0, peak - peak_before)
+            if payload_bytes is not None:
+                self.payload[stage] = max(self.payload.get(stage, 0), payload_bytes)
+
+    def summary(self, elapsed):
+        """
+        Resumo por etapa.
+
+        Args:
+            elapsed (float): Duração total da reprodução, para a vazão.
+
+        Returns:
+            dict: {etapa: {count, errors, p50, p95, p99, mean, throughput,
+            rss_mb, peak_growth_mb, payload_kb}} (tempos em ms).
+        """
+        result = {}
+        for stage in sorted(self.durations, key=lambda name: (
+                STAGES.index(name) if name in STAGES else len(STAGES), name)):
+            values = sorted(self.durations[stage])
+            result[stage] = {
+                'count': len(values),
+                'errors': self.errors[stage],
+                **{f"p{p}": percentile(values, p) * 1000 for p in (50, 95, 99)},
+                'mean': sum(values) / len(values) * 1000,
+                'throughput': len(values) / elapsed if elapsed else None,
+                'rss_mb': self.rss[stage] / 2 ** 20 if stage in self.rss else None,
+                'peak_growth_mb': self.peak_growth[stage] / 2 ** 20 if resource else None,
+                'payload_kb': self.payload[stage] / 1024 if stage in self.payload else None,
+            }
+        return result
+
+
+class LocalTextract:
+    """
+    Textract simulado: o AnalyzeExpense devolve uma nota do corpus de NLP.
+
+    A nota é escolhida pelo hash do conteúdo da imagem (a mesma imagem gera
+    sempre a mesma resposta). line_items acrescenta linhas de itens à
+    resposta para simular notas longas (resumos acima do limite do claim check).
+    """
+
+    def __init__(self, s3, corpus_path=CORPUS_PATH, latency=0.0, line_items=0):
+        with open(corpus_path, encoding='utf-8') as corpus:
+            self.corpus = json.load(corpus)
+        self.s3 = s3
+        self.latency = latency
+        self.line_items = line_items
+        self.calls = collections.Counter()
+        self.lock = threading.Lock()
+
+    def response_for(self, content):
+        entry = self.corpus[int(hashlib.sha256(content).hexdigest(), 16) % len(self.corpus)]
+        fields = [{'Type': {'Text': field_type}, 'ValueDetection': {'Text': str(value)}}
+                  for field_type, value in entry.get('summary', {}).items() if value]
+        items = [{'LineItemExpenseFields': [
+            {'Type': {'Text': 'ITEM'}, 'ValueDetection': {'Text': f"PRODUTO {index:05d} 1 UN"}},
+            {'Type': {'Text': 'PRICE'}, 'ValueDetection': {'Text': f"{index % 100},90"}}]}
+            for index in range(self.line_items)]
+        return {'ExpenseDocuments': [{
+            'SummaryFields': fields,
+            'LineItemGroups': [{'LineItems': items}] if items else [],
+            'Blocks': [{'BlockType': 'LINE', 'Text': line} for line in entry.get('text', [])]
+        }]}
+
+    def analyze_expense(self, Document, **kwargs):
+        with self.lock:
+            self.calls['AnalyzeExpense'] += 1
+        location = Document['S3Object']
+        try:
+            content = self.s3.get_object(Bucket=location['Bucket'], Key=location['Name'])['Body'].read()
+        except ClientError:
+            raise ClientError({'Error': {'Code': 'InvalidS3ObjectException',
+                                         'Message': 'Objeto não encontrado.'}}, 'AnalyzeExpense')
+        if self.latency:
+            time.sleep(self.latency)
+        return self.response_for(content)
+
+
+class LocalStepFunctions:
+    """
+    Step Functions simulado: cada execução percorre as etapas do pipeline em
+    um pool de threads (start_execution) ou na própria chamada (start_sync_execution).
+    """
+
+    def __init__(self, pipeline, max_workers):
+        self.pipeline = pipeline
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='execucao')
+        self.executions = {}
+        self.futures = []
+        self.lock = threading.Lock()
+
+    def _new_execution(self, stateMachineArn, input, name):
+        arn = f"{stateMachineArn.replace(':stateMachine:', ':execution:')}:{name or uuid.uuid4()}"
+        with self.lock:
+            if arn in self.executions:
+                raise ClientError({'Error': {'Code': 'ExecutionAlreadyExists', 'Message': arn}},
+                                  'StartExecution')
+            self.executions[arn] = {'executionArn': arn, 'stateMachineArn': stateMachineArn,
+                                    'status': 'RUNNING', 'input': input,
+                                    'startDate': time.time()}
+        return arn
+
+    def _run(self, arn, started):
+        execution = self.executions[arn]
+        try:
+            output = self.pipeline.run_execution(arn, json.loads(execution['input']))
+            execution.update(status='SUCCEEDED', output=json.dumps(output))
+        except Exception as e:
+            execution.update(status='FAILED', error=type(e).__name__, cause=str(e)[:1000])
+        finally:
+            execution['stopDate'] = time.time()
+            self.pipeline.stats.record('execution', time.perf_counter() - started,
+                                       error=execution['status'] != 'SUCCEEDED')
+        return execution
+
+    def start_execution(self, stateMachineArn, input='{}', name=None, **kwargs):
+        arn = self._new_execution(stateMachineArn, input, name)
+        future = self.executor.submit(self._run, arn, time.perf_counter())
+        with self.lock:
+            self.futures.append(future)
+        return {'executionArn': arn, 'startDate': self.executions[arn]['startDate']}
+
+    def start_sync_execution(self, stateMachineArn, input='{}', name=None, **kwargs):
+        arn = self._new_execution(stateMachineArn, input, name)
+        return dict(self._run(arn, time.perf_counter()))
+
+    def describe_execution(self, executionArn):
+        execution = self.executions.get(executionArn)
+        if execution is None:
+            raise ClientError({'Error': {'Code': 'ExecutionDoesNotExist', 'Message': executionArn}},
+                              'DescribeExecution')
+        return dict(execution)
+
+    def wait(self):
+        """Aguarda todas as execuções iniciadas (inclusive as iniciadas durante a espera)."""
+        while True:
+            with self.lock:
+                pending = [future for future in self.futures if not future.done()]
+            if not pending:
+                return
+            wait(pending)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class LocalPipeline:
+    """
+    Pipeline completo no processo: s3_upload -> textract_lambda -> nlp_lambda -> s3_move.
+
+    Os clientes 's3', 'textract' e 'stepfunctions' do registro de clientes
+    (aws_clients) são substituídos pelos simulados, de modo que as Lambdas
+    rodam sem alteração. As execuções seguem a definição do Step Functions:
+    o ID da execução é acrescentado à entrada do Textract e da movimentação.
+    Como todas as Lambdas dividem o processo, os caches de container (clientes,
+    claim check) valem para todas as etapas: leituras que na AWS aconteceriam
+    em outro container aqui podem vir da memória.
+
+    Args:
+        bucket_name (str): Bucket de origem (SOURCE_BUCKET).
+        s3_latency (float): Segundos por chamada ao S3.
+        textract_latency (float): Segundos por chamada ao AnalyzeExpense.
+        textract_tps (float): Cota de TPS do limitador do motor do Textract.
+        max_executions (int): Execuções do Step Functions em paralelo.
+        line_items (int): Linhas de itens acrescentadas a cada resposta do Textract.
+    """
+
+    def __init__(self, bucket_name='notas-fiscais-local', s3_latency=0.0, textract_latency=0.0,
+                 textract_tps=textract_engine.TEXTRACT_SYNC_TPS, max_executions=8, line_items=0):
+        self.bucket_name = bucket_name
+        os.environ['SOURCE_BUCKET'] = bucket_name
+        os.environ['STEP_FUNCTIONS_ARN'] = STATE_MACHINE_ARN
+        self.stats = StageStats()
+        self.s3 = LocalS3(latency=s3_latency)
+        self.textract = LocalTextract(self.s3, latency=textract_latency, line_items=line_items)
+        self.stepfunctions = LocalStepFunctions(self, max_executions)
+        aws_clients._clients.update({
+            ('s3', ()): self.s3,
+            ('textract', ()): self.textract,
+            ('stepfunctions', ()): self.stepfunctions,
+        })
+        # Motor novo: os limitadores de TPS do container não são herdados de outra execução
+        textract_engine._engine = textract_engine.TextractEngine(
+            client=self.textract, sync_tps=textract_tps)
+
+    def invoke(self, stage, handler, event, function_name=None):
+        """Chama o handler de uma Lambda registrando a latência, a memória e o estado devolvido."""
+        peak_before = peak_rss()
+        start = time.perf_counter()
+        try:
+            result = handler(event, LocalContext(function_name or stage))
+        except Exception:
+            self.stats.record(stage, time.perf_counter() - start, error=True, peak_before=peak_before)
+            raise
+        payload = len(json.dumps(result, default=str).encode('utf-8'))
+        self.stats.record(stage, time.perf_counter() - start, peak_before=peak_before,
+                          payload_bytes=payload)
+        return result
+
+    def run_execution(self, execution_arn, state):
+        """Percorre a máquina de estados padrão (TextractLambda -> NLPLambda -> MoveLambda)."""
+        state = self.invoke('textract', textract_lambda.lambda_handler,
+                            {**state, 'execution_id': execution_arn}, 'textract_lambda')
+        state = self.invoke('nlp', nlp_lambda.lambda_handler, state, 'nlp_lambda')
+        return self.invoke('move', s3_move.lambda_handler,
+                           {**state, 'execution_id': execution_arn}, 's3_move')
+
+    def upload(self, event):
+        """Requisição da API ao s3_upload; erros de validação (4xx) contam como erro da etapa."""
+        peak_before = peak_rss()
+        start = time.perf_counter()
+        response = s3_upload.lambda_handler(event, LocalContext('s3_upload_lambda'))
+        self.stats.record('upload', time.perf_counter() - start,
+                          error=response.get('statusCode', 500) >= 400, peak_before=peak_before)
+        return response
+
+    def replay(self, events, concurrency=8):
+        """
+        Envia os eventos à API com `concurrency` requisições simultâneas e
+        aguarda o fim de todas as execuções iniciadas.
+
+        Returns:
+            tuple: (respostas do upload na ordem dos eventos, segundos decorridos).
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='api') as executor:
+            responses = list(executor.map(self.upload, events))
+        self.stepfunctions.wait()
+        return responses, time.perf_counter() - start
+
+    def execution_statuses(self):
+        return collections.Counter(execution['status']
+                                   for execution in self.stepfunctions.executions.values())
+
+    def close(self):
+        self.stepfunctions.shutdown()
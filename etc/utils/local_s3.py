@@ -0,0 +1,243 @@
+# utils/local_s3.py
+# S3 local em memória para testes e benchmarks sem conta AWS: implementa o
+# subconjunto da API do cliente boto3 usado pelas Lambdas (put/get/head/copy/
+# delete, delete_objects, cópia em partes e listagem paginada) com latência
+# opcional por chamada.
+import collections
+import datetime
+import hashlib
+import io
+import threading
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+
+# Máximo de chaves por página da listagem, como no S3
+LIST_PAGE_SIZE = 1000
+
+
+def _error(code, message, operation):
+    return {'Error': {'Code': code, 'Message': message}}, operation
+
+
+class NoSuchKey(ClientError):
+    def __init__(self, key, operation='GetObject'):
+        super().__init__(*_error('NoSuchKey', f'A chave {key} não existe.', operation))
+
+
+class LocalS3:
+    """
+    Cliente S3 em memória, seguro para uso por várias threads.
+
+    Parâmetros:
+        latency (float): Segundos de espera por chamada (simula a ida e volta à API).
+        bandwidth (float): Bytes por segundo de cada cópia no servidor (copy_object e
+            upload_part_copy); None copia sem espera proporcional ao tamanho.
+    """
+
+    class exceptions:
+        NoSuchKey = NoSuchKey
+        ClientError = ClientError
+
+    def __init__(self, latency=0.0, bandwidth=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.objects = {}
+        self.uploads = {}
+        self.calls = collections.Counter()
+        self.lock = threading.Lock()
+
+    def _call(self, operation, size=0):
+        with self.lock:
+            self.calls[operation] += 1
+        delay = self.latency + (size / self.bandwidth if self.bandwidth and size else 0.0)
+        if delay:
+            time.sleep(delay)
+
+    @staticmethod
+    def _source(item, kwargs, operation):
+        # Cópias condicionadas ao ETag da origem (CopySourceIfMatch)
+        expected = kwargs.get('CopySourceIfMatch')
+        if expected and expected != item['ETag']:
+            raise ClientError(*_error('PreconditionFailed', 'ETag da origem mudou.', operation))
+
+    def _get(self, bucket, key, operation):
+        with self.lock:
+            item = self.objects.get((bucket, key))
+        if item is None:
+            raise NoSuchKey(key, operation)
+        return item
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        self._call('PutObject')
+        # Corpos em arquivo (ex: MemoryviewReader do s3_upload) são lidos como no boto3
+        body = Body.read() if hasattr(Body, 'read') else Body
+        body = body.encode('utf-8') if isinstance(body, str) else bytes(body)
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self.lock:
+            # Escritas condicionais: If-None-Match='*' cria apenas, If-Match exige o ETag atual
+            current = self.objects.get((Bucket, Key))
+            if (kwargs.get('IfNoneMatch') == '*' and current is not None) or \
+                    (kwargs.get('IfMatch') and (current is None or current['ETag'] != kwargs['IfMatch'])):
+                raise ClientError(*_error('PreconditionFailed', 'Condição não atendida.', 'PutObject'))
+            self.objects[(Bucket, Key)] = {
+                'Body': body, 'ETag': etag, 'Metadata': kwargs.get('Metadata', {}),
+                'ContentType': kwargs.get('ContentType', 'binary/octet-stream'),
+                'LastModified': datetime.datetime.now(datetime.timezone.utc)}
+        return {'ETag': etag}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._call('GetObject')
+        item = self._get(Bucket, Key, 'GetObject')
+        return {'Body': io.BytesIO(item['Body']), 'ContentLength': len(item['Body']),
+                'ETag': item['ETag'], 'ContentType': item['ContentType'],
+                'Metadata': item['Metadata'], 'LastModified': item['LastModified']}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._call('HeadObject')
+        item = self._get(Bucket, Key, 'HeadObject')
+        return {'ContentLength': len(item['Body']), 'ETag': item['ETag'],
+                'ContentType': item['ContentType'], 'Metadata': item['Metadata'],
+                'LastModified': item['LastModified']}
+
+    def copy_object(self, CopySource, Bucket, Key, **kwargs):
+        item = self._get(CopySource['Bucket'], CopySource['Key'], 'CopyObject')
+        if len(item['Body']) > 5 * 1024 ** 3:
+            raise ClientError(*_error('InvalidRequest', 'Origem maior que 5 GB.', 'CopyObject'))
+        self._source(item, kwargs, 'CopyObject')
+        self._call('CopyObject', len(item['Body']))
+        # A cópia é gravada em uma única parte: o ETag volta a ser o MD5 do conteúdo
+        etag = f'"{hashlib.md5(item["Body"]).hexdigest()}"'
+        with self.lock:
+            self.objects[(Bucket, Key)] = {**item, 'ETag': etag, 'LastModified': datetime.datetime.now(
+                datetime.timezone.utc)}
+        return {'CopyObjectResult': {'ETag': etag}}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._call('CreateMultipartUpload')
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self.uploads[upload_id] = {'Bucket': Bucket, 'Key': Key, 'Parts': {},
+                                       'Metadata': kwargs.get('Metadata', {}),
+                                       'ContentType': kwargs.get('ContentType',
+                                                                 'binary/octet-stream')}
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def upload_part_copy(self, Bucket, Key, UploadId, PartNumber, CopySource,
+                         CopySourceRange=None, **kwargs):
+        item = self._get(CopySource['Bucket'], CopySource['Key'], 'UploadPartCopy')
+        self._source(item, kwargs, 'UploadPartCopy')
+        body = item['Body']
+        if CopySourceRange:
+            first, last = map(int, CopySourceRange.split('=', 1)[1].split('-'))
+            body = body[first:last + 1]
+        self._call('UploadPartCopy', len(body))
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self.lock:
+            upload = self.uploads.get(UploadId)
+            if upload is None:
+                raise ClientError(*_error('NoSuchUpload', UploadId, 'UploadPartCopy'))
+            upload['Parts'][PartNumber] = (body, etag)
+        return {'CopyPartResult': {'ETag': etag}}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self._call('CompleteMultipartUpload')
+        with self.lock:
+            upload = self.uploads.pop(UploadId, None)
+        if upload is None:
+            raise ClientError(*_error('NoSuchUpload', UploadId, 'CompleteMultipartUpload'))
+        parts = [upload['Parts'][part['PartNumber']] for part in MultipartUpload['Parts']]
+        if any(etag != part['ETag'] for (_, etag), part in zip(parts, MultipartUpload['Parts'])):
+            raise ClientError(*_error('InvalidPart', 'ETag da parte não confere.',
+                                      'CompleteMultipartUpload'))
+        digests = b''.join(bytes.fromhex(etag.strip('"')) for _, etag in parts)
+        etag = f'"{hashlib.md5(digests).hexdigest()}-{len(parts)}"'
+        with self.lock:
+            self.objects[(Bucket, Key)] = {
+                'Body': b''.join(body for body, _ in parts), 'ETag': etag,
+                'Metadata': upload['Metadata'], 'ContentType': upload['ContentType'],
+                'LastModified': datetime.datetime.now(datetime.timezone.utc)}
+        return {'Bucket': Bucket, 'Key': Key, 'ETag': etag}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self._call('AbortMultipartUpload')
+        with self.lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._call('DeleteObject')
+        with self.lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self._call('DeleteObjects')
+        if len(Delete['Objects']) > 1000:
+            raise ClientError(*_error('MalformedXML', 'Mais de 1000 chaves.', 'DeleteObjects'))
+        with self.lock:
+            for item in Delete['Objects']:
+                self.objects.pop((Bucket, item['Key']), None)
+        deleted = [] if Delete.get('Quiet') else [{'Key': item['Key']} for item in Delete['Objects']]
+        return {'Deleted': deleted}
+
+    def list_objects_v2(self, Bucket, Prefix='', StartAfter='', ContinuationToken=None,
+                        MaxKeys=LIST_PAGE_SIZE, Delimiter=None, **kwargs):
+        self._call('ListObjectsV2')
+        with self.lock:
+            keys = sorted(key for bucket, key in self.objects
+                          if bucket == Bucket and key.startswith(Prefix))
+        after = ContinuationToken or StartAfter
+        keys = [key for key in keys if key > after] if after else keys
+
+        contents, prefixes = [], []
+        last, truncated = None, False
+        for key in keys:
+            common = None
+            if Delimiter and Delimiter in key[len(Prefix):]:
+                common = Prefix + key[len(Prefix):].split(Delimiter, 1)[0] + Delimiter
+                if prefixes and prefixes[-1] == common:
+                    # As chaves do mesmo prefixo comum são consecutivas na ordem
+                    last = key
+                    continue
+            if len(contents) + len(prefixes) >= MaxKeys:
+                truncated = True
+                break
+            if common:
+                prefixes.append(common)
+            else:
+                item = self.objects.get((Bucket, key))
+                if item is None:
+                    # Excluída por outra thread depois da cópia da lista
+                    continue
+                contents.append({'Key': key, 'Size': len(item['Body']), 'ETag': item['ETag'],
+                                 'LastModified': item['LastModified']})
+            last = key
+
+        response = {'Contents': contents, 'KeyCount': len(contents) + len(prefixes),
+                    'IsTruncated': truncated}
+        if prefixes:
+            response['CommonPrefixes'] = [{'Prefix': prefix} for prefix in prefixes]
+        if truncated:
+            response['NextContinuationToken'] = last
+        return response
+
+    def get_paginator(self, operation_name):
+        if operation_name != 'list_objects_v2':
+            raise NotImplementedError(operation_name)
+        return _ListPaginator(self)
+
+
+class _ListPaginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            response = self.client.list_objects_v2(ContinuationToken=token, **kwargs)
+            yield response
+            if not response['IsTruncated']:
+                return
+            token = response['NextContinuationToken']
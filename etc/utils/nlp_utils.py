@@ -1,3 +1,364 @@
 # utils/nlp_utils.py
-# Pode conter funções auxiliares para processamento de linguagem natural
-pass
+# Extração dos campos da NotaFiscal a partir da saída do Textract: regras e
+# validadores primeiro; o spaCy só é carregado para nome e endereço do emissor
+# quando as regras não encontram esses campos.
+import os
+import re
+import threading
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Modelo do spaCy usado no fallback de nome/endereço do emissor: nome do pacote ou
+# diretório do modelo já descompactado (layer em /opt ou imagem do container); vazio desativa
+SPACY_MODEL = os.environ.get('SPACY_MODEL', 'pt_core_news_sm')
+# Componentes do pipeline que não são carregados: só o NER é usado no fallback
+SPACY_EXCLUDE = [name for name in os.environ.get(
+    'SPACY_EXCLUDE', 'parser,lemmatizer,attribute_ruler,morphologizer,senter').split(',') if name]
+# Linhas do cabeçalho (topo do cupom) analisadas para nome e endereço do emissor
+HEADER_LINES = 8
+
+NOTA_FISCAL_FIELDS = ('nome_emissor', 'CNPJ_emissor', 'endereco_emissor', 'CNPJ_CPF_consumidor',
+                      'data_emissao', 'numero_nota_fiscal', 'serie_nota_fiscal', 'valor_total',
+                      'forma_pgto')
+
+# Expressões compiladas uma única vez por processo (container). As que percorrem
+# o texto inteiro são aplicadas ao texto já em maiúsculas, sem IGNORECASE, e as
+# de linha usam MULTILINE para encontrar a linha em uma única busca.
+CNPJ_PATTERN = re.compile(r'(?<!\d)(\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2})(?!\d)')
+CPF_PATTERN = re.compile(r'(?<!\d)(\d{3}\.?\d{3}\.?\d{3}-?\d{2})(?!\d)')
+DATE_PATTERN = re.compile(r'(?<!\d)(\d{2})[/.-](\d{2})[/.-](\d{4}|\d{2})(?!\d)')
+# Chave de acesso da NF-e/NFC-e: 44 dígitos, em blocos de 4 ou corridos
+ACCESS_KEY_PATTERN = re.compile(r'(?<!\d)(\d{4}(?: ?\d{4}){10})(?!\d)')
+NUMBER_PATTERN = re.compile(
+    r'(?:NFC-?E|NF-?E|\bNF\b|NOTA FISCAL|EXTRATO|CUPOM)[^\d\n]{0,20}?'
+    r'(?:N[º°O.]*|NUM(?:ERO)?\.?|NÚMERO)\s*:?\s*(\d{1,9})')
+SERIES_PATTERN = re.compile(r'S[ÉE]RIE\s*:?\s*(\d{1,3})')
+MONEY_PATTERN = re.compile(r'(?<![\d,.])(\d{1,3}(?:\.\d{3})*,\d{2}|\d+[.,]\d{2})(?![\d,])')
+TOTAL_LINE_PATTERN = re.compile(
+    r'^.*(?:VALOR\s+TOTAL|VALOR\s+A\s+PAGAR|TOTAL\s+(?:R\$|A\s+PAGAR|GERAL)|^\s*TOTAL\b).*$',
+    re.MULTILINE)
+CONSUMER_LINE_PATTERN = re.compile(r'^.*(?:CONSUMIDOR|\bCPF\b|DESTINAT[ÁA]RIO).*$', re.MULTILINE)
+ISSUER_LINE_PATTERN = re.compile(r'^.*\bCNPJ\b.*$', re.MULTILINE)
+ADDRESS_PATTERN = re.compile(
+    r'\b(?:RUA|R\.|AV\.?|AVENIDA|ROD\.?|RODOVIA|ESTRADA|EST\.|PRA[ÇC]A|ALAMEDA|AL\.|'
+    r'TRAVESSA|TV\.|LARGO|QUADRA|QD\.?)\s|\bCEP\b|\d{5}-\d{3}', re.IGNORECASE)
+# Linhas do cabeçalho que não são nome nem endereço do emissor
+HEADER_NOISE_PATTERN = re.compile(
+    r'CNPJ|\bIE\b|INSCRI[ÇC][ÃA]O|DOCUMENTO AUXILIAR|NFC-?E|NF-?E|CUPOM|EXTRATO|'
+    r'CONSUMIDOR|TEL\.?|FONE|\d{2}/\d{2}/\d{4}', re.IGNORECASE)
+
+# Formas de pagamento, na ordem de prioridade (as mais específicas primeiro).
+# As palavras-chave são buscadas com 'in' (bem mais rápido que a expressão) e
+# a expressão só confirma a forma encontrada (ex: PIX como palavra inteira).
+PAYMENT_PATTERNS = (
+    ('pix', ('PIX',), re.compile(r'\bPIX\b')),
+    ('cartao_credito', ('CRÉDITO', 'CREDITO'), re.compile(r'CR[ÉE]DITO')),
+    ('cartao_debito', ('DÉBITO', 'DEBITO'), re.compile(r'D[ÉE]BITO')),
+    ('vale', ('VALE', 'VOUCHER', 'ALIMENTA', 'REFEI'),
+     re.compile(r'\bVALE\b|VOUCHER|ALIMENTA[ÇC][ÃA]O|REFEI[ÇC][ÃA]O')),
+    ('dinheiro', ('DINHEIRO', 'ESPÉCIE', 'ESPECIE'), re.compile(r'DINHEIRO|ESP[ÉE]CIE')),
+)
+
+# Tipos de campo do AnalyzeExpense (e chaves de formulário) usados como primeira fonte
+KEY_ALIASES = {
+    'nome_emissor': ('VENDOR_NAME', 'NAME'),
+    'endereco_emissor': ('VENDOR_ADDRESS', 'ADDRESS', 'ENDEREÇO'),
+    'CNPJ_emissor': ('VENDOR_GST_NUMBER', 'TAX_PAYER_ID', 'CNPJ'),
+    'data_emissao': ('INVOICE_RECEIPT_DATE', 'DATA', 'DATA DE EMISSÃO', 'EMISSÃO'),
+    'numero_nota_fiscal': ('INVOICE_RECEIPT_ID', 'NÚMERO', 'NUMERO'),
+    'valor_total': ('TOTAL', 'AMOUNT_PAID', 'VALOR TOTAL', 'VALOR A PAGAR'),
+    'forma_pgto': ('PAYMENT_TERMS', 'FORMA DE PAGAMENTO'),
+}
+
+
+def only_digits(text):
+    return ''.join(char for char in text if char.isdigit())
+
+
+def is_valid_cnpj(value):
+    """Valida os dígitos verificadores de um CNPJ (com ou sem máscara)."""
+    digits = only_digits(value)
+    if len(digits) != 14 or digits == digits[0] * 14:
+        return False
+    for size in (12, 13):
+        weights = list(range(size - 7, 1, -1)) + list(range(9, 1, -1))
+        total = sum(int(digit) * weight for digit, weight in zip(digits[:size], weights))
+        check = 11 - total % 11
+        if (0 if check >= 10 else check) != int(digits[size]):
+            return False
+    return True
+
+
+def is_valid_cpf(value):
+    """Valida os dígitos verificadores de um CPF (com ou sem máscara)."""
+    digits = only_digits(value)
+    if len(digits) != 11 or digits == digits[0] * 11:
+        return False
+    for size in (9, 10):
+        total = sum(int(digit) * weight
+                    for digit, weight in zip(digits[:size], range(size + 1, 1, -1)))
+        check = total * 10 % 11
+        if (0 if check == 10 else check) != int(digits[size]):
+            return False
+    return True
+
+
+def format_cnpj(value):
+    digits = only_digits(value)
+    return f"{digits[:2]}.{digits[2:5]}.{digits[5:8]}/{digits[8:12]}-{digits[12:]}"
+
+
+def format_cpf(value):
+    digits = only_digits(value)
+    return f"{digits[:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:]}"
+
+
+def parse_money(text):
+    """Converte um valor em reais ('1.234,56', '12.50') para float, ou None."""
+    match = MONEY_PATTERN.search(text or '')
+    if not match:
+        return None
+    value = match.group(1)
+    if ',' in value:
+        value = value.replace('.', '').replace(',', '.')
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_date(text):
+    """Primeira data válida do texto, no formato dd/mm/aaaa, ou None."""
+    for day, month, year in DATE_PATTERN.findall(text or ''):
+        if len(year) == 2:
+            year = f"20{year}"
+        try:
+            return datetime(int(year), int(month), int(day)).strftime('%d/%m/%Y')
+        except ValueError:
+            continue
+    return None
+
+
+def parse_access_key(text):
+    """
+    Decodifica a chave de acesso (44 dígitos) da NF-e/NFC-e.
+
+    A chave contém UF, ano/mês, CNPJ do emissor, modelo, série e número da
+    nota; só é aceita se o dígito verificador (módulo 11) conferir.
+
+    Retorno:
+        dict: {'CNPJ_emissor', 'serie_nota_fiscal', 'numero_nota_fiscal'} ou None.
+    """
+    for match in ACCESS_KEY_PATTERN.finditer(text or ''):
+        key = only_digits(match.group(1))
+        weights = [2, 3, 4, 5, 6, 7, 8, 9] * 6
+        total = sum(int(digit) * weight for digit, weight in zip(reversed(key[:43]), weights))
+        check = 11 - total % 11
+        if (0 if check >= 10 else check) != int(key[43]):
+            continue
+        return {
+            'CNPJ_emissor': format_cnpj(key[6:20]) if is_valid_cnpj(key[6:20]) else None,
+            'serie_nota_fiscal': str(int(key[22:25])),
+            'numero_nota_fiscal': str(int(key[25:34])),
+        }
+    return None
+
+
+def find_tax_ids(text):
+    """CNPJs e CPFs válidos do texto, na ordem em que aparecem, já formatados."""
+    found = []
+    for match in CNPJ_PATTERN.finditer(text):
+        if is_valid_cnpj(match.group(1)):
+            found.append((match.start(), format_cnpj(match.group(1))))
+    for match in CPF_PATTERN.finditer(text):
+        if is_valid_cpf(match.group(1)):
+            found.append((match.start(), format_cpf(match.group(1))))
+    return [value for _, value in sorted(found)]
+
+
+def detect_payment(text):
+    """Forma de pagamento normalizada ('dinheiro', 'pix', 'cartao_credito', ...), ou None."""
+    text = (text or '').upper()
+    for name, keywords, pattern in PAYMENT_PATTERNS:
+        if any(keyword in text for keyword in keywords) and pattern.search(text):
+            return name
+    return None
+
+
+def normalize_keys(key_values):
+    """Chaves em maiúsculas, para comparar com KEY_ALIASES."""
+    return {key.strip().upper(): value for key, value in (key_values or {}).items()
+            if key and value}
+
+
+def lookup(key_values, field):
+    """Valor do primeiro tipo/chave conhecido para o campo, ou None."""
+    for alias in KEY_ALIASES.get(field, ()):
+        value = key_values.get(alias)
+        if value:
+            return value.strip()
+    return None
+
+
+def extract_header(lines):
+    """
+    Nome e endereço do emissor pelas regras do cabeçalho do cupom.
+
+    O nome é a primeira linha do topo que não é CNPJ, IE, título do documento
+    ou endereço; o endereço são as linhas com logradouro ou CEP.
+    """
+    name, address = None, []
+    for line in lines[:HEADER_LINES]:
+        if ADDRESS_PATTERN.search(line):
+            address.append(line.strip())
+        elif address:
+            # O endereço terminou (ex: linha do CNPJ ou do título)
+            break
+        elif name is None and not HEADER_NOISE_PATTERN.search(line) \
+                and sum(char.isalpha() for char in line) >= 3:
+            name = line.strip()
+    return name, (', '.join(address) or None)
+
+
+_nlp = None
+_nlp_lock = threading.Lock()
+_nlp_failed = False
+# Tempo do último carregamento do modelo (segundos), registrado nas métricas da Lambda
+nlp_load_seconds = None
+
+
+def load_nlp():
+    """
+    Carrega o modelo do spaCy uma única vez por processo (ou None se indisponível).
+
+    Os componentes em SPACY_EXCLUDE nem são lidos do disco, o que reduz o
+    tempo de carregamento e a memória; o NER continua disponível.
+    """
+    global _nlp, _nlp_failed, nlp_load_seconds
+    if _nlp is None and not _nlp_failed and SPACY_MODEL:
+        with _nlp_lock:
+            if _nlp is None and not _nlp_failed:
+                start = time.perf_counter()
+                try:
+                    import spacy
+                    _nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+                    # Só o carregamento bem-sucedido entra na métrica ModelLoadDuration
+                    nlp_load_seconds = time.perf_counter() - start
+                except (ImportError, OSError) as e:
+                    logger.warning(f"spaCy indisponível ({SPACY_MODEL}): {e}")
+                    _nlp_failed = True
+    return _nlp
+
+
+def get_nlp():
+    """
+    Retorna o modelo do spaCy, carregando-o na primeira chamada.
+
+    O import e o carregamento do modelo levam segundos e centenas de MB;
+    por isso só acontecem quando as regras não preenchem nome ou endereço.
+    """
+    return _nlp if _nlp is not None else load_nlp()
+
+
+def extract_entities(lines):
+    """Nome (ORG) e endereço (LOC) do emissor reconhecidos pelo spaCy no cabeçalho."""
+    nlp = get_nlp()
+    if nlp is None:
+        return None, None
+    doc = nlp('\n'.join(lines[:HEADER_LINES]))
+    name = next((entity.text for entity in doc.ents if entity.label_ == 'ORG'), None)
+    address = next((entity.text for entity in doc.ents if entity.label_ == 'LOC'), None)
+    return name, address
+
+
+def extract_nota_fiscal(key_values=None, lines=None, use_spacy=True):
+    """
+    Extrai os campos da NotaFiscal da saída do Textract.
+
+    Os pares chave-valor (SummaryFields do AnalyzeExpense ou FORMS do
+    AnalyzeDocument) têm precedência; as linhas de texto completam os campos
+    com expressões regulares e validadores (CNPJ/CPF, datas, chave de acesso).
+    O spaCy é usado apenas para nome e endereço do emissor, e só se as regras
+    não os encontrarem.
+
+    Parâmetros:
+        key_values (dict): {tipo ou chave: texto}.
+        lines (list): Linhas de texto na ordem de leitura.
+        use_spacy (bool): Permite o fallback com o spaCy.
+
+    Retorno:
+        dict: Campos da NotaFiscal (None quando não encontrados).
+    """
+    key_values = normalize_keys(key_values)
+    lines = [line for line in (lines or []) if line and line.strip()]
+    text = '\n'.join(lines)
+    upper = text.upper()
+    fields = dict.fromkeys(NOTA_FISCAL_FIELDS)
+
+    access_key = parse_access_key(text) or {}
+
+    # CNPJ do emissor: campo do Textract, chave de acesso ou primeiro CNPJ fora das linhas do consumidor
+    issuer_ids = [value for value in find_tax_ids(lookup(key_values, 'CNPJ_emissor') or '')
+                  if len(value) == 18]
+    fields['CNPJ_emissor'] = issuer_ids[0] if issuer_ids else access_key.get('CNPJ_emissor')
+    consumer_lines = CONSUMER_LINE_PATTERN.findall(upper)
+    if fields['CNPJ_emissor'] is None:
+        for line in ISSUER_LINE_PATTERN.findall(upper):
+            ids = [value for value in find_tax_ids(line) if len(value) == 18]
+            if ids and line not in consumer_lines:
+                fields['CNPJ_emissor'] = ids[0]
+                break
+
+    # Consumidor: CPF/CNPJ válido nas linhas do consumidor, diferente do emissor
+    for line in consumer_lines:
+        ids = [value for value in find_tax_ids(line) if value != fields['CNPJ_emissor']]
+        if ids:
+            fields['CNPJ_CPF_consumidor'] = ids[0]
+            break
+
+    fields['data_emissao'] = parse_date(lookup(key_values, 'data_emissao')) or parse_date(text)
+
+    # Número e série: campo do Textract, chave de acesso e, por último, o texto
+    number = only_digits(lookup(key_values, 'numero_nota_fiscal') or '')
+    fields['numero_nota_fiscal'] = str(int(number)) if number else \
+        access_key.get('numero_nota_fiscal')
+    if fields['numero_nota_fiscal'] is None:
+        match = NUMBER_PATTERN.search(upper)
+        fields['numero_nota_fiscal'] = str(int(match.group(1))) if match else None
+    fields['serie_nota_fiscal'] = access_key.get('serie_nota_fiscal')
+    if fields['serie_nota_fiscal'] is None:
+        match = SERIES_PATTERN.search(upper)
+        fields['serie_nota_fiscal'] = str(int(match.group(1))) if match else None
+
+    fields['valor_total'] = parse_money(lookup(key_values, 'valor_total'))
+    if fields['valor_total'] is None:
+        for match in TOTAL_LINE_PATTERN.finditer(upper):
+            # O valor pode estar na mesma linha ou na seguinte
+            next_line = upper[match.end() + 1:].split('\n', 1)[0]
+            fields['valor_total'] = parse_money(match.group(0)) or parse_money(next_line)
+            if fields['valor_total'] is not None:
+                break
+
+    fields['forma_pgto'] = detect_payment(lookup(key_values, 'forma_pgto')) or detect_payment(upper)
+
+    name, address = extract_header(lines)
+    fields['nome_emissor'] = lookup(key_values, 'nome_emissor') or name
+    fields['endereco_emissor'] = lookup(key_values, 'endereco_emissor') or address
+    if use_spacy and (fields['nome_emissor'] is None or fields['endereco_emissor'] is None):
+        name, address = extract_entities(lines)
+        fields['nome_emissor'] = fields['nome_emissor'] or name
+        fields['endereco_emissor'] = fields['endereco_emissor'] or address
+    return fields
+
+
+def extract_from_textract(summary):
+    """
+    Extrai a NotaFiscal do resultado resumido do Textract (summarize_expense).
+
+    Parâmetros:
+        summary (dict): {'summary': {tipo: texto}, 'text': linhas, ...}.
+    """
+    return extract_nota_fiscal(summary.get('summary'), summary.get('text'))